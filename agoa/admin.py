@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Airline, Airport, Flight, Turnaround
+from .models import Airline, Airport, Flight, Turnaround, TurnaroundDailyStats
 
 
 @admin.register(Airline)
@@ -34,3 +34,12 @@ class TurnaroundAdmin(admin.ModelAdmin):
     """Configure Turnaround list view with connected flights and timing."""
 
     list_display = ("arrival_flight", "departure_flight", "airport", "scheduled_start")
+
+
+@admin.register(TurnaroundDailyStats)
+class TurnaroundDailyStatsAdmin(admin.ModelAdmin):
+    """Configure the daily statistics rollup as a read-mostly list."""
+
+    list_display = ("date", "airport", "airline", "turnaround_count", "actual_count")
+    list_filter = ("airport", "airline")
+    date_hierarchy = "date"
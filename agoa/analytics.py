@@ -0,0 +1,355 @@
+"""
+Columnar punctuality analytics with NumPy.
+
+The flights or turnarounds of a date range are read in one query into
+NumPy arrays: times as epoch seconds computed by the database (NaN when
+unknown) and airlines and airports as small ints indexing a table of IATA
+codes. Delay distributions, top-N longest flights and per-group figures
+are then whole-array operations, with no Python loop over rows.
+
+Percentiles use the nearest-rank method, like ``agoa.stats``. NumPy is an
+optional dependency: without it ``analytics_available()`` is False and the
+API actions answer 501.
+"""
+
+from datetime import date
+from typing import Any, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, FloatField, Func, QuerySet
+
+from .models import Airline, Airport, Flight, Turnaround
+from .stats import PERCENTILES
+from .utils import days_bounds
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+# ?group_by= values of each analysis
+FLIGHT_GROUPS = ("airline", "departure_airport", "arrival_airport")
+TURNAROUND_GROUPS = ("airport", "airline")
+
+# Upper bounds, in minutes, of the buckets of the delay histograms; the
+# first bucket holds early flights and the last everything above
+DELAY_BUCKETS = (0, 15, 30, 60, 120, 180)
+
+
+def analytics_available() -> bool:
+    return np is not None
+
+
+class EpochSeconds(Func):
+    """Seconds since the epoch of a datetime column, as a float"""
+
+    template = "EXTRACT(EPOCH FROM %(expressions)s)"
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler: Any, connection: Any, **extra: Any) -> Any:
+        # Datetimes are stored as UTC text
+        return self.as_sql(
+            compiler,
+            connection,
+            template="(julianday(%(expressions)s) - 2440587.5) * 86400.0",
+            **extra,
+        )
+
+    def as_mysql(self, compiler: Any, connection: Any, **extra: Any) -> Any:
+        return self.as_sql(
+            compiler, connection, template="UNIX_TIMESTAMP(%(expressions)s)", **extra
+        )
+
+
+def _read_columns(queryset: QuerySet, columns: dict[str, Any]) -> dict[str, Any]:
+    """
+    Named float64 columns of ``queryset``, NaN where NULL.
+
+    The query runs on a plain cursor: Django's per-value converters would
+    cost more than the whole NumPy side.
+    """
+    query = queryset.values_list(*columns.values()).query
+    sql, params = query.get_compiler(queryset.db).as_sql()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    if not rows:
+        return {name: np.empty(0) for name in columns}
+    # julianday() is only precise to a few microseconds: keep milliseconds
+    table = np.round(np.array(rows, dtype=np.float64), 3)
+    return {name: table[:, i] for i, name in enumerate(columns)}
+
+
+def _categories(model: type, *id_columns: Any) -> tuple[list[Any], Any]:
+    """Small ints for foreign key columns, and the IATA code of each"""
+    ids = np.concatenate(id_columns) if id_columns else np.empty(0)
+    unique, inverse = np.unique(ids, return_inverse=True)
+    codes = dict(
+        model.objects.filter(pk__in=unique.astype(np.int64).tolist()).values_list(
+            "pk", "iata_code"
+        )
+    )
+    labels = np.array([codes.get(int(pk), "") for pk in unique], dtype=object)
+    splits = np.cumsum([len(column) for column in id_columns])[:-1]
+    return np.split(inverse.astype(np.int32), splits), labels
+
+
+def _float(value: Any) -> Optional[float]:
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def distribution(minutes: Any) -> dict[str, Any]:
+    """Count, mean and percentiles of the known values"""
+    known = minutes[~np.isnan(minutes)]
+    summary: dict[str, Any] = {
+        "count": int(known.size),
+        "average_minutes": _float(known.mean()) if known.size else None,
+    }
+    values = (
+        np.percentile(known, PERCENTILES, method="inverted_cdf")
+        if known.size
+        else [None] * len(PERCENTILES)
+    )
+    for p, value in zip(PERCENTILES, values):
+        summary[f"p{p}_minutes"] = None if value is None else float(value)
+    return summary
+
+
+def grouped_distributions(
+    minutes: Any, groups: Any, group_count: int
+) -> list[dict[str, Any]]:
+    """
+    ``distribution`` of the known values of each group, in one pass.
+
+    The values are sorted by (group, value); each group's percentiles are
+    then read at its offset plus its nearest rank, ``ceil(count * p / 100)``.
+    """
+    known = ~np.isnan(minutes)
+    values, keys = minutes[known], groups[known]
+    counts = np.bincount(keys, minlength=group_count)
+    sums = np.bincount(keys, weights=values, minlength=group_count)
+    values = values[np.lexsort((values, keys))]
+    starts = np.cumsum(counts) - counts
+    averages = np.divide(
+        sums, counts, out=np.full(group_count, np.nan), where=counts > 0
+    )
+    percentiles = {}
+    for p in PERCENTILES:
+        ranks = (counts * p + 99) // 100
+        picked = np.full(group_count, np.nan)
+        present = counts > 0
+        picked[present] = values[starts[present] + ranks[present] - 1]
+        percentiles[p] = picked
+    return [
+        {
+            "count": int(counts[g]),
+            "average_minutes": _float(averages[g]),
+            **{f"p{p}_minutes": _float(percentiles[p][g]) for p in PERCENTILES},
+        }
+        for g in range(group_count)
+    ]
+
+
+def histogram(minutes: Any) -> list[dict[str, Any]]:
+    """Counts of the known values per ``DELAY_BUCKETS`` bucket"""
+    known = minutes[~np.isnan(minutes)]
+    edges = np.array([-np.inf, *DELAY_BUCKETS, np.inf])
+    # Buckets are (low, high]: a flight 15 minutes late is in "0-15"
+    counts = np.bincount(
+        np.searchsorted(edges, known, side="left") - 1, minlength=len(edges) - 1
+    )
+    bounds = [None, *DELAY_BUCKETS, None]
+    return [
+        {"above_minutes": low, "up_to_minutes": high, "count": int(count)}
+        for low, high, count in zip(bounds, bounds[1:], counts)
+    ]
+
+
+class FlightColumns:
+    """The flights departing from ``first`` to ``last``, column by column"""
+
+    def __init__(self, first: date, last: date) -> None:
+        start, end = days_bounds(first, last)
+        flights = Flight.objects.filter(
+            scheduled_departure__gte=start, scheduled_departure__lt=end
+        )
+        columns = _read_columns(
+            flights,
+            {
+                "id": F("id"),
+                "airline": F("airline_id"),
+                "departure_airport": F("departure_airport_id"),
+                "arrival_airport": F("arrival_airport_id"),
+                "scheduled_departure": EpochSeconds("scheduled_departure"),
+                "actual_departure": EpochSeconds("actual_departure"),
+                "scheduled_arrival": EpochSeconds("scheduled_arrival"),
+                "actual_arrival": EpochSeconds("actual_arrival"),
+            },
+        )
+        self.ids = columns["id"].astype(np.int64)
+        (self.airline,), self.airline_codes = _categories(Airline, columns["airline"])
+        (self.departure_airport, self.arrival_airport), self.airport_codes = (
+            _categories(
+                Airport, columns["departure_airport"], columns["arrival_airport"]
+            )
+        )
+        self.departure_delay = (
+            columns["actual_departure"] - columns["scheduled_departure"]
+        ) / 60
+        self.arrival_delay = (
+            columns["actual_arrival"] - columns["scheduled_arrival"]
+        ) / 60
+        actual = columns["actual_arrival"] - columns["actual_departure"]
+        scheduled = columns["scheduled_arrival"] - columns["scheduled_departure"]
+        # Actual block time when both actual times are known
+        self.duration = np.where(np.isnan(actual), scheduled, actual) / 60
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def groups(self, group_by: str) -> tuple[Any, Any]:
+        """Group of each flight and the IATA code of each group"""
+        codes = self.airline_codes if group_by == "airline" else self.airport_codes
+        return getattr(self, group_by), codes
+
+    def on_time_rates(self, groups: Any, group_count: int) -> Any:
+        threshold = settings.AGOA_ON_TIME_THRESHOLD.total_seconds() / 60
+        known = ~np.isnan(self.departure_delay)
+        on_time = known & (self.departure_delay <= threshold)
+        departed = np.bincount(groups[known], minlength=group_count)
+        punctual = np.bincount(groups[on_time], minlength=group_count)
+        return np.divide(
+            punctual, departed, out=np.full(group_count, np.nan), where=departed > 0
+        )
+
+    def longest(self, top: int) -> list[dict[str, Any]]:
+        """The ``top`` longest flights, longest first"""
+        top = min(top, len(self))
+        if not top:
+            return []
+        candidates = np.argpartition(-self.duration, top - 1)[:top]
+        picked = candidates[
+            np.lexsort((self.ids[candidates], -self.duration[candidates]))
+        ]
+        numbers = dict(
+            Flight.objects.filter(pk__in=self.ids[picked].tolist()).values_list(
+                "pk", "flight_number"
+            )
+        )
+        return [
+            {
+                "id": int(self.ids[i]),
+                "flight_number": numbers.get(int(self.ids[i])),
+                "airline": self.airline_codes[self.airline[i]],
+                "departure_airport": self.airport_codes[self.departure_airport[i]],
+                "arrival_airport": self.airport_codes[self.arrival_airport[i]],
+                "duration_minutes": float(self.duration[i]),
+            }
+            for i in picked
+        ]
+
+
+def flight_analytics(
+    first: date, last: date, group_by: Optional[str] = None, top: int = 10
+) -> dict[str, Any]:
+    """
+    Delay figures and longest flights of the flights departing in a range.
+
+    Delays are actual minus scheduled times, in minutes, over the flights
+    with the actual time known; durations are actual block times, else
+    scheduled. With ``group_by`` (see ``FLIGHT_GROUPS``) the delays are
+    also summarised per airline or airport.
+    """
+    flights = FlightColumns(first, last)
+    threshold = settings.AGOA_ON_TIME_THRESHOLD.total_seconds() / 60
+    departed = flights.departure_delay[~np.isnan(flights.departure_delay)]
+    result: dict[str, Any] = {
+        "count": len(flights),
+        "departure_delay": distribution(flights.departure_delay),
+        "arrival_delay": distribution(flights.arrival_delay),
+        "on_time_departure_rate": (
+            float(np.count_nonzero(departed <= threshold) / departed.size)
+            if departed.size
+            else None
+        ),
+        "departure_delay_histogram": histogram(flights.departure_delay),
+        "longest_flights": flights.longest(top),
+    }
+    if group_by:
+        groups, codes = flights.groups(group_by)
+        departures = grouped_distributions(flights.departure_delay, groups, len(codes))
+        arrivals = grouped_distributions(flights.arrival_delay, groups, len(codes))
+        rates = flights.on_time_rates(groups, len(codes))
+        counts = np.bincount(groups, minlength=len(codes))
+        result["groups"] = sorted(
+            (
+                {
+                    group_by: codes[g],
+                    "count": int(counts[g]),
+                    "departure_delay": departures[g],
+                    "arrival_delay": arrivals[g],
+                    "on_time_departure_rate": _float(rates[g]),
+                }
+                for g in range(len(codes))
+            ),
+            key=lambda row: row[group_by],
+        )
+    return result
+
+
+def turnaround_analytics(
+    first: date, last: date, group_by: Optional[str] = None
+) -> dict[str, Any]:
+    """
+    Scheduled and actual durations of the turnarounds starting in a range,
+    and their difference (actual - scheduled), overall and per airport or
+    airline of the arrival flight (see ``TURNAROUND_GROUPS``).
+    """
+    start, end = days_bounds(first, last)
+    turnarounds = Turnaround.objects.filter(
+        scheduled_start__gte=start, scheduled_start__lt=end
+    )
+    columns = _read_columns(
+        turnarounds,
+        {
+            "airport": F("airport_id"),
+            "airline": F("arrival_flight__airline"),
+            "scheduled_start": EpochSeconds("scheduled_start"),
+            "scheduled_end": EpochSeconds("scheduled_end"),
+            "actual_start": EpochSeconds("actual_start"),
+            "actual_end": EpochSeconds("actual_end"),
+        },
+    )
+    scheduled = (columns["scheduled_end"] - columns["scheduled_start"]) / 60
+    actual = (columns["actual_end"] - columns["actual_start"]) / 60
+    durations = {
+        "scheduled_duration": scheduled,
+        "actual_duration": actual,
+        "duration_delta": actual - scheduled,
+    }
+    result: dict[str, Any] = {
+        "count": int(scheduled.size),
+        **{name: distribution(values) for name, values in durations.items()},
+    }
+    if group_by:
+        model = Airport if group_by == "airport" else Airline
+        (groups,), codes = _categories(model, columns[group_by])
+        counts = np.bincount(groups, minlength=len(codes))
+        summaries = {
+            name: grouped_distributions(values, groups, len(codes))
+            for name, values in durations.items()
+        }
+        result["groups"] = sorted(
+            (
+                {
+                    group_by: codes[g],
+                    "count": int(counts[g]),
+                    **{name: summaries[name][g] for name in durations},
+                }
+                for g in range(len(codes))
+            ),
+            key=lambda row: row[group_by],
+        )
+    return result
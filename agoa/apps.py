@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class AgoaConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "agoa"
+
+    def ready(self) -> None:
+        from . import database, metrics, signals  # noqa: F401
@@ -0,0 +1,242 @@
+"""
+Async read endpoints for the hot turnaround and flight queries.
+
+These are plain Django async views, served natively under ASGI
+(``agoa.asgi``): while a query runs, the worker's event loop keeps serving
+other requests instead of pinning a thread. They return the same bodies as
+their synchronous DRF counterparts in ``agoa.views``:
+
+- GET /api/async/turnarounds/by_date_and_airport/?date=YYYY-MM-DD&airport=XXX
+- GET /api/async/turnarounds/average_duration/?date=YYYY-MM-DD&group_by=airport
+- GET /api/async/flights/lookup/?flight_number=AF001&date=YYYY-MM-DD
+
+It also serves the Server-Sent Events stream of turnaround and flight
+changes at an airport (see ``agoa.push``):
+
+- GET /api/async/turnarounds/stream/?airport=XXX
+"""
+
+import asyncio
+from functools import wraps
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from asgiref.sync import sync_to_async
+from authentication.permissions import HasTokenScope
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    NotAuthenticated,
+    PermissionDenied,
+)
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .models import Airport, Flight, Turnaround
+from .push import Subscription, broker
+from .renderers import FastJSONRenderer
+from .serializers import FlightSerializer, RowSerializer, TurnaroundSerializer
+from .stats import (
+    DURATION_GROUPS,
+    arollup_duration_averages,
+    aturnaround_duration_stats,
+    merge_percentiles,
+)
+from .utils import parse_date
+from .views import average_duration_payload, flight_lookup_queryset, parse_expand
+
+AsyncView = Callable[..., Awaitable[HttpResponse]]
+
+
+def json_response(
+    data: Any, status_code: int = status.HTTP_200_OK, fast_rendering: bool = False
+) -> HttpResponse:
+    """Render ``data`` exactly as DRF's JSONRenderer does for the sync views"""
+    renderer_context = {"fast_rendering": fast_rendering}
+    return HttpResponse(
+        FastJSONRenderer().render(data, renderer_context=renderer_context),
+        status=status_code,
+        content_type="application/json",
+    )
+
+
+def error(message: str, status_code: int = status.HTTP_400_BAD_REQUEST):
+    return json_response({"error": message}, status_code)
+
+
+def async_api_view(view: AsyncView) -> AsyncView:
+    """
+    Authenticate an async GET view like the DRF views are.
+
+    The configured DRF authentication classes run in a worker thread (they
+    may query the user table), unauthenticated requests get a 401 and tokens
+    without the "read" scope a 403. The view receives a DRF ``Request`` so it
+    can read ``query_params``.
+    """
+
+    @wraps(view)
+    async def wrapper(request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+        if request.method != "GET":
+            return error("Method not allowed", status.HTTP_405_METHOD_NOT_ALLOWED)
+        authenticators = [
+            authenticator()
+            for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ]
+        drf_request = Request(request, authenticators=authenticators)
+        try:
+            user = await sync_to_async(lambda: drf_request.user)()
+            if not user or not user.is_authenticated:
+                raise NotAuthenticated()
+            permission = HasTokenScope()
+            if not permission.has_permission(drf_request, view):
+                raise PermissionDenied(permission.message)
+            return await view(drf_request, *args, **kwargs)
+        except APIException as exc:
+            return _exception_response(exc, authenticators)
+
+    return wrapper
+
+
+def _exception_response(exc: APIException, authenticators: list) -> HttpResponse:
+    # Same body and headers as DRF's default exception handler
+    detail = exc.detail
+    data = detail if isinstance(detail, (list, dict)) else {"detail": detail}
+    response = json_response(data, exc.status_code)
+    if isinstance(exc, (AuthenticationFailed, NotAuthenticated)):
+        header = authenticators[0].authenticate_header(None) if authenticators else None
+        if header:
+            response["WWW-Authenticate"] = header
+        else:
+            response.status_code = status.HTTP_403_FORBIDDEN
+    return response
+
+
+@async_api_view
+async def turnarounds_by_date_and_airport(request: Request) -> HttpResponse:
+    """Async version of TurnaroundViewSet.by_date_and_airport"""
+    day = request.query_params.get("date")
+    airport_code = request.query_params.get("airport")
+    if not day or not airport_code:
+        return error("Date and airport parameters are required")
+    try:
+        day = parse_date(day)
+    except ValueError:
+        return error("Invalid date format. Use YYYY-MM-DD")
+
+    expand = parse_expand(request.query_params, TurnaroundSerializer)
+    turnarounds = Turnaround.objects.scheduled_on(day).at_airport(airport_code)
+    row_serializer = (
+        None if expand else RowSerializer.for_serializer(TurnaroundSerializer)
+    )
+    if row_serializer is not None:
+        values = row_serializer.values(turnarounds)
+        rows = [row async for row in values.aiterator()]
+        data = row_serializer.to_representation(rows, using=turnarounds.db)
+        return json_response(data, fast_rendering=True)
+
+    paths = TurnaroundSerializer.select_related_paths(expand)
+    if paths:
+        turnarounds = turnarounds.select_related(*paths)
+
+    rows = [turnaround async for turnaround in turnarounds.aiterator()]
+    serializer = TurnaroundSerializer(rows, many=True, context={"expand": expand})
+    return json_response(serializer.data)
+
+
+@async_api_view
+async def turnarounds_average_duration(request: Request) -> HttpResponse:
+    """Async version of TurnaroundViewSet.average_duration"""
+    day = request.query_params.get("date")
+    group_by = request.query_params.get("group_by")
+    if not day:
+        return error("Date parameter is required")
+    try:
+        day = parse_date(day)
+    except ValueError:
+        return error("Invalid date format. Use YYYY-MM-DD")
+    if group_by and group_by not in DURATION_GROUPS:
+        return error("Invalid group_by. Use airport or airline")
+
+    stats = await arollup_duration_averages(day, day, group_by)
+    if not stats:
+        return error("No turnarounds found for this date", status.HTTP_404_NOT_FOUND)
+
+    if request.query_params.get("percentiles") not in ("0", "false"):
+        live = await aturnaround_duration_stats(
+            Turnaround.objects.scheduled_on(day), group_by
+        )
+        stats = merge_percentiles(stats, live, group_by)
+
+    return json_response(average_duration_payload(day, group_by, stats))
+
+
+@async_api_view
+async def flight_lookup(request: Request) -> HttpResponse:
+    """Async version of FlightViewSet.lookup"""
+    try:
+        flights = flight_lookup_queryset(Flight.objects.all(), request.query_params)
+    except ValueError as exc:
+        return error(str(exc))
+
+    expand = parse_expand(request.query_params, FlightSerializer)
+    paths = FlightSerializer.select_related_paths(expand)
+    if paths:
+        flights = flights.select_related(*paths)
+
+    try:
+        flight = await flights.aget()
+    except Flight.DoesNotExist:
+        return error("Flight not found", status.HTTP_404_NOT_FOUND)
+    except Flight.MultipleObjectsReturned:
+        return error("Several flights match. Pass the airline parameter")
+
+    return json_response(FlightSerializer(flight, context={"expand": expand}).data)
+
+
+@async_api_view
+async def turnaround_stream(request: Request) -> HttpResponse:
+    """
+    Stream changes of the turnarounds and flights of an airport.
+
+    Each batch of changes is a ``changes`` event whose data is the JSON
+    rendered by ``agoa.push.render_changes``. A ``reload`` event means the
+    client fell behind and changes were dropped: it should fetch the
+    turnarounds again. Comment lines are sent every ``AGOA_PUSH_HEARTBEAT``
+    while nothing changes.
+    """
+    airport_code = request.query_params.get("airport")
+    if not airport_code:
+        return error("Airport parameter is required")
+    airport = await Airport.objects.filter(iata_code=airport_code).afirst()
+    if airport is None:
+        return error("Airport not found", status.HTTP_404_NOT_FOUND)
+
+    subscription = broker.subscribe(airport.pk)
+    response = StreamingHttpResponse(
+        _event_stream(subscription, airport.iata_code),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+async def _event_stream(
+    subscription: Subscription, airport_code: str
+) -> AsyncIterator[str]:
+    heartbeat = settings.AGOA_PUSH_HEARTBEAT.total_seconds()
+    try:
+        yield f'event: subscribed\ndata: {{"airport": "{airport_code}"}}\n\n'
+        while True:
+            try:
+                event, data = await asyncio.wait_for(subscription.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {event}\ndata: {data}\n\n"
+    finally:
+        # Runs when the client disconnects and the server closes the stream
+        broker.unsubscribe(subscription)
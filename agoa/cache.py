@@ -0,0 +1,117 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from django.conf import settings
+from django.db import models
+
+from .models import Airline, Airport
+from .utils import shared_cache
+
+
+class ReferenceCache:
+    """
+    Per-process LRU cache for a small, rarely changing model.
+
+    Entries are stored under the model's current version, and any change to
+    the table bumps that version. When ``AGOA_REFERENCE_CACHE_ALIAS`` names a
+    shared Django cache (see ``shared_cache``), the version and its timestamp
+    live there, so every worker process sees a change at once. Otherwise they
+    are process-local and also bumped every ``AGOA_REFERENCE_CACHE_TTL``
+    seconds, so changes made by other workers are served within that time.
+    """
+
+    def __init__(self, model: type[models.Model], maxsize: int) -> None:
+        self.model = model
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self._local_version = (int(time.time() * 1000), time.time())
+        self._local_refreshed = time.monotonic()
+        self._key = f"agoa:reference-cache:{model._meta.label_lower}"
+
+    @property
+    def _shared(self) -> Any:
+        return shared_cache(settings.AGOA_REFERENCE_CACHE_ALIAS)
+
+    def version(self) -> tuple[int, float]:
+        """Current ``(version, last modified timestamp)`` of the table"""
+        shared = self._shared
+        if shared is None:
+            with self._lock:
+                age = time.monotonic() - self._local_refreshed
+                if age >= settings.AGOA_REFERENCE_CACHE_TTL:
+                    # Another worker may have changed the table meanwhile
+                    self._set_local_version(self._local_version[0] + 1)
+                return self._local_version
+        state = shared.get(self._key)
+        if state is None:
+            # Evicted or never set: start from a version no entry can hold
+            state = (int(time.time() * 1000), time.time())
+            shared.add(self._key, state, None)
+            state = shared.get(self._key, state)
+        return state
+
+    def invalidate(self) -> None:
+        """Mark every cached entry of the model as stale"""
+        version, _ = self.version()
+        shared = self._shared
+        with self._lock:
+            state = self._set_local_version(version + 1)
+        if shared is not None:
+            shared.set(self._key, state, None)
+
+    def _set_local_version(self, version: int) -> tuple[int, float]:
+        # Called with the lock held
+        self._local_version = (version, time.time())
+        self._local_refreshed = time.monotonic()
+        self._entries.clear()
+        return self._local_version
+
+    def get_or_set(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the entry for ``key``, computing it on a miss"""
+        versioned = (self.version()[0], key)
+        with self._lock:
+            if versioned in self._entries:
+                self._entries.move_to_end(versioned)
+                return self._entries[versioned]
+        value = compute()
+        with self._lock:
+            self._entries[versioned] = value
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def get_object(self, pk: Any) -> models.Model:
+        """
+        Return the instance with primary key ``pk``.
+
+        Raises ``model.DoesNotExist``, or ``ValueError``/``TypeError`` for a
+        malformed key. Callers get their own copy of the cached instance.
+        """
+        pk = int(pk)
+        instance = self.get_or_set(
+            ("object", pk), lambda: self.model._default_manager.get(pk=pk)
+        )
+        return copy.copy(instance)
+
+    def id_for_code(self, iata_code: str) -> Optional[int]:
+        """Primary key of the row with ``iata_code``, or None if there is none"""
+        return self.get_or_set(
+            ("code", iata_code),
+            lambda: self.model._default_manager.filter(iata_code=iata_code)
+            .values_list("pk", flat=True)
+            .first(),
+        )
+
+
+REFERENCE_CACHES = {
+    model: ReferenceCache(model, settings.AGOA_REFERENCE_CACHE_SIZE)
+    for model in (Airline, Airport)
+}
+
+
+def reference_cache_for(model: type[models.Model]) -> Optional[ReferenceCache]:
+    return REFERENCE_CACHES.get(model)
@@ -0,0 +1,89 @@
+"""
+SQLite tuning and read routing for the production database profile.
+
+``configure_sqlite`` runs the ``AGOA_SQLITE_PRAGMAS`` on every new SQLite
+connection: WAL lets readers and the writer work concurrently, and the busy
+timeout makes writers queue instead of failing. Connections to the aliases
+of ``AGOA_READ_DATABASES`` are then made read-only.
+
+``ReadReplicaRouter`` sends the reads made inside ``read_from_replicas()``
+to one of those aliases, as the viewsets do for safe requests, and every
+other query to the default database.
+"""
+
+import contextvars
+import random
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_use_replicas: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "agoa_use_replicas", default=False
+)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender: Any, connection: Any, **kwargs: Any) -> None:
+    if connection.vendor != "sqlite":
+        return
+    pragmas = dict(settings.AGOA_SQLITE_PRAGMAS)
+    read_only = connection.alias in settings.AGOA_READ_DATABASES
+    # The DB-API connection, so that the pragmas are not counted as queries
+    execute = connection.connection.execute
+    journal_mode = pragmas.pop("journal_mode", None)
+    if journal_mode is not None:
+        # Kept in the database file: only the first connection changes it
+        current = execute("PRAGMA journal_mode").fetchone()[0]
+        if current.lower() not in (journal_mode.lower(), "memory"):
+            execute(f"PRAGMA journal_mode = {journal_mode}")
+    for name, value in pragmas.items():
+        execute(f"PRAGMA {name} = {value}")
+    if read_only:
+        execute("PRAGMA query_only = ON")
+
+
+@contextmanager
+def read_from_replicas() -> Iterator[None]:
+    """Route the reads made in the block to ``AGOA_READ_DATABASES``"""
+    token = _use_replicas.set(True)
+    try:
+        yield
+    finally:
+        _use_replicas.reset(token)
+
+
+class ReadReplicaRouter:
+    """
+    Database router reading from replicas inside ``read_from_replicas()``.
+
+    Reads stay on the default database outside that block, within a
+    transaction (which may have written rows a replica cannot see yet) and
+    for rows related to an instance loaded from it.
+    """
+
+    def db_for_read(self, model: Any, **hints: Any) -> Optional[str]:
+        replicas = settings.AGOA_READ_DATABASES
+        if not replicas or not _use_replicas.get():
+            return None
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model: Any, **hints: Any) -> Optional[str]:
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1: Any, obj2: Any, **hints: Any) -> Optional[bool]:
+        # Replicas hold the same rows as the default database
+        return True
+
+    def allow_migrate(self, db: str, app_label: str, **hints: Any) -> Optional[bool]:
+        if db in settings.AGOA_READ_DATABASES:
+            return False
+        return None
@@ -0,0 +1,84 @@
+import csv
+import json
+from datetime import datetime
+from typing import Any, Iterable, Iterator, Sequence
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# Exported column name -> ORM lookup read with values_list()
+FLIGHT_EXPORT_COLUMNS = {
+    "id": "id",
+    "flight_number": "flight_number",
+    "airline": "airline__iata_code",
+    "departure_airport": "departure_airport__iata_code",
+    "arrival_airport": "arrival_airport__iata_code",
+    "scheduled_departure": "scheduled_departure",
+    "actual_departure": "actual_departure",
+    "scheduled_arrival": "scheduled_arrival",
+    "actual_arrival": "actual_arrival",
+}
+
+TURNAROUND_EXPORT_COLUMNS = {
+    "id": "id",
+    "airport": "airport__iata_code",
+    "arrival_flight": "arrival_flight_id",
+    "departure_flight": "departure_flight_id",
+    "scheduled_start": "scheduled_start",
+    "actual_start": "actual_start",
+    "scheduled_end": "scheduled_end",
+    "actual_end": "actual_end",
+}
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller"""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _format(value: Any) -> Any:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+    return value
+
+
+def _csv_lines(columns: Sequence[str], rows: Iterable[tuple]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(["" if v is None else _format(v) for v in row])
+
+
+def _ndjson_lines(columns: Sequence[str], rows: Iterable[tuple]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(dict(zip(columns, map(_format, row)))) + "\n"
+
+
+def stream_export(
+    queryset: QuerySet, columns: dict[str, str], output: str, filename: str
+) -> StreamingHttpResponse:
+    """
+    Stream ``queryset`` as CSV or NDJSON without materialising it.
+
+    Rows are fetched as tuples with ``values_list`` through a server-side
+    ``iterator`` in chunks of ``AGOA_EXPORT_CHUNK_SIZE``, so memory use does
+    not depend on the number of rows exported.
+    """
+    rows = queryset.values_list(*columns.values())
+    rows = rows.iterator(chunk_size=settings.AGOA_EXPORT_CHUNK_SIZE)
+    lines = _csv_lines if output == "csv" else _ndjson_lines
+    response = StreamingHttpResponse(
+        lines(list(columns), rows), content_type=EXPORT_CONTENT_TYPES[output]
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{output}"'
+    return response
@@ -0,0 +1,178 @@
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from .models import Airline, Airport, Flight, Tombstone, Turnaround
+from .parsers import decoded
+from .push import publish_flights
+from .serializers import FlightBulkRowSerializer
+from .stats import refresh_daily_stats, turnaround_keys
+from .status import propagate_flight_times
+from .utils import batched
+
+FLIGHT_KEY_FIELDS = ["flight_number", "airline", "scheduled_departure"]
+FLIGHT_UPDATE_FIELDS = [
+    "departure_airport",
+    "arrival_airport",
+    "scheduled_arrival",
+    "actual_departure",
+    "actual_arrival",
+    # Set by bulk_create on the new values (auto_now)
+    "updated_at",
+]
+
+
+@dataclass
+class BulkResult:
+    """Outcome of a bulk upload, reported back to the client"""
+
+    received: int = 0
+    upserted: int = 0
+    errors: list[dict[str, Any]] = field(default_factory=list)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "received": self.received,
+            "upserted": self.upserted,
+            "failed": len(self.errors),
+            "errors": self.errors,
+        }
+
+
+def upsert_flights(rows: Iterable[Any], batch_size: int | None = None) -> BulkResult:
+    """
+    Validate and upsert flight rows, ``batch_size`` rows at a time.
+
+    Each batch resolves its airline and airport IATA codes with one query per
+    table and is written with a single ``INSERT ... ON CONFLICT DO UPDATE``
+    keyed on (flight_number, airline, scheduled_departure). Invalid rows,
+    undecodable NDJSON lines included, are reported with their 0-based
+    position and do not stop the load.
+    """
+    batch_size = batch_size or settings.AGOA_BULK_BATCH_SIZE
+    result = BulkResult()
+    for batch in batched(rows, batch_size):
+        offset = result.received
+        result.received += len(batch)
+        result.upserted += _upsert_batch(batch, offset, result.errors)
+    result.errors.sort(key=lambda error: error["row"])
+    return result
+
+
+def _upsert_batch(batch: list[Any], offset: int, errors: list[dict[str, Any]]) -> int:
+    row_serializer = FlightBulkRowSerializer()
+    valid: list[tuple[int, dict[str, Any]]] = []
+    for index, row in enumerate(batch, start=offset):
+        try:
+            valid.append((index, row_serializer.run_validation(decoded(row))))
+        except ValidationError as exc:
+            errors.append({"row": index, "errors": exc.detail})
+
+    airlines = dict(
+        Airline.objects.filter(
+            iata_code__in={row["airline"] for _, row in valid}
+        ).values_list("iata_code", "id")
+    )
+    airports = dict(
+        Airport.objects.filter(
+            iata_code__in={row["departure_airport"] for _, row in valid}
+            | {row["arrival_airport"] for _, row in valid}
+        ).values_list("iata_code", "id")
+    )
+
+    # Later rows win when the same flight appears twice in one batch, which
+    # PostgreSQL would otherwise reject inside a single ON CONFLICT statement
+    flights: dict[tuple[Any, ...], Flight] = {}
+    for index, row in valid:
+        unknown = {
+            name: [f"Unknown IATA code '{row[name]}'."]
+            for name, lookup in (
+                ("airline", airlines),
+                ("departure_airport", airports),
+                ("arrival_airport", airports),
+            )
+            if row[name] not in lookup
+        }
+        if unknown:
+            errors.append({"row": index, "errors": unknown})
+            continue
+        flight = Flight(
+            flight_number=row["flight_number"],
+            airline_id=airlines[row["airline"]],
+            departure_airport_id=airports[row["departure_airport"]],
+            arrival_airport_id=airports[row["arrival_airport"]],
+            scheduled_departure=row["scheduled_departure"],
+            scheduled_arrival=row["scheduled_arrival"],
+            actual_departure=row.get("actual_departure"),
+            actual_arrival=row.get("actual_arrival"),
+        )
+        key = (flight.flight_number, flight.airline_id, flight.scheduled_departure)
+        flights[key] = flight
+
+    if flights:
+        with transaction.atomic():
+            airports_before = _flight_airports(flights)
+            Flight.objects.bulk_create(
+                flights.values(),
+                update_conflicts=True,
+                unique_fields=FLIGHT_KEY_FIELDS,
+                update_fields=FLIGHT_UPDATE_FIELDS,
+            )
+            Tombstone.record_moves(
+                "flight",
+                [
+                    pk
+                    for key, (pk, airports) in airports_before.items()
+                    if airports != _airports(flights[key])
+                ],
+            )
+            # bulk_create sends no signals, so copy actual times to the
+            # turnarounds, keep the rollup current and push the changes here
+            upserted = list(flights.values())
+            transaction.on_commit(lambda: publish_flights(upserted))
+            ids = [flight.pk for flight in upserted]
+            propagate_flight_times(ids)
+            refresh_daily_stats(
+                turnaround_keys(
+                    Turnaround.objects.filter(
+                        Q(arrival_flight_id__in=ids) | Q(departure_flight_id__in=ids)
+                    )
+                )
+            )
+    return len(flights)
+
+
+def _airports(flight: Flight) -> tuple[int, int]:
+    return flight.departure_airport_id, flight.arrival_airport_id
+
+
+def _flight_airports(
+    flights: dict[tuple[Any, ...], Flight],
+) -> dict[tuple[Any, ...], tuple[int, tuple[int, int]]]:
+    """
+    Id and airports of the existing flights among ``flights``, by key.
+
+    Upserts cannot change the key columns, but a changed airport moves the
+    flight out of airport filters (see ``Tombstone``).
+    """
+    rows = Flight.objects.filter(
+        flight_number__in={key[0] for key in flights},
+        airline_id__in={key[1] for key in flights},
+        scheduled_departure__in={key[2] for key in flights},
+    ).values_list(
+        "pk",
+        "flight_number",
+        "airline_id",
+        "scheduled_departure",
+        "departure_airport_id",
+        "arrival_airport_id",
+    )
+    return {
+        (number, airline, departure): (pk, (departure_airport, arrival_airport))
+        for pk, number, airline, departure, departure_airport, arrival_airport in rows
+        if (number, airline, departure) in flights
+    }
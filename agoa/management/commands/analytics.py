@@ -0,0 +1,89 @@
+import json
+from typing import Any, Optional
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from agoa.analytics import (
+    FLIGHT_GROUPS,
+    TURNAROUND_GROUPS,
+    analytics_available,
+    flight_analytics,
+    turnaround_analytics,
+)
+from agoa.stats import PERCENTILES
+from agoa.utils import parse_date
+
+
+def _minutes(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+class Command(BaseCommand):
+    help = "Summarise flight delays or turnaround durations over a date range"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--from", dest="first", required=True, help="YYYY-MM-DD")
+        parser.add_argument("--to", dest="last", help="Last day (default --from)")
+        parser.add_argument(
+            "--kind", choices=("flights", "turnarounds"), default="flights"
+        )
+        parser.add_argument(
+            "--group-by",
+            choices=sorted(set(FLIGHT_GROUPS) | set(TURNAROUND_GROUPS)),
+            help="Also summarise per airline or airport",
+        )
+        parser.add_argument(
+            "--top", type=int, default=10, help="Longest flights to list"
+        )
+        parser.add_argument(
+            "--json", action="store_true", help="Print the report as JSON"
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if not analytics_available():
+            raise CommandError("Analytics require NumPy, which is not installed")
+        try:
+            first = parse_date(options["first"])
+            last = parse_date(options["last"]) if options["last"] else first
+        except ValueError:
+            raise CommandError("Invalid date format. Use YYYY-MM-DD")
+        if first > last:
+            raise CommandError("--from must not be after --to")
+
+        group_by = options["group_by"]
+        if options["kind"] == "flights":
+            if group_by and group_by not in FLIGHT_GROUPS:
+                raise CommandError(f"Flights group by {', '.join(FLIGHT_GROUPS)}")
+            report = flight_analytics(first, last, group_by, options["top"])
+            figures = ("departure_delay", "arrival_delay")
+        else:
+            if group_by and group_by not in TURNAROUND_GROUPS:
+                raise CommandError(
+                    f"Turnarounds group by {', '.join(TURNAROUND_GROUPS)}"
+                )
+            report = turnaround_analytics(first, last, group_by)
+            figures = ("scheduled_duration", "actual_duration", "duration_delta")
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"{options['kind'].capitalize()}: {report['count']}")
+        rows = [("all", report)]
+        rows += [(group[group_by], group) for group in report.get("groups", [])]
+        for label, row in rows:
+            for figure in figures:
+                summary = row[figure]
+                percentiles = " ".join(
+                    f"p{p}={_minutes(summary[f'p{p}_minutes'])}" for p in PERCENTILES
+                )
+                self.stdout.write(
+                    f"{label} {figure}: n={summary['count']} "
+                    f"avg={_minutes(summary['average_minutes'])} {percentiles}"
+                )
+        for flight in report.get("longest_flights", []):
+            self.stdout.write(
+                f"longest: {flight['flight_number']} "
+                f"{flight['departure_airport']}-{flight['arrival_airport']} "
+                f"{_minutes(flight['duration_minutes'])} min"
+            )
@@ -0,0 +1,55 @@
+from datetime import timedelta
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from agoa.matching import MatchingRules, match_turnarounds
+from agoa.models import Airport
+from agoa.utils import parse_date
+
+
+class Command(BaseCommand):
+    help = "Pair arriving and departing flights of one airport and day"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("date", help="Day to match, YYYY-MM-DD")
+        parser.add_argument("airport", help="IATA code of the airport")
+        parser.add_argument(
+            "--any-airline",
+            action="store_true",
+            help="Allow pairing flights of different airlines",
+        )
+        parser.add_argument(
+            "--min-ground", type=int, help="Minimum ground time in minutes"
+        )
+        parser.add_argument(
+            "--max-ground", type=int, help="Maximum ground time in minutes"
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Report pairs without saving"
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        try:
+            day = parse_date(options["date"])
+        except ValueError:
+            raise CommandError("Invalid date format. Use YYYY-MM-DD")
+        airport = Airport.objects.filter(iata_code=options["airport"]).first()
+        if airport is None:
+            raise CommandError(f"Unknown airport {options['airport']}")
+
+        rules = {"same_airline": not options["any_airline"]}
+        if options["min_ground"] is not None:
+            rules["min_ground_time"] = timedelta(minutes=options["min_ground"])
+        if options["max_ground"] is not None:
+            rules["max_ground_time"] = timedelta(minutes=options["max_ground"])
+
+        turnarounds = match_turnarounds(
+            day, airport.id, MatchingRules(**rules), dry_run=options["dry_run"]
+        )
+        verb = "Would create" if options["dry_run"] else "Created"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {len(turnarounds)} turnarounds at {airport.iata_code} on {day}"
+            )
+        )
@@ -0,0 +1,21 @@
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from agoa.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = "Delete the tombstones of deleted rows older than AGOA_TOMBSTONE_RETENTION"
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        cutoff = timezone.now() - settings.AGOA_TOMBSTONE_RETENTION
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {deleted} tombstones older than "
+                f"{timezone.localtime(cutoff):%Y-%m-%d %H:%M}"
+            )
+        )
@@ -0,0 +1,48 @@
+from datetime import date
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.utils import timezone
+
+from agoa.models import Turnaround
+from agoa.stats import rebuild_daily_stats
+from agoa.utils import parse_date
+
+
+class Command(BaseCommand):
+    help = "Rebuild the turnaround daily statistics for a date range"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--from", dest="first", help="First day, YYYY-MM-DD")
+        parser.add_argument("--to", dest="last", help="Last day, YYYY-MM-DD")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        try:
+            first = parse_date(options["first"]) if options["first"] else None
+            last = parse_date(options["last"]) if options["last"] else None
+        except ValueError:
+            raise CommandError("Invalid date format. Use YYYY-MM-DD")
+
+        if first is None or last is None:
+            bounds = self._turnaround_days()
+            if bounds is None:
+                self.stdout.write("No turnarounds to aggregate")
+                return
+            first, last = first or bounds[0], last or bounds[1]
+
+        rows = rebuild_daily_stats(first, last)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {rows} daily stats rows from {first} to {last}"
+            )
+        )
+
+    def _turnaround_days(self) -> tuple[date, date] | None:
+        first = Turnaround.objects.order_by("scheduled_start").first()
+        last = Turnaround.objects.order_by("-scheduled_start").first()
+        if first is None or last is None:
+            return None
+        return (
+            timezone.localdate(first.scheduled_start),
+            timezone.localdate(last.scheduled_start),
+        )
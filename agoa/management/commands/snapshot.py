@@ -0,0 +1,67 @@
+import json
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from agoa.snapshot import SNAPSHOT_FORMATS, snapshot_available, write_snapshot
+from agoa.utils import parse_date
+
+
+class Command(BaseCommand):
+    help = (
+        "Write airlines, airports, and flights and turnarounds partitioned by "
+        "day, as Parquet or Arrow files; reruns only rewrite what changed"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--output-dir",
+            default=settings.AGOA_SNAPSHOT_ROOT,
+            help="Snapshot directory (default AGOA_SNAPSHOT_ROOT)",
+        )
+        parser.add_argument("--from", dest="first", help="First day, YYYY-MM-DD")
+        parser.add_argument("--to", dest="last", help="Last day, YYYY-MM-DD")
+        parser.add_argument(
+            "--format", choices=sorted(SNAPSHOT_FORMATS), default="parquet"
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Rewrite every file, changed or not",
+        )
+        parser.add_argument(
+            "--json", action="store_true", help="Print the report as JSON"
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if not snapshot_available():
+            raise CommandError("Snapshots require pyarrow, which is not installed")
+        first = last = None
+        try:
+            if options["first"]:
+                first = parse_date(options["first"])
+                last = parse_date(options["last"]) if options["last"] else first
+            elif options["last"]:
+                raise CommandError("--to requires --from")
+        except ValueError:
+            raise CommandError("Invalid date format. Use YYYY-MM-DD")
+        if first and last and first > last:
+            raise CommandError("--from must not be after --to")
+
+        report = write_snapshot(
+            options["output_dir"], first, last, options["format"], options["full"]
+        )
+        if options["json"]:
+            self.stdout.write(json.dumps(report.as_dict(), indent=2))
+            return
+        for path in report.written:
+            self.stdout.write(f"wrote {path}")
+        for path in report.removed:
+            self.stdout.write(f"removed {path}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {len(report.written)} files ({report.rows} rows), "
+                f"{report.unchanged} unchanged, {len(report.removed)} removed"
+            )
+        )
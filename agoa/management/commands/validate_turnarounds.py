@@ -0,0 +1,72 @@
+import json
+from datetime import timedelta
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from agoa.models import Turnaround
+from agoa.utils import parse_date
+from agoa.validation import VALIDATION_RULES, validate_turnarounds
+
+
+class Command(BaseCommand):
+    help = "Report turnarounds breaking consistency rules over a date range"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--from", dest="first", help="First day, YYYY-MM-DD")
+        parser.add_argument("--to", dest="last", help="Last day, YYYY-MM-DD")
+        parser.add_argument("--airport", help="IATA code of the airport")
+        parser.add_argument(
+            "--rule",
+            action="append",
+            dest="rules",
+            choices=sorted(VALIDATION_RULES),
+            help="Rule to check; repeat for several (default all)",
+        )
+        parser.add_argument(
+            "--min-ground", type=int, help="Minimum connection time in minutes"
+        )
+        parser.add_argument(
+            "--json", action="store_true", help="Print the report as JSON"
+        )
+        parser.add_argument(
+            "--fail",
+            action="store_true",
+            help="Exit with an error status when a rule is broken",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        turnarounds = Turnaround.objects.all()
+        try:
+            if options["first"]:
+                first = parse_date(options["first"])
+                last = parse_date(options["last"]) if options["last"] else first
+                turnarounds = Turnaround.objects.scheduled_between(first, last)
+            elif options["last"]:
+                raise CommandError("--to requires --from")
+        except ValueError:
+            raise CommandError("Invalid date format. Use YYYY-MM-DD")
+        if options["airport"]:
+            turnarounds = turnarounds.at_airport(options["airport"])
+
+        min_ground_time = None
+        if options["min_ground"] is not None:
+            min_ground_time = timedelta(minutes=options["min_ground"])
+        report = validate_turnarounds(turnarounds, options["rules"], min_ground_time)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report.as_dict(), indent=2))
+        else:
+            for violation in report.violations:
+                self.stdout.write(
+                    f"{violation.rule}: turnaround {violation.turnaround} at "
+                    f"{violation.airport}: {violation.detail}"
+                )
+            summary = (
+                f"Checked {report.checked} turnarounds, "
+                f"{len(report.violations)} violations"
+            )
+            style = self.style.ERROR if report.violations else self.style.SUCCESS
+            self.stdout.write(style(summary))
+        if options["fail"] and report.violations:
+            raise CommandError("Turnarounds break consistency rules")
@@ -0,0 +1,162 @@
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Hashable, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Flight, Turnaround
+from .occupancy import TurnaroundTimes, occupancy_cache
+from .push import publish_turnarounds
+from .stats import refresh_daily_stats, turnaround_keys
+from .utils import day_bounds
+
+
+def _default_min_ground_time() -> timedelta:
+    return settings.AGOA_MIN_GROUND_TIME
+
+
+def _default_max_ground_time() -> timedelta:
+    return settings.AGOA_MAX_GROUND_TIME
+
+
+@dataclass(frozen=True)
+class MatchingRules:
+    """How arrivals may be paired with departures"""
+
+    same_airline: bool = True
+    min_ground_time: timedelta = field(default_factory=_default_min_ground_time)
+    max_ground_time: timedelta = field(default_factory=_default_max_ground_time)
+
+
+@dataclass(frozen=True)
+class FlightSlot:
+    """The parts of a flight the matcher needs, read with values_list()"""
+
+    id: int
+    airline_id: int
+    scheduled: datetime
+    actual: Optional[datetime]
+
+
+class _FreeSlots:
+    """
+    Sorted departures from which the earliest free one can be taken.
+
+    ``take_from(i)`` returns the first untaken index >= i. Taken indexes
+    point to their successor and paths are compressed, so a whole sweep
+    costs close to O(n).
+    """
+
+    def __init__(self, departures: list[FlightSlot]) -> None:
+        self.departures = departures
+        self.times = [departure.scheduled for departure in departures]
+        self._next = list(range(len(departures) + 1))
+
+    def first_free(self, index: int) -> int:
+        root = index
+        while self._next[root] != root:
+            root = self._next[root]
+        while self._next[index] != root:
+            self._next[index], index = root, self._next[index]
+        return root
+
+    def take(self, index: int) -> None:
+        self._next[index] = index + 1
+
+
+def match_slots(
+    arrivals: list[FlightSlot], departures: list[FlightSlot], rules: MatchingRules
+) -> list[tuple[FlightSlot, FlightSlot]]:
+    """
+    Pair each arrival with the next free departure allowed by ``rules``.
+
+    Arrivals are swept in time order and each takes the earliest departure
+    leaving at least ``min_ground_time`` and at most ``max_ground_time``
+    after it lands. Departures are bucketed per airline when
+    ``same_airline`` is set and located by binary search, so the sweep is
+    O((arrivals + departures) log departures) rather than a nested loop.
+    """
+    buckets: dict[Hashable, list[FlightSlot]] = {}
+    for departure in sorted(departures, key=lambda slot: (slot.scheduled, slot.id)):
+        key = departure.airline_id if rules.same_airline else None
+        buckets.setdefault(key, []).append(departure)
+    free = {key: _FreeSlots(bucket) for key, bucket in buckets.items()}
+
+    pairs = []
+    for arrival in sorted(arrivals, key=lambda slot: (slot.scheduled, slot.id)):
+        slots = free.get(arrival.airline_id if rules.same_airline else None)
+        if slots is None:
+            continue
+        earliest = arrival.scheduled + rules.min_ground_time
+        index = slots.first_free(bisect_left(slots.times, earliest))
+        if index == len(slots.departures):
+            continue
+        departure = slots.departures[index]
+        if departure.scheduled - arrival.scheduled > rules.max_ground_time:
+            continue
+        slots.take(index)
+        pairs.append((arrival, departure))
+    return pairs
+
+
+def match_turnarounds(
+    day: date, airport_id: int, rules: MatchingRules, dry_run: bool = False
+) -> list[Turnaround]:
+    """
+    Create turnarounds for the flights landing at ``airport_id`` on ``day``.
+
+    Flights already part of a turnaround are left alone. Departures are
+    looked for up to ``max_ground_time`` past the end of the day. Unless
+    ``dry_run`` is set, the turnarounds are written with one bulk insert
+    and the daily statistics rollup is refreshed.
+    """
+    start, end = day_bounds(day)
+    arrivals = Flight.objects.arriving_at(airport_id, day).filter(
+        arrival_turnaround__isnull=True
+    )
+    departures = Flight.objects.filter(
+        departure_airport_id=airport_id,
+        scheduled_departure__gte=start + rules.min_ground_time,
+        scheduled_departure__lt=end + rules.max_ground_time,
+        departure_turnaround__isnull=True,
+    )
+    pairs = match_slots(
+        _slots(arrivals, "scheduled_arrival", "actual_arrival"),
+        _slots(departures, "scheduled_departure", "actual_departure"),
+        rules,
+    )
+    turnarounds = [
+        Turnaround(
+            arrival_flight_id=arrival.id,
+            departure_flight_id=departure.id,
+            airport_id=airport_id,
+            scheduled_start=arrival.scheduled,
+            actual_start=arrival.actual,
+            scheduled_end=departure.scheduled,
+            actual_end=departure.actual,
+        )
+        for arrival, departure in pairs
+    ]
+    if dry_run or not turnarounds:
+        return turnarounds
+
+    with transaction.atomic():
+        Turnaround.objects.bulk_create(turnarounds)
+        # bulk_create sends no signals, so keep the rollup and the occupancy
+        # index current, and push the new turnarounds, here
+        refresh_daily_stats(
+            turnaround_keys(
+                Turnaround.objects.filter(pk__in=[t.pk for t in turnarounds])
+            )
+        )
+        created = [TurnaroundTimes.of(turnaround) for turnaround in turnarounds]
+        transaction.on_commit(lambda: occupancy_cache.apply([], created))
+        transaction.on_commit(lambda: publish_turnarounds(created))
+    return turnarounds
+
+
+def _slots(queryset: Any, scheduled: str, actual: str) -> list[FlightSlot]:
+    rows = queryset.values_list("id", "airline_id", scheduled, actual)
+    return [FlightSlot(*row) for row in rows]
@@ -0,0 +1,377 @@
+"""
+Per-endpoint request metrics, exposed in the Prometheus text format.
+
+``MetricsMiddleware`` times every request and attributes it to the resolved
+view (its URL name, e.g. ``flight-list``) and HTTP method. While a request
+runs, a ``RequestMetrics`` record sits in a context variable: the database
+execute wrapper installed on every connection adds each query's time to it,
+and ``TimedSerializerMixin`` (or ``timed_serialization`` around code
+serializing by hand) adds the time spent serializing. Context variables
+follow the request into ``sync_to_async`` threads, so async views are
+measured as well.
+
+Observations go to rolling histograms covering the last
+``AGOA_METRICS_WINDOW``, served by ``metrics_view`` at ``/api/_metrics``.
+Requests repeating one SQL statement more than
+``AGOA_METRICS_N_PLUS_ONE_THRESHOLD`` times are counted and logged as
+likely N+1 patterns. Work done outside requests reports failures through
+the ``COUNTERS`` (see ``MetricsRegistry.increment``).
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpRequest, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Histogram name -> (help text, buckets)
+HISTOGRAMS = {
+    "agoa_request_duration_seconds": ("Wall time of requests", SECONDS_BUCKETS),
+    "agoa_sql_queries": ("SQL queries per request", QUERY_BUCKETS),
+    "agoa_sql_duration_seconds": ("SQL time per request", SECONDS_BUCKETS),
+    "agoa_serializer_duration_seconds": (
+        "Serializer time per request",
+        SECONDS_BUCKETS,
+    ),
+    "agoa_response_size_bytes": ("Size of non-streaming responses", BYTES_BUCKETS),
+}
+
+# Counter name -> help text, for events outside requests
+COUNTERS = {
+    "agoa_status_flush_failures_total": (
+        "Background flushes of buffered flight status updates that failed"
+    ),
+    "agoa_status_updates_lost_total": (
+        "Buffered flight status updates dropped by failed flushes"
+    ),
+}
+
+
+@dataclass
+class RequestMetrics:
+    """What one request spent, filled in while it runs"""
+
+    sql_count: int = 0
+    sql_time: float = 0.0
+    serializer_time: float = 0.0
+    serializing: bool = False
+    statements: Counter = field(default_factory=Counter)
+
+
+_current: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar(
+    "agoa_request_metrics", default=None
+)
+
+
+def current_request_metrics() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+def _execute_wrapper(
+    execute: Callable, sql: str, params: Any, many: bool, context: dict
+) -> Any:
+    record = _current.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record.sql_time += time.perf_counter() - started
+        record.sql_count += 1
+        # Parameters are separate, so one statement shape is one string
+        record.statements[sql] += 1
+
+
+@receiver(connection_created)
+def install_execute_wrapper(sender: Any, connection: Any, **kwargs: Any) -> None:
+    # The wrapper list outlives reconnections: install once per connection
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_wrapper)
+
+
+class TimedSerializerMixin:
+    """
+    Count the time spent in ``to_representation`` towards the request.
+
+    Only the outermost serializer is timed, so nested serializers are not
+    counted twice. Lazy related lookups made while serializing count as
+    serializer time too (and as SQL time).
+    """
+
+    def to_representation(self, instance: Any) -> Any:
+        with timed_serialization():
+            return super().to_representation(instance)  # type: ignore[misc]
+
+
+@contextmanager
+def timed_serialization() -> Iterator[None]:
+    """Count the time spent in the block as serializer time, unless nested"""
+    record = _current.get()
+    if record is None or record.serializing:
+        yield
+        return
+    record.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record.serializer_time += time.perf_counter() - started
+        record.serializing = False
+
+
+class RollingHistogram:
+    """
+    Bucketed observations over the last ``window`` seconds.
+
+    The window is split into ``slices`` ring slots; an observation lands in
+    the slot of the current slice, which is emptied first when it last held
+    an older slice. A snapshot adds up the slots still within the window.
+    """
+
+    def __init__(self, buckets: tuple, window: float, slices: int) -> None:
+        self.buckets = buckets
+        self.slice_seconds = window / slices
+        # Per slot: [slice number, bucket counts..., +Inf count, sum]
+        self.slots = [[-1] + [0] * (len(buckets) + 1) + [0.0] for _ in range(slices)]
+
+    def _slot(self, now: float) -> list:
+        number = int(now // self.slice_seconds)
+        slot = self.slots[number % len(self.slots)]
+        if slot[0] != number:
+            slot[:] = [number] + [0] * (len(self.buckets) + 1) + [0.0]
+        return slot
+
+    def observe(self, value: float, now: float) -> None:
+        slot = self._slot(now)
+        slot[1 + bisect_left(self.buckets, value)] += 1
+        slot[-1] += value
+
+    def snapshot(self, now: float) -> tuple[list[int], float]:
+        """Cumulative counts per bucket (the last is +Inf) and the sum"""
+        oldest = int(now // self.slice_seconds) - len(self.slots) + 1
+        counts = [0] * (len(self.buckets) + 1)
+        total = 0.0
+        for slot in self.slots:
+            if slot[0] >= oldest:
+                for i, count in enumerate(slot[1:-1]):
+                    counts[i] += count
+                total += slot[-1]
+        for i in range(1, len(counts)):
+            counts[i] += counts[i - 1]
+        return counts, total
+
+
+class MetricsRegistry:
+    """Rolling histograms and N+1 counts per (view, method), and COUNTERS"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._histograms: dict[tuple[str, str], dict[str, RollingHistogram]] = {}
+        self._n_plus_one: Counter = Counter()
+        self._reported: set[tuple[str, str]] = set()
+        self._counters: Counter = Counter()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._n_plus_one.clear()
+            self._reported.clear()
+            self._counters.clear()
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        """Add ``amount`` to one of the ``COUNTERS``"""
+        with self._lock:
+            self._counters[name] += amount
+
+    def counter(self, name: str) -> int:
+        with self._lock:
+            return self._counters[name]
+
+    def record(
+        self,
+        view: str,
+        method: str,
+        duration: float,
+        record: RequestMetrics,
+        size: Optional[int],
+    ) -> None:
+        values = {
+            "agoa_request_duration_seconds": duration,
+            "agoa_sql_queries": record.sql_count,
+            "agoa_sql_duration_seconds": record.sql_time,
+            "agoa_serializer_duration_seconds": record.serializer_time,
+            "agoa_response_size_bytes": size,
+        }
+        repeated = self._repeated_statements(record)
+        now = time.time()
+        with self._lock:
+            histograms = self._histograms.get((view, method))
+            if histograms is None:
+                window = settings.AGOA_METRICS_WINDOW.total_seconds()
+                histograms = self._histograms[(view, method)] = {
+                    name: RollingHistogram(
+                        buckets, window, settings.AGOA_METRICS_SLICES
+                    )
+                    for name, (_, buckets) in HISTOGRAMS.items()
+                }
+            for name, value in values.items():
+                if value is not None:
+                    histograms[name].observe(value, now)
+            if repeated:
+                self._n_plus_one[(view, method)] += 1
+                new = [sql for sql in repeated if (view, sql) not in self._reported]
+                self._reported.update((view, sql) for sql in new)
+            else:
+                new = []
+        for sql in new:
+            logger.warning(
+                "Possible N+1 in %s %s: %d executions of %s",
+                method,
+                view,
+                record.statements[sql],
+                sql[:300],
+            )
+
+    @staticmethod
+    def _repeated_statements(record: RequestMetrics) -> list[str]:
+        threshold = settings.AGOA_METRICS_N_PLUS_ONE_THRESHOLD
+        if record.sql_count <= threshold:
+            return []
+        return [sql for sql, count in record.statements.items() if count > threshold]
+
+    def n_plus_one(self, view: str, method: str) -> int:
+        with self._lock:
+            return self._n_plus_one[(view, method)]
+
+    def render(self) -> str:
+        """The metrics in the Prometheus text exposition format"""
+        now = time.time()
+        window = settings.AGOA_METRICS_WINDOW.total_seconds()
+        with self._lock:
+            snapshots = {
+                key: {name: h.snapshot(now) for name, h in histograms.items()}
+                for key, histograms in sorted(self._histograms.items())
+            }
+            n_plus_one = sorted(self._n_plus_one.items())
+            counters = {name: self._counters[name] for name in COUNTERS}
+
+        lines = []
+        for name, (description, buckets) in HISTOGRAMS.items():
+            lines.append(f"# HELP {name} {description}, over the last {window:g}s")
+            lines.append(f"# TYPE {name} histogram")
+            bounds = [f"{bound:g}" for bound in buckets] + ["+Inf"]
+            for (view, method), histograms in snapshots.items():
+                counts, total = histograms[name]
+                labels = f'view="{_escape(view)}",method="{method}"'
+                for bound, count in zip(bounds, counts):
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f"{name}_sum{{{labels}}} {total:g}")
+                lines.append(f"{name}_count{{{labels}}} {counts[-1]}")
+        lines.append(
+            "# HELP agoa_n_plus_one_total Requests repeating one SQL statement "
+            "more than the N+1 threshold"
+        )
+        lines.append("# TYPE agoa_n_plus_one_total counter")
+        for (view, method), count in n_plus_one:
+            labels = f'view="{_escape(view)}",method="{method}"'
+            lines.append(f"agoa_n_plus_one_total{{{labels}}} {count}")
+        for name, description in COUNTERS.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {counters[name]}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """
+    Record wall time, SQL, serializer time and response size per endpoint.
+
+    Works under WSGI and ASGI. The time of a streaming response is the time
+    to its first byte, and its size is not recorded.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if self.is_async:
+            return self.__acall__(request)
+        record = RequestMetrics()
+        token = _current.set(record)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, record, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        record = RequestMetrics()
+        token = _current.set(record)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, record, time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def _record(
+        request: HttpRequest,
+        response: HttpResponse,
+        record: RequestMetrics,
+        duration: float,
+    ) -> None:
+        match = request.resolver_match
+        if match is not None and match.func is metrics_view:
+            return
+        view = match.view_name if match is not None else "<unresolved>"
+        size = None if response.streaming else len(response.content)
+        registry.record(view, request.method or "", duration, record, size)
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """
+    Serve the metrics to Prometheus.
+
+    When ``AGOA_METRICS_TOKEN`` is set, the scraper must send it as a
+    bearer token; otherwise the endpoint is open, for internal networks.
+    """
+    token = settings.AGOA_METRICS_TOKEN
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponse(status=401, headers={"WWW-Authenticate": "Bearer"})
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
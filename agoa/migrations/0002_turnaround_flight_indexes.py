@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("agoa", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="flight",
+            index=models.Index(
+                fields=["departure_airport", "scheduled_departure"],
+                name="flight_dep_airport_sched_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="flight",
+            index=models.Index(
+                fields=["arrival_airport", "scheduled_arrival"],
+                name="flight_arr_airport_sched_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="turnaround",
+            index=models.Index(
+                fields=["airport", "scheduled_start"],
+                name="turnaround_airport_start_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="turnaround",
+            index=models.Index(fields=["scheduled_start"], name="turnaround_start_idx"),
+        ),
+    ]
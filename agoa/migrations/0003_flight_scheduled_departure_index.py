@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("agoa", "0002_turnaround_flight_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="flight",
+            index=models.Index(
+                fields=["scheduled_departure"], name="flight_sched_dep_idx"
+            ),
+        ),
+    ]
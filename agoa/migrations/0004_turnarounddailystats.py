@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:50
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("agoa", "0003_flight_scheduled_departure_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TurnaroundDailyStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("turnaround_count", models.PositiveIntegerField(default=0)),
+                (
+                    "scheduled_duration",
+                    models.DurationField(default=datetime.timedelta),
+                ),
+                ("actual_count", models.PositiveIntegerField(default=0)),
+                ("actual_duration", models.DurationField(default=datetime.timedelta)),
+                (
+                    "duration_deviation",
+                    models.DurationField(default=datetime.timedelta),
+                ),
+                ("arrival_delay_count", models.PositiveIntegerField(default=0)),
+                ("arrival_delay", models.DurationField(default=datetime.timedelta)),
+                ("departure_delay_count", models.PositiveIntegerField(default=0)),
+                ("departure_delay", models.DurationField(default=datetime.timedelta)),
+                ("on_time_departures", models.PositiveIntegerField(default=0)),
+                (
+                    "airline",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="agoa.airline",
+                    ),
+                ),
+                (
+                    "airport",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="agoa.airport",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "turnaround daily stats",
+                "unique_together": {("date", "airport", "airline")},
+            },
+        ),
+    ]
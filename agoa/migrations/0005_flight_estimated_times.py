@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("agoa", "0004_turnarounddailystats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="flight",
+            name="estimated_arrival",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="flight",
+            name="estimated_departure",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("agoa", "0005_flight_estimated_times"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("model", models.CharField(max_length=20)),
+                ("object_id", models.PositiveIntegerField()),
+                ("deleted_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="flight",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="turnaround",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name="flight",
+            index=models.Index(fields=["updated_at"], name="flight_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="turnaround",
+            index=models.Index(fields=["updated_at"], name="turnaround_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="tombstone",
+            index=models.Index(
+                fields=["model", "deleted_at"], name="tombstone_model_deleted_idx"
+            ),
+        ),
+    ]
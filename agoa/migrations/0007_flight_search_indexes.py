@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("agoa", "0006_updated_at_tombstone"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="flight",
+            index=models.Index(
+                fields=["airline", "scheduled_departure"],
+                name="flight_airline_sched_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="flight",
+            index=models.Index(
+                fields=["departure_airport", "arrival_airport", "scheduled_departure"],
+                name="flight_route_sched_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="flight",
+            index=models.Index(
+                condition=models.Q(
+                    ("estimated_departure__gt", models.F("scheduled_departure")),
+                    ("actual_departure__gt", models.F("scheduled_departure")),
+                    _connector="OR",
+                ),
+                fields=["scheduled_departure"],
+                name="flight_behind_schedule_idx",
+            ),
+        ),
+    ]
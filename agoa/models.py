@@ -1,9 +1,11 @@
-from typing import Any
+from typing import Any, Iterable
 from django.db import models
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
-from datetime import datetime
+from django.utils import timezone
+from datetime import date, datetime, timedelta
 from django.db.models import CharField, ForeignKey, DateTimeField, OneToOneField
+from .utils import day_bounds, days_bounds
 
 
 class Airline(models.Model):
@@ -32,6 +34,77 @@ class Airport(models.Model):
         return f"{self.name} ({self.iata_code})"
 
 
+class FlightQuerySet(models.QuerySet):
+    def departing_between(self, first: date, last: date) -> "FlightQuerySet":
+        """Flights scheduled to leave on any day from ``first`` to ``last``"""
+        start, end = days_bounds(first, last)
+        return self.filter(scheduled_departure__gte=start, scheduled_departure__lt=end)
+
+    def serving_between(
+        self, airport_id: int, first: date, last: date
+    ) -> "FlightQuerySet":
+        """Flights leaving or landing at ``airport_id`` from ``first`` to ``last``"""
+        start, end = days_bounds(first, last)
+        return self.filter(
+            models.Q(
+                departure_airport_id=airport_id,
+                scheduled_departure__gte=start,
+                scheduled_departure__lt=end,
+            )
+            | models.Q(
+                arrival_airport_id=airport_id,
+                scheduled_arrival__gte=start,
+                scheduled_arrival__lt=end,
+            )
+        )
+
+    def numbered_from(self, prefix: str) -> "FlightQuerySet":
+        """Flights whose number starts with ``prefix``, as an index range"""
+        # LIKE 'prefix%' cannot use the index on SQLite: compare instead
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return self.filter(flight_number__gte=prefix, flight_number__lt=upper)
+
+    def delayed(self, threshold: timedelta) -> "FlightQuerySet":
+        """
+        Flights leaving more than ``threshold`` after their scheduled time.
+
+        The actual departure is used once known, else the estimate.
+        """
+        late = models.F("scheduled_departure") + models.Value(
+            threshold, output_field=models.DurationField()
+        )
+        return self.filter(BEHIND_SCHEDULE).filter(
+            models.Q(actual_departure__gt=late)
+            | models.Q(actual_departure__isnull=True, estimated_departure__gt=late)
+        )
+
+    def departing_from(self, airport_id: int, day: date) -> "FlightQuerySet":
+        """Flights scheduled to leave ``airport_id`` on ``day``"""
+        start, end = day_bounds(day)
+        return self.filter(
+            departure_airport_id=airport_id,
+            scheduled_departure__gte=start,
+            scheduled_departure__lt=end,
+        )
+
+    def arriving_at(self, airport_id: int, day: date) -> "FlightQuerySet":
+        """Flights scheduled to land at ``airport_id`` on ``day``"""
+        start, end = day_bounds(day)
+        return self.filter(
+            arrival_airport_id=airport_id,
+            scheduled_arrival__gte=start,
+            scheduled_arrival__lt=end,
+        )
+
+
+# Flights whose departure is, or is expected to be, later than scheduled.
+# Filters on delays include this exact condition so that the partial index
+# flight_behind_schedule_idx can serve them.
+BEHIND_SCHEDULE = models.Q(
+    estimated_departure__gt=models.F("scheduled_departure")
+) | models.Q(actual_departure__gt=models.F("scheduled_departure"))
+
+
 class Flight(models.Model):
     """Flight"""
 
@@ -45,12 +118,49 @@ class Flight(models.Model):
     )
 
     scheduled_departure: models.DateTimeField = models.DateTimeField()
+    # Latest estimate, from status events or propagated down the rotation
+    estimated_departure: models.DateTimeField = models.DateTimeField(
+        null=True, blank=True
+    )
     actual_departure: models.DateTimeField = models.DateTimeField(null=True, blank=True)
     scheduled_arrival: models.DateTimeField = models.DateTimeField()
+    estimated_arrival: models.DateTimeField = models.DateTimeField(
+        null=True, blank=True
+    )
     actual_arrival: models.DateTimeField = models.DateTimeField(null=True, blank=True)
+    # Set on save; bulk writes set it themselves (see ?changed_since=)
+    updated_at: models.DateTimeField = models.DateTimeField(auto_now=True)
+
+    objects = FlightQuerySet.as_manager()
 
     class Meta:
         unique_together = ["flight_number", "airline", "scheduled_departure"]
+        indexes = [
+            models.Index(
+                fields=["departure_airport", "scheduled_departure"],
+                name="flight_dep_airport_sched_idx",
+            ),
+            models.Index(
+                fields=["arrival_airport", "scheduled_arrival"],
+                name="flight_arr_airport_sched_idx",
+            ),
+            models.Index(fields=["scheduled_departure"], name="flight_sched_dep_idx"),
+            models.Index(fields=["updated_at"], name="flight_updated_idx"),
+            # Search: by airline, by route, and delayed flights, per period
+            models.Index(
+                fields=["airline", "scheduled_departure"],
+                name="flight_airline_sched_idx",
+            ),
+            models.Index(
+                fields=["departure_airport", "arrival_airport", "scheduled_departure"],
+                name="flight_route_sched_idx",
+            ),
+            models.Index(
+                fields=["scheduled_departure"],
+                name="flight_behind_schedule_idx",
+                condition=BEHIND_SCHEDULE,
+            ),
+        ]
 
     def __str__(self) -> str:
         airline: Airline = self.airline  # Type annotation helps type checker
@@ -59,6 +169,21 @@ class Flight(models.Model):
         return f"Flight {self.flight_number}"
 
 
+class TurnaroundQuerySet(models.QuerySet):
+    def scheduled_on(self, day: date) -> "TurnaroundQuerySet":
+        """Turnarounds whose scheduled start falls on ``day``"""
+        return self.scheduled_between(day, day)
+
+    def scheduled_between(self, first: date, last: date) -> "TurnaroundQuerySet":
+        """Turnarounds scheduled to start on any day from ``first`` to ``last``"""
+        start, end = days_bounds(first, last)
+        return self.filter(scheduled_start__gte=start, scheduled_start__lt=end)
+
+    def at_airport(self, iata_code: str) -> "TurnaroundQuerySet":
+        """Turnarounds taking place at the airport with ``iata_code``"""
+        return self.filter(airport__iata_code=iata_code)
+
+
 class Turnaround(models.Model):
     """Period between landing and takeoff at the same airport"""
 
@@ -76,11 +201,25 @@ class Turnaround(models.Model):
     actual_start: models.DateTimeField = models.DateTimeField(null=True, blank=True)
     scheduled_end: models.DateTimeField = models.DateTimeField()
     actual_end: models.DateTimeField = models.DateTimeField(null=True, blank=True)
+    # Set on save; bulk writes set it themselves (see ?changed_since=)
+    updated_at: models.DateTimeField = models.DateTimeField(auto_now=True)
+
+    objects = TurnaroundQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["airport", "scheduled_start"],
+                name="turnaround_airport_start_idx",
+            ),
+            models.Index(fields=["scheduled_start"], name="turnaround_start_idx"),
+            models.Index(fields=["updated_at"], name="turnaround_updated_idx"),
+        ]
 
     def clean(self) -> None:
         if (
-            self.arrival_flight.arrival_airport != self.airport
-            or self.departure_flight.departure_airport != self.airport
+            self.arrival_flight.arrival_airport_id != self.airport_id
+            or self.departure_flight.departure_airport_id != self.airport_id
         ):
             raise ValidationError(
                 "Flights must arrive and depart from the same airport as the turnaround"
@@ -88,3 +227,101 @@ class Turnaround(models.Model):
 
     def __str__(self) -> str:
         return f"Turnaround {self.arrival_flight} -> {self.departure_flight}"
+
+
+class TurnaroundDailyStats(models.Model):
+    """
+    Turnaround totals per day, airport and airline (of the arrival flight).
+
+    Rows are kept up to date by signals on Turnaround and Flight, and can be
+    rebuilt with ``manage.py rebuild_turnaround_stats``. Sums are stored
+    rather than averages so that rows can be added up over any date range.
+    """
+
+    date: models.DateField = models.DateField()
+    airport: models.ForeignKey["Airport", Any] = models.ForeignKey(
+        "Airport", related_name="+", on_delete=models.CASCADE
+    )
+    airline: models.ForeignKey["Airline", Any] = models.ForeignKey(
+        "Airline", related_name="+", on_delete=models.CASCADE
+    )
+
+    turnaround_count: models.PositiveIntegerField = models.PositiveIntegerField(
+        default=0
+    )
+    scheduled_duration: models.DurationField = models.DurationField(default=timedelta)
+    # Turnarounds with both actual times set
+    actual_count: models.PositiveIntegerField = models.PositiveIntegerField(default=0)
+    actual_duration: models.DurationField = models.DurationField(default=timedelta)
+    # Sum of |actual duration - scheduled duration| over those turnarounds
+    duration_deviation: models.DurationField = models.DurationField(default=timedelta)
+    # Delays of the arrival and departure flights that have actual times
+    arrival_delay_count: models.PositiveIntegerField = models.PositiveIntegerField(
+        default=0
+    )
+    arrival_delay: models.DurationField = models.DurationField(default=timedelta)
+    departure_delay_count: models.PositiveIntegerField = models.PositiveIntegerField(
+        default=0
+    )
+    departure_delay: models.DurationField = models.DurationField(default=timedelta)
+    on_time_departures: models.PositiveIntegerField = models.PositiveIntegerField(
+        default=0
+    )
+
+    class Meta:
+        unique_together = ["date", "airport", "airline"]
+        verbose_name_plural = "turnaround daily stats"
+
+    def __str__(self) -> str:
+        return f"Turnarounds on {self.date} ({self.turnaround_count})"
+
+
+class Tombstone(models.Model):
+    """
+    A deleted flight or turnaround, or one moved out of some list filters.
+
+    Recorded as rows are deleted, or have a ``FILTER_FIELDS`` value changed
+    (``moved``), so that ``?changed_since=`` clients learn about rows that
+    are gone, or gone from their filtered list. Kept for
+    ``AGOA_TOMBSTONE_RETENTION``; ``manage.py purge_tombstones`` removes
+    older ones.
+    """
+
+    # Model name of the row: "flight" or "turnaround"
+    model: models.CharField = models.CharField(max_length=20)
+    object_id: models.PositiveIntegerField = models.PositiveIntegerField()
+    deleted_at: models.DateTimeField = models.DateTimeField(default=timezone.now)
+    # The row still exists, with other values in FILTER_FIELDS
+    moved: models.BooleanField = models.BooleanField(default=False)
+
+    # Model name -> columns the list filters select rows by (see
+    # flight_search_queryset and by_date_and_airport)
+    FILTER_FIELDS = {
+        "flight": [
+            "flight_number",
+            "airline_id",
+            "departure_airport_id",
+            "arrival_airport_id",
+            "scheduled_departure",
+        ],
+        "turnaround": ["airport_id", "scheduled_start"],
+    }
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["model", "deleted_at"], name="tombstone_model_deleted_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        if self.moved:
+            return f"Moved {self.model} {self.object_id}"
+        return f"Deleted {self.model} {self.object_id}"
+
+    @classmethod
+    def record_moves(cls, model_name: str, ids: Iterable[int]) -> None:
+        """Record that the rows ``ids`` changed values in FILTER_FIELDS"""
+        cls.objects.bulk_create(
+            [cls(model=model_name, object_id=pk, moved=True) for pk in ids]
+        )
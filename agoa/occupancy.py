@@ -0,0 +1,325 @@
+import math
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from heapq import merge
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from .models import Turnaround
+from .utils import day_bounds, shared_cache
+
+OCCUPANCY_KINDS = ("scheduled", "actual")
+
+
+class TurnaroundTimes(NamedTuple):
+    """The parts of a turnaround the occupancy index needs"""
+
+    id: int
+    airport_id: int
+    scheduled_start: datetime
+    scheduled_end: datetime
+    actual_start: Optional[datetime]
+    actual_end: Optional[datetime]
+
+    @classmethod
+    def of(cls, turnaround: Turnaround) -> "TurnaroundTimes":
+        return cls(*(getattr(turnaround, name) for name in cls._fields))
+
+    @classmethod
+    def read(cls, queryset: QuerySet) -> list["TurnaroundTimes"]:
+        return [cls(*row) for row in queryset.values_list(*cls._fields)]
+
+    def interval(self, kind: str) -> Optional[tuple[datetime, datetime]]:
+        start, end = getattr(self, f"{kind}_start"), getattr(self, f"{kind}_end")
+        if start is None or end is None or end <= start:
+            return None
+        return start, end
+
+    def days(self) -> set[date]:
+        """Local days overlapped by the scheduled or actual interval"""
+        days = set()
+        for kind in OCCUPANCY_KINDS:
+            interval = self.interval(kind)
+            if interval is None:
+                continue
+            day = timezone.localdate(interval[0])
+            # The end is exclusive: a turnaround ending at midnight is not
+            # on the ground the next day
+            last = timezone.localdate(interval[1] - timedelta(microseconds=1))
+            while day <= last:
+                days.add(day)
+                day += timedelta(days=1)
+        return days
+
+
+@dataclass
+class OccupancyBucket:
+    """Aircraft on the ground during ``[start, start + resolution)``"""
+
+    start: datetime
+    peak: int
+    average: float
+
+
+class IntervalIndex:
+    """
+    Half-open ``[start, end)`` intervals kept as two sorted lists.
+
+    The number of intervals covering ``t`` is the number of starts at or
+    before ``t`` minus the number of ends at or before it, so point queries
+    are two binary searches and a timeline is one sweep over the merged
+    start and end events. Adding or removing an interval keeps both lists
+    sorted, so the index never has to be rebuilt.
+    """
+
+    def __init__(self) -> None:
+        self.starts: list[datetime] = []
+        self.ends: list[datetime] = []
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def add(self, start: datetime, end: datetime) -> None:
+        insort(self.starts, start)
+        insort(self.ends, end)
+
+    def remove(self, start: datetime, end: datetime) -> None:
+        del self.starts[bisect_left(self.starts, start)]
+        del self.ends[bisect_left(self.ends, end)]
+
+    def copy(self) -> "IntervalIndex":
+        index = IntervalIndex()
+        index.starts, index.ends = self.starts.copy(), self.ends.copy()
+        return index
+
+    def count_at(self, moment: datetime) -> int:
+        return bisect_right(self.starts, moment) - bisect_right(self.ends, moment)
+
+    def _events_after(self, start: datetime) -> Iterator[tuple[datetime, int]]:
+        # Ends sort before starts at the same instant (-1 < +1), so an
+        # aircraft leaving a stand as another arrives is not double counted
+        return merge(
+            ((moment, -1) for moment in self.ends[bisect_right(self.ends, start) :]),
+            ((moment, 1) for moment in self.starts[bisect_right(self.starts, start) :]),
+        )
+
+    def timeline(
+        self, start: datetime, end: datetime, resolution: timedelta
+    ) -> list[OccupancyBucket]:
+        """Peak and time-weighted mean count per ``resolution`` bucket"""
+        events = self._events_after(start)
+        event = next(events, None)
+        level = self.count_at(start)
+        buckets = []
+        bucket_start = start
+        while bucket_start < end:
+            bucket_end = min(bucket_start + resolution, end)
+            while event is not None and event[0] <= bucket_start:
+                level += event[1]
+                event = next(events, None)
+            peak, area, moment = level, 0.0, bucket_start
+            while event is not None and event[0] < bucket_end:
+                area += level * (event[0] - moment).total_seconds()
+                moment = event[0]
+                level += event[1]
+                peak = max(peak, level)
+                event = next(events, None)
+            area += level * (bucket_end - moment).total_seconds()
+            length = (bucket_end - bucket_start).total_seconds()
+            buckets.append(OccupancyBucket(bucket_start, peak, area / length))
+            bucket_start = bucket_end
+        return buckets
+
+    def peak(self, start: datetime, end: datetime) -> tuple[int, Optional[datetime]]:
+        """Highest count within ``[start, end)`` and when it is first reached"""
+        best, best_at = self.count_at(start), start
+        level = best
+        events = self._events_after(start)
+        for moment, delta in events:
+            if moment >= end:
+                break
+            level += delta
+            if level > best:
+                best, best_at = level, moment
+        return best, (best_at if best else None)
+
+
+class AirportDayOccupancy:
+    """Scheduled and actual ground intervals of one airport on one day"""
+
+    def __init__(self, airport_id: int, day: date) -> None:
+        self.airport_id = airport_id
+        self.day = day
+        self.start, self.end = day_bounds(day)
+        self.indexes = {kind: IntervalIndex() for kind in OCCUPANCY_KINDS}
+        self._turnarounds: dict[int, TurnaroundTimes] = {}
+
+    @classmethod
+    def build(cls, airport_id: int, day: date) -> "AirportDayOccupancy":
+        occupancy = cls(airport_id, day)
+        for times in TurnaroundTimes.read(occupancy.overlapping()):
+            occupancy.add(times)
+        return occupancy
+
+    def copy(self) -> "AirportDayOccupancy":
+        occupancy = AirportDayOccupancy(self.airport_id, self.day)
+        occupancy.indexes = {kind: index.copy() for kind, index in self.indexes.items()}
+        occupancy._turnarounds = self._turnarounds.copy()
+        return occupancy
+
+    def overlapping(self) -> QuerySet:
+        """Turnarounds of the airport on the ground at some point of the day"""
+        return Turnaround.objects.filter(airport_id=self.airport_id).filter(
+            Q(scheduled_start__lt=self.end, scheduled_end__gt=self.start)
+            | Q(actual_start__lt=self.end, actual_end__gt=self.start)
+        )
+
+    def covers(self, times: TurnaroundTimes) -> bool:
+        return times.airport_id == self.airport_id and self.day in times.days()
+
+    def add(self, times: TurnaroundTimes) -> None:
+        if times.id in self._turnarounds:
+            self.remove(times.id)
+        if not self.covers(times):
+            return
+        self._turnarounds[times.id] = times
+        for kind, index in self.indexes.items():
+            interval = times.interval(kind)
+            if interval is not None:
+                index.add(*interval)
+
+    def remove(self, turnaround_id: int) -> None:
+        times = self._turnarounds.pop(turnaround_id, None)
+        if times is None:
+            return
+        for kind, index in self.indexes.items():
+            interval = times.interval(kind)
+            if interval is not None:
+                index.remove(*interval)
+
+
+class OccupancyCache:
+    """
+    Per-process LRU of ``AirportDayOccupancy`` indexes.
+
+    Each airport and day has a version in the Django cache named by
+    ``AGOA_OCCUPANCY_CACHE_ALIAS``. A process applying a turnaround change
+    updates its own index in place when it held the current version, and
+    bumps the version so that other processes rebuild theirs on next use.
+    Without a shared cache (see ``shared_cache``) versions are per process,
+    and also bumped every ``AGOA_OCCUPANCY_CACHE_TTL`` seconds so that other
+    workers' changes are picked up within that time.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[tuple[int, date], tuple[int, Any]] = OrderedDict()
+        # Process-local version of each key, and when it was last refreshed
+        self._local_versions: dict[tuple[int, date], tuple[int, float]] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def _shared(self) -> Any:
+        return shared_cache(settings.AGOA_OCCUPANCY_CACHE_ALIAS)
+
+    def _local_version(self, key: tuple[int, date]) -> int:
+        with self._lock:
+            version, refreshed = self._local_versions.get(key, (0, -math.inf))
+            now = time.monotonic()
+            if now - refreshed >= settings.AGOA_OCCUPANCY_CACHE_TTL:
+                version += 1
+                self._local_versions[key] = (version, now)
+            return version
+
+    @staticmethod
+    def _version_key(key: tuple[int, date]) -> str:
+        return f"agoa:occupancy:{key[0]}:{key[1].isoformat()}"
+
+    def version(self, key: tuple[int, date]) -> int:
+        shared = self._shared
+        if shared is None:
+            return self._local_version(key)
+        version = shared.get(self._version_key(key))
+        if version is None:
+            # Evicted or never set: start from a version no entry can hold
+            shared.add(self._version_key(key), int(time.time() * 1000), None)
+            version = shared.get(self._version_key(key))
+        return version
+
+    def _bump(self, key: tuple[int, date]) -> tuple[int, int]:
+        """Increment the version of ``key``, returning (before, after)"""
+        shared = self._shared
+        if shared is None:
+            with self._lock:
+                before = self._local_version(key)
+                refreshed = self._local_versions[key][1]
+                self._local_versions[key] = (before + 1, refreshed)
+            return before, before + 1
+        before = self.version(key)
+        try:
+            after = shared.incr(self._version_key(key))
+        except ValueError:
+            after = self.version(key)
+        return before, after
+
+    def get(self, airport_id: int, day: date) -> AirportDayOccupancy:
+        """Index of ``airport_id`` on ``day``, built on first use"""
+        key = (airport_id, day)
+        version = self.version(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                return entry[1]
+        occupancy = AirportDayOccupancy.build(airport_id, day)
+        with self._lock:
+            self._store(key, version, occupancy)
+        return occupancy
+
+    def clear(self) -> None:
+        """Drop every index held by this process"""
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, key: tuple[int, date], version: int, value: Any) -> None:
+        self._entries[key] = (version, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def apply(
+        self, before: Iterable[TurnaroundTimes], after: Iterable[TurnaroundTimes]
+    ) -> None:
+        """
+        Account for turnarounds changing from ``before`` to ``after``.
+
+        Deleted turnarounds only appear in ``before`` and new ones only in
+        ``after``. Every airport and day touched by either side has its
+        version bumped; indexes held at the previous version are updated
+        rather than dropped. Updates go to a copy, so that requests reading
+        the index meanwhile never see it half changed.
+        """
+        before, after = list(before), list(after)
+        keys = {(t.airport_id, day) for t in before + after for day in t.days()}
+        with self._lock:
+            for key in keys:
+                previous, current = self._bump(key)
+                entry = self._entries.pop(key, None)
+                if entry is None or entry[0] != previous or current != previous + 1:
+                    continue
+                occupancy = entry[1].copy()
+                for times in before:
+                    occupancy.remove(times.id)
+                for times in after:
+                    occupancy.add(times)
+                self._store(key, current, occupancy)
+
+
+occupancy_cache = OccupancyCache(settings.AGOA_OCCUPANCY_CACHE_SIZE)
@@ -0,0 +1,120 @@
+import json
+from typing import Any, Optional
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, _reverse_ordering
+from rest_framework.request import Request
+from rest_framework.views import APIView
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Opt-in keyset (cursor) pagination for the AGOA list endpoints.
+
+    Pages are located by filtering on the whole last seen ordering key instead
+    of an OFFSET, so fetching page 1000 costs the same as fetching page 1.
+    For a key ``(a, id)`` the next page is ``(a, id) > (x, y)``, spelled
+    ``a > x OR (a = x AND id > y)`` (``<`` for descending columns). Views
+    declare their key through a ``pagination_ordering`` attribute, which must
+    end with a unique column (``id``): every row then has its own position
+    and, unlike CursorPagination, ties on the leading columns never fall back
+    to an offset. Key columns must not be nullable.
+
+    Existing clients keep receiving plain, unpaginated lists. A client opts in
+    by sending either ``?page_size=N`` or a ``?cursor=`` returned by a
+    previous page.
+    """
+
+    ordering = ("id",)
+    page_size_query_param = "page_size"
+    max_page_size = getattr(settings, "AGOA_MAX_PAGE_SIZE", 1000)
+
+    def is_requested(self, request: Request) -> bool:
+        """Whether the client opted in to pagination"""
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def paginate_queryset(
+        self, queryset: QuerySet, request: Request, view: Optional[APIView] = None
+    ) -> Optional[list[Any]]:
+        if not self.is_requested(request):
+            return None
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = None if self.cursor is None else self.cursor.position
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        # One extra row tells whether there is a page beyond this one
+        results = list(queryset[: self.page_size + 1])
+        self.page = results[: self.page_size]
+        beyond = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+        self.has_next = position is not None if reverse else beyond
+        self.has_previous = beyond if reverse else position is not None
+        self.display_page_controls = self.has_next or self.has_previous
+        return self.page
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next:
+            return None
+        if self.page:
+            position = self._get_position_from_instance(self.page[-1], self.ordering)
+        else:
+            position = self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.has_previous:
+            return None
+        if self.page:
+            position = self._get_position_from_instance(self.page[0], self.ordering)
+        else:
+            position = self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def get_ordering(
+        self, request: Request, queryset: QuerySet, view: APIView
+    ) -> tuple[str, ...]:
+        ordering = getattr(view, "pagination_ordering", None)
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+        return tuple(super().get_ordering(request, queryset, view))
+
+    def _get_position_from_instance(
+        self, instance: Any, ordering: tuple[str, ...]
+    ) -> str:
+        names = [name.lstrip("-") for name in ordering]
+        if isinstance(instance, dict):
+            values = [instance[name] for name in names]
+        else:
+            values = [getattr(instance, name) for name in names]
+        return json.dumps([str(value) for value in values])
+
+    def _after(self, ordering: tuple[str, ...], position: str) -> Q:
+        """Rows strictly after ``position`` in ``ordering``"""
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        after = Q()
+        equal = {}
+        for order, value in zip(ordering, values):
+            name = order.lstrip("-")
+            lookup = "lt" if order.startswith("-") else "gt"
+            after |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+        return after
@@ -0,0 +1,67 @@
+import json
+from typing import IO, Any, Iterator, Mapping, NamedTuple, Optional
+
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import BaseParser
+from rest_framework.settings import api_settings
+
+
+class UndecodableLine(NamedTuple):
+    """Stands in for an NDJSON line that is not valid JSON"""
+
+    line: int
+    error: str
+
+
+def decoded(row: Any) -> Any:
+    """
+    Return ``row``, or raise ``ValidationError`` if it is an undecodable line.
+
+    Lets bulk loaders report bad NDJSON lines like any other invalid row.
+    """
+    if isinstance(row, UndecodableLine):
+        raise ValidationError(
+            {
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    f"NDJSON parse error on line {row.line} - {row.error}"
+                ]
+            }
+        )
+    return row
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parse newline-delimited JSON (one JSON document per line).
+
+    The body is returned as a lazy iterator so that large uploads are decoded
+    line by line while they are being processed, rather than all at once.
+    Since earlier rows may already be written by then, a line that is not
+    valid JSON does not fail the request: an ``UndecodableLine`` is yielded
+    in its place, for the consumer to report (see ``decoded``).
+    """
+
+    media_type = "application/x-ndjson"
+
+    def parse(
+        self,
+        stream: IO[bytes],
+        media_type: Optional[str] = None,
+        parser_context: Optional[Mapping[str, Any]] = None,
+    ) -> Iterator[Any]:
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        return self._iter_lines(stream, encoding)
+
+    @staticmethod
+    def _iter_lines(stream: IO[bytes], encoding: str) -> Iterator[Any]:
+        for number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line.decode(encoding))
+            except ValueError as exc:
+                row = UndecodableLine(number, str(exc))
+            yield row
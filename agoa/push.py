@@ -0,0 +1,249 @@
+"""
+Push of turnaround and flight changes to subscribers, per airport.
+
+Changes are published as ``(kind, id)`` pairs against the airports they
+concern. The broker debounces them per airport for ``AGOA_PUSH_DEBOUNCE``
+(or until ``AGOA_PUSH_MAX_BATCH`` are pending), then reads the changed rows
+once, serializes the batch once and hands the same JSON to every
+subscriber of the airport. Subscribers are asyncio queues, fed thread
+safely from whichever thread flushed.
+
+The broker lives in the worker process. With several workers, set
+``AGOA_PUSH_REDIS_URL`` (needs the ``redis`` package) to relay published
+changes between processes through Redis pub/sub.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Iterable, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework.utils.encoders import JSONEncoder
+
+from .cache import reference_cache_for
+from .models import Airport, Flight, Turnaround
+from .serializers import FlightSerializer, TurnaroundSerializer
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Change kind -> (model, serializer) used to render it
+PUSH_KINDS = {
+    "turnaround": (Turnaround, TurnaroundSerializer),
+    "flight": (Flight, FlightSerializer),
+}
+
+
+class Subscription:
+    """
+    Events for one client, as ``(event, JSON data)`` on an asyncio queue.
+
+    The queue is bounded by ``AGOA_PUSH_QUEUE_SIZE``: a client too slow to
+    keep up loses its pending batches and gets a ``reload`` event instead.
+    """
+
+    def __init__(self, airport_id: int) -> None:
+        self.airport_id = airport_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue[tuple[str, str]] = asyncio.Queue(
+            settings.AGOA_PUSH_QUEUE_SIZE
+        )
+
+    def deliver(self, message: str) -> None:
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message: str) -> None:
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(("reload", "{}"))
+            return
+        self.queue.put_nowait(("changes", message))
+
+    async def get(self) -> tuple[str, str]:
+        return await self.queue.get()
+
+
+class TurnaroundBroker:
+    """In-process fan-out of debounced change batches, per airport"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscriptions: dict[int, set[Subscription]] = defaultdict(set)
+        self._pending: dict[int, set[tuple[str, int]]] = defaultdict(set)
+        self._timers: dict[int, threading.Timer] = {}
+        self._relay: Optional[RedisRelay] = None
+
+    def subscribe(self, airport_id: int) -> Subscription:
+        """Register a client from within its event loop"""
+        subscription = Subscription(airport_id)
+        with self._lock:
+            self._subscriptions[airport_id].add(subscription)
+        self._start_relay()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions[subscription.airport_id].discard(subscription)
+            if not self._subscriptions[subscription.airport_id]:
+                del self._subscriptions[subscription.airport_id]
+
+    def subscribers(self, airport_id: int) -> int:
+        with self._lock:
+            return len(self._subscriptions.get(airport_id, ()))
+
+    def publish(self, kind: str, ids_by_airport: dict[int, Iterable[int]]) -> None:
+        """Queue changes of ``kind`` rows for the airports they concern"""
+        self._start_relay()
+        if self._relay is not None:
+            self._relay.publish(kind, ids_by_airport)
+        else:
+            self.receive(kind, ids_by_airport)
+
+    def receive(self, kind: str, ids_by_airport: dict[int, Iterable[int]]) -> None:
+        debounce = settings.AGOA_PUSH_DEBOUNCE.total_seconds()
+        due = []
+        with self._lock:
+            for airport_id, ids in ids_by_airport.items():
+                if airport_id not in self._subscriptions:
+                    continue
+                pending = self._pending[airport_id]
+                pending.update((kind, pk) for pk in ids)
+                if debounce <= 0 or len(pending) >= settings.AGOA_PUSH_MAX_BATCH:
+                    due.append(airport_id)
+                elif airport_id not in self._timers:
+                    timer = threading.Timer(
+                        debounce, self._flush_in_background, [airport_id]
+                    )
+                    timer.daemon = True
+                    self._timers[airport_id] = timer
+                    timer.start()
+        for airport_id in due:
+            self.flush(airport_id)
+
+    def flush(self, airport_id: int) -> None:
+        """Send the pending changes of ``airport_id`` to its subscribers"""
+        with self._lock:
+            pending = self._pending.pop(airport_id, set())
+            timer = self._timers.pop(airport_id, None)
+            subscriptions = list(self._subscriptions.get(airport_id, ()))
+        if timer is not None:
+            timer.cancel()
+        if not pending or not subscriptions:
+            return
+        changes = render_changes(airport_id, pending)
+        if changes is None:
+            logger.info("Dropped changes for deleted airport %s", airport_id)
+            return
+        message = json.dumps(changes, cls=JSONEncoder)
+        for subscription in subscriptions:
+            try:
+                subscription.deliver(message)
+            except RuntimeError:
+                # The client's event loop is gone
+                self.unsubscribe(subscription)
+
+    def _flush_in_background(self, airport_id: int) -> None:
+        try:
+            self.flush(airport_id)
+        except Exception:
+            logger.exception("Could not push changes for airport %s", airport_id)
+        finally:
+            close_old_connections()
+
+    def _start_relay(self) -> None:
+        if self._relay is not None or not settings.AGOA_PUSH_REDIS_URL:
+            return
+        with self._lock:
+            if self._relay is None:
+                if redis is None:
+                    raise RuntimeError("AGOA_PUSH_REDIS_URL needs the redis package")
+                self._relay = RedisRelay(self, settings.AGOA_PUSH_REDIS_URL)
+
+
+class RedisRelay:
+    """Shares published changes between worker processes via Redis pub/sub"""
+
+    channel = "agoa:push"
+
+    def __init__(self, broker: TurnaroundBroker, url: str) -> None:
+        self.broker = broker
+        self.client = redis.Redis.from_url(url)
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self.pubsub.subscribe(**{self.channel: self._on_message})
+        self.thread = self.pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def publish(self, kind: str, ids_by_airport: dict[int, Iterable[int]]) -> None:
+        payload = {str(airport): list(ids) for airport, ids in ids_by_airport.items()}
+        self.client.publish(self.channel, json.dumps([kind, payload]))
+
+    def _on_message(self, message: dict[str, Any]) -> None:
+        # Runs on the pub/sub thread, which an exception would stop
+        try:
+            kind, payload = json.loads(message["data"])
+            self.broker.receive(
+                kind, {int(airport): ids for airport, ids in payload.items()}
+            )
+        except Exception:
+            logger.exception("Could not relay pushed changes")
+        finally:
+            close_old_connections()
+
+
+def render_changes(
+    airport_id: int, pending: set[tuple[str, int]]
+) -> Optional[dict[str, Any]]:
+    """
+    Read the changed rows and describe them as upserts or deletes.
+
+    Rows are read when the batch is sent, so a row changed several times
+    within the debounce window is sent once, in its latest state. Returns
+    None when the airport has been deleted since.
+    """
+    try:
+        airport = reference_cache_for(Airport).get_object(airport_id)
+    except Airport.DoesNotExist:
+        return None
+    changes = []
+    for kind, (model, serializer_class) in PUSH_KINDS.items():
+        ids = sorted(pk for change_kind, pk in pending if change_kind == kind)
+        if not ids:
+            continue
+        rows = {row.pk: row for row in model.objects.filter(pk__in=ids)}
+        serializer = serializer_class()
+        for pk in ids:
+            if pk in rows:
+                data = serializer.to_representation(rows[pk])
+                changes.append({"type": kind, "op": "upsert", "id": pk, "data": data})
+            else:
+                changes.append({"type": kind, "op": "delete", "id": pk})
+    return {"airport": airport.iata_code, "changes": changes}
+
+
+broker = TurnaroundBroker()
+
+
+def publish_turnarounds(turnarounds: Iterable[Any]) -> None:
+    """Publish changes of turnarounds (anything with id and airport_id)"""
+    ids_by_airport: dict[int, list[int]] = defaultdict(list)
+    for turnaround in turnarounds:
+        ids_by_airport[turnaround.airport_id].append(turnaround.id)
+    broker.publish("turnaround", ids_by_airport)
+
+
+def publish_flights(flights: Iterable[Flight]) -> None:
+    """Publish changes of flights to their departure and arrival airports"""
+    ids_by_airport: dict[int, list[int]] = defaultdict(list)
+    for flight in flights:
+        ids_by_airport[flight.departure_airport_id].append(flight.pk)
+        if flight.arrival_airport_id != flight.departure_airport_id:
+            ids_by_airport[flight.arrival_airport_id].append(flight.pk)
+    broker.publish("flight", ids_by_airport)
@@ -0,0 +1,55 @@
+from typing import Any, Optional
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    DRF's JSON renderer, encoding with orjson for views that opt in.
+
+    A view sets ``fast_rendering`` (or passes it in the renderer context)
+    when its response holds only what ``RowSerializer`` produces (dicts,
+    lists, strings, integers, booleans, None) plus values the DRF encoder
+    handles, such as datetimes. orjson then writes the same bytes as
+    ``json.dumps`` with DRF's settings, several times faster. Floats are
+    formatted differently by the two encoders, so other responses, and
+    indented ones, are left to ``JSONRenderer``. Without the ``orjson``
+    package this is ``JSONRenderer``.
+    """
+
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def render(
+        self,
+        data: Any,
+        accepted_media_type: Optional[str] = None,
+        renderer_context: Optional[dict] = None,
+    ) -> bytes:
+        renderer_context = renderer_context or {}
+        view = renderer_context.get("view")
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or not renderer_context.get(
+                "fast_rendering", getattr(view, "fast_rendering", False)
+            )
+            or self.get_indent(accepted_media_type, renderer_context) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data, default=self.encoder_class().default, option=self.options
+        )
+        # Escaped like JSONRenderer does, to stay a strict JavaScript subset
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+        return ret
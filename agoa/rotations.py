@@ -0,0 +1,395 @@
+"""
+Aircraft rotations as an in-memory graph, and a delay what-if simulator.
+
+A turnaround links an arrival to the departure the same aircraft flies
+next, so following turnarounds from flight to flight walks the aircraft's
+rotation. ``RotationGraph`` holds a window of flights in flat arrays: each
+flight gets a slot, and per slot the arrays store its best known times and
+the slots of the flights before and after it in the rotation. Knock-on
+delays are then a walk along these arrays, without touching the database.
+
+The graph is kept up to date incrementally from the ``updated_at`` columns
+and tombstones, like ``?changed_since=`` clients are: each ``sync`` reads
+only the flights and turnarounds changed since the previous one.
+"""
+
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import Any, NamedTuple, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Flight, Tombstone, Turnaround
+from .utils import days_bounds
+
+NO_FLIGHT = -1
+
+# Flights departing this long before the window may land in it, as the
+# arrival of one of its turnarounds
+FLIGHT_LOOKBACK = timedelta(days=1)
+
+FLIGHT_COLUMNS = (
+    "id",
+    "flight_number",
+    "scheduled_departure",
+    "estimated_departure",
+    "actual_departure",
+    "scheduled_arrival",
+    "estimated_arrival",
+    "actual_arrival",
+)
+TURNAROUND_COLUMNS = ("id", "arrival_flight_id", "departure_flight_id")
+
+
+def _seconds(moment: datetime) -> int:
+    return int(moment.timestamp())
+
+
+def _datetime(seconds: int) -> datetime:
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+
+
+class FlightDelay(NamedTuple):
+    """A flight pushed back by ``delay``, with its new best times"""
+
+    id: int
+    flight_number: str
+    delay: timedelta
+    departure: datetime
+    arrival: datetime
+
+
+class TurnaroundDelay(NamedTuple):
+    """A turnaround whose arrival or departure moves"""
+
+    id: int
+    start_delay: timedelta
+    end_delay: timedelta
+
+
+class Simulation(NamedTuple):
+    flights: list[FlightDelay]
+    turnarounds: list[TurnaroundDelay]
+
+
+class RotationGraph:
+    """
+    The rotations of the turnarounds scheduled to start from ``first`` to
+    ``last``, with their flights.
+
+    Times are each flight's best known ones (actual, else estimated, else
+    scheduled) in epoch seconds. Not thread-safe: ``RotationCache`` holds a
+    lock per graph.
+    """
+
+    def __init__(self, first: date, last: date) -> None:
+        self.first, self.last = first, last
+        self.start, self.end = days_bounds(first, last)
+        self.synced_at: Optional[datetime] = None
+        # flight id -> slot, and turnaround id -> slot of its arrival flight
+        self._slots: dict[int, int] = {}
+        self._turnarounds: dict[int, int] = {}
+        # Per slot
+        self.ids = array("q")
+        self.flight_numbers: list[str] = []
+        self.departures = array("q")
+        self.arrivals = array("q")
+        self.departed = array("b")
+        self.next_slots = array("q")
+        self.previous_slots = array("q")
+        self.turnaround_ids = array("q")
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    @property
+    def turnaround_count(self) -> int:
+        return len(self._turnarounds)
+
+    @classmethod
+    def load(cls, first: date, last: date) -> "RotationGraph":
+        graph = cls(first, last)
+        graph.sync()
+        return graph
+
+    def _slot(self, flight_id: int) -> int:
+        slot = self._slots.get(flight_id)
+        if slot is None:
+            slot = self._slots[flight_id] = len(self.ids)
+            self.ids.append(flight_id)
+            self.flight_numbers.append("")
+            for column in (self.departures, self.arrivals):
+                column.append(0)
+            self.departed.append(0)
+            for column in (self.next_slots, self.previous_slots, self.turnaround_ids):
+                column.append(NO_FLIGHT)
+        return slot
+
+    def set_flight(self, row: tuple) -> None:
+        """Add a flight, or update its times, from ``FLIGHT_COLUMNS``"""
+        (
+            flight_id,
+            flight_number,
+            scheduled_departure,
+            estimated_departure,
+            actual_departure,
+            scheduled_arrival,
+            estimated_arrival,
+            actual_arrival,
+        ) = row
+        slot = self._slot(flight_id)
+        self.flight_numbers[slot] = flight_number
+        self.departures[slot] = _seconds(
+            actual_departure or estimated_departure or scheduled_departure
+        )
+        self.arrivals[slot] = _seconds(
+            actual_arrival or estimated_arrival or scheduled_arrival
+        )
+        self.departed[slot] = actual_departure is not None
+
+    def remove_flight(self, flight_id: int) -> None:
+        slot = self._slots.pop(flight_id, None)
+        if slot is None:
+            return
+        # The slot stays allocated, unlinked from both neighbours
+        for arrival in (self.previous_slots[slot], slot):
+            if arrival != NO_FLIGHT and self.turnaround_ids[arrival] != NO_FLIGHT:
+                self.remove_turnaround(self.turnaround_ids[arrival])
+
+    def set_turnaround(
+        self, turnaround_id: int, arrival_id: int, departure_id: int
+    ) -> None:
+        """Link an arrival to the departure after it (flights must be set)"""
+        self.remove_turnaround(turnaround_id)
+        arrival, departure = self._slots[arrival_id], self._slots[departure_id]
+        # Turnarounds that held either flight before, whose change is not
+        # read yet
+        for linked in (arrival, self.previous_slots[departure]):
+            if linked != NO_FLIGHT and self.turnaround_ids[linked] != NO_FLIGHT:
+                self.remove_turnaround(self.turnaround_ids[linked])
+        self.next_slots[arrival] = departure
+        self.previous_slots[departure] = arrival
+        self.turnaround_ids[arrival] = turnaround_id
+        self._turnarounds[turnaround_id] = arrival
+
+    def remove_turnaround(self, turnaround_id: int) -> None:
+        arrival = self._turnarounds.pop(turnaround_id, None)
+        if arrival is None:
+            return
+        departure = self.next_slots[arrival]
+        self.next_slots[arrival] = NO_FLIGHT
+        self.turnaround_ids[arrival] = NO_FLIGHT
+        if departure != NO_FLIGHT:
+            self.previous_slots[departure] = NO_FLIGHT
+
+    def sync(self) -> None:
+        """
+        Read the flights and turnarounds changed since the last sync.
+
+        The first sync loads the window. Later ones resend rows updated up to
+        ``AGOA_SYNC_OVERLAP`` before the previous sync, so that writes
+        committed late are not missed.
+        """
+        now = timezone.now()
+        since = (
+            None
+            if self.synced_at is None
+            else self.synced_at - settings.AGOA_SYNC_OVERLAP
+        )
+        flights = Flight.objects.all()
+        turnarounds = Turnaround.objects.all()
+        if since is None:
+            flights = flights.filter(
+                scheduled_departure__gte=self.start - FLIGHT_LOOKBACK,
+                scheduled_departure__lt=self.end,
+            )
+            turnarounds = turnarounds.filter(
+                scheduled_start__gte=self.start, scheduled_start__lt=self.end
+            )
+        else:
+            flights = flights.filter(updated_at__gte=since)
+            turnarounds = turnarounds.filter(updated_at__gte=since)
+            for model, object_id in Tombstone.objects.filter(
+                deleted_at__gte=since, moved=False
+            ).values_list("model", "object_id"):
+                if model == "turnaround":
+                    self.remove_turnaround(object_id)
+                elif model == "flight":
+                    self.remove_flight(object_id)
+
+        for row in flights.values_list(*FLIGHT_COLUMNS):
+            if row[0] in self._slots or (
+                self.start - FLIGHT_LOOKBACK <= row[2] < self.end
+            ):
+                self.set_flight(row)
+        links = []
+        for row in turnarounds.values_list(*TURNAROUND_COLUMNS, "scheduled_start"):
+            if self.start <= row[3] < self.end:
+                links.append(row[:3])
+            else:
+                # Rescheduled out of the window
+                self.remove_turnaround(row[0])
+        missing = {
+            flight_id
+            for _, arrival_id, departure_id in links
+            for flight_id in (arrival_id, departure_id)
+            if flight_id not in self._slots
+        }
+        if missing:
+            for row in Flight.objects.filter(pk__in=missing).values_list(
+                *FLIGHT_COLUMNS
+            ):
+                self.set_flight(row)
+        for turnaround_id, arrival_id, departure_id in links:
+            if arrival_id in self._slots and departure_id in self._slots:
+                self.set_turnaround(turnaround_id, arrival_id, departure_id)
+        self.synced_at = now
+
+    def rotation(self, flight_id: int) -> list[int]:
+        """Ids of the flights of ``flight_id``'s rotation, in order"""
+        slot = self._slots[flight_id]
+        seen = {slot}
+        while self.previous_slots[slot] != NO_FLIGHT:
+            slot = self.previous_slots[slot]
+            if slot in seen:
+                break
+            seen.add(slot)
+        rotation = [self.ids[slot]]
+        while self.next_slots[slot] != NO_FLIGHT and len(rotation) <= len(seen):
+            slot = self.next_slots[slot]
+            rotation.append(self.ids[slot])
+        return rotation
+
+    def simulate(
+        self,
+        delays: dict[int, timedelta],
+        min_ground_time: Optional[timedelta] = None,
+    ) -> Simulation:
+        """
+        Knock-on effects of delaying each flight of ``delays`` by its value.
+
+        A delayed flight lands that much later; the next flight of its
+        rotation cannot leave before ``min_ground_time`` (by default
+        ``AGOA_MIN_GROUND_TIME``) after it, so it is delayed by whatever that
+        pushes it past its current departure, and so on down the rotation.
+        Flights that already left stop the walk. Raises ``KeyError`` for a
+        flight outside the graph.
+        """
+        if min_ground_time is None:
+            min_ground_time = settings.AGOA_MIN_GROUND_TIME
+        ground = int(min_ground_time.total_seconds())
+        next_slots, departures, arrivals = (
+            self.next_slots,
+            self.departures,
+            self.arrivals,
+        )
+        departed = self.departed
+        shifts: dict[int, int] = {}
+        for flight_id, delay in delays.items():
+            slot, shift = self._slots[flight_id], int(delay.total_seconds())
+            # A rotation has one flight per slot: it cannot be longer
+            for _ in range(len(self.ids)):
+                if shift <= 0 or shifts.get(slot, 0) >= shift:
+                    break
+                shifts[slot] = shift
+                following = next_slots[slot]
+                if following == NO_FLIGHT or departed[following]:
+                    break
+                shift = arrivals[slot] + shift + ground - departures[following]
+                slot = following
+
+        flights = [
+            FlightDelay(
+                self.ids[slot],
+                self.flight_numbers[slot],
+                timedelta(seconds=shift),
+                _datetime(departures[slot] + shift),
+                _datetime(arrivals[slot] + shift),
+            )
+            for slot, shift in shifts.items()
+        ]
+        flights.sort(key=lambda flight: (flight.departure, flight.id))
+        turnarounds = {}
+        for slot, shift in shifts.items():
+            # The turnaround after the flight, and the one before it
+            for arrival in (slot, self.previous_slots[slot]):
+                if arrival == NO_FLIGHT or self.turnaround_ids[arrival] == NO_FLIGHT:
+                    continue
+                turnaround_id = self.turnaround_ids[arrival]
+                turnarounds[turnaround_id] = TurnaroundDelay(
+                    turnaround_id,
+                    timedelta(seconds=shifts.get(arrival, 0)),
+                    timedelta(seconds=shifts.get(next_slots[arrival], 0)),
+                )
+        return Simulation(flights, sorted(turnarounds.values()))
+
+
+class RotationCache:
+    """
+    Per-process LRU of rotation graphs, one per day.
+
+    The graph of a day covers the turnarounds starting that day and the
+    next, so that delays are followed through overnight rotations. Each
+    ``get`` syncs the graph with the changes since its previous use.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[date, tuple[RotationGraph, threading.Lock]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, day: date) -> tuple[RotationGraph, threading.Lock]:
+        """The synced graph of ``day`` and the lock to hold while using it"""
+        with self._lock:
+            entry = self._entries.get(day)
+            if entry is None:
+                entry = (RotationGraph(day, day + timedelta(days=1)), threading.Lock())
+                self._entries[day] = entry
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+            self._entries.move_to_end(day)
+        graph, lock = entry
+        with lock:
+            graph.sync()
+        return entry
+
+    def simulate(self, day: date, delays: dict[int, timedelta]) -> Simulation:
+        graph, lock = self.get(day)
+        with lock:
+            return graph.simulate(delays)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+rotation_cache = RotationCache(settings.AGOA_ROTATION_CACHE_SIZE)
+
+
+def simulation_payload(simulation: Simulation) -> dict[str, Any]:
+    """The JSON body describing a simulation"""
+    return {
+        "flights": [
+            {
+                "id": flight.id,
+                "flight_number": flight.flight_number,
+                "delay_minutes": flight.delay.total_seconds() / 60,
+                "departure": flight.departure,
+                "arrival": flight.arrival,
+            }
+            for flight in simulation.flights
+        ],
+        "turnarounds": [
+            {
+                "id": turnaround.id,
+                "start_delay_minutes": turnaround.start_delay.total_seconds() / 60,
+                "end_delay_minutes": turnaround.end_delay.total_seconds() / 60,
+            }
+            for turnaround in simulation.turnarounds
+        ],
+    }
@@ -1,26 +1,384 @@
-from rest_framework import serializers
+from datetime import datetime, timezone as dt_timezone, tzinfo
+from functools import partial
+from typing import Any, Callable, Collection, Iterable, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+from django.db.models import QuerySet, TextField
+from django.db.models.functions import Cast
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from .cache import reference_cache_for
+from .metrics import TimedSerializerMixin, timed_serialization
 from .models import Airline, Airport, Flight, Turnaround
+from .utils import MAX_ID
+
+
+class ExpandableSerializerMixin:
+    """
+    Nest related objects in place of their primary keys on request.
+
+    ``expandable_fields`` maps a foreign key field to the serializer used to
+    render it. Fields named in the ``expand`` entry of the serializer context
+    are rendered nested, and the expansion applies recursively to nested
+    serializers that are themselves expandable.
+    """
+
+    expandable_fields: dict[str, type[serializers.Serializer]] = {}
+
+    @classmethod
+    def expandable_names(cls) -> set[str]:
+        """Every expand token understood by this serializer and its children"""
+        names = set(cls.expandable_fields)
+        for serializer_class in cls.expandable_fields.values():
+            if issubclass(serializer_class, ExpandableSerializerMixin):
+                names |= serializer_class.expandable_names()
+        return names
+
+    @classmethod
+    def select_related_paths(
+        cls, expand: Collection[str], prefix: str = ""
+    ) -> list[str]:
+        """``select_related`` lookups needed to render ``expand`` without N+1"""
+        paths = []
+        for name, serializer_class in cls.expandable_fields.items():
+            if name not in expand:
+                continue
+            paths.append(prefix + name)
+            if issubclass(serializer_class, ExpandableSerializerMixin):
+                paths += serializer_class.select_related_paths(
+                    expand, prefix=f"{prefix}{name}__"
+                )
+        return paths
+
+    def to_representation(self, instance: Any) -> Any:
+        data = super().to_representation(instance)  # type: ignore[misc]
+        expand = self.context.get("expand", ())  # type: ignore[attr-defined]
+        for name in self.expandable_fields.keys() & set(expand):
+            related = getattr(instance, name)
+            data[name] = self._expanded_serializer(name).to_representation(related)
+        return data
+
+    def _expanded_serializer(self, name: str) -> serializers.Serializer:
+        # One child serializer per field, reused for every row of a list
+        cache = self.__dict__.setdefault("_expanded_serializers", {})
+        if name not in cache:
+            cache[name] = self.expandable_fields[name](
+                context=self.context  # type: ignore[attr-defined]
+            )
+        return cache[name]
+
+
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key field resolving airlines and airports through the reference
+    cache, so validating a write does not query them. Other models are looked
+    up as usual.
+    """
+
+    def to_internal_value(self, data: Any) -> Any:
+        queryset = self.get_queryset()
+        reference_cache = reference_cache_for(queryset.model)
+        if reference_cache is None or self.pk_field is not None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            return reference_cache.get_object(data)
+        except queryset.model.DoesNotExist:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
+class CachedReferencesMixin:
+    """
+    Turn a write referencing an airline or airport deleted by another worker,
+    but still cached here, into a validation error rather than a 500. The
+    stale cache is invalidated so that the next attempt sees the deletion.
+    """
 
+    def save(self, **kwargs: Any) -> Any:
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)  # type: ignore[misc]
+        except IntegrityError:
+            missing = {}
+            for name, value in self.validated_data.items():  # type: ignore[attr-defined]
+                reference_cache = reference_cache_for(type(value))
+                if reference_cache is None:
+                    continue
+                if not type(value)._default_manager.filter(pk=value.pk).exists():
+                    reference_cache.invalidate()
+                    field = self.fields[name]  # type: ignore[attr-defined]
+                    missing[name] = [
+                        field.error_messages["does_not_exist"].format(pk_value=value.pk)
+                    ]
+            if not missing:
+                raise
+            raise serializers.ValidationError(missing)
 
-class AirlineSerializer(serializers.ModelSerializer):
+
+class AirlineSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Airline
         fields = "__all__"
 
 
-class AirportSerializer(serializers.ModelSerializer):
+class AirportSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Airport
         fields = "__all__"
 
 
-class FlightSerializer(serializers.ModelSerializer):
+class FlightSerializer(
+    CachedReferencesMixin,
+    TimedSerializerMixin,
+    ExpandableSerializerMixin,
+    serializers.ModelSerializer,
+):
+    serializer_related_field = CachedPrimaryKeyRelatedField
+    expandable_fields = {
+        "airline": AirlineSerializer,
+        "departure_airport": AirportSerializer,
+        "arrival_airport": AirportSerializer,
+    }
+
     class Meta:
         model = Flight
         fields = "__all__"
 
 
-class TurnaroundSerializer(serializers.ModelSerializer):
+class TurnaroundSerializer(
+    CachedReferencesMixin,
+    TimedSerializerMixin,
+    ExpandableSerializerMixin,
+    serializers.ModelSerializer,
+):
+    serializer_related_field = CachedPrimaryKeyRelatedField
+    expandable_fields = {
+        "arrival_flight": FlightSerializer,
+        "departure_flight": FlightSerializer,
+        "airport": AirportSerializer,
+    }
+
     class Meta:
         model = Turnaround
         fields = "__all__"
+
+
+class RowSerializer:
+    """
+    Read-only rendering of ``values()`` rows exactly as a model serializer
+    renders instances.
+
+    The serializer's fields are compiled once into ``(name, column, is
+    datetime)`` entries: primary key related fields read the ``_id`` column,
+    datetimes are formatted like DRF's ``DateTimeField`` and integer, string
+    and boolean fields are passed through. A row then costs a few dictionary
+    lookups instead of a model instance and a walk through DRF fields.
+
+    Parsing datetimes is the largest remaining cost. SQLite stores them as
+    UTC text, so when the output is in UTC too, ``values`` reads that text
+    and it is reformatted with string operations instead.
+    """
+
+    PASS_THROUGH_FIELDS = (
+        serializers.IntegerField,
+        serializers.CharField,
+        serializers.BooleanField,
+    )
+    # Suffix of the values() keys holding datetimes as stored text
+    TEXT_SUFFIX = "_text"
+
+    _compiled: dict[type, Optional["RowSerializer"]] = {}
+
+    def __init__(self, fields: list[tuple[str, str, bool]]) -> None:
+        self.fields = fields
+
+    @classmethod
+    def for_serializer(cls, serializer_class: type) -> Optional["RowSerializer"]:
+        """The row serializer of ``serializer_class``, None if unsupported"""
+        if serializer_class not in cls._compiled:
+            cls._compiled[serializer_class] = cls._compile(serializer_class)
+        return cls._compiled[serializer_class]
+
+    @classmethod
+    def _compile(cls, serializer_class: type) -> Optional["RowSerializer"]:
+        opts = serializer_class.Meta.model._meta
+        fields = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if "." in field.source or field.source == "*":
+                return None
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                if field.pk_field is not None:
+                    return None
+                fields.append((name, opts.get_field(field.source).attname, False))
+            elif isinstance(field, serializers.DateTimeField):
+                output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+                if output_format is None or output_format.lower() != ISO_8601:
+                    return None
+                if getattr(field, "timezone", None) is not None:
+                    return None
+                fields.append((name, field.source, True))
+            elif isinstance(field, cls.PASS_THROUGH_FIELDS):
+                fields.append((name, field.source, False))
+            else:
+                return None
+        return cls(fields)
+
+    def values(self, queryset: QuerySet, keep: Collection[str] = ()) -> QuerySet:
+        """
+        ``queryset.values()`` with the columns to render.
+
+        ``keep`` names model fields to read as usual as well, for instance
+        the ordering of a cursor page.
+        """
+        text = _reads_utc_text(queryset.db)
+        columns, casts = [], {}
+        for _, column, is_datetime in self.fields:
+            if text and is_datetime:
+                casts[column + self.TEXT_SUFFIX] = Cast(column, TextField())
+            else:
+                columns.append(column)
+        columns += [name for name in keep if name not in columns]
+        return queryset.values(*columns, **casts)
+
+    def to_representation(
+        self, rows: Iterable[dict[str, Any]], using: str = DEFAULT_DB_ALIAS
+    ) -> list[dict]:
+        """Render rows read by ``values`` from the database ``using``"""
+        plan = []
+        if _reads_utc_text(using):
+            format_text = partial(_format_utc_text, connections[using])
+            for name, column, is_datetime in self.fields:
+                if is_datetime:
+                    plan.append((name, column + self.TEXT_SUFFIX, format_text))
+                else:
+                    plan.append((name, column, None))
+        else:
+            format_datetime = _datetime_formatter()
+            for name, column, is_datetime in self.fields:
+                plan.append((name, column, format_datetime if is_datetime else None))
+
+        data = []
+        with timed_serialization():
+            for row in rows:
+                item = {}
+                for name, key, convert in plan:
+                    value = row[key]
+                    if convert is not None and value is not None:
+                        value = convert(value)
+                    item[name] = value
+                data.append(item)
+        return data
+
+
+def _is_utc(zone: tzinfo) -> bool:
+    return zone is dt_timezone.utc or str(zone) in ("UTC", "Etc/UTC")
+
+
+def _reads_utc_text(using: str) -> bool:
+    """Whether datetimes are stored as UTC text and rendered in UTC"""
+    connection = connections[using]
+    return (
+        settings.USE_TZ
+        and connection.vendor == "sqlite"
+        and _is_utc(connection.timezone)
+        and _is_utc(timezone.get_current_timezone())
+    )
+
+
+def _format_utc_text(connection: Any, text: str) -> str:
+    # Django stores "YYYY-MM-DD HH:MM:SS[.ffffff]"; anything else is parsed
+    if len(text) in (19, 26) and text[10] == " ":
+        return f"{text[:10]}T{text[11:]}Z"
+    value = connection.ops.convert_datetimefield_value(text, None, connection)
+    return _datetime_formatter()(value)
+
+
+def _datetime_formatter() -> Callable[[datetime], str]:
+    """DRF's ISO 8601 representation of datetimes, in the current time zone"""
+    if not settings.USE_TZ:
+
+        def format_naive(value: datetime) -> str:
+            if timezone.is_aware(value):
+                value = timezone.make_naive(value, dt_timezone.utc)
+            return value.isoformat()
+
+        return format_naive
+
+    current = timezone.get_current_timezone()
+    if _is_utc(current):
+        current = dt_timezone.utc
+
+    def format_aware(value: datetime) -> str:
+        if value.tzinfo is None:
+            value = timezone.make_aware(value, current)
+        if value.tzinfo is not current:
+            value = value.astimezone(current)
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+
+    return format_aware
+
+
+class FlightBulkRowSerializer(serializers.Serializer):
+    """
+    One row of a bulk schedule upload.
+
+    Airline and airports are given by IATA code; they are resolved to ids for
+    a whole batch at once by the ingestion code rather than per row.
+    """
+
+    flight_number = serializers.CharField(max_length=10)
+    airline = serializers.CharField(max_length=2)
+    departure_airport = serializers.CharField(max_length=3)
+    arrival_airport = serializers.CharField(max_length=3)
+    scheduled_departure = serializers.DateTimeField()
+    scheduled_arrival = serializers.DateTimeField()
+    actual_departure = serializers.DateTimeField(required=False, allow_null=True)
+    actual_arrival = serializers.DateTimeField(required=False, allow_null=True)
+
+
+class FlightStatusEventSerializer(serializers.Serializer):
+    """One status event: an estimated or actual time for a flight"""
+
+    flight = serializers.IntegerField(min_value=1, max_value=MAX_ID)
+    event = serializers.ChoiceField(choices=["ETD", "ETA", "ATD", "ATA"])
+    # null clears a time reported by mistake
+    time = serializers.DateTimeField(allow_null=True)
+
+
+# Longest ground time a matching run accepts, in minutes; larger values
+# overflow the time arithmetic
+MAX_GROUND_MINUTES = 3 * 24 * 60
+
+
+class TurnaroundMatchSerializer(serializers.Serializer):
+    """Parameters of an automatic turnaround matching run"""
+
+    date = serializers.DateField()
+    airport = serializers.SlugRelatedField(
+        slug_field="iata_code", queryset=Airport.objects.all()
+    )
+    same_airline = serializers.BooleanField(default=True)
+    min_ground_minutes = serializers.IntegerField(
+        min_value=0, max_value=MAX_GROUND_MINUTES, required=False
+    )
+    max_ground_minutes = serializers.IntegerField(
+        min_value=1, max_value=MAX_GROUND_MINUTES, required=False
+    )
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate(self, attrs: dict[str, Any]) -> dict[str, Any]:
+        minimum = attrs.get("min_ground_minutes")
+        maximum = attrs.get("max_ground_minutes")
+        if minimum is not None and maximum is not None and minimum > maximum:
+            raise serializers.ValidationError(
+                "min_ground_minutes must not exceed max_ground_minutes"
+            )
+        return attrs
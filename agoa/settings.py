@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -46,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so that its timings include the other middleware
+    "agoa.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -86,6 +89,58 @@ DATABASES = {
     }
 }
 
+# "development" keeps the settings above; "production" reuses connections,
+# tunes SQLite and serves GET requests of the viewsets from a read-only
+# "replica" connection (to AGOA_DATABASE_REPLICA, or the same file).
+AGOA_DATABASE_PROFILE = os.environ.get("AGOA_DATABASE_PROFILE", "development")
+
+# Pragmas run on every new SQLite connection, and the read-only aliases that
+# ReadReplicaRouter sends the reads of safe requests to
+AGOA_SQLITE_PRAGMAS: dict[str, object] = {}
+AGOA_READ_DATABASES: list[str] = []
+
+if AGOA_DATABASE_PROFILE == "production":
+    DATABASES["default"].update(
+        {
+            "CONN_MAX_AGE": 600,
+            "CONN_HEALTH_CHECKS": True,
+            # Writers take the lock when the transaction starts, so that they
+            # wait for each other (busy_timeout) instead of failing
+            "OPTIONS": {"transaction_mode": "IMMEDIATE"},
+        }
+    )
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.environ.get("AGOA_DATABASE_REPLICA", BASE_DIR / "db.sqlite3"),
+        "OPTIONS": {},
+        "TEST": {"MIRROR": "default"},
+    }
+    AGOA_SQLITE_PRAGMAS = {
+        # Readers no longer block the writer, nor the writer readers
+        "journal_mode": "WAL",
+        # Safe with WAL: a power loss may only lose the last commits
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        # 64 MiB page cache per connection, 256 MiB memory-mapped
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    }
+    AGOA_READ_DATABASES = ["replica"]
+
+DATABASE_ROUTERS = ["agoa.database.ReadReplicaRouter"]
+
+# The local-memory cache is per process: the reference, occupancy and token
+# caches then only see the changes made by their own worker, and refresh
+# after a TTL (see agoa.utils.shared_cache). With several workers, set
+# AGOA_CACHE_URL (e.g. redis://127.0.0.1:6379/1, needs redis) to share it.
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+if os.environ.get("AGOA_CACHE_URL"):
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ["AGOA_CACHE_URL"],
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -130,14 +185,99 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # DRF settings with all required attributes
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "authentication.authentication.CachedJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # JSONRenderer, with orjson (when installed) for the values() fast path
+    "DEFAULT_RENDERER_CLASSES": [
+        "agoa.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    # Cursor pagination is opt-in: clients send ?page_size= or ?cursor=
+    "DEFAULT_PAGINATION_CLASS": "agoa.pagination.KeysetCursorPagination",
+    "PAGE_SIZE": 100,
 }
 
+# Upper bound for the ?page_size= query parameter on list endpoints
+AGOA_MAX_PAGE_SIZE = 1000
+
+# Rows validated and written per transaction by POST /api/flights/bulk/
+AGOA_BULK_BATCH_SIZE = 1000
+
+# Rows fetched per database round trip by the streaming export actions,
+# and per record batch of the columnar snapshots
+AGOA_EXPORT_CHUNK_SIZE = 2000
+
+# Default directory of `manage.py snapshot`
+AGOA_SNAPSHOT_ROOT = BASE_DIR / "snapshots"
+
+# A departure counts as on time when it leaves at most this late
+AGOA_ON_TIME_THRESHOLD = timedelta(minutes=15)
+
+# Lifetime of cached punctuality rankings, per date range
+AGOA_PUNCTUALITY_CACHE_SECONDS = 60
+
+# Ground time allowed between an arrival and the departure it connects to
+AGOA_MIN_GROUND_TIME = timedelta(minutes=30)
+AGOA_MAX_GROUND_TIME = timedelta(hours=6)
+
+# Airline and airport responses are cached per process, up to this many
+# entries per model. The version that invalidates them is kept in this
+# Django cache; only a shared backend (see CACHES) lets every worker see a
+# change at once. With a per-process cache, or None, a worker serves other
+# workers' changes after at most AGOA_REFERENCE_CACHE_TTL seconds.
+AGOA_REFERENCE_CACHE_SIZE = 1024
+AGOA_REFERENCE_CACHE_ALIAS = "default"
+AGOA_REFERENCE_CACHE_TTL = 60
+
+# Flight status events for the same flight and field within this window
+# are coalesced and written together; zero applies each upload at once.
+# The buffer is flushed early once it holds this many updates.
+AGOA_STATUS_EVENT_WINDOW = timedelta(milliseconds=500)
+AGOA_STATUS_EVENT_MAX_BUFFER = 5000
+# Turnarounds down an aircraft rotation that a delay is propagated to
+AGOA_ROTATION_PROPAGATION_DEPTH = 12
+# Rotation graphs (for delay what-ifs) kept per process, one per day
+AGOA_ROTATION_CACHE_SIZE = 8
+
+# Request metrics served at /api/_metrics: histograms cover the last
+# AGOA_METRICS_WINDOW, rotated in AGOA_METRICS_SLICES steps. A request running
+# one SQL statement more than AGOA_METRICS_N_PLUS_ONE_THRESHOLD times is
+# flagged as N+1. Set AGOA_METRICS_TOKEN to require it as a bearer token.
+AGOA_METRICS_WINDOW = timedelta(minutes=5)
+AGOA_METRICS_SLICES = 5
+AGOA_METRICS_N_PLUS_ONE_THRESHOLD = 10
+AGOA_METRICS_TOKEN = None
+
+# Delta sync (?changed_since=) resends rows updated this long before the
+# client's time, to catch writes committed late. Deletions are remembered for
+# AGOA_TOMBSTONE_RETENTION; older sync times must reload the collection.
+AGOA_SYNC_OVERLAP = timedelta(seconds=5)
+AGOA_TOMBSTONE_RETENTION = timedelta(days=7)
+
+# Changes pushed to subscribers of an airport are batched for this long, or
+# until this many are pending. Each client buffers at most AGOA_PUSH_QUEUE_SIZE
+# batches; AGOA_PUSH_HEARTBEAT keeps idle streams open through proxies.
+AGOA_PUSH_DEBOUNCE = timedelta(milliseconds=250)
+AGOA_PUSH_MAX_BATCH = 500
+AGOA_PUSH_QUEUE_SIZE = 100
+AGOA_PUSH_HEARTBEAT = timedelta(seconds=15)
+# Relay pushed changes between worker processes through Redis, if set
+AGOA_PUSH_REDIS_URL = None
+
+# Per-airport and day occupancy indexes kept per process, and the Django
+# cache holding the versions that tell workers to rebuild them. Without a
+# shared backend (see CACHES), indexes are rebuilt after
+# AGOA_OCCUPANCY_CACHE_TTL seconds to pick up other workers' changes.
+AGOA_OCCUPANCY_CACHE_SIZE = 256
+AGOA_OCCUPANCY_CACHE_ALIAS = "default"
+AGOA_OCCUPANCY_CACHE_TTL = 60
+# Default bucket size of the occupancy timeline
+AGOA_OCCUPANCY_RESOLUTION = timedelta(minutes=60)
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "AGOA API",
     "VERSION": "1.0.0",
@@ -149,3 +289,15 @@ SIMPLE_JWT = {
     "AUTH_HEADER_NAME": "HTTP_AUTHORIZATION",
     "ACCESS_TOKEN_LIFETIME": timedelta(days=14),
 }
+
+# Verified access tokens and their users are cached per process, up to this
+# many for this many seconds; other workers' changes to a user (e.g. a
+# deactivation) are seen after the TTL. Revocations are rejected at once by
+# every worker: cache hits check this Django cache when it is shared (see
+# CACHES), else the RevokedToken table.
+AGOA_AUTH_CACHE_SIZE = 10000
+AGOA_AUTH_CACHE_TTL = 60
+AGOA_AUTH_CACHE_ALIAS = "default"
+
+# Lifetime of the scoped access tokens issued to service accounts
+AGOA_SERVICE_TOKEN_LIFETIME = timedelta(days=30)
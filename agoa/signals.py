@@ -0,0 +1,180 @@
+from typing import Any
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache import reference_cache_for
+from .models import Airline, Airport, Flight, Tombstone, Turnaround
+from .occupancy import TurnaroundTimes, occupancy_cache
+from .push import publish_flights, publish_turnarounds
+from .stats import refresh_daily_stats, turnaround_keys
+from .status import propagate_flight_times
+
+# Signals are skipped for fixture loading (raw=True): related rows may not
+# exist yet, so rebuild the rollup with rebuild_turnaround_stats afterwards.
+
+
+def _flight_turnarounds(flight: Flight) -> Any:
+    return Turnaround.objects.filter(
+        Q(arrival_flight_id=flight.pk) | Q(departure_flight_id=flight.pk)
+    )
+
+
+@receiver(pre_save, sender=Turnaround)
+def remember_turnaround_keys(
+    sender: Any, instance: Turnaround, raw: bool = False, **kwargs: Any
+) -> None:
+    """Remember the rollup row an existing turnaround counted towards"""
+    if not raw and instance.pk:
+        instance._stats_keys = turnaround_keys(
+            Turnaround.objects.filter(pk=instance.pk)
+        )
+
+
+@receiver(post_save, sender=Turnaround)
+def refresh_turnaround_stats(
+    sender: Any, instance: Turnaround, raw: bool = False, **kwargs: Any
+) -> None:
+    if raw:
+        return
+    keys = turnaround_keys(Turnaround.objects.filter(pk=instance.pk))
+    refresh_daily_stats(keys | instance.__dict__.pop("_stats_keys", set()))
+
+
+@receiver(pre_delete, sender=Turnaround)
+def remember_deleted_turnaround_keys(
+    sender: Any, instance: Turnaround, **kwargs: Any
+) -> None:
+    # Computed before the delete, while the arrival flight still exists
+    instance._stats_keys = turnaround_keys(Turnaround.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Turnaround)
+def refresh_deleted_turnaround_stats(
+    sender: Any, instance: Turnaround, **kwargs: Any
+) -> None:
+    refresh_daily_stats(instance.__dict__.pop("_stats_keys", set()))
+
+
+@receiver(pre_save, sender=Flight)
+def remember_flight_keys(
+    sender: Any, instance: Flight, raw: bool = False, **kwargs: Any
+) -> None:
+    """Remember the rollup rows of turnarounds using an existing flight"""
+    if not raw and instance.pk:
+        instance._stats_keys = turnaround_keys(_flight_turnarounds(instance))
+
+
+@receiver(post_save, sender=Flight)
+def propagate_flight_status(
+    sender: Any, instance: Flight, created: bool, raw: bool = False, **kwargs: Any
+) -> None:
+    """Copy actual times to the flight's turnarounds and down the rotation"""
+    # Registered before refresh_flight_stats, which reads the copied times
+    if raw or created:
+        return
+    propagate_flight_times([instance.pk])
+
+
+@receiver(post_save, sender=Flight)
+def refresh_flight_stats(
+    sender: Any, instance: Flight, created: bool, raw: bool = False, **kwargs: Any
+) -> None:
+    # A new flight cannot belong to a turnaround yet
+    if raw or created:
+        return
+    keys = turnaround_keys(_flight_turnarounds(instance))
+    refresh_daily_stats(keys | instance.__dict__.pop("_stats_keys", set()))
+
+
+@receiver(pre_save, sender=Turnaround)
+def remember_turnaround_times(
+    sender: Any, instance: Turnaround, raw: bool = False, **kwargs: Any
+) -> None:
+    """Remember where an existing turnaround sat in the occupancy index"""
+    if not raw and instance.pk:
+        instance._occupancy_before = TurnaroundTimes.read(
+            Turnaround.objects.filter(pk=instance.pk)
+        )
+
+
+def _turnarounds_changed(
+    before: list[TurnaroundTimes], after: list[TurnaroundTimes]
+) -> None:
+    occupancy_cache.apply(before, after)
+    # Both sides, so a turnaround moved to another airport leaves the old one
+    publish_turnarounds(before + after)
+
+
+@receiver(post_save, sender=Turnaround)
+def update_occupancy(
+    sender: Any, instance: Turnaround, raw: bool = False, **kwargs: Any
+) -> None:
+    if raw:
+        return
+    before = instance.__dict__.pop("_occupancy_before", [])
+    after = [TurnaroundTimes.of(instance)]
+    # Applied once committed, so a rollback never reaches the index or clients
+    transaction.on_commit(lambda: _turnarounds_changed(before, after))
+
+
+@receiver(post_delete, sender=Turnaround)
+def update_deleted_occupancy(sender: Any, instance: Turnaround, **kwargs: Any) -> None:
+    before = [TurnaroundTimes.of(instance)]
+    transaction.on_commit(lambda: _turnarounds_changed(before, []))
+
+
+@receiver(post_save, sender=Flight)
+@receiver(post_delete, sender=Flight)
+def push_flight_change(
+    sender: Any, instance: Flight, raw: bool = False, **kwargs: Any
+) -> None:
+    if not raw:
+        transaction.on_commit(lambda: publish_flights([instance]))
+
+
+@receiver(pre_save, sender=Flight)
+@receiver(pre_save, sender=Turnaround)
+def remember_filter_values(
+    sender: Any, instance: Any, raw: bool = False, **kwargs: Any
+) -> None:
+    """Remember the values list filters select an existing row by"""
+    if not raw and instance.pk:
+        fields = Tombstone.FILTER_FIELDS[sender._meta.model_name]
+        instance._filter_values = (
+            sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+        )
+
+
+@receiver(post_save, sender=Flight)
+@receiver(post_save, sender=Turnaround)
+def record_move(sender: Any, instance: Any, raw: bool = False, **kwargs: Any) -> None:
+    """Record a row that may have left ?changed_since= clients' filters"""
+    before = instance.__dict__.pop("_filter_values", None)
+    if raw or before is None:
+        return
+    name = sender._meta.model_name
+    after = tuple(getattr(instance, field) for field in Tombstone.FILTER_FIELDS[name])
+    if after != before:
+        Tombstone.record_moves(name, [instance.pk])
+
+
+@receiver(post_delete, sender=Flight)
+@receiver(post_delete, sender=Turnaround)
+def record_tombstone(sender: Any, instance: Any, **kwargs: Any) -> None:
+    """Keep deletions for ?changed_since= clients, in the deleting transaction"""
+    Tombstone.objects.create(model=sender._meta.model_name, object_id=instance.pk)
+
+
+@receiver(post_save, sender=Airline)
+@receiver(post_delete, sender=Airline)
+@receiver(post_save, sender=Airport)
+@receiver(post_delete, sender=Airport)
+def invalidate_reference_cache(sender: Any, **kwargs: Any) -> None:
+    reference_cache = reference_cache_for(sender)
+    if reference_cache is not None:
+        # Again on commit, in case a reader cached the uncommitted state
+        reference_cache.invalidate()
+        transaction.on_commit(reference_cache.invalidate)
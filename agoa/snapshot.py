@@ -0,0 +1,346 @@
+"""
+Columnar snapshots of the schedule, as Parquet or Arrow IPC files.
+
+``write_snapshot`` writes airlines and airports whole, and flights and
+turnarounds one file per day of scheduled departure or start, in
+Hive-style partitions that pyarrow, pandas, DuckDB or Spark read as one
+dataset:
+
+    snapshots/airlines/part.parquet
+    snapshots/flights/date=2024-03-20/part.parquet
+    snapshots/turnarounds/date=2024-03-20/part.parquet
+
+Foreign keys are kept as ids, so renaming an airport only rewrites the
+airports file. Rows are read in chunks of ``AGOA_EXPORT_CHUNK_SIZE`` and
+written as one record batch each, so memory does not depend on the size of
+a partition.
+
+A manifest records a fingerprint of every file: the row count, the sum of
+the ids and the latest ``updated_at`` of a partition, or a hash of the
+rows of a reference table. Reruns only rewrite the files whose
+fingerprint changed, and remove the partitions whose rows are all gone.
+
+pyarrow is an optional dependency: without it ``snapshot_available()`` is
+False.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import IO, Any, Iterable, NamedTuple, Optional, Union
+
+from django.conf import settings
+from django.db.models import Count, Max, Model, QuerySet, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Airline, Airport, Flight, Turnaround
+from .utils import batched, days_bounds
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+# File extension and content type of each output
+SNAPSHOT_FORMATS = {
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "arrow": (".arrow", "application/vnd.apache.arrow.file"),
+}
+
+MANIFEST = "_manifest.json"
+
+
+def snapshot_available() -> bool:
+    return pa is not None
+
+
+def _arrow_type(kind: str) -> Any:
+    if kind == "timestamp":
+        return pa.timestamp("us", tz="UTC")
+    return {"int64": pa.int64(), "string": pa.string()}[kind]
+
+
+class SnapshotTable(NamedTuple):
+    """A model and the columns written for it"""
+
+    model: type[Model]
+    # Column name (a field attname) -> "int64", "string" or "timestamp"
+    columns: dict[str, str]
+    # Datetime field whose UTC day partitions the table, if any
+    partition_by: Optional[str] = None
+
+    def schema(self) -> Any:
+        return pa.schema(
+            [
+                pa.field(name, _arrow_type(kind), nullable=kind != "int64")
+                for name, kind in self.columns.items()
+            ]
+        )
+
+    def rows(self, day: Optional[date] = None) -> Iterable[tuple]:
+        """The rows of the table, or of one partition, in id order"""
+        queryset: QuerySet = self.model.objects.all()
+        if day is not None:
+            start, end = days_bounds(day, day)
+            queryset = queryset.filter(
+                **{f"{self.partition_by}__gte": start, f"{self.partition_by}__lt": end}
+            )
+        return (
+            queryset.order_by("pk")
+            .values_list(*self.columns)
+            .iterator(chunk_size=settings.AGOA_EXPORT_CHUNK_SIZE)
+        )
+
+
+SNAPSHOT_TABLES = {
+    "airlines": SnapshotTable(
+        Airline, {"id": "int64", "name": "string", "iata_code": "string"}
+    ),
+    "airports": SnapshotTable(
+        Airport,
+        {
+            "id": "int64",
+            "name": "string",
+            "iata_code": "string",
+            "city": "string",
+            "country": "string",
+        },
+    ),
+    "flights": SnapshotTable(
+        Flight,
+        {
+            "id": "int64",
+            "flight_number": "string",
+            "airline_id": "int64",
+            "departure_airport_id": "int64",
+            "arrival_airport_id": "int64",
+            "scheduled_departure": "timestamp",
+            "estimated_departure": "timestamp",
+            "actual_departure": "timestamp",
+            "scheduled_arrival": "timestamp",
+            "estimated_arrival": "timestamp",
+            "actual_arrival": "timestamp",
+            "updated_at": "timestamp",
+        },
+        partition_by="scheduled_departure",
+    ),
+    "turnarounds": SnapshotTable(
+        Turnaround,
+        {
+            "id": "int64",
+            "arrival_flight_id": "int64",
+            "departure_flight_id": "int64",
+            "airport_id": "int64",
+            "scheduled_start": "timestamp",
+            "actual_start": "timestamp",
+            "scheduled_end": "timestamp",
+            "actual_end": "timestamp",
+            "updated_at": "timestamp",
+        },
+        partition_by="scheduled_start",
+    ),
+}
+
+
+def write_table(
+    table: SnapshotTable,
+    rows: Iterable[tuple],
+    sink: Union[str, Path, IO[bytes]],
+    output: str,
+) -> int:
+    """Write ``rows`` to ``sink`` one record batch per chunk; return the count"""
+    schema = table.schema()
+    if output == "parquet":
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_file(sink, schema)
+    count = 0
+    with writer:
+        for chunk in batched(rows, settings.AGOA_EXPORT_CHUNK_SIZE):
+            arrays = [
+                pa.array(values, type=column.type)
+                for values, column in zip(zip(*chunk), schema)
+            ]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            count += len(chunk)
+    return count
+
+
+def partition_fingerprints(
+    table: SnapshotTable, first: Optional[date], last: Optional[date]
+) -> dict[str, list]:
+    """
+    [row count, sum of ids, latest updated_at] of each day with rows.
+
+    An edit moves updated_at, and a deletion the count and the id sum, so
+    one aggregate query tells which partitions changed.
+    """
+    queryset: QuerySet = table.model.objects.all()
+    if first is not None and last is not None:
+        start, end = days_bounds(first, last)
+        queryset = queryset.filter(
+            **{f"{table.partition_by}__gte": start, f"{table.partition_by}__lt": end}
+        )
+    days = (
+        queryset.annotate(day=TruncDate(table.partition_by))
+        .values("day")
+        .annotate(rows=Count("pk"), id_sum=Sum("pk"), updated=Max("updated_at"))
+        .order_by("day")
+    )
+    return {
+        row["day"].isoformat(): [row["rows"], row["id_sum"], row["updated"].isoformat()]
+        for row in days
+    }
+
+
+def table_fingerprint(table: SnapshotTable) -> str:
+    """Hash of every row of a small, unpartitioned table"""
+    digest = hashlib.sha256()
+    for row in table.rows():
+        digest.update(json.dumps(row, default=str).encode())
+    return digest.hexdigest()
+
+
+@dataclass
+class SnapshotReport:
+    """Files written, kept and removed by a snapshot run"""
+
+    output: str
+    written: list[str] = field(default_factory=list)
+    unchanged: int = 0
+    removed: list[str] = field(default_factory=list)
+    rows: int = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "output": self.output,
+            "written": self.written,
+            "unchanged": self.unchanged,
+            "removed": self.removed,
+            "rows": self.rows,
+        }
+
+
+class Snapshot:
+    """A snapshot directory and its manifest"""
+
+    def __init__(self, root: Union[str, Path], output: str = "parquet") -> None:
+        self.root = Path(root)
+        self.output = output
+        self.manifest: dict[str, Any] = {"format": output, "files": {}}
+        path = self.root / MANIFEST
+        if path.exists():
+            manifest = json.loads(path.read_text())
+            # Switching formats rewrites everything
+            if manifest.get("format") == output:
+                self.manifest = manifest
+
+    def path(self, name: str, day: Optional[str] = None) -> Path:
+        directory = self.root / name
+        if day is not None:
+            directory /= f"date={day}"
+        return directory / f"part{SNAPSHOT_FORMATS[self.output][0]}"
+
+    def key(self, path: Path) -> str:
+        """Manifest key of a file: its path in the snapshot"""
+        return path.relative_to(self.root).as_posix()
+
+    def write(
+        self, name: str, day: Optional[str], fingerprint: Any, report: SnapshotReport
+    ) -> None:
+        table = SNAPSHOT_TABLES[name]
+        path = self.path(name, day)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Readers never see a half-written file
+        partial = path.with_name(path.name + ".partial")
+        rows = table.rows(date.fromisoformat(day) if day else None)
+        try:
+            count = write_table(table, rows, partial, self.output)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        os.replace(partial, path)
+        self.manifest["files"][self.key(path)] = {
+            "fingerprint": fingerprint,
+            "rows": count,
+            "written_at": timezone.now().isoformat(),
+        }
+        self.save()
+        report.written.append(self.key(path))
+        report.rows += count
+
+    def unchanged(self, path: Path, fingerprint: Any) -> bool:
+        entry = self.manifest["files"].get(self.key(path))
+        return (
+            entry is not None and entry["fingerprint"] == fingerprint and path.exists()
+        )
+
+    def save(self) -> None:
+        path = self.root / MANIFEST
+        partial = path.with_name(path.name + ".partial")
+        partial.write_text(json.dumps(self.manifest, indent=2, sort_keys=True))
+        os.replace(partial, path)
+
+    def update(
+        self,
+        first: Optional[date] = None,
+        last: Optional[date] = None,
+        full: bool = False,
+    ) -> SnapshotReport:
+        """
+        Bring the snapshot up to date for the days ``first`` to ``last``
+        (every day when not given) and the reference tables.
+
+        With ``full``, every file is rewritten whatever its fingerprint.
+        """
+        report = SnapshotReport(self.output)
+        self.root.mkdir(parents=True, exist_ok=True)
+        for name, table in SNAPSHOT_TABLES.items():
+            if table.partition_by is None:
+                fingerprint: Any = table_fingerprint(table)
+                if full or not self.unchanged(self.path(name), fingerprint):
+                    self.write(name, None, fingerprint, report)
+                else:
+                    report.unchanged += 1
+                continue
+
+            fingerprints = partition_fingerprints(table, first, last)
+            for day, fingerprint in fingerprints.items():
+                if full or not self.unchanged(self.path(name, day), fingerprint):
+                    self.write(name, day, fingerprint, report)
+                else:
+                    report.unchanged += 1
+            # Partitions of the range left without rows
+            for path in sorted((self.root / name).glob("date=*")):
+                day = path.name.removeprefix("date=")
+                in_range = first is None or first.isoformat() <= day
+                in_range &= last is None or day <= last.isoformat()
+                if in_range and day not in fingerprints:
+                    shutil.rmtree(path)
+                    prefix = self.key(path) + "/"
+                    files = self.manifest["files"]
+                    for key in [key for key in files if key.startswith(prefix)]:
+                        del files[key]
+                    self.save()
+                    report.removed.append(self.key(path))
+        self.save()
+        return report
+
+
+def write_snapshot(
+    root: Union[str, Path],
+    first: Optional[date] = None,
+    last: Optional[date] = None,
+    output: str = "parquet",
+    full: bool = False,
+) -> SnapshotReport:
+    """Update the snapshot in ``root``; see ``Snapshot.update``"""
+    return Snapshot(root, output).update(first, last, full)
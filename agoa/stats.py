@@ -0,0 +1,537 @@
+from datetime import date, timedelta
+from functools import reduce
+from operator import or_
+from typing import Any, Iterable, NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Avg,
+    Case,
+    Count,
+    DurationField,
+    ExpressionWrapper,
+    F,
+    IntegerField,
+    Q,
+    QuerySet,
+    Sum,
+    Value,
+    When,
+    Window,
+)
+from django.db.models.functions import Rank, RowNumber, TruncDate
+
+from .models import Turnaround, TurnaroundDailyStats
+
+PERCENTILES = (50, 90, 99)
+
+# ?group_by= value -> lookup naming the group of a turnaround
+DURATION_GROUPS = {
+    "airport": "airport__iata_code",
+    "airline": "arrival_flight__airline__iata_code",
+}
+
+
+def _minutes(value: Optional[timedelta]) -> Optional[float]:
+    return None if value is None else value.total_seconds() / 60
+
+
+def turnaround_duration_stats(
+    queryset: QuerySet, group_by: Optional[str] = None
+) -> list[dict[str, Any]]:
+    """
+    Summarise scheduled and actual turnaround durations in one SQL query.
+
+    Durations are computed per row in the database (``end - start``). Window
+    functions partitioned by the optional ``group_by`` key (see
+    ``DURATION_GROUPS``) add the count, the mean and the rank of every row,
+    and only the rows sitting at a requested percentile are returned, so at
+    most ``2 * len(PERCENTILES)`` rows per group leave the database.
+    Percentiles use the nearest-rank method. Actual figures only consider
+    turnarounds with both actual times set.
+
+    Returns one dict per group, ordered by group key.
+    """
+    return _summarise_durations(_duration_rows(queryset, group_by), group_by)
+
+
+async def aturnaround_duration_stats(
+    queryset: QuerySet, group_by: Optional[str] = None
+) -> list[dict[str, Any]]:
+    """Async version of ``turnaround_duration_stats``"""
+    rows = [row async for row in _duration_rows(queryset, group_by)]
+    return _summarise_durations(rows, group_by)
+
+
+def _duration_rows(queryset: QuerySet, group_by: Optional[str]) -> QuerySet:
+    key = F(DURATION_GROUPS[group_by]) if group_by else Value("")
+    partition = {"partition_by": [F("group")]}
+    return (
+        queryset.annotate(
+            group=key,
+            scheduled=ExpressionWrapper(
+                F("scheduled_end") - F("scheduled_start"), output_field=DurationField()
+            ),
+            actual=ExpressionWrapper(
+                F("actual_end") - F("actual_start"), output_field=DurationField()
+            ),
+        )
+        .annotate(
+            scheduled_rank=Window(
+                RowNumber(), order_by=F("scheduled").asc(), **partition
+            ),
+            actual_rank=Window(
+                RowNumber(), order_by=F("actual").asc(nulls_last=True), **partition
+            ),
+            scheduled_count=Window(Count("pk"), **partition),
+            actual_count=Window(Count("actual"), **partition),
+            scheduled_avg=Window(Avg("scheduled"), **partition),
+            actual_avg=Window(Avg("actual"), **partition),
+        )
+        .filter(
+            _rank_filter("scheduled_rank", "scheduled_count")
+            | _rank_filter("actual_rank", "actual_count")
+        )
+        .values(
+            "group",
+            "scheduled",
+            "actual",
+            "scheduled_rank",
+            "actual_rank",
+            "scheduled_count",
+            "actual_count",
+            "scheduled_avg",
+            "actual_avg",
+        )
+    )
+
+
+def _summarise_durations(
+    rows: Iterable[dict[str, Any]], group_by: Optional[str]
+) -> list[dict[str, Any]]:
+    groups: dict[str, dict[str, Any]] = {}
+    for row in rows:
+        summary = groups.get(row["group"])
+        if summary is None:
+            summary = groups[row["group"]] = {
+                "count": row["scheduled_count"],
+                "scheduled": _summary(row["scheduled_avg"]),
+                "actual": _summary(row["actual_avg"], row["actual_count"]),
+            }
+            if group_by:
+                summary = groups[row["group"]] = {group_by: row["group"], **summary}
+        for kind in ("scheduled", "actual"):
+            for p in PERCENTILES:
+                if row[f"{kind}_rank"] == _nearest_rank(p, row[f"{kind}_count"]):
+                    summary[kind][f"p{p}_minutes"] = _minutes(row[kind])
+
+    return [groups[name] for name in sorted(groups)]
+
+
+def _rank_filter(rank: str, count: str) -> Q:
+    # ceil(count * p / 100) in integer arithmetic, so that SQL and Python
+    # agree exactly on which row holds each percentile
+    condition = Q()
+    for p in PERCENTILES:
+        condition |= Q(**{rank: (F(count) * p + 99) / 100})
+    return condition
+
+
+def _nearest_rank(percentile: int, count: int) -> int:
+    return (count * percentile + 99) // 100
+
+
+def _summary(average: Optional[timedelta], count: Optional[int] = None) -> dict:
+    summary: dict[str, Any] = {} if count is None else {"count": count}
+    summary["average_minutes"] = _minutes(average)
+    summary.update({f"p{p}_minutes": None for p in PERCENTILES})
+    return summary
+
+
+class StatsKey(NamedTuple):
+    """Identifies one TurnaroundDailyStats row"""
+
+    date: date
+    airport_id: int
+    airline_id: int
+
+
+# ?group_by= value -> TurnaroundDailyStats lookup naming the group
+ROLLUP_GROUPS = {
+    "airport": "airport__iata_code",
+    "airline": "airline__iata_code",
+}
+
+ROLLUP_SUMS = [
+    "turnaround_count",
+    "scheduled_duration",
+    "actual_count",
+    "actual_duration",
+    "duration_deviation",
+    "arrival_delay_count",
+    "arrival_delay",
+    "departure_delay_count",
+    "departure_delay",
+    "on_time_departures",
+]
+
+
+def _duration(end: str, start: str) -> ExpressionWrapper:
+    return ExpressionWrapper(F(end) - F(start), output_field=DurationField())
+
+
+def turnaround_keys(queryset: QuerySet) -> set[StatsKey]:
+    """Rollup rows that the turnarounds of ``queryset`` contribute to"""
+    rows = queryset.values_list(
+        TruncDate("scheduled_start"), "airport_id", "arrival_flight__airline_id"
+    )
+    return {StatsKey(*row) for row in rows}
+
+
+def _annotate_stats(queryset: QuerySet) -> QuerySet:
+    return queryset.annotate(
+        day=TruncDate("scheduled_start"),
+        airline=F("arrival_flight__airline_id"),
+        scheduled=_duration("scheduled_end", "scheduled_start"),
+        actual=_duration("actual_end", "actual_start"),
+        arrival_delay=_duration(
+            "arrival_flight__actual_arrival", "arrival_flight__scheduled_arrival"
+        ),
+        departure_delay=_duration(
+            "departure_flight__actual_departure",
+            "departure_flight__scheduled_departure",
+        ),
+    )
+
+
+def _stats_aggregates() -> dict[str, Any]:
+    # The delay sums cannot reuse the names of the annotations they sum;
+    # _rename_delays gives them the rollup column names
+    on_time = F("departure_flight__scheduled_departure") + Value(
+        settings.AGOA_ON_TIME_THRESHOLD, output_field=DurationField()
+    )
+    return {
+        "turnaround_count": Count("pk"),
+        "scheduled_duration": Sum("scheduled"),
+        "actual_count": Count("actual"),
+        "actual_duration": Sum("actual"),
+        "duration_deviation": Sum(
+            Case(
+                When(actual__gt=F("scheduled"), then=F("actual") - F("scheduled")),
+                default=F("scheduled") - F("actual"),
+                output_field=DurationField(),
+            )
+        ),
+        "arrival_delay_count": Count("arrival_delay"),
+        "arrival_delay_sum": Sum("arrival_delay"),
+        "departure_delay_count": Count("departure_delay"),
+        "departure_delay_sum": Sum("departure_delay"),
+        "on_time_departures": Count(
+            "pk", filter=Q(departure_flight__actual_departure__lte=on_time)
+        ),
+    }
+
+
+def _rename_delays(row: dict[str, Any]) -> dict[str, Any]:
+    row["arrival_delay"] = row.pop("arrival_delay_sum")
+    row["departure_delay"] = row.pop("departure_delay_sum")
+    return row
+
+
+def aggregate_daily_stats(queryset: QuerySet) -> dict[StatsKey, dict[str, Any]]:
+    """Compute the rollup columns of every key covered by ``queryset``"""
+    rows = (
+        _annotate_stats(queryset)
+        .values("day", "airport", "airline")
+        .annotate(**_stats_aggregates())
+        .order_by()
+    )
+
+    stats = {}
+    for row in rows:
+        key = StatsKey(row.pop("day"), row.pop("airport"), row.pop("airline"))
+        # Sums over no actual times come back as NULL
+        stats[key] = {
+            name: timedelta() if value is None else value
+            for name, value in _rename_delays(row).items()
+        }
+    return stats
+
+
+def refresh_daily_stats(keys: Iterable[StatsKey]) -> None:
+    """
+    Recompute the rollup rows for ``keys`` from the turnarounds table.
+
+    Only the turnarounds of the affected days, airports and airlines are
+    read, so keeping the rollup current costs O(turnarounds per key) per
+    change. Keys that no longer have turnarounds are deleted.
+    """
+    keys = set(keys)
+    if not keys:
+        return
+    days = [key.date for key in keys]
+    turnarounds = Turnaround.objects.scheduled_between(min(days), max(days)).filter(
+        airport_id__in={key.airport_id for key in keys},
+        arrival_flight__airline_id__in={key.airline_id for key in keys},
+    )
+    stats = aggregate_daily_stats(turnarounds)
+
+    with transaction.atomic():
+        stale = [key for key in keys if key not in stats]
+        if stale:
+            TurnaroundDailyStats.objects.filter(
+                reduce(or_, (Q(**key._asdict()) for key in stale))
+            ).delete()
+        _write_daily_stats({key: stats[key] for key in keys if key in stats})
+
+
+def rebuild_daily_stats(first: date, last: date) -> int:
+    """Replace the rollup rows from ``first`` to ``last`` inclusive"""
+    stats = aggregate_daily_stats(Turnaround.objects.scheduled_between(first, last))
+    with transaction.atomic():
+        TurnaroundDailyStats.objects.filter(date__range=(first, last)).delete()
+        _write_daily_stats(stats)
+    return len(stats)
+
+
+def _write_daily_stats(stats: dict[StatsKey, dict[str, Any]]) -> None:
+    TurnaroundDailyStats.objects.bulk_create(
+        [TurnaroundDailyStats(**key._asdict(), **row) for key, row in stats.items()],
+        update_conflicts=True,
+        unique_fields=["date", "airport", "airline"],
+        update_fields=ROLLUP_SUMS,
+    )
+
+
+def rollup_totals(
+    first: date, last: date, group_by: Optional[str] = None
+) -> list[dict[str, Any]]:
+    """
+    Sum the rollup rows of a date range, optionally per ROLLUP_GROUPS key.
+
+    The rollup is read per day, so O(days) rows. Days of the range without
+    any rollup row, e.g. loaded by fixture (signals skip raw saves), are
+    aggregated from their turnarounds in one more query.
+    """
+    rows = list(_daily_totals(first, last, group_by))
+    missing = _missing_days(first, last, rows)
+    if missing:
+        rows.extend(_live_totals(first, last, missing, group_by))
+    return _combine_totals(rows, group_by)
+
+
+async def arollup_totals(
+    first: date, last: date, group_by: Optional[str] = None
+) -> list[dict[str, Any]]:
+    """Async version of ``rollup_totals``"""
+    rows = [row async for row in _daily_totals(first, last, group_by)]
+    missing = _missing_days(first, last, rows)
+    if missing:
+        rows.extend(await _alive_totals(first, last, missing, group_by))
+    return _combine_totals(rows, group_by)
+
+
+_ROLLUP_AGGREGATES = {name: Sum(name) for name in ROLLUP_SUMS}
+
+
+def _daily_totals(first: date, last: date, group_by: Optional[str]) -> QuerySet:
+    rows = TurnaroundDailyStats.objects.filter(date__range=(first, last))
+    if group_by:
+        rows = rows.values("date", group=F(ROLLUP_GROUPS[group_by]))
+    else:
+        rows = rows.values("date")
+    return rows.annotate(**_ROLLUP_AGGREGATES).order_by()
+
+
+def _missing_days(first: date, last: date, rows: list[dict[str, Any]]) -> list[date]:
+    covered = {row["date"] for row in rows}
+    days = (first + timedelta(days=n) for n in range((last - first).days + 1))
+    return [day for day in days if day not in covered]
+
+
+def _combine_totals(
+    rows: Iterable[dict[str, Any]], group_by: Optional[str]
+) -> list[dict[str, Any]]:
+    totals: dict[Any, dict[str, Any]] = {}
+    for row in rows:
+        group = row.get("group")
+        total = totals.get(group)
+        if total is None:
+            total = totals[group] = {name: None for name in ROLLUP_SUMS}
+            if group_by:
+                total["group"] = group
+        for name in ROLLUP_SUMS:
+            if row[name] is not None:
+                total[name] = (
+                    row[name] if total[name] is None else total[name] + row[name]
+                )
+    return [
+        totals[group]
+        for group in sorted(totals, key=lambda group: (group is None, group))
+        if totals[group]["turnaround_count"]
+    ]
+
+
+def _live_turnarounds(first: date, last: date, days: list[date]) -> QuerySet:
+    turnarounds = Turnaround.objects.scheduled_between(first, last)
+    return _annotate_stats(turnarounds).filter(day__in=days)
+
+
+def _grouped_live_totals(turnarounds: QuerySet, group_by: str) -> QuerySet:
+    rows = turnarounds.values(group=F(DURATION_GROUPS[group_by])).order_by("group")
+    return rows.annotate(**_stats_aggregates())
+
+
+def _live_totals(
+    first: date, last: date, days: list[date], group_by: Optional[str]
+) -> list[dict[str, Any]]:
+    turnarounds = _live_turnarounds(first, last, days)
+    if group_by:
+        totals = list(_grouped_live_totals(turnarounds, group_by))
+    else:
+        totals = [turnarounds.aggregate(**_stats_aggregates())]
+    return [_rename_delays(row) for row in totals if row["turnaround_count"]]
+
+
+async def _alive_totals(
+    first: date, last: date, days: list[date], group_by: Optional[str]
+) -> list[dict[str, Any]]:
+    turnarounds = _live_turnarounds(first, last, days)
+    if group_by:
+        totals = [row async for row in _grouped_live_totals(turnarounds, group_by)]
+    else:
+        totals = [await turnarounds.aaggregate(**_stats_aggregates())]
+    return [_rename_delays(row) for row in totals if row["turnaround_count"]]
+
+
+def _average(total: Optional[timedelta], count: int) -> Optional[float]:
+    return _minutes(_duration_ratio(total, count))
+
+
+def _duration_ratio(total: Optional[timedelta], count: int) -> Optional[timedelta]:
+    return total / count if total is not None and count else None
+
+
+def rollup_duration_averages(
+    first: date, last: date, group_by: Optional[str] = None
+) -> list[dict[str, Any]]:
+    """Mean scheduled and actual durations, in the shape of the live stats"""
+    return _duration_averages(rollup_totals(first, last, group_by), group_by)
+
+
+async def arollup_duration_averages(
+    first: date, last: date, group_by: Optional[str] = None
+) -> list[dict[str, Any]]:
+    """Async version of ``rollup_duration_averages``"""
+    totals = await arollup_totals(first, last, group_by)
+    return _duration_averages(totals, group_by)
+
+
+def _duration_averages(
+    totals: list[dict[str, Any]], group_by: Optional[str]
+) -> list[dict[str, Any]]:
+    averages = []
+    for row in totals:
+        summary = {
+            "count": row["turnaround_count"],
+            # Percentiles cannot be rolled up: see merge_percentiles
+            "scheduled": _summary(
+                _duration_ratio(row["scheduled_duration"], row["turnaround_count"])
+            ),
+            "actual": _summary(
+                _duration_ratio(row["actual_duration"], row["actual_count"]),
+                row["actual_count"],
+            ),
+        }
+        averages.append({group_by: row["group"], **summary} if group_by else summary)
+    return averages
+
+
+def merge_percentiles(
+    averages: list[dict[str, Any]],
+    live: list[dict[str, Any]],
+    group_by: Optional[str] = None,
+) -> list[dict[str, Any]]:
+    """Add live percentiles to rollup averages, dropping groups missing live"""
+    live_by_group = {row.get(group_by): row for row in live}
+    return [
+        {**summary, **live_by_group[summary.get(group_by)]}
+        for summary in averages
+        if summary.get(group_by) in live_by_group
+    ]
+
+
+def rollup_punctuality(
+    first: date, last: date, group_by: Optional[str] = None
+) -> list[dict[str, Any]]:
+    """Delay and on-time figures of a date range, from the rollup"""
+    punctuality = []
+    for row in rollup_totals(first, last, group_by):
+        summary = {
+            "count": row["turnaround_count"],
+            "average_arrival_delay_minutes": _average(
+                row["arrival_delay"], row["arrival_delay_count"]
+            ),
+            "average_departure_delay_minutes": _average(
+                row["departure_delay"], row["departure_delay_count"]
+            ),
+            "on_time_departure_rate": (
+                row["on_time_departures"] / row["departure_delay_count"]
+                if row["departure_delay_count"]
+                else None
+            ),
+            "average_duration_deviation_minutes": _average(
+                row["duration_deviation"], row["actual_count"]
+            ),
+        }
+        punctuality.append({group_by: row["group"], **summary} if group_by else summary)
+    return punctuality
+
+
+def punctuality_ranking(first: date, last: date, top: int) -> list[dict[str, Any]]:
+    """
+    Rank (airline, airport) pairs by mean turnaround duration deviation.
+
+    The mean |actual - scheduled| duration is computed per pair from the
+    rollup and ranked with a ``RANK()`` window in a single query; pairs
+    without actual times are left out. Results are cached for
+    ``AGOA_PUNCTUALITY_CACHE_SECONDS`` per date range and size.
+    """
+    cache_key = f"agoa:punctuality-ranking:{first}:{last}:{top}"
+    ranking = cache.get(cache_key)
+    if ranking is not None:
+        return ranking
+
+    rows = (
+        TurnaroundDailyStats.objects.filter(date__range=(first, last))
+        .values(
+            airline_code=F("airline__iata_code"), airport_code=F("airport__iata_code")
+        )
+        .annotate(
+            measured=Sum("actual_count", output_field=IntegerField()),
+            deviation=Sum("duration_deviation"),
+        )
+        .filter(measured__gt=0)
+        .annotate(
+            average=ExpressionWrapper(
+                F("deviation") / F("measured"), output_field=DurationField()
+            )
+        )
+        .annotate(rank=Window(Rank(), order_by=F("average").asc()))
+        .order_by("rank", "airline_code", "airport_code")
+    )[:top]
+
+    ranking = [
+        {
+            "rank": row["rank"],
+            "airline": row["airline_code"],
+            "airport": row["airport_code"],
+            "count": row["measured"],
+            "average_duration_deviation_minutes": _minutes(row["average"]),
+        }
+        for row in rows
+    ]
+    cache.set(cache_key, ranking, settings.AGOA_PUNCTUALITY_CACHE_SECONDS)
+    return ranking
@@ -0,0 +1,308 @@
+import atexit
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import partial
+from typing import Any, Iterable, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .metrics import registry
+from .models import Flight, Turnaround
+from .occupancy import TurnaroundTimes, occupancy_cache
+from .parsers import decoded
+from .push import publish_flights, publish_turnarounds
+from .serializers import FlightStatusEventSerializer
+from .stats import refresh_daily_stats, turnaround_keys
+from .utils import batched
+
+logger = logging.getLogger(__name__)
+
+# Status event type -> Flight field it sets
+STATUS_EVENT_FIELDS = {
+    "ETD": "estimated_departure",
+    "ETA": "estimated_arrival",
+    "ATD": "actual_departure",
+    "ATA": "actual_arrival",
+}
+
+FLIGHT_TIME_FIELDS = [
+    "scheduled_departure",
+    "estimated_departure",
+    "actual_departure",
+    "scheduled_arrival",
+    "estimated_arrival",
+    "actual_arrival",
+]
+
+# Read with the times, to know which airports to push a changed flight to
+FLIGHT_AIRPORT_FIELDS = ["departure_airport_id", "arrival_airport_id"]
+
+# (flight id, Flight field) -> latest time received
+StatusUpdates = dict[tuple[int, str], Optional[datetime]]
+
+
+@dataclass
+class StatusResult:
+    """Outcome of a status event upload, reported back to the client"""
+
+    received: int = 0
+    queued: int = 0
+    errors: list[dict[str, Any]] = field(default_factory=list)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "received": self.received,
+            "queued": self.queued,
+            "failed": len(self.errors),
+            "errors": self.errors,
+        }
+
+
+def coalesce_events(rows: Iterable[Any], result: StatusResult) -> StatusUpdates:
+    """
+    Validate status events and keep the last time per flight and field.
+
+    Invalid rows are reported in ``result`` with their 0-based position.
+    """
+    event_serializer = FlightStatusEventSerializer()
+    updates: StatusUpdates = {}
+    for index, row in enumerate(rows):
+        result.received += 1
+        try:
+            event = event_serializer.run_validation(decoded(row))
+        except ValidationError as exc:
+            result.errors.append({"row": index, "errors": exc.detail})
+            continue
+        result.queued += 1
+        updates[(event["flight"], STATUS_EVENT_FIELDS[event["event"]])] = event["time"]
+    return updates
+
+
+class StatusEventBuffer:
+    """
+    Collects status updates and applies them together.
+
+    Updates for the same flight and field received within
+    ``AGOA_STATUS_EVENT_WINDOW`` of each other are coalesced: only the last
+    one is written. The buffer is flushed by a timer when the window ends,
+    or straight away once it holds ``AGOA_STATUS_EVENT_MAX_BUFFER`` updates.
+    A zero window applies every call synchronously.
+
+    Buffered updates are not durable: they are flushed at interpreter exit,
+    but a failed background flush drops them. Failures are logged and
+    counted in the ``agoa_status_*`` metrics.
+    """
+
+    def __init__(self) -> None:
+        self._updates: StatusUpdates = {}
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def add(self, updates: StatusUpdates) -> None:
+        window = settings.AGOA_STATUS_EVENT_WINDOW.total_seconds()
+        with self._lock:
+            self._updates.update(updates)
+            full = len(self._updates) >= settings.AGOA_STATUS_EVENT_MAX_BUFFER
+            if not full and window > 0:
+                if self._timer is None:
+                    self._timer = threading.Timer(window, self._flush_in_background)
+                    # Not waited for at exit: the atexit hook flushes instead
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+        self.flush()
+
+    def flush(self) -> int:
+        """Apply the buffered updates now, returning how many flights changed"""
+        updates = self._take()
+        return apply_status_updates(updates) if updates else 0
+
+    def _take(self) -> StatusUpdates:
+        with self._lock:
+            updates, self._updates = self._updates, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        return updates
+
+    def _flush_in_background(self) -> None:
+        updates = self._take()
+        if not updates:
+            return
+        try:
+            apply_status_updates(updates)
+        except Exception:
+            logger.exception("Could not apply %d flight status updates", len(updates))
+            registry.increment("agoa_status_flush_failures_total")
+            registry.increment("agoa_status_updates_lost_total", len(updates))
+        finally:
+            close_old_connections()
+
+
+status_buffer = StatusEventBuffer()
+atexit.register(status_buffer._flush_in_background)
+
+
+def apply_status_updates(updates: StatusUpdates) -> int:
+    """
+    Write coalesced status updates and propagate them.
+
+    Updates are applied ``AGOA_BULK_BATCH_SIZE`` flights per transaction:
+    one read and one bulk update of the flights, then the new actual times
+    are copied to the turnarounds using them and the estimates are pushed
+    down the rotation (see ``propagate_flight_times``). Unknown flights are
+    skipped. Returns the number of flights updated.
+    """
+    by_flight: dict[int, dict[str, Optional[datetime]]] = {}
+    for (flight_id, name), value in updates.items():
+        by_flight.setdefault(flight_id, {})[name] = value
+
+    updated = 0
+    for ids in batched(sorted(by_flight), settings.AGOA_BULK_BATCH_SIZE):
+        now = timezone.now()
+        with transaction.atomic():
+            flights = list(
+                Flight.objects.filter(pk__in=ids).only(
+                    *FLIGHT_TIME_FIELDS, *FLIGHT_AIRPORT_FIELDS
+                )
+            )
+            for flight in flights:
+                for name, value in by_flight[flight.pk].items():
+                    setattr(flight, name, value)
+                # A new departure time moves the arrival estimate, unless the
+                # event stream gave one
+                if "estimated_arrival" not in by_flight[flight.pk]:
+                    _estimate_arrival(flight)
+                flight.updated_at = now
+            Flight.objects.bulk_update(
+                flights, [*STATUS_EVENT_FIELDS.values(), "updated_at"]
+            )
+            # Bound now: the next batch rebinds ``flights``
+            transaction.on_commit(partial(publish_flights, flights))
+            changed = propagate_flight_times([flight.pk for flight in flights])
+            refresh_daily_stats(
+                turnaround_keys(Turnaround.objects.filter(pk__in=changed))
+            )
+        updated += len(flights)
+    return updated
+
+
+def _best_departure(flight: Flight) -> datetime:
+    return (
+        flight.actual_departure
+        or flight.estimated_departure
+        or flight.scheduled_departure
+    )
+
+
+def _best_arrival(flight: Flight) -> datetime:
+    return flight.actual_arrival or flight.estimated_arrival or flight.scheduled_arrival
+
+
+def _estimate_arrival(flight: Flight) -> bool:
+    """Move the arrival estimate with the departure; True if it changed"""
+    if flight.actual_arrival is not None:
+        return False
+    departure = _best_departure(flight)
+    estimate = None
+    if departure != flight.scheduled_departure:
+        estimate = departure + (flight.scheduled_arrival - flight.scheduled_departure)
+    changed = estimate != flight.estimated_arrival
+    flight.estimated_arrival = estimate
+    return changed
+
+
+def propagate_flight_times(flight_ids: list[int]) -> set[int]:
+    """
+    Push the times of ``flight_ids`` to turnarounds and down the rotation.
+
+    The turnarounds arriving on or departing with these flights take their
+    actual times (one set-based UPDATE each). Then, level by level, the
+    departure leaving after each arrival is re-estimated to leave no
+    earlier than ``AGOA_MIN_GROUND_TIME`` after it lands, and its own
+    arrival estimate moves with it. Estimates are only pushed later: one
+    from the event stream cannot be told from one derived here, so none is
+    moved earlier or cleared. Flights that already left stop the
+    propagation, as do estimates that do not change; at most
+    ``AGOA_ROTATION_PROPAGATION_DEPTH`` levels are followed.
+
+    Returns the ids of the turnarounds whose actual times were rewritten.
+    """
+    touched = Turnaround.objects.filter(
+        Q(arrival_flight_id__in=flight_ids) | Q(departure_flight_id__in=flight_ids)
+    )
+    before = TurnaroundTimes.read(touched)
+    Turnaround.objects.filter(arrival_flight_id__in=flight_ids).update(
+        actual_start=Subquery(
+            Flight.objects.filter(pk=OuterRef("arrival_flight_id")).values(
+                "actual_arrival"
+            )[:1]
+        )
+    )
+    Turnaround.objects.filter(departure_flight_id__in=flight_ids).update(
+        actual_end=Subquery(
+            Flight.objects.filter(pk=OuterRef("departure_flight_id")).values(
+                "actual_departure"
+            )[:1]
+        )
+    )
+    after = TurnaroundTimes.read(touched)
+    unchanged = set(before)
+    changed = [times for times in after if times not in unchanged]
+    # update() skips auto_now: mark the turnarounds whose times moved
+    Turnaround.objects.filter(pk__in=[times.id for times in changed]).update(
+        updated_at=timezone.now()
+    )
+    transaction.on_commit(lambda: occupancy_cache.apply(before, after))
+    transaction.on_commit(lambda: publish_turnarounds(changed))
+
+    frontier = flight_ids
+    for _ in range(settings.AGOA_ROTATION_PROPAGATION_DEPTH):
+        frontier = _propagate_one_level(frontier)
+        if not frontier:
+            break
+    return {times.id for times in after}
+
+
+def _propagate_one_level(arrival_ids: list[int]) -> list[int]:
+    arrivals = {
+        flight.pk: _best_arrival(flight)
+        for flight in Flight.objects.filter(pk__in=arrival_ids).only(
+            *FLIGHT_TIME_FIELDS
+        )
+    }
+    departures = Flight.objects.filter(
+        departure_turnaround__arrival_flight_id__in=arrival_ids,
+        actual_departure__isnull=True,
+    ).annotate(previous_id=F("departure_turnaround__arrival_flight_id"))
+    changed = []
+    now = timezone.now()
+    for departure in departures.only(*FLIGHT_TIME_FIELDS, *FLIGHT_AIRPORT_FIELDS):
+        ready = arrivals[departure.previous_id] + settings.AGOA_MIN_GROUND_TIME
+        if ready <= (departure.estimated_departure or departure.scheduled_departure):
+            continue
+        departure.estimated_departure = ready
+        _estimate_arrival(departure)
+        departure.updated_at = now
+        changed.append(departure)
+    Flight.objects.bulk_update(
+        changed, ["estimated_departure", "estimated_arrival", "updated_at"]
+    )
+    if changed:
+        transaction.on_commit(lambda: publish_flights(changed))
+    return [flight.pk for flight in changed]
+
+
+def ingest_status_events(rows: Iterable[Any]) -> StatusResult:
+    """Validate and coalesce status events, then hand them to the buffer"""
+    result = StatusResult()
+    updates = coalesce_events(rows, result)
+    if updates:
+        status_buffer.add(updates)
+    return result
@@ -1,10 +1,45 @@
-from django.test import TestCase
+import asyncio
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+import unittest
+from asgiref.sync import sync_to_async
+from django.db import OperationalError, connection, connections
+from django.db.models import F
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework import serializers, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
-from .models import Airline, Airport, Flight, Turnaround
-from datetime import datetime, timedelta
+from .models import (
+    Airline,
+    Airport,
+    Flight,
+    Tombstone,
+    Turnaround,
+    TurnaroundDailyStats,
+)
+from . import analytics, snapshot
+from .async_views import _event_stream
+from .database import ReadReplicaRouter, read_from_replicas
+from .matching import FlightSlot, MatchingRules, match_slots
+from .metrics import RollingHistogram, registry
+from .occupancy import occupancy_cache
+from .push import RedisRelay, TurnaroundBroker, broker
+from .rotations import RotationGraph, rotation_cache
+from .serializers import FlightSerializer, RowSerializer, TurnaroundSerializer
+from .snapshot import SNAPSHOT_TABLES, partition_fingerprints, write_snapshot
+from .stats import rollup_totals
+from .status import status_buffer
+from .views import FlightViewSet, flight_search_queryset
+from datetime import date, datetime, timedelta
+from unittest import mock
 from django.utils import timezone
 
 
@@ -165,3 +200,2597 @@ class AgoaAPITests(APITestCase):
         url = reverse("airline-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+# IATA code -> (name, city, country) of the airports the tests use
+TEST_AIRPORTS = {
+    "CDG": ("Paris Charles de Gaulle", "Paris", "France"),
+    "JFK": ("John F. Kennedy", "New York", "USA"),
+    "FRA": ("Frankfurt Airport", "Frankfurt", "DE"),
+    "LHR": ("London Heathrow", "London", "UK"),
+}
+
+# IATA code -> name of the airlines the tests use
+TEST_AIRLINES = {
+    "TA": "Test Airline",
+    "TB": "Other Airline",
+    "AF": "Air France",
+    "LH": "Lufthansa",
+}
+
+
+class ScheduleFixtures:
+    """Test user, reference data and schedule factories for the API tests"""
+
+    def log_in(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def create_airline(self, code):
+        return Airline.objects.create(name=TEST_AIRLINES[code], iata_code=code)
+
+    def create_airports(self, *codes):
+        airports = []
+        for code in codes:
+            name, city, country = TEST_AIRPORTS[code]
+            airports.append(
+                Airport.objects.create(
+                    name=name, iata_code=code, city=city, country=country
+                )
+            )
+        return airports
+
+    def create_flight(
+        self, number, airline, origin, destination, departure, block=None, **fields
+    ):
+        """A flight leaving at ``departure``, landing ``block`` (8 hours) later"""
+        return Flight.objects.create(
+            **{
+                "flight_number": number,
+                "airline": airline,
+                "departure_airport": origin,
+                "arrival_airport": destination,
+                "scheduled_departure": departure,
+                "scheduled_arrival": departure + (block or timedelta(hours=8)),
+                **fields,
+            }
+        )
+
+    def link(self, arrival, departure, **fields):
+        """A turnaround between the landing and the takeoff of two flights"""
+        return Turnaround.objects.create(
+            **{
+                "arrival_flight": arrival,
+                "departure_flight": departure,
+                "airport": arrival.arrival_airport,
+                "scheduled_start": arrival.scheduled_arrival,
+                "scheduled_end": departure.scheduled_departure,
+                **fields,
+            }
+        )
+
+
+class PaginationTests(ScheduleFixtures, APITestCase):
+    def setUp(self):
+        """Create flights sharing departure times to exercise the cursor"""
+        self.log_in()
+        airline = self.create_airline("TA")
+        cdg, jfk = self.create_airports("CDG", "JFK")
+        base = timezone.now().replace(microsecond=0)
+        for i in range(5):
+            self.create_flight(
+                f"TA{i}",
+                airline,
+                cdg,
+                jfk,
+                # Two flights per departure slot, in reverse creation order
+                base - timedelta(hours=i // 2),
+                scheduled_arrival=base + timedelta(hours=8),
+            )
+
+    def test_list_is_unpaginated_by_default(self):
+        """Test that clients which do not opt in still get a plain list"""
+        response = self.client.get(reverse("flight-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 5)
+
+    def test_cursor_pages_follow_departure_then_id(self):
+        """Test walking every page yields each flight once, in key order"""
+        url = reverse("flight-list")
+        params = {"page_size": 2}
+        seen = []
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 2)
+            seen.extend(response.data["results"])
+            url, params = response.data["next"], None
+
+        expected = list(
+            Flight.objects.order_by("scheduled_departure", "id").values_list(
+                "id", flat=True
+            )
+        )
+        self.assertEqual([flight["id"] for flight in seen], expected)
+
+    def test_ties_are_paged_by_key_without_offset(self):
+        """Test rows sharing a departure are split by id, both ways"""
+        Flight.objects.update(scheduled_departure=timezone.now())
+        expected = list(Flight.objects.order_by("id").values_list("id", flat=True))
+        response = self.client.get(reverse("flight-list"), {"page_size": 2})
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(response.data["next"])
+        self.assertNotIn("OFFSET", " ".join(q["sql"] for q in queries).upper())
+        self.assertEqual([f["id"] for f in second.data["results"]], expected[2:4])
+
+        first = self.client.get(second.data["previous"])
+        self.assertEqual([f["id"] for f in first.data["results"]], expected[:2])
+        self.assertIsNone(first.data["previous"])
+
+    def test_page_size_is_capped(self):
+        """Test that page_size above the configured maximum is clamped"""
+        with mock.patch.object(FlightViewSet.pagination_class, "max_page_size", 2):
+            response = self.client.get(reverse("flight-list"), {"page_size": 50})
+        self.assertEqual(len(response.data["results"]), 2)
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "EXPLAIN output is SQLite's")
+class QueryPlanTests(TestCase):
+    """Fail when the hot date/airport lookups fall back to full table scans"""
+
+    day = date(2024, 3, 20)
+
+    def assertUsesIndex(self, queryset, table, index):
+        plan = queryset.explain()
+        self.assertNotRegex(plan, rf"\bSCAN {table}\b", plan)
+        self.assertIn(f"SEARCH {table} USING INDEX {index}", plan)
+
+    def test_turnarounds_by_date_and_airport(self):
+        """Test the by_date_and_airport lookup uses the composite index"""
+        queryset = (
+            Turnaround.objects.scheduled_on(self.day)
+            .at_airport("CDG")
+            .select_related("arrival_flight", "departure_flight")
+        )
+        self.assertUsesIndex(
+            queryset, "agoa_turnaround", "turnaround_airport_start_idx"
+        )
+
+    def test_turnarounds_by_date(self):
+        """Test the average_duration filter uses the scheduled_start index"""
+        queryset = Turnaround.objects.scheduled_on(self.day)
+        self.assertUsesIndex(queryset, "agoa_turnaround", "turnaround_start_idx")
+
+    def test_flights_departing_from_airport(self):
+        """Test departures per airport and day use a range scan"""
+        queryset = Flight.objects.departing_from(1, self.day)
+        self.assertUsesIndex(queryset, "agoa_flight", "flight_dep_airport_sched_idx")
+
+    def test_flights_arriving_at_airport(self):
+        """Test arrivals per airport and day use a range scan"""
+        queryset = Flight.objects.arriving_at(1, self.day)
+        self.assertUsesIndex(queryset, "agoa_flight", "flight_arr_airport_sched_idx")
+
+
+class ExpandTests(ScheduleFixtures, APITestCase):
+    def setUp(self):
+        """Create a rotation of turnarounds at CDG"""
+        self.log_in()
+        self.airline = self.create_airline("TA")
+        self.cdg, self.jfk = self.create_airports("CDG", "JFK")
+        self.start = timezone.now().replace(hour=10, minute=0, second=0)
+
+    def create_turnarounds(self, count):
+        for i in range(count):
+            departure = self.start + timedelta(hours=i)
+            inbound = self.create_flight(
+                f"TA{i}0",
+                self.airline,
+                self.jfk,
+                self.cdg,
+                departure - timedelta(hours=8),
+                block=timedelta(hours=7),
+            )
+            outbound = self.create_flight(
+                f"TA{i}1", self.airline, self.cdg, self.jfk, departure
+            )
+            self.link(inbound, outbound)
+
+    def test_flight_expand_nests_related_objects(self):
+        """Test that expanded foreign keys are rendered as objects"""
+        self.create_turnarounds(1)
+        response = self.client.get(
+            reverse("flight-list"), {"expand": "airline,departure_airport"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        flight = response.data[0]
+        self.assertEqual(flight["airline"]["iata_code"], "TA")
+        self.assertEqual(flight["departure_airport"]["iata_code"], "JFK")
+        self.assertEqual(flight["arrival_airport"], self.cdg.id)
+
+    def test_unknown_expand_field_is_rejected(self):
+        """Test that typos in expand are reported instead of ignored"""
+        response = self.client.get(reverse("flight-list"), {"expand": "pilot"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_turnaround_list_query_count_is_constant(self):
+        """Test that a fully expanded turnaround list costs one query"""
+        expand = "arrival_flight,departure_flight,airport,airline"
+        for count in (1, 5):
+            Turnaround.objects.all().delete()
+            Flight.objects.all().delete()
+            self.create_turnarounds(count)
+            # Plus the two aggregates of the collection's ETag
+            with self.assertNumQueries(3):
+                response = self.client.get(
+                    reverse("turnaround-list"), {"expand": expand}
+                )
+            self.assertEqual(len(response.data), count)
+
+        turnaround = response.data[0]
+        self.assertEqual(turnaround["airport"]["iata_code"], "CDG")
+        self.assertEqual(turnaround["arrival_flight"]["airline"]["iata_code"], "TA")
+        self.assertEqual(turnaround["departure_flight"]["arrival_airport"], self.jfk.id)
+
+    def test_by_date_and_airport_query_count_is_constant(self):
+        """Test that the per-airport lookup honours expand without N+1"""
+        self.create_turnarounds(3)
+        # Plus the two aggregates of the collection's ETag
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse("turnaround-by-date-and-airport"),
+                {
+                    "date": self.start.strftime("%Y-%m-%d"),
+                    "airport": "CDG",
+                    "expand": "arrival_flight,departure_flight,airline",
+                },
+            )
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(
+            response.data[0]["departure_flight"]["airline"]["name"], "Test Airline"
+        )
+
+
+class FlightBulkTests(ScheduleFixtures, APITestCase):
+    def setUp(self):
+        """Create reference data and one existing flight"""
+        self.log_in()
+        self.airline = self.create_airline("TA")
+        self.cdg, self.jfk = self.create_airports("CDG", "JFK")
+        self.departure = timezone.now().replace(microsecond=0)
+        self.flight = self.create_flight(
+            "TA1", self.airline, self.cdg, self.jfk, self.departure
+        )
+
+    def row(self, number, **overrides):
+        row = {
+            "flight_number": number,
+            "airline": "TA",
+            "departure_airport": "CDG",
+            "arrival_airport": "JFK",
+            "scheduled_departure": self.departure.isoformat(),
+            "scheduled_arrival": (self.departure + timedelta(hours=8)).isoformat(),
+        }
+        row.update(overrides)
+        return row
+
+    def test_bulk_json_upserts_and_reports_errors(self):
+        """Test a JSON array load creates, updates and reports bad rows"""
+        actual = (self.departure + timedelta(minutes=20)).isoformat()
+        rows = [
+            self.row("TA1", actual_departure=actual),
+            self.row("TA2"),
+            self.row("TA3", airline="ZZ"),
+            self.row("TA4", scheduled_departure="not a date"),
+        ]
+        response = self.client.post(reverse("flight-bulk"), rows, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["received"], 4)
+        self.assertEqual(response.data["upserted"], 2)
+        self.assertEqual([e["row"] for e in response.data["errors"]], [2, 3])
+        self.assertIn("airline", response.data["errors"][0]["errors"])
+        self.assertEqual(Flight.objects.count(), 2)
+        self.flight.refresh_from_db()
+        self.assertEqual(
+            self.flight.actual_departure, self.departure + timedelta(minutes=20)
+        )
+
+    def test_bulk_records_flights_moved_to_other_airports(self):
+        """Test an upsert changing airports leaves a moved tombstone"""
+        rows = [self.row("TA1", arrival_airport="CDG"), self.row("TA2")]
+        self.client.post(reverse("flight-bulk"), rows, format="json")
+        self.assertEqual(
+            list(Tombstone.objects.values_list("object_id", "moved")),
+            [(self.flight.id, True)],
+        )
+
+    def test_bulk_ndjson(self):
+        """Test an NDJSON stream is parsed line by line"""
+        body = "\n".join(json.dumps(self.row(f"TA{i}")) for i in range(2, 5))
+        response = self.client.post(
+            reverse("flight-bulk"),
+            body + "\n",
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["upserted"], 3)
+        self.assertEqual(Flight.objects.count(), 4)
+
+    def test_bulk_query_count_does_not_grow_with_rows(self):
+        """Test each batch resolves codes and writes with a fixed query count"""
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(reverse("flight-bulk"), [self.row("TA2")], format="json")
+        rows = [self.row(f"TA{i}") for i in range(3, 50)]
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(reverse("flight-bulk"), rows, format="json")
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(Flight.objects.count(), 49)
+
+    def test_bulk_rejects_object_body(self):
+        """Test that a single JSON object is not accepted as a schedule"""
+        response = self.client.post(
+            reverse("flight-bulk"), self.row("TA2"), format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_rejects_other_non_array_bodies(self):
+        """Test that bare strings and numbers are not accepted either"""
+        for body in ("TA2", 42, None):
+            response = self.client.post(
+                reverse("flight-bulk"),
+                json.dumps(body),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(AGOA_BULK_BATCH_SIZE=2)
+    def test_bulk_ndjson_reports_undecodable_lines(self):
+        """Test a bad line is reported as a row error and the load goes on"""
+        lines = [json.dumps(self.row(f"TA{i}")) for i in range(2, 6)]
+        lines.insert(2, '{"flight_number": "TA9",')
+        response = self.client.post(
+            reverse("flight-bulk"),
+            "\n\n".join(lines),
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["received"], 5)
+        self.assertEqual(response.data["upserted"], 4)
+        [error] = response.data["errors"]
+        self.assertEqual(error["row"], 2)
+        self.assertIn("line 5", str(error["errors"]))
+        self.assertEqual(Flight.objects.count(), 5)
+
+
+class ExportTests(ScheduleFixtures, APITestCase):
+    def setUp(self):
+        """Create a turnaround at CDG and a flight on another day"""
+        self.log_in()
+        airline = self.create_airline("TA")
+        cdg, jfk, lhr = self.create_airports("CDG", "JFK", "LHR")
+        noon = timezone.make_aware(datetime(2024, 3, 20, 12, 0))
+        self.inbound = self.create_flight(
+            "TA1", airline, jfk, cdg, noon - timedelta(hours=8)
+        )
+        self.outbound = self.create_flight(
+            "TA2", airline, cdg, lhr, noon + timedelta(hours=2), timedelta(hours=1)
+        )
+        self.create_flight("TA3", airline, lhr, jfk, noon + timedelta(days=1))
+        self.link(self.inbound, self.outbound)
+
+    def read(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b"".join(response.streaming_content).decode()
+
+    def test_flight_csv_export(self):
+        """Test exporting a day of flights as CSV"""
+        response = self.client.get(reverse("flight-export"), {"date": "2024-03-20"})
+        self.assertEqual(response["Content-Type"], "text/csv")
+        content = self.read(response)
+        lines = content.splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["id", "flight_number", "airline"])
+        self.assertEqual(len(lines), 3)
+        self.assertIn("TA2,TA,CDG,LHR,2024-03-20T14:00:00Z,,", content)
+
+    def test_flight_export_by_airport_and_range(self):
+        """Test the airport filter keeps flights leaving or landing there"""
+        response = self.client.get(
+            reverse("flight-export"),
+            {"from": "2024-03-20", "to": "2024-03-21", "airport": "LHR"},
+        )
+        numbers = [row.split(",")[1] for row in self.read(response).splitlines()[1:]]
+        self.assertEqual(sorted(numbers), ["TA2", "TA3"])
+
+    def test_turnaround_ndjson_export(self):
+        """Test exporting turnarounds as NDJSON"""
+        response = self.client.get(
+            reverse("turnaround-export"),
+            {"date": "2024-03-20", "airport": "CDG", "output": "ndjson"},
+        )
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["airport"], "CDG")
+        self.assertEqual(rows[0]["arrival_flight"], self.inbound.id)
+        self.assertIsNone(rows[0]["actual_start"])
+
+    def test_export_requires_dates(self):
+        """Test the export rejects missing dates and unknown outputs"""
+        url = reverse("turnaround-export")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {"date": "2024-03-20", "output": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AverageDurationTests(ScheduleFixtures, APITestCase):
+    def setUp(self):
+        """Create ten turnarounds of 10 to 100 minutes at two airports"""
+        self.log_in()
+        airline = self.create_airline("TA")
+        cdg, jfk = self.create_airports("CDG", "JFK")
+        start = timezone.make_aware(datetime(2024, 3, 20, 8, 0))
+        for i in range(10):
+            airport = cdg if i < 6 else jfk
+            inbound = self.create_flight(
+                f"TA{i}0", airline, jfk, airport, start - timedelta(hours=8)
+            )
+            outbound = self.create_flight(
+                f"TA{i}1", airline, airport, jfk, start + timedelta(hours=2)
+            )
+            self.link(
+                inbound,
+                outbound,
+                scheduled_end=start + timedelta(minutes=10 * (i + 1)),
+                # Half of the turnarounds ran 5 minutes over schedule
+                actual_start=start if i % 2 else None,
+                actual_end=(
+                    start + timedelta(minutes=10 * (i + 1) + 5) if i % 2 else None
+                ),
+            )
+
+    def test_average_duration(self):
+        """Test averages and percentiles come from the turnaround times"""
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse("turnaround-average-duration"), {"date": "2024-03-20"}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 10)
+        self.assertEqual(response.data["average_duration_minutes"], 55)
+        scheduled = response.data["scheduled"]
+        self.assertEqual((scheduled["p50_minutes"], scheduled["p90_minutes"]), (50, 90))
+        self.assertEqual(scheduled["p99_minutes"], 100)
+        actual = response.data["actual"]
+        self.assertEqual(actual["count"], 5)
+        self.assertEqual(actual["average_minutes"], 65)
+        self.assertEqual(actual["p50_minutes"], 65)
+        self.assertEqual(actual["p99_minutes"], 105)
+
+    def test_average_duration_grouped_by_airport(self):
+        """Test figures can be split per airport"""
+        response = self.client.get(
+            reverse("turnaround-average-duration"),
+            {"date": "2024-03-20", "group_by": "airport"},
+        )
+        groups = {group["airport"]: group for group in response.data["groups"]}
+        self.assertEqual(groups["CDG"]["count"], 6)
+        self.assertEqual(groups["CDG"]["scheduled"]["average_minutes"], 35)
+        self.assertEqual(groups["JFK"]["scheduled"]["p50_minutes"], 80)
+
+    def test_average_duration_reads_the_rollup(self):
+        """Test averages without percentiles cost one rollup query"""
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("turnaround-average-duration"),
+                {"date": "2024-03-20", "percentiles": "false"},
+            )
+        self.assertEqual(response.data["average_duration_minutes"], 55)
+        self.assertEqual(response.data["actual"]["average_minutes"], 65)
+        # Same shape as with percentiles
+        self.assertIsNone(response.data["scheduled"]["p50_minutes"])
+        self.assertIsNone(response.data["actual"]["p99_minutes"])
+
+    def test_average_duration_without_turnarounds(self):
+        """Test an empty day and an unknown grouping are reported"""
+        url = reverse("turnaround-average-duration")
+        response = self.client.get(url, {"date": "2024-03-21"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(url, {"date": "2024-03-20", "group_by": "gate"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class DailyStatsTests(ScheduleFixtures, APITestCase):
+    def setUp(self):
+        """Create one late turnaround at CDG"""
+        self.log_in()
+        self.airline = self.create_airline("TA")
+        self.cdg, self.jfk = self.create_airports("CDG", "JFK")
+        self.noon = timezone.make_aware(datetime(2024, 3, 20, 12, 0))
+        self.turnaround = self.create_turnaround("TA1", self.noon)
+
+    def create_turnaround(self, number, start):
+        inbound = self.create_flight(
+            f"{number}0",
+            self.airline,
+            self.jfk,
+            self.cdg,
+            start - timedelta(hours=8),
+            actual_arrival=start + timedelta(minutes=10),
+        )
+        outbound = self.create_flight(
+            f"{number}1", self.airline, self.cdg, self.jfk, start + timedelta(hours=1)
+        )
+        return self.link(
+            inbound,
+            outbound,
+            actual_start=start + timedelta(minutes=10),
+            actual_end=start + timedelta(hours=1, minutes=30),
+        )
+
+    def stats(self):
+        return TurnaroundDailyStats.objects.get(
+            date=date(2024, 3, 20), airport=self.cdg, airline=self.airline
+        )
+
+    def test_rollup_follows_turnaround_and_flight_changes(self):
+        """Test creates, updates and deletes keep the rollup in step"""
+        stats = self.stats()
+        self.assertEqual(stats.turnaround_count, 1)
+        self.assertEqual(stats.scheduled_duration, timedelta(hours=1))
+        self.assertEqual(stats.duration_deviation, timedelta(minutes=20))
+        self.assertEqual(stats.arrival_delay, timedelta(minutes=10))
+        self.assertEqual(stats.departure_delay_count, 0)
+
+        departure = self.turnaround.departure_flight
+        departure.actual_departure = departure.scheduled_departure + timedelta(
+            minutes=30
+        )
+        departure.save()
+        stats = self.stats()
+        self.assertEqual(stats.departure_delay, timedelta(minutes=30))
+        self.assertEqual(stats.on_time_departures, 0)
+
+        self.create_turnaround("TA2", self.noon + timedelta(hours=2))
+        self.assertEqual(self.stats().turnaround_count, 2)
+
+        self.turnaround.scheduled_start += timedelta(days=1)
+        self.turnaround.scheduled_end += timedelta(days=1)
+        self.turnaround.save()
+        self.assertEqual(self.stats().turnaround_count, 1)
+
+        Flight.objects.filter(flight_number__startswith="TA2").delete()
+        self.assertFalse(
+            TurnaroundDailyStats.objects.filter(date=date(2024, 3, 20)).exists()
+        )
+
+    def test_rebuild_command(self):
+        """Test the management command recreates rows for a date range"""
+        TurnaroundDailyStats.objects.all().delete()
+        out = StringIO()
+        call_command(
+            "rebuild_turnaround_stats",
+            "--from=2024-03-20",
+            "--to=2024-03-20",
+            stdout=out,
+        )
+        self.assertIn("Rebuilt 1 daily stats rows", out.getvalue())
+        self.assertEqual(self.stats().actual_duration, timedelta(minutes=80))
+
+    def test_partly_rolled_up_range(self):
+        """Test days missing from the rollup are computed from turnarounds"""
+        self.create_turnaround("TA2", self.noon + timedelta(days=1))
+        TurnaroundDailyStats.objects.filter(date=date(2024, 3, 21)).delete()
+        with self.assertNumQueries(2):
+            [totals] = rollup_totals(date(2024, 3, 19), date(2024, 3, 21))
+        self.assertEqual(totals["turnaround_count"], 2)
+        self.assertEqual(totals["actual_duration"], timedelta(minutes=160))
+        self.assertEqual(totals["arrival_delay"], timedelta(minutes=20))
+
+    def test_punctuality(self):
+        """Test the punctuality endpoint reports rollup figures"""
+        response = self.client.get(
+            reverse("turnaround-punctuality"),
+            {"from": "2024-03-19", "to": "2024-03-21", "group_by": "airline"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        group = response.data["groups"][0]
+        self.assertEqual(group["airline"], "TA")
+        self.assertEqual(group["average_arrival_delay_minutes"], 10)
+        self.assertIsNone(group["on_time_departure_rate"])
+        self.assertEqual(group["average_duration_deviation_minutes"], 20)
+
+
+class PunctualityRankingTests(ScheduleFixtures, APITestCase):
+    def setUp(self):
+        """Create rollup rows for three airline/airport pairs"""
+        self.log_in()
+        af, lh = self.create_airline("AF"), self.create_airline("LH")
+        cdg, fra = self.create_airports("CDG", "FRA")
+        for day, airline, airport, measured, deviation in [
+            (20, af, cdg, 2, 30),
+            (21, af, cdg, 1, 3),
+            (20, lh, fra, 1, 5),
+            (20, lh, cdg, 0, 0),
+        ]:
+            TurnaroundDailyStats.objects.create(
+                date=date(2024, 3, day),
+                airport=airport,
+                airline=airline,
+                turnaround_count=2,
+                actual_count=measured,
+                duration_deviation=timedelta(minutes=deviation),
+            )
+        self.addCleanup(cache.clear)
+
+    def test_ranking_orders_pairs_by_mean_deviation(self):
+        """Test pairs are ranked best first and unmeasured pairs skipped"""
+        url = reverse("turnaround-punctuality-ranking")
+        params = {"from": "2024-03-01", "to": "2024-03-31", "top": 5}
+        with self.assertNumQueries(1):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual(
+            [(r["rank"], r["airline"], r["airport"]) for r in results],
+            [(1, "LH", "FRA"), (2, "AF", "CDG")],
+        )
+        self.assertEqual(results[1]["average_duration_deviation_minutes"], 11)
+
+        # Repeat calls for the same range are served from the cache
+        with self.assertNumQueries(0):
+            self.client.get(url, params)
+
+    def test_ranking_validates_top(self):
+        """Test that top must be a positive integer"""
+        # "²" passes str.isdigit but not int()
+        for top in ("many", "0", "²"):
+            with self.subTest(top=top):
+                response = self.client.get(
+                    reverse("turnaround-punctuality-ranking"),
+                    {"date": "2024-03-20", "top": top},
+                )
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TurnaroundMatchingTests(ScheduleFixtures, APITestCase):
+    def setUp(self):
+        """Create arrivals and departures at CDG for two airlines"""
+        self.log_in()
+        self.af, self.lh = self.create_airline("AF"), self.create_airline("LH")
+        self.cdg, self.fra = self.create_airports("CDG", "FRA")
+        self.noon = timezone.make_aware(datetime(2024, 3, 20, 12, 0))
+
+    def flight(self, number, airline, arriving, minutes):
+        at = self.noon + timedelta(minutes=minutes)
+        hour = timedelta(hours=1)
+        if arriving:
+            return self.create_flight(
+                number, airline, self.fra, self.cdg, at - hour, hour
+            )
+        return self.create_flight(number, airline, self.cdg, self.fra, at, hour)
+
+    def match(self, **params):
+        data = {"date": "2024-03-20", "airport": "CDG", **params}
+        return self.client.post(reverse("turnaround-match"), data, format="json")
+
+    def test_match_pairs_next_departure_of_same_airline(self):
+        """Test arrivals take the earliest allowed departure of their airline"""
+        af_in = self.flight("AF1", self.af, True, 0)
+        lh_in = self.flight("LH1", self.lh, True, 10)
+        self.flight("AF2", self.af, False, 20)  # too soon after AF1
+        af_out = self.flight("AF3", self.af, False, 45)
+        lh_out = self.flight("LH2", self.lh, False, 50)
+
+        response = self.match()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["matched"], 2)
+        pairs = set(
+            Turnaround.objects.values_list("arrival_flight", "departure_flight")
+        )
+        self.assertEqual(pairs, {(af_in.id, af_out.id), (lh_in.id, lh_out.id)})
+        turnaround = Turnaround.objects.get(arrival_flight=af_in)
+        self.assertEqual(
+            turnaround.scheduled_end - turnaround.scheduled_start, timedelta(minutes=45)
+        )
+        self.assertEqual(
+            TurnaroundDailyStats.objects.get(airline=self.af).turnaround_count, 1
+        )
+
+        # Already paired flights are not matched again
+        self.assertEqual(self.match().data["matched"], 0)
+
+    def test_match_rules(self):
+        """Test ground time limits, airline mixing and dry runs"""
+        arrival = self.flight("AF1", self.af, True, 0)
+        departure = self.flight("LH2", self.lh, False, 90)
+
+        self.assertEqual(self.match().data["matched"], 0)
+        response = self.match(same_airline=False, max_ground_minutes=60)
+        self.assertEqual(response.data["matched"], 0)
+        response = self.match(same_airline=False, dry_run=True)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["turnarounds"][0]["departure_flight"], departure.id
+        )
+        self.assertFalse(Turnaround.objects.exists())
+
+        out = StringIO()
+        call_command(
+            "match_turnarounds", "2024-03-20", "CDG", "--any-airline", stdout=out
+        )
+        self.assertIn("Created 1 turnarounds", out.getvalue())
+        self.assertTrue(Turnaround.objects.filter(arrival_flight=arrival).exists())
+
+    def test_match_slots_sweep(self):
+        """Test the sweep pairs a busy day without reusing departures"""
+        base = self.noon.replace(hour=0)
+        arrivals = [
+            FlightSlot(i, i % 3, base + timedelta(minutes=i), None) for i in range(750)
+        ]
+        departures = [
+            FlightSlot(1000 + i, i % 3, base + timedelta(minutes=45 + i), None)
+            for i in range(750)
+        ]
+        pairs = match_slots(arrivals, departures, MatchingRules())
+        self.assertEqual(len(pairs), 750)
+        self.assertEqual(len({departure.id for _, departure in pairs}), 750)
+        for arrival, departure in pairs:
+            self.assertEqual(arrival.airline_id, departure.airline_id)
+            self.assertGreaterEqual(
+                departure.scheduled - arrival.scheduled, timedelta(minutes=30)
+            )
+
+    def test_ground_times_are_bounded(self):
+        """Test ground times too large for the time arithmetic get a 400"""
+        for params in ({"min_ground_minutes": 10**12}, {"max_ground_minutes": 10**12}):
+            with self.subTest(params=params):
+                response = self.match(**params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn(next(iter(params)), response.data)
+
+
+class ReferenceCacheTests(ScheduleFixtures, APITestCase):
+    def setUp(self):
+        self.log_in()
+        self.airline = self.create_airline("AF")
+        self.cdg, self.fra = self.create_airports("CDG", "FRA")
+
+    def test_list_is_served_from_cache(self):
+        """A repeated list request does not query the database"""
+        url = reverse("airport-list")
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertIn("Last-Modified", second)
+
+    def test_if_none_match_returns_not_modified(self):
+        """A matching ETag gets a 304 without a body"""
+        url = reverse("airline-detail", args=[self.airline.id])
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(response.content)
+
+    def test_changes_invalidate_cache(self):
+        """Creating or updating an airport changes the ETag and the data"""
+        url = reverse("airport-list")
+        before = self.client.get(url)
+        Airport.objects.create(
+            name="Heathrow", iata_code="LHR", city="London", country="UK"
+        )
+        after = self.client.get(url, HTTP_IF_NONE_MATCH=before["ETag"])
+        self.assertEqual(after.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(after["ETag"], before["ETag"])
+        self.assertEqual(len(after.data), 3)
+
+        self.client.patch(
+            reverse("airport-detail", args=[self.cdg.id]), {"city": "Roissy"}
+        )
+        detail = self.client.get(reverse("airport-detail", args=[self.cdg.id]))
+        self.assertEqual(detail.data["city"], "Roissy")
+
+    def test_flight_validation_uses_cache(self):
+        """Airline and airport ids are resolved without querying them"""
+        payload = {
+            "flight_number": "AF100",
+            "airline": self.airline.id,
+            "departure_airport": self.cdg.id,
+            "arrival_airport": self.fra.id,
+            "scheduled_departure": "2024-03-20T10:00:00Z",
+            "scheduled_arrival": "2024-03-20T11:30:00Z",
+        }
+        url = reverse("flight-list")
+        self.client.post(url, payload)  # warm the cache
+        payload["flight_number"] = "AF101"
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        tables = " ".join(query["sql"] for query in queries)
+        self.assertNotIn('FROM "agoa_airline"', tables)
+        self.assertNotIn('FROM "agoa_airport"', tables)
+
+    def test_unknown_airport_is_rejected(self):
+        """Ids missing from the table still fail validation"""
+        response = self.client.post(
+            reverse("flight-list"),
+            {
+                "flight_number": "AF100",
+                "airline": self.airline.id,
+                "departure_airport": self.cdg.id,
+                "arrival_airport": 9999,
+                "scheduled_departure": "2024-03-20T10:00:00Z",
+                "scheduled_arrival": "2024-03-20T11:30:00Z",
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("arrival_airport", response.data)
+
+    def test_other_workers_changes_are_seen_after_the_ttl(self):
+        """Without a shared cache, entries and ETags expire after the TTL"""
+        url = reverse("airport-list")
+        before = self.client.get(url)
+        # Renamed by another worker: this process gets no signal
+        Airport.objects.filter(pk=self.cdg.pk).update(city="Roissy")
+        self.assertEqual(self.client.get(url)["ETag"], before["ETag"])
+        with override_settings(AGOA_REFERENCE_CACHE_TTL=0):
+            after = self.client.get(url, HTTP_IF_NONE_MATCH=before["ETag"])
+        self.assertEqual(after.status_code, status.HTTP_200_OK)
+        self.assertEqual(after.data[0]["city"], "Roissy")
+
+
+class StaleReferenceTests(ScheduleFixtures, APITransactionTestCase):
+    def test_airport_deleted_by_another_worker(self):
+        """A cached but deleted airport fails validation, not the database"""
+        self.log_in()
+        airline = self.create_airline("AF")
+        cdg, fra = self.create_airports("CDG", "FRA")
+        payload = {
+            "flight_number": "AF100",
+            "airline": airline.id,
+            "departure_airport": cdg.id,
+            "arrival_airport": fra.id,
+            "scheduled_departure": "2024-03-20T10:00:00Z",
+            "scheduled_arrival": "2024-03-20T11:30:00Z",
+        }
+        url = reverse("flight-list")
+        self.client.post(url, payload)  # warm the cache
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM agoa_flight")
+            cursor.execute("DELETE FROM agoa_airport WHERE id = %s", [fra.id])
+
+        payload["flight_number"] = "AF101"
+        for _ in range(2):
+            response = self.client.post(url, payload)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("arrival_airport", response.data)
+        self.assertFalse(Flight.objects.exists())
+
+
+class AsyncViewTests(ScheduleFixtures, APITestCase):
+    def setUp(self):
+        """Reuse the average duration data, with a real token"""
+        AverageDurationTests.setUp(self)
+        # The async views are plain Django views: force_authenticate is ignored
+        self.client.force_authenticate(user=None)
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def assertSameBody(self, sync_name, async_name, params):
+        expected = self.client.get(reverse(sync_name), params)
+        response = self.client.get(reverse(async_name), params)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        return response
+
+    def test_by_date_and_airport(self):
+        """The async endpoint returns the sync endpoint's body"""
+        response = self.assertSameBody(
+            "turnaround-by-date-and-airport",
+            "async-turnaround-by-date-and-airport",
+            {"date": "2024-03-20", "airport": "CDG", "expand": "arrival_flight"},
+        )
+        self.assertEqual(len(response.json()), 6)
+        self.assertSameBody(
+            "turnaround-by-date-and-airport",
+            "async-turnaround-by-date-and-airport",
+            {"date": "20-03-2024", "airport": "CDG"},
+        )
+
+    def test_average_duration(self):
+        """Averages and percentiles match the sync endpoint"""
+        for params in (
+            {"date": "2024-03-20"},
+            {"date": "2024-03-20", "group_by": "airport"},
+            {"date": "2024-03-20", "group_by": "airline", "percentiles": "false"},
+            {"date": "2024-03-21"},
+            {"date": "2024-03-20", "group_by": "gate"},
+        ):
+            with self.subTest(params=params):
+                self.assertSameBody(
+                    "turnaround-average-duration",
+                    "async-turnaround-average-duration",
+                    params,
+                )
+
+    def test_flight_lookup(self):
+        """Flights are found by number and departure date"""
+        response = self.assertSameBody(
+            "flight-lookup",
+            "async-flight-lookup",
+            {"flight_number": "TA31", "date": "2024-03-20", "expand": "airline"},
+        )
+        self.assertEqual(response.json()["airline"]["iata_code"], "TA")
+        for params in (
+            {"flight_number": "TA31", "date": "2024-03-21"},
+            {"flight_number": "TA31"},
+            {"flight_number": "TA31", "date": "2024-03-20", "expand": "gate"},
+        ):
+            with self.subTest(params=params):
+                self.assertSameBody("flight-lookup", "async-flight-lookup", params)
+
+    def test_authentication_required(self):
+        """Requests without a valid token are rejected like DRF does"""
+        self.client.credentials()
+        response = self.client.get(
+            reverse("async-flight-lookup"),
+            {"flight_number": "TA31", "date": "2024-03-20"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("WWW-Authenticate", response)
+
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer invalid")
+        response = self.client.get(reverse("async-flight-lookup"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_asgi_application(self):
+        """The ASGI entry point loads the project settings"""
+        from .asgi import application
+
+        self.assertTrue(callable(application))
+
+
+class OccupancyTests(ScheduleFixtures, APITestCase):
+    def setUp(self):
+        """Create turnarounds at CDG around 10:00 on 2024-03-20"""
+        self.log_in()
+        occupancy_cache.clear()
+
+        self.airline = self.create_airline("AF")
+        self.cdg, self.fra = self.create_airports("CDG", "FRA")
+        self.day = timezone.make_aware(datetime(2024, 3, 20))
+        self.url = reverse("airport-occupancy", args=[self.cdg.id])
+        self.count = 0
+        # On the ground 10:00-11:00, 10:30-12:00 and 11:00-11:30
+        self.turnaround(10 * 60, 11 * 60)
+        self.turnaround(10 * 60 + 30, 12 * 60)
+        self.turnaround(11 * 60, 11 * 60 + 30)
+
+    def turnaround(self, start, end):
+        """Create a turnaround at CDG from ``start`` to ``end`` minutes"""
+        self.count += 1
+        start = self.day + timedelta(minutes=start)
+        end = self.day + timedelta(minutes=end)
+        hour = timedelta(hours=1)
+        inbound = self.create_flight(
+            f"AF{self.count}0", self.airline, self.fra, self.cdg, start - hour, hour
+        )
+        outbound = self.create_flight(
+            f"AF{self.count}1", self.airline, self.cdg, self.fra, end, hour
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.link(inbound, outbound)
+
+    def buckets(self, response):
+        return {
+            bucket["start"][11:16]: (bucket["peak"], bucket["average"])
+            for bucket in response.json()["buckets"]
+            if bucket["peak"]
+        }
+
+    def test_hourly_occupancy(self):
+        """Peaks and averages follow the turnaround intervals"""
+        response = self.client.get(self.url, {"date": "2024-03-20"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["buckets"]), 24)
+        self.assertEqual(
+            response.json()["peak"], {"count": 2, "at": "2024-03-20T10:30:00Z"}
+        )
+        # The turnaround ending at 11:00 frees the airport as the next arrives
+        self.assertEqual(self.buckets(response), {"10:00": (2, 1.5), "11:00": (2, 1.5)})
+
+        response = self.client.get(self.url, {"date": "2024-03-20", "resolution": "30"})
+        self.assertEqual(
+            self.buckets(response),
+            {
+                "10:00": (1, 1.0),
+                "10:30": (2, 2.0),
+                "11:00": (2, 2.0),
+                "11:30": (1, 1.0),
+            },
+        )
+
+    def test_overnight_turnaround_counts_on_both_days(self):
+        """A turnaround spanning midnight occupies the airport on both days"""
+        self.turnaround(23 * 60, 25 * 60)
+        response = self.client.get(self.url, {"date": "2024-03-21"})
+        self.assertEqual(self.buckets(response), {"00:00": (1, 1.0)})
+        response = self.client.get(self.url, {"date": "2024-03-20"})
+        self.assertEqual(self.buckets(response)["23:00"], (1, 1.0))
+
+    def test_index_is_updated_incrementally(self):
+        """Changes reach a cached index without rebuilding it"""
+        self.client.get(self.url, {"date": "2024-03-20"})
+        turnaround = self.turnaround(10 * 60 + 45, 11 * 60 + 15)
+        with self.assertNumQueries(1):  # the airport only
+            response = self.client.get(self.url, {"date": "2024-03-20"})
+        self.assertEqual(response.data["peak"]["count"], 3)
+
+        turnaround.scheduled_end = self.day + timedelta(hours=10, minutes=50)
+        with self.captureOnCommitCallbacks(execute=True):
+            turnaround.save()
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.url, {"date": "2024-03-20", "resolution": "15"}
+            )
+        self.assertEqual(self.buckets(response)["10:45"], (3, 2.333))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            turnaround.delete()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {"date": "2024-03-20"})
+        self.assertEqual(self.buckets(response)["10:00"], (2, 1.5))
+
+    def test_matching_updates_index(self):
+        """Turnarounds created by the matcher reach a cached index"""
+        self.client.get(self.url, {"date": "2024-03-20"})
+        Turnaround.objects.all().delete()
+        occupancy_cache.clear()
+        self.assertEqual(
+            self.client.get(self.url, {"date": "2024-03-20"}).data["peak"]["count"], 0
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("turnaround-match"),
+                {"date": "2024-03-20", "airport": "CDG"},
+                format="json",
+            )
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {"date": "2024-03-20"})
+        # Paired 10:00-11:00, 10:30-11:30 and 11:00-12:00
+        self.assertEqual(self.buckets(response), {"10:00": (2, 1.5), "11:00": (2, 1.5)})
+
+    def test_other_workers_changes_are_seen_after_the_ttl(self):
+        """Without a shared cache, indexes are rebuilt after the TTL"""
+        self.client.get(self.url, {"date": "2024-03-20"})
+        # Moved by another worker: this process gets no signal
+        Turnaround.objects.update(scheduled_end=F("scheduled_start"))
+        response = self.client.get(self.url, {"date": "2024-03-20"})
+        self.assertEqual(response.data["peak"]["count"], 2)
+        with override_settings(AGOA_OCCUPANCY_CACHE_TTL=0):
+            response = self.client.get(self.url, {"date": "2024-03-20"})
+        self.assertEqual(response.data["peak"]["count"], 0)
+
+    def test_invalid_parameters(self):
+        """Missing dates and bad resolutions or kinds are rejected"""
+        for params in (
+            {},
+            {"date": "20-03-2024"},
+            {"date": "2024-03-20", "resolution": "0"},
+            {"date": "2024-03-20", "resolution": "abc"},
+            {"date": "2024-03-20", "resolution": "²"},
+            {"date": "2024-03-20", "kind": "estimated"},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ValidationTests(ScheduleFixtures, APITestCase):
+    def setUp(self):
+        """Create one valid turnaround and one breaking each rule"""
+        self.log_in()
+        self.airline = self.create_airline("AF")
+        self.cdg, self.fra = self.create_airports("CDG", "FRA")
+        self.day = timezone.make_aware(datetime(2024, 3, 20))
+
+        # Lands at CDG at 10:00, leaves at 11:00 for FRA, landing at 12:00
+        self.valid = self.turnaround("AF1", "AF2", 10 * 60, 11 * 60)
+        self.late = self.turnaround("AF3", "AF4", 12 * 60, 11 * 60 + 30)
+        self.short = self.turnaround("AF5", "AF6", 13 * 60, 13 * 60 + 10)
+        self.mismatch = self.turnaround(
+            "AF7", "AF8", 14 * 60, 15 * 60, arrival_airport=self.fra
+        )
+        # AF2 lands at FRA at 12:00, yet this turnaround starts at 10:30,
+        # before the aircraft left CDG
+        self.overlap = self.link(
+            self.valid.departure_flight,
+            self.flight("AF9", self.fra, self.cdg, 13 * 60),
+            scheduled_start=self.at(10 * 60 + 30),
+        )
+
+    def at(self, minutes):
+        return self.day + timedelta(minutes=minutes)
+
+    def flight(self, number, origin, destination, departure):
+        return self.create_flight(
+            number,
+            self.airline,
+            origin,
+            destination,
+            self.at(departure),
+            timedelta(hours=1),
+        )
+
+    def turnaround(self, inbound, outbound, arrival, departure, arrival_airport=None):
+        """Turnaround at CDG between flights landing and leaving at the times"""
+        return self.link(
+            self.flight(inbound, self.fra, arrival_airport or self.cdg, arrival - 60),
+            self.flight(outbound, self.cdg, self.fra, departure),
+            airport=self.cdg,
+            scheduled_end=self.at(max(arrival, departure)),
+        )
+
+    def test_report(self):
+        """Each rule reports the turnaround breaking it, in one query"""
+        with self.assertNumQueries(2):  # the count and the violations
+            response = self.client.get(
+                reverse("turnaround-validate"), {"date": "2024-03-20"}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["checked"], 5)
+        self.assertFalse(response.data["valid"])
+        self.assertEqual(
+            {(v["rule"], v["turnaround"]) for v in response.data["violations"]},
+            {
+                ("time_order", self.late.id),
+                ("min_connection", self.short.id),
+                ("airport_mismatch", self.mismatch.id),
+                ("rotation_overlap", self.overlap.id),
+            },
+        )
+        details = {v["rule"]: v["detail"] for v in response.data["violations"]}
+        self.assertEqual(
+            details["time_order"], "AF3 lands at 12:00 after AF4 leaves at 11:30"
+        )
+        self.assertEqual(
+            details["min_connection"], "10 minutes on the ground, minimum is 30"
+        )
+        self.assertEqual(
+            details["rotation_overlap"],
+            f"Starts at 10:30, before turnaround {self.valid.id} ends at 11:00",
+        )
+
+    def test_rules_airport_and_batch_scopes(self):
+        """The check can be narrowed to rules, an airport or some flights"""
+        url = reverse("turnaround-validate")
+        response = self.client.get(
+            url, {"date": "2024-03-20", "rules": "min_connection,time_order"}
+        )
+        self.assertEqual(response.data["counts"]["min_connection"], 1)
+        self.assertEqual(response.data["counts"]["airport_mismatch"], 0)
+        self.assertEqual(len(response.data["violations"]), 2)
+
+        response = self.client.get(url, {"date": "2024-03-20", "airport": "FRA"})
+        self.assertEqual(response.data["checked"], 1)
+
+        flights = f"{self.valid.arrival_flight_id},{self.short.departure_flight_id}"
+        response = self.client.get(url, {"flights": flights})
+        self.assertEqual(response.data["checked"], 2)
+        self.assertEqual(
+            [v["rule"] for v in response.data["violations"]], ["min_connection"]
+        )
+
+        response = self.client.get(
+            url, {"date": "2024-03-20", "min_ground_minutes": "5"}
+        )
+        self.assertEqual(response.data["counts"]["min_connection"], 0)
+
+        for params in (
+            {},
+            {"date": "2024-03-20", "rules": "gates"},
+            {"flights": "x"},
+            {"flights": "1,²"},
+            {"flights": "99999999999999999999"},
+            {"date": "2024-03-20", "min_ground_minutes": "²"},
+            {"date": "2024-03-20", "min_ground_minutes": "99999999999"},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_management_command(self):
+        """The command prints the report and can fail on violations"""
+        out = StringIO()
+        call_command(
+            "validate_turnarounds", "--from", "2024-03-20", "--json", stdout=out
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["checked"], 5)
+        self.assertEqual(len(report["violations"]), 4)
+
+        out = StringIO()
+        call_command(
+            "validate_turnarounds",
+            "--airport",
+            "CDG",
+            "--rule",
+            "time_order",
+            stdout=out,
+        )
+        self.assertIn("time_order: turnaround", out.getvalue())
+        self.assertIn("Checked 4 turnarounds, 1 violations", out.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command("validate_turnarounds", "--fail", stdout=StringIO())
+
+
+@override_settings(AGOA_STATUS_EVENT_WINDOW=timedelta(0))
+class StatusEventTests(ScheduleFixtures, APITestCase):
+    def setUp(self):
+        """An aircraft flying FRA-CDG-FRA-CDG through two turnarounds"""
+        self.log_in()
+        airline = self.create_airline("AF")
+        cdg, fra = self.create_airports("CDG", "FRA")
+        self.day = timezone.make_aware(datetime(2024, 3, 20))
+        self.flights = [
+            self.create_flight(
+                f"AF{number}",
+                airline,
+                origin,
+                destination,
+                self.at(hour * 60),
+                timedelta(hours=1),
+            )
+            for number, (origin, destination, hour) in enumerate(
+                [(fra, cdg, 8), (cdg, fra, 10), (fra, cdg, 12)], start=1
+            )
+        ]
+        f1, f2, f3 = self.flights
+        self.first = self.link(f1, f2)
+        self.second = self.link(f2, f3)
+
+    def at(self, minutes):
+        return self.day + timedelta(minutes=minutes)
+
+    def send(self, events):
+        return self.client.post(
+            reverse("flight-events"),
+            [
+                {"flight": flight.id, "event": event, "time": time}
+                for flight, event, time in events
+            ],
+            format="json",
+        )
+
+    def refresh(self):
+        for obj in [*self.flights, self.first, self.second]:
+            obj.refresh_from_db()
+
+    def test_actual_arrival_propagates_down_the_rotation(self):
+        """A late arrival delays the next departures of the aircraft"""
+        f1, f2, f3 = self.flights
+        response = self.send(
+            [(f1, "ATA", "2024-03-20T09:50:00Z"), (f1, "ATA", "2024-03-20T10:40:00Z")]
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["queued"], 2)
+
+        self.refresh()
+        # Only the last of the coalesced events is applied
+        self.assertEqual(f1.actual_arrival, self.at(10 * 60 + 40))
+        self.assertEqual(self.first.actual_start, self.at(10 * 60 + 40))
+        # 30 minutes minimum ground time, then the same block time
+        self.assertEqual(f2.estimated_departure, self.at(11 * 60 + 10))
+        self.assertEqual(f2.estimated_arrival, self.at(12 * 60 + 10))
+        self.assertEqual(f3.estimated_departure, self.at(12 * 60 + 40))
+        self.assertEqual(f3.estimated_arrival, self.at(13 * 60 + 40))
+
+    def test_small_delay_is_absorbed(self):
+        """Propagation stops once the ground time absorbs the delay"""
+        f1, f2, f3 = self.flights
+        self.send([(f1, "ATA", "2024-03-20T09:50:00Z")])
+        self.refresh()
+        self.assertEqual(f2.estimated_departure, self.at(10 * 60 + 20))
+        self.assertIsNone(f3.estimated_departure)
+
+    def test_explicit_estimate_survives_upstream_changes(self):
+        """Propagation never moves an estimate from the stream earlier"""
+        f1, f2, _ = self.flights
+        self.send([(f2, "ETD", "2024-03-20T11:30:00Z")])
+        for arrival in ("2024-03-20T10:40:00Z", "2024-03-20T09:00:00Z"):
+            self.send([(f1, "ATA", arrival)])
+            f2.refresh_from_db()
+            self.assertEqual(f2.estimated_departure, self.at(11 * 60 + 30))
+
+        self.send([(f1, "ATA", "2024-03-20T11:20:00Z")])
+        f2.refresh_from_db()
+        self.assertEqual(f2.estimated_departure, self.at(11 * 60 + 50))
+
+    def test_actual_departure_closes_turnaround(self):
+        """Departure times end the turnaround and update the rollup"""
+        f1, f2, f3 = self.flights
+        self.send(
+            [(f1, "ATA", "2024-03-20T09:00:00Z"), (f2, "ATD", "2024-03-20T11:15:00Z")]
+        )
+        self.refresh()
+        self.assertEqual(self.first.actual_end, self.at(11 * 60 + 15))
+        self.assertEqual(f2.estimated_arrival, self.at(12 * 60 + 15))
+        self.assertEqual(f3.estimated_departure, self.at(12 * 60 + 45))
+        stats = TurnaroundDailyStats.objects.get(airport=self.first.airport)
+        self.assertEqual(stats.actual_count, 1)
+        self.assertEqual(stats.actual_duration, timedelta(hours=2, minutes=15))
+
+    def test_events_are_buffered_within_window(self):
+        """Within the window, updates wait in the buffer and are coalesced"""
+        f1 = self.flights[0]
+        with override_settings(AGOA_STATUS_EVENT_WINDOW=timedelta(minutes=1)):
+            with mock.patch("agoa.status.threading.Timer") as timer:
+                self.send([(f1, "ETA", "2024-03-20T09:20:00Z")])
+                self.send([(f1, "ETA", "2024-03-20T09:30:00Z")])
+            timer.assert_called_once()
+            f1.refresh_from_db()
+            self.assertIsNone(f1.estimated_arrival)
+            self.assertEqual(status_buffer.flush(), 1)
+        f1.refresh_from_db()
+        self.assertEqual(f1.estimated_arrival, self.at(9 * 60 + 30))
+
+    @mock.patch("agoa.status.close_old_connections")
+    def test_failed_background_flush_is_counted(self, close):
+        """Updates lost by a timer (or exit) flush show in the metrics"""
+        registry.clear()
+        f1, f2, _ = self.flights
+        with override_settings(AGOA_STATUS_EVENT_WINDOW=timedelta(minutes=1)):
+            with mock.patch("agoa.status.threading.Timer"):
+                self.send([(f1, "ETA", "2024-03-20T09:20:00Z")])
+                self.send([(f2, "ETA", "2024-03-20T11:20:00Z")])
+            with mock.patch(
+                "agoa.status.apply_status_updates", side_effect=OperationalError
+            ), self.assertLogs("agoa.status", "ERROR"):
+                status_buffer._flush_in_background()
+        self.assertEqual(registry.counter("agoa_status_flush_failures_total"), 1)
+        self.assertEqual(registry.counter("agoa_status_updates_lost_total"), 2)
+        self.assertIn("agoa_status_updates_lost_total 2", registry.render())
+        close.assert_called_once()
+        self.assertEqual(status_buffer.flush(), 0)
+
+    def test_ndjson_and_invalid_events(self):
+        """NDJSON is accepted and invalid events are reported by position"""
+        f1 = self.flights[0]
+        body = "\n".join(
+            [
+                json.dumps(
+                    {"flight": f1.id, "event": "ETA", "time": "2024-03-20T09:05:00Z"}
+                ),
+                json.dumps(
+                    {"flight": f1.id, "event": "XYZ", "time": "2024-03-20T09:05:00Z"}
+                ),
+                json.dumps({"flight": 999999, "event": "ATA", "time": None}),
+            ]
+        )
+        response = self.client.post(
+            reverse("flight-events"), body, content_type="application/x-ndjson"
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["queued"], 2)
+        self.assertEqual([e["row"] for e in response.data["errors"]], [1])
+        f1.refresh_from_db()
+        self.assertEqual(f1.estimated_arrival, self.at(9 * 60 + 5))
+
+    def test_oversized_flight_id_does_not_poison_the_batch(self):
+        """An id no database can hold is an invalid event, not a failed flush"""
+        f1, f2, _ = self.flights
+        response = self.client.post(
+            reverse("flight-events"),
+            [
+                {"flight": f1.id, "event": "ETA", "time": "2024-03-20T09:05:00Z"},
+                {"flight": 10**20, "event": "ETA", "time": "2024-03-20T09:05:00Z"},
+                {"flight": f2.id, "event": "ETA", "time": "2024-03-20T11:05:00Z"},
+            ],
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["queued"], 2)
+        self.assertEqual([e["row"] for e in response.data["errors"]], [1])
+        self.refresh()
+        self.assertEqual(f1.estimated_arrival, self.at(9 * 60 + 5))
+        self.assertEqual(f2.estimated_arrival, self.at(11 * 60 + 5))
+
+    def test_undecodable_event_lines_are_reported(self):
+        """A line that is not JSON is an invalid event, not a failed request"""
+        f1 = self.flights[0]
+        body = "not json\n" + json.dumps(
+            {"flight": f1.id, "event": "ETA", "time": "2024-03-20T09:05:00Z"}
+        )
+        response = self.client.post(
+            reverse("flight-events"), body, content_type="application/x-ndjson"
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["queued"], 1)
+        self.assertEqual([e["row"] for e in response.data["errors"]], [0])
+        f1.refresh_from_db()
+        self.assertEqual(f1.estimated_arrival, self.at(9 * 60 + 5))
+
+    def test_flight_update_reaches_turnaround(self):
+        """Setting an actual time through the API updates the turnaround"""
+        f1 = self.flights[0]
+        response = self.client.patch(
+            reverse("flight-detail", args=[f1.id]),
+            {"actual_arrival": "2024-03-20T09:10:00Z"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.actual_start, self.at(9 * 60 + 10))
+
+
+class FakeRedis:
+    """Hands published messages to the subscribed handlers at once"""
+
+    def __init__(self):
+        self.handlers = {}
+
+    def pubsub(self, **kwargs):
+        return self
+
+    def subscribe(self, **handlers):
+        self.handlers.update(handlers)
+
+    def run_in_thread(self, **kwargs):
+        return None
+
+    def publish(self, channel, data):
+        self.handlers[channel]({"data": data.encode()})
+
+
+@override_settings(
+    AGOA_PUSH_DEBOUNCE=timedelta(0), AGOA_STATUS_EVENT_WINDOW=timedelta(0)
+)
+class PushTests(ScheduleFixtures, APITestCase):
+    at = StatusEventTests.at
+
+    def setUp(self):
+        """The rotation of the status event tests, with a real token"""
+        StatusEventTests.setUp(self)
+        self.cdg = self.first.airport
+        token = RefreshToken.for_user(self.user).access_token
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    def commit(self, change):
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+
+    async def next_event(self, stream):
+        frame = (await asyncio.wait_for(anext(stream), 5)).decode()
+        event, data = frame.rstrip("\n").split("\n")
+        return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+    async def test_stream_sends_turnaround_changes(self):
+        """Saved and deleted turnarounds reach the airport's stream"""
+        response = await self.async_client.get(
+            reverse("async-turnaround-stream"), {"airport": "CDG"}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertEqual(
+            await self.next_event(stream), ("subscribed", {"airport": "CDG"})
+        )
+
+        self.first.scheduled_end = self.at(10 * 60 + 30)
+        await sync_to_async(self.commit)(self.first.save)
+        event, data = await self.next_event(stream)
+        self.assertEqual(event, "changes")
+        self.assertEqual(data["airport"], "CDG")
+        [change] = data["changes"]
+        self.assertEqual(change["op"], "upsert")
+        self.assertEqual(change["id"], self.first.id)
+        self.assertEqual(change["data"]["scheduled_end"], "2024-03-20T10:30:00Z")
+
+        first_id = self.first.id
+        await sync_to_async(self.commit)(self.first.delete)
+        event, data = await self.next_event(stream)
+        self.assertEqual(
+            data["changes"], [{"type": "turnaround", "op": "delete", "id": first_id}]
+        )
+
+    def test_stream_needs_known_airport(self):
+        url = reverse("async-turnaround-stream")
+        response = self.client.get(url, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {"airport": "XXX"}, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.client.force_authenticate(user=None)
+        response = self.client.get(url, {"airport": "CDG"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_changes_are_debounced_per_airport(self):
+        """Changes within the debounce window are sent as one batch"""
+        subscription = broker.subscribe(self.cdg.id)
+        self.addCleanup(broker.unsubscribe, subscription)
+        f1, f2, f3 = self.flights
+        events = [
+            {"flight": f1.id, "event": "ATA", "time": "2024-03-20T10:40:00Z"},
+        ]
+
+        def send():
+            self.client.post(reverse("flight-events"), events, format="json")
+
+        with override_settings(AGOA_PUSH_DEBOUNCE=timedelta(minutes=1)):
+            with mock.patch("agoa.push.threading.Timer") as timer:
+                await sync_to_async(self.commit)(send)
+        timer.assert_called_once()
+        self.assertTrue(subscription.queue.empty())
+
+        await sync_to_async(broker.flush)(self.cdg.id)
+        event, message = await asyncio.wait_for(subscription.get(), 5)
+        changes = {(c["type"], c["id"]) for c in json.loads(message)["changes"]}
+        # The late arrival, the turnaround it starts and the delayed flights
+        # of the rotation, all of which use CDG
+        self.assertEqual(
+            changes,
+            {
+                ("flight", f1.id),
+                ("flight", f2.id),
+                ("flight", f3.id),
+                ("turnaround", self.first.id),
+            },
+        )
+
+    @override_settings(AGOA_PUSH_DEBOUNCE=timedelta(0))
+    async def test_changes_for_a_deleted_airport_are_dropped(self):
+        """An airport deleted since its clients subscribed gets nothing"""
+        ory = await Airport.objects.acreate(
+            name="Paris Orly", iata_code="ORY", city="Paris", country="France"
+        )
+        ory_id = ory.id
+        subscription = broker.subscribe(ory_id)
+        self.addCleanup(broker.unsubscribe, subscription)
+        await ory.adelete()
+
+        await sync_to_async(broker.receive)("flight", {ory_id: [self.flights[0].id]})
+        self.assertTrue(subscription.queue.empty())
+
+    @mock.patch("agoa.push.close_old_connections")
+    @override_settings(AGOA_PUSH_REDIS_URL="redis://relay")
+    async def test_changes_are_relayed_through_redis(self, _):
+        """Published changes come back from Redis with integer airport keys"""
+        fake = FakeRedis()
+        relayed = TurnaroundBroker()
+        with mock.patch("agoa.push.redis") as redis:
+            redis.Redis.from_url.return_value = fake
+            subscription = relayed.subscribe(self.cdg.id)
+        redis.Redis.from_url.assert_called_once_with("redis://relay")
+
+        publish = sync_to_async(relayed.publish)
+        await publish("turnaround", {self.cdg.id: [self.first.id]})
+        event, message = await asyncio.wait_for(subscription.get(), 5)
+        [change] = json.loads(message)["changes"]
+        self.assertEqual((change["type"], change["id"]), ("turnaround", self.first.id))
+
+        # A bad message is logged and later ones still get through
+        with self.assertLogs("agoa.push", "ERROR"):
+            fake.publish(RedisRelay.channel, '["flight"]')
+        await publish("turnaround", {self.cdg.id: [self.second.id]})
+        event, message = await asyncio.wait_for(subscription.get(), 5)
+        self.assertEqual(json.loads(message)["changes"][0]["id"], self.second.id)
+
+    @override_settings(AGOA_PUSH_QUEUE_SIZE=1)
+    async def test_slow_client_is_told_to_reload(self):
+        subscription = broker.subscribe(self.cdg.id)
+        self.addCleanup(broker.unsubscribe, subscription)
+        subscription.deliver('{"changes": []}')
+        subscription.deliver('{"changes": []}')
+        self.assertEqual(await subscription.get(), ("reload", "{}"))
+
+    @override_settings(AGOA_PUSH_HEARTBEAT=timedelta(milliseconds=10))
+    async def test_heartbeat_and_unsubscribe(self):
+        """Idle streams get comments, and closing a stream unsubscribes"""
+        stream = _event_stream(broker.subscribe(self.cdg.id), "CDG")
+        await anext(stream)
+        self.assertEqual(await anext(stream), ": keepalive\n\n")
+        self.assertEqual(broker.subscribers(self.cdg.id), 1)
+        await stream.aclose()
+        self.assertEqual(broker.subscribers(self.cdg.id), 0)
+
+
+@override_settings(AGOA_STATUS_EVENT_WINDOW=timedelta(0))
+class DeltaSyncTests(ScheduleFixtures, APITestCase):
+    at = StatusEventTests.at
+
+    def setUp(self):
+        """The rotation of the status event tests, last updated a day ago"""
+        StatusEventTests.setUp(self)
+        self.synced = timezone.now()
+        Flight.objects.update(updated_at=self.synced - timedelta(days=1))
+        Turnaround.objects.update(updated_at=self.synced - timedelta(days=1))
+
+    def test_unchanged_collection_is_not_modified(self):
+        """A current ETag gets a 304 without reading the rows"""
+        url = reverse("flight-list")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+        response = self.client.patch(
+            reverse("flight-detail", args=[self.flights[0].id]),
+            {"actual_arrival": "2024-03-20T09:10:00Z"},
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.data), 3)
+
+        params = {"date": "2024-03-20", "airport": "CDG"}
+        url = reverse("turnaround-by-date-and-airport")
+        etag = self.client.get(url, params)["ETag"]
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_changed_since_returns_changes_and_deletions(self):
+        """Status events and deletions show up in the next delta"""
+        f1, f2, f3 = self.flights
+        self.client.post(
+            reverse("flight-events"),
+            [{"flight": f1.id, "event": "ATA", "time": "2024-03-20T09:50:00Z"}],
+            format="json",
+        )
+        second_id = self.second.id
+        self.second.delete()
+        since = {"changed_since": self.synced.isoformat()}
+
+        response = self.client.get(reverse("flight-list"), since)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The arrival and the departure it delays, not the unaffected flight
+        self.assertEqual(
+            [row["id"] for row in response.data["results"]], [f1.id, f2.id]
+        )
+        self.assertEqual(response.data["deleted"], [])
+        self.assertGreaterEqual(response.data["until"], self.synced)
+
+        response = self.client.get(reverse("turnaround-list"), since)
+        self.assertEqual(
+            [row["id"] for row in response.data["results"]], [self.first.id]
+        )
+        self.assertEqual(response.data["deleted"], [second_id])
+
+        until = response.data["until"]
+        response = self.client.get(reverse("flight-list"), {"changed_since": until})
+        # Resent within the overlap, in case a write committed late
+        self.assertEqual(len(response.data["results"]), 2)
+        with override_settings(AGOA_SYNC_OVERLAP=timedelta(0)):
+            response = self.client.get(reverse("flight-list"), {"changed_since": until})
+        self.assertEqual(response.data["results"], [])
+
+    def test_changed_since_is_paginated(self):
+        """Changed rows are paged by update time; every page lists deletions"""
+        f1, f2, _ = self.flights
+        Flight.objects.filter(pk=f2.pk).update(updated_at=timezone.now())
+        Flight.objects.filter(pk=f1.pk).update(updated_at=timezone.now())
+        second_id = self.second.id
+        self.second.delete()
+        params = {"changed_since": self.synced.isoformat(), "page_size": 1}
+
+        response = self.client.get(reverse("flight-list"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row["id"] for row in response.data["results"]], [f2.id])
+        self.assertIsNotNone(response.data["next"])
+        response = self.client.get(response.data["next"])
+        self.assertEqual([row["id"] for row in response.data["results"]], [f1.id])
+        self.assertIsNone(response.data["next"])
+
+        params["page_size"] = 10
+        response = self.client.get(reverse("turnaround-list"), params)
+        self.assertEqual(response.data["results"], [])
+        self.assertEqual(response.data["deleted"], [second_id])
+
+    def test_rows_leaving_the_filter_are_deleted(self):
+        """A row edited out of the filters is reported as deleted"""
+        _, f2, f3 = self.flights
+        url = reverse("flight-list")
+        params = {"departure_airport": "FRA", "changed_since": self.synced.isoformat()}
+        etag = self.client.get(url, params)["ETag"]
+
+        f3.departure_airport = f2.departure_airport
+        f3.save()
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], [])
+        self.assertEqual(response.data["deleted"], [f3.id])
+
+    def test_rows_changed_elsewhere_are_not_deleted(self):
+        """Writes to rows the filters never matched are not reported"""
+        f1, f2, _ = self.flights
+        url = reverse("flight-list")
+        params = {"departure_airport": "FRA", "changed_since": self.synced.isoformat()}
+
+        f2.estimated_departure = f2.scheduled_departure + timedelta(minutes=20)
+        f2.save()
+        f1.estimated_departure = f1.scheduled_departure + timedelta(minutes=5)
+        f1.save()
+        response = self.client.get(url, params)
+        self.assertEqual([row["id"] for row in response.data["results"]], [f1.id])
+        self.assertEqual(response.data["deleted"], [])
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_list_filters_once(self):
+        with mock.patch.object(
+            FlightViewSet,
+            "filter_queryset",
+            autospec=True,
+            side_effect=FlightViewSet.filter_queryset,
+        ) as filter_queryset:
+            self.client.get(reverse("flight-list"), {"departure_airport": "FRA"})
+        self.assertEqual(filter_queryset.call_count, 1)
+
+    def test_invalid_or_expired_changed_since(self):
+        url = reverse("flight-list")
+        response = self.client.get(url, {"changed_since": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        old = self.synced - timedelta(days=30)
+        response = self.client.get(url, {"changed_since": old.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    def test_purge_tombstones(self):
+        first_id = self.first.id
+        self.first.delete()
+        Tombstone.objects.create(
+            model="flight", object_id=999, deleted_at=self.synced - timedelta(days=30)
+        )
+        out = StringIO()
+        call_command("purge_tombstones", stdout=out)
+        self.assertIn("Deleted 1 tombstones", out.getvalue())
+        self.assertEqual(
+            set(Tombstone.objects.values_list("model", "object_id")),
+            {("turnaround", first_id)},
+        )
+
+
+class FlightSearchTests(ScheduleFixtures, APITestCase):
+    def setUp(self):
+        """Flights between CDG, JFK and FRA over a week, some delayed"""
+        self.log_in()
+        af, lh = self.create_airline("AF"), self.create_airline("LH")
+        cdg, jfk, fra = self.create_airports("CDG", "JFK", "FRA")
+        self.monday = timezone.make_aware(datetime(2024, 3, 18, 9))
+        self.flights = {}
+        for number, airline, origin, destination, day, delay in [
+            ("AF10", af, cdg, jfk, 0, None),
+            ("AF11", af, cdg, jfk, 2, timedelta(minutes=40)),
+            ("AF12", af, cdg, jfk, 9, None),
+            ("AF20", af, cdg, fra, 1, timedelta(minutes=10)),
+            ("LH30", lh, fra, jfk, 3, timedelta(hours=2)),
+            ("LH31", lh, jfk, cdg, 4, None),
+        ]:
+            departure = self.monday + timedelta(days=day)
+            self.flights[number] = self.create_flight(
+                number,
+                airline,
+                origin,
+                destination,
+                departure,
+                estimated_departure=delay and departure + delay,
+            )
+
+    def search(self, **params):
+        response = self.client.get(reverse("flight-list"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return [flight["flight_number"] for flight in response.data]
+
+    def test_route_this_week(self):
+        """Test a route and week filter returns that route's flights only"""
+        numbers = self.search(
+            departure_airport="CDG",
+            arrival_airport="jfk",
+            **{"from": "2024-03-18", "to": "2024-03-24"},
+            ordering="scheduled_departure",
+        )
+        self.assertEqual(numbers, ["AF10", "AF11"])
+
+    def test_filters(self):
+        """Test each filter on its own, and unknown codes"""
+        self.assertEqual(sorted(self.search(airline="LH")), ["LH30", "LH31"])
+        self.assertEqual(
+            sorted(self.search(flight_number="af1")), ["AF10", "AF11", "AF12"]
+        )
+        self.assertEqual(sorted(self.search(delayed="true")), ["AF11", "LH30"])
+        self.assertEqual(self.search(date="2024-03-19"), ["AF20"])
+        self.assertEqual(self.search(arrival_airport="XXX"), [])
+
+    def test_ordering(self):
+        """Test whitelisted ordering, also across cursor pages"""
+        self.assertEqual(
+            self.search(ordering="-flight_number"),
+            ["LH31", "LH30", "AF20", "AF12", "AF11", "AF10"],
+        )
+        response = self.client.get(
+            reverse("flight-list"), {"ordering": "-scheduled_departure", "page_size": 4}
+        )
+        self.assertEqual(
+            [flight["flight_number"] for flight in response.data["results"]],
+            ["AF12", "LH31", "LH30", "AF11"],
+        )
+        next_page = self.client.get(response.data["next"])
+        self.assertEqual(
+            [flight["flight_number"] for flight in next_page.data["results"]],
+            ["AF20", "AF10"],
+        )
+
+    def test_invalid_parameters(self):
+        url = reverse("flight-list")
+        for params in (
+            {"ordering": "airline"},
+            {"delayed": "maybe"},
+            {"from": "2024-03-18"},
+            {"date": "18-03-2024"},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn("error", response.data)
+
+    def test_filters_use_indexes(self):
+        """Test every filter, alone or with a period, is served by an index"""
+        week = {"from": "2024-03-18", "to": "2024-03-24"}
+        route = {"departure_airport": "CDG", "arrival_airport": "JFK"}
+        for params, index in [
+            ({"airline": "AF"}, "flight_airline_sched_idx"),
+            ({"airline": "AF", **week}, "flight_airline_sched_idx"),
+            ({"departure_airport": "CDG", **week}, "flight_dep_airport_sched_idx"),
+            ({"arrival_airport": "JFK", **week}, "flight_arr_airport_sched_idx"),
+            (route, "flight_route_sched_idx"),
+            ({**route, **week}, "flight_route_sched_idx"),
+            (week, "flight_sched_dep_idx"),
+            ({"delayed": "true", **week}, "flight_behind_schedule_idx"),
+            ({"flight_number": "AF1"}, "agoa_flight_flight_number_airline_id"),
+        ]:
+            with self.subTest(params=params):
+                queryset, _ = flight_search_queryset(Flight.objects.all(), params)
+                plan = queryset.explain()
+                self.assertNotRegex(plan, r"\bSCAN agoa_flight\b", plan)
+                self.assertRegex(plan, rf"SEARCH agoa_flight USING INDEX {index}", plan)
+
+        # Alone, delayed reads the partial index of late flights only
+        queryset, _ = flight_search_queryset(Flight.objects.all(), {"delayed": "1"})
+        self.assertIn("USING INDEX flight_behind_schedule_idx", queryset.explain())
+
+
+class MetricsTests(ScheduleFixtures, APITestCase):
+    create_turnarounds = ExpandTests.create_turnarounds
+
+    def setUp(self):
+        """A few expandable turnarounds, and empty metrics"""
+        ExpandTests.setUp(self)
+        self.create_turnarounds(5)
+        registry.clear()
+
+    def scrape(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if line and not line.startswith("#"):
+                name, value = line.rsplit(" ", 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_records_time_sql_serializer_and_size(self):
+        """Each request is measured under its view name and method"""
+        url = reverse("turnaround-list")
+        with CaptureQueriesContext(connection) as queries:
+            sizes = [len(self.client.get(url).content) for _ in range(2)]
+        # Read now: the next request resets the connection's query log
+        query_count = len(queries)
+
+        samples = self.scrape()
+        labels = '{view="turnaround-list",method="GET"}'
+        self.assertEqual(samples[f"agoa_request_duration_seconds_count{labels}"], 2)
+        self.assertEqual(samples[f"agoa_sql_queries_sum{labels}"], query_count)
+        self.assertEqual(samples[f"agoa_response_size_bytes_sum{labels}"], sum(sizes))
+        self.assertGreater(samples[f"agoa_serializer_duration_seconds_sum{labels}"], 0)
+        self.assertEqual(
+            samples[
+                'agoa_sql_queries_bucket{view="turnaround-list",method="GET",le="+Inf"}'
+            ],
+            2,
+        )
+        # The scrape itself is not recorded
+        self.assertNotIn('view="metrics"', "".join(samples))
+
+    def test_async_views_are_measured(self):
+        """SQL run by the async ORM in worker threads counts too"""
+        token = RefreshToken.for_user(self.user).access_token
+        response = self.client.get(
+            reverse("async-turnaround-by-date-and-airport"),
+            {"date": self.start.strftime("%Y-%m-%d"), "airport": "CDG"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()), 5)
+        labels = '{view="async-turnaround-by-date-and-airport",method="GET"}'
+        self.assertGreaterEqual(self.scrape()[f"agoa_sql_queries_sum{labels}"], 1)
+
+    @override_settings(AGOA_METRICS_N_PLUS_ONE_THRESHOLD=3)
+    def test_flags_n_plus_one(self):
+        """Expanding without select_related repeats one lookup per row"""
+        with mock.patch.object(
+            TurnaroundSerializer, "select_related_paths", return_value=[]
+        ):
+            with self.assertLogs("agoa.metrics", "WARNING") as logs:
+                self.client.get(reverse("turnaround-list"), {"expand": "airport"})
+        self.assertIn("Possible N+1 in GET turnaround-list", logs.output[0])
+        self.assertEqual(registry.n_plus_one("turnaround-list", "GET"), 1)
+
+        self.client.get(reverse("turnaround-list"), {"expand": "airport"})
+        self.assertEqual(registry.n_plus_one("turnaround-list", "GET"), 1)
+        samples = self.scrape()
+        self.assertEqual(
+            samples['agoa_n_plus_one_total{view="turnaround-list",method="GET"}'], 1
+        )
+
+    @override_settings(AGOA_METRICS_TOKEN="s3cret")
+    def test_token(self):
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 401)
+        response = self.client.get(url, headers={"Authorization": "Bearer s3cret"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_histograms_roll_over(self):
+        """Observations older than the window are dropped"""
+        histogram = RollingHistogram((1, 10), window=60, slices=6)
+        histogram.observe(0.5, now=1000)
+        histogram.observe(5, now=1030)
+        histogram.observe(50, now=1055)
+        self.assertEqual(histogram.snapshot(now=1059), ([1, 2, 3], 55.5))
+        self.assertEqual(histogram.snapshot(now=1065), ([0, 1, 2], 55))
+        self.assertEqual(histogram.snapshot(now=1200), ([0, 0, 0], 0))
+
+
+class RowSerializerTests(ScheduleFixtures, APITestCase):
+    setUp = ExpandTests.setUp
+    create_turnarounds = ExpandTests.create_turnarounds
+
+    def expected(self, serializer_class, queryset):
+        """The bytes the DRF serializer and renderer produce"""
+        return JSONRenderer().render(serializer_class(queryset, many=True).data)
+
+    def add_actual_times(self):
+        turnaround = Turnaround.objects.order_by("pk").first()
+        turnaround.actual_start = turnaround.scheduled_start + timedelta(
+            minutes=3, microseconds=250
+        )
+        turnaround.save()
+        flight = turnaround.arrival_flight
+        flight.actual_arrival = turnaround.actual_start
+        flight.flight_number = "TA\u2028\u00e9"
+        flight.save()
+
+    def test_flight_list_matches_serializer(self):
+        self.create_turnarounds(3)
+        self.add_actual_times()
+        response = self.client.get(reverse("flight-list"))
+        self.assertEqual(
+            response.content,
+            self.expected(FlightSerializer, Flight.objects.order_by("pk")),
+        )
+        self.assertIn(b"TA\\u2028", response.content)
+
+    def test_paginated_list_matches_serializer(self):
+        self.create_turnarounds(3)
+        self.add_actual_times()
+        flights = Flight.objects.order_by("scheduled_departure", "pk")
+        url = reverse("flight-list")
+        response = self.client.get(url, {"page_size": 4})
+        first = response.json()
+        page = {"next": first["next"], "previous": None, "results": flights[:4]}
+        page["results"] = FlightSerializer(page["results"], many=True).data
+        self.assertEqual(response.content, JSONRenderer().render(page))
+        second = self.client.get(first["next"]).json()
+        self.assertEqual(
+            [flight["id"] for flight in second["results"]],
+            [flight.id for flight in flights[4:]],
+        )
+
+    def test_by_date_and_airport_matches_serializer(self):
+        self.create_turnarounds(3)
+        self.add_actual_times()
+        params = {"date": self.start.date().isoformat(), "airport": "CDG"}
+        for zone in ("UTC", "America/New_York"):
+            with self.subTest(zone=zone), timezone.override(zone):
+                response = self.client.get(
+                    reverse("turnaround-by-date-and-airport"), params
+                )
+                self.assertEqual(
+                    response.content,
+                    self.expected(
+                        TurnaroundSerializer, Turnaround.objects.order_by("pk")
+                    ),
+                )
+
+    def test_changed_since_matches_serializer(self):
+        self.create_turnarounds(2)
+        since = (timezone.now() - timedelta(minutes=1)).isoformat()
+        response = self.client.get(reverse("turnaround-list"), {"changed_since": since})
+        data = response.json()
+        # Times go through DRF's encoder, as with JSONRenderer
+        self.assertTrue(data["until"].endswith("Z"))
+        turnarounds = Turnaround.objects.order_by("updated_at", "pk")
+        expected = {
+            "changed_since": data["changed_since"],
+            "until": data["until"],
+            "results": TurnaroundSerializer(turnarounds, many=True).data,
+            "deleted": [],
+        }
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+    def test_datetimes_stored_in_another_format(self):
+        """Rows written outside the ORM are rendered like the serializer does"""
+        self.create_turnarounds(1)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE agoa_turnaround SET actual_start = %s",
+                ["2024-03-20T08:00:05.5+01:00"],
+            )
+        response = self.client.get(reverse("turnaround-list"))
+        self.assertEqual(
+            response.content,
+            self.expected(TurnaroundSerializer, Turnaround.objects.all()),
+        )
+        self.assertIn(b'"actual_start":"2024-03-20T07:00:05.500000Z"', response.content)
+
+    def test_without_orjson(self):
+        self.create_turnarounds(2)
+        self.add_actual_times()
+        with mock.patch("agoa.renderers.orjson", None):
+            response = self.client.get(reverse("flight-list"))
+        self.assertEqual(
+            response.content,
+            self.expected(FlightSerializer, Flight.objects.order_by("pk")),
+        )
+
+    def test_expand_uses_the_serializer(self):
+        self.create_turnarounds(1)
+        with mock.patch.object(RowSerializer, "to_representation") as fast:
+            response = self.client.get(reverse("flight-list"), {"expand": "airline"})
+        fast.assert_not_called()
+        self.assertEqual(response.data[0]["airline"]["iata_code"], "TA")
+
+    def test_unsupported_fields_are_not_compiled(self):
+        class DescribedFlightSerializer(FlightSerializer):
+            description = serializers.SerializerMethodField()
+
+            def get_description(self, flight):
+                return str(flight)
+
+        self.assertIsNone(RowSerializer.for_serializer(DescribedFlightSerializer))
+        compiled = RowSerializer.for_serializer(FlightSerializer)
+        self.assertIn(("airline", "airline_id", False), compiled.fields)
+
+
+class DatabaseProfileTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="ops", password="pass12345")
+        self.client.force_authenticate(user=self.user)
+        self.router = ReadReplicaRouter()
+
+    def open_connection(self, alias):
+        """A new connection to the test database under ``alias``"""
+        copy = connection.copy(alias)
+        copy.ensure_connection()
+        self.addCleanup(copy.close)
+        return copy
+
+    @override_settings(
+        AGOA_SQLITE_PRAGMAS={"journal_mode": "WAL", "cache_size": -2000},
+        AGOA_READ_DATABASES=["read_only"],
+    )
+    @unittest.skipUnless(connection.vendor == "sqlite", "pragmas are SQLite's")
+    def test_pragmas_and_read_only_replica(self):
+        primary = self.open_connection("default")
+        with primary.cursor() as cursor:
+            cursor.execute("PRAGMA cache_size")
+            self.assertEqual(cursor.fetchone()[0], -2000)
+            cursor.execute("PRAGMA query_only")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+        replica = self.open_connection("read_only")
+        with replica.cursor() as cursor:
+            cursor.execute("PRAGMA query_only")
+            self.assertEqual(cursor.fetchone()[0], 1)
+            with self.assertRaisesMessage(OperationalError, "readonly"):
+                cursor.execute("CREATE TABLE scratch (id INTEGER)")
+
+    @override_settings(AGOA_READ_DATABASES=["replica"])
+    def test_router_reads_from_replicas_outside_transactions(self):
+        default = connections["default"]
+        with mock.patch.object(default, "in_atomic_block", False):
+            self.assertIsNone(self.router.db_for_read(Flight))
+            with read_from_replicas():
+                self.assertEqual(self.router.db_for_read(Flight), "replica")
+                # Rows related to one read from the default database follow it
+                self.assertEqual(
+                    self.router.db_for_read(Flight, instance=self.user), "default"
+                )
+            self.assertIsNone(self.router.db_for_read(Flight))
+        with read_from_replicas():
+            self.assertIsNone(self.router.db_for_read(Flight))
+        self.assertEqual(self.router.db_for_write(Flight), "default")
+        self.assertFalse(self.router.allow_migrate("replica", "agoa"))
+        self.assertIsNone(self.router.allow_migrate("default", "agoa"))
+
+    def test_router_without_replicas(self):
+        with read_from_replicas():
+            self.assertIsNone(self.router.db_for_read(Flight))
+
+    def test_only_safe_requests_use_replicas(self):
+        airline = {"name": "Test Airline", "iata_code": "TA"}
+        with mock.patch(
+            "agoa.views.read_from_replicas", wraps=read_from_replicas
+        ) as replicas:
+            self.client.post(reverse("airline-list"), airline, format="json")
+            replicas.assert_not_called()
+            response = self.client.get(reverse("airline-list"))
+            replicas.assert_called_once()
+        self.assertEqual(response.data[0]["iata_code"], "TA")
+
+
+class RotationTests(ScheduleFixtures, APITestCase):
+    def setUp(self):
+        """One aircraft: JFK -> CDG -> JFK -> CDG on 2024-03-20"""
+        ExpandTests.setUp(self)
+        rotation_cache.clear()
+        self.day = date(2024, 3, 20)
+        first_leg = timezone.make_aware(datetime(2024, 3, 20, 1, 0))
+        airports = [self.jfk, self.cdg, self.jfk, self.cdg]
+        self.flights = [
+            self.create_flight(
+                f"TA{i}",
+                self.airline,
+                airports[i],
+                airports[i + 1],
+                first_leg + timedelta(hours=3 * i),
+                # One hour on the ground between legs
+                timedelta(hours=2),
+            )
+            for i in range(3)
+        ]
+        self.turnarounds = [
+            self.link(arrival, departure)
+            for arrival, departure in zip(self.flights, self.flights[1:])
+        ]
+
+    def impact(self, flight, minutes):
+        url = reverse("flight-delay-impact", args=[flight.id])
+        response = self.client.get(url, {"minutes": minutes})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_graph_walks_rotations(self):
+        graph = RotationGraph.load(self.day, self.day)
+        self.assertEqual((len(graph), graph.turnaround_count), (3, 2))
+        ids = [flight.id for flight in self.flights]
+        self.assertEqual(graph.rotation(ids[1]), ids)
+
+    def test_delay_propagates_through_minimum_ground_time(self):
+        first, second, third = self.flights
+        data = self.impact(first, 90)
+        # Lands 90 minutes late: the second leg leaves 60 minutes late, after
+        # 30 minutes on the ground, and the third 30 minutes late
+        self.assertEqual(
+            [(f["id"], f["delay_minutes"]) for f in data["flights"]],
+            [(first.id, 90), (second.id, 60), (third.id, 30)],
+        )
+        self.assertEqual(
+            data["flights"][1]["departure"],
+            second.scheduled_departure + timedelta(minutes=60),
+        )
+        self.assertEqual(
+            [
+                (t["id"], t["start_delay_minutes"], t["end_delay_minutes"])
+                for t in data["turnarounds"]
+            ],
+            [(self.turnarounds[0].id, 90, 60), (self.turnarounds[1].id, 60, 30)],
+        )
+
+    def test_slack_absorbs_small_delays(self):
+        data = self.impact(self.flights[1], 20)
+        self.assertEqual([f["id"] for f in data["flights"]], [self.flights[1].id])
+        # The turnaround before the flight ends later, the one after starts later
+        self.assertEqual(
+            [
+                (t["start_delay_minutes"], t["end_delay_minutes"])
+                for t in data["turnarounds"]
+            ],
+            [(0, 20), (20, 0)],
+        )
+
+    def test_departed_flights_stop_the_walk(self):
+        second = self.flights[1]
+        second.actual_departure = second.scheduled_departure
+        second.save()
+        data = self.impact(self.flights[0], 90)
+        self.assertEqual([f["id"] for f in data["flights"]], [self.flights[0].id])
+
+    def test_graph_follows_changes_incrementally(self):
+        first, second, third = self.flights
+        self.impact(first, 90)
+        graph, _ = rotation_cache.get(self.day)
+
+        # A fourth leg, linked after the cached graph was built
+        fourth = self.create_flight(
+            "TA3",
+            self.airline,
+            self.cdg,
+            self.jfk,
+            third.scheduled_arrival + timedelta(minutes=40),
+            timedelta(hours=2, minutes=20),
+        )
+        self.link(third, fourth)
+        data = self.impact(first, 90)
+        self.assertEqual(
+            [f["delay_minutes"] for f in data["flights"]], [90, 60, 30, 20]
+        )
+
+        # Already expected an hour late, the second leg absorbs the delay
+        second.estimated_departure = second.scheduled_departure + timedelta(hours=1)
+        second.estimated_arrival = second.scheduled_arrival + timedelta(hours=1)
+        second.save()
+        self.assertEqual(
+            [f["id"] for f in self.impact(first, 90)["flights"]], [first.id]
+        )
+
+        self.turnarounds[0].delete()
+        self.assertEqual(len(self.impact(first, 90)["flights"]), 1)
+        self.assertIs(rotation_cache.get(self.day)[0], graph)
+
+    def test_invalid_minutes(self):
+        url = reverse("flight-delay-impact", args=[self.flights[0].id])
+        for minutes in ("", "abc", "-5", "0", "nan"):
+            response = self.client.get(url, {"minutes": minutes})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@unittest.skipIf(analytics.np is None, "NumPy is not installed")
+class AnalyticsTests(ScheduleFixtures, APITestCase):
+    def setUp(self):
+        """Five TA flights JFK -> CDG and one TB flight CDG -> JFK on 2024-03-20"""
+        ExpandTests.setUp(self)
+        self.other = self.create_airline("TB")
+        base = timezone.make_aware(datetime(2024, 3, 20, 6, 0))
+        # (departure delay, flight time in minutes); None: not flown yet
+        legs = [(0, 475), (5, 485), (20, 475), (60, 470), None]
+        self.flights = []
+        for i, leg in enumerate(legs):
+            departure = base + timedelta(hours=i)
+            actual = {}
+            if leg is not None:
+                departure_delay, duration = leg
+                actual["actual_departure"] = departure + timedelta(
+                    minutes=departure_delay
+                )
+                actual["actual_arrival"] = actual["actual_departure"] + timedelta(
+                    minutes=duration
+                )
+            self.flights.append(
+                self.create_flight(
+                    f"TA{i}", self.airline, self.jfk, self.cdg, departure, **actual
+                )
+            )
+        self.return_leg = self.create_flight(
+            "TB1",
+            self.other,
+            self.cdg,
+            self.jfk,
+            base + timedelta(hours=10),
+            timedelta(hours=9),
+            actual_departure=base + timedelta(hours=10, minutes=200),
+            actual_arrival=base + timedelta(hours=19, minutes=200),
+        )
+        # Outside the range
+        self.create_flight(
+            "TA9", self.airline, self.jfk, self.cdg, base + timedelta(days=1)
+        )
+
+    def get(self, name, **params):
+        return self.client.get(reverse(name), {"date": "2024-03-20", **params})
+
+    def test_flight_delays_and_percentiles(self):
+        response = self.get("flight-analytics", top=2)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data
+        self.assertEqual(data["count"], 6)
+        # Nearest rank over the delays 0, 5, 20, 60 and 200
+        self.assertEqual(
+            data["departure_delay"],
+            {
+                "count": 5,
+                "average_minutes": 57.0,
+                "p50_minutes": 20.0,
+                "p90_minutes": 200.0,
+                "p99_minutes": 200.0,
+            },
+        )
+        # Within the default 15 minutes: 0 and 5
+        self.assertEqual(data["on_time_departure_rate"], 0.4)
+        self.assertEqual(
+            [bucket["count"] for bucket in data["departure_delay_histogram"]],
+            [1, 1, 1, 1, 0, 0, 1],
+        )
+        self.assertEqual(
+            [
+                (f["flight_number"], f["duration_minutes"])
+                for f in data["longest_flights"]
+            ],
+            [("TB1", 540.0), ("TA1", 485.0)],
+        )
+        self.assertEqual(data["longest_flights"][0]["departure_airport"], "CDG")
+
+    def test_grouped_flight_analytics(self):
+        data = self.get("flight-analytics", group_by="airline").data
+        self.assertEqual([group["airline"] for group in data["groups"]], ["TA", "TB"])
+        ta, tb = data["groups"]
+        self.assertEqual(ta["count"], 5)
+        self.assertEqual(
+            (ta["departure_delay"]["count"], ta["departure_delay"]["p50_minutes"]),
+            (4, 5.0),
+        )
+        # Arrival delays -5, 10, 15 and 50
+        self.assertEqual(ta["arrival_delay"]["average_minutes"], 17.5)
+        self.assertEqual(ta["on_time_departure_rate"], 0.5)
+        self.assertEqual(tb["on_time_departure_rate"], 0.0)
+
+        data = self.get("flight-analytics", group_by="departure_airport").data
+        self.assertEqual(
+            [(g["departure_airport"], g["count"]) for g in data["groups"]],
+            [("CDG", 1), ("JFK", 5)],
+        )
+
+    def test_turnaround_durations(self):
+        for arrival, departure, late in [(0, 2, 10), (1, 3, -20)]:
+            arrival, departure = self.flights[arrival], self.flights[departure]
+            Turnaround.objects.create(
+                arrival_flight=arrival,
+                departure_flight=departure,
+                airport=self.cdg,
+                scheduled_start=arrival.scheduled_departure,
+                scheduled_end=arrival.scheduled_departure + timedelta(minutes=60),
+                actual_start=arrival.scheduled_departure,
+                actual_end=arrival.scheduled_departure + timedelta(minutes=60 + late),
+            )
+        response = self.get("turnaround-analytics", group_by="airport")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(response.data["duration_delta"]["average_minutes"], -5.0)
+        self.assertEqual(response.data["duration_delta"]["p99_minutes"], 10.0)
+        (group,) = response.data["groups"]
+        self.assertEqual(group["airport"], "CDG")
+        self.assertEqual(group["actual_duration"]["p50_minutes"], 40.0)
+
+    def test_empty_range(self):
+        data = self.client.get(
+            reverse("flight-analytics"), {"date": "2024-01-01", "group_by": "airline"}
+        ).data
+        self.assertEqual(data["count"], 0)
+        self.assertIsNone(data["departure_delay"]["p50_minutes"])
+        self.assertIsNone(data["on_time_departure_rate"])
+        self.assertEqual((data["longest_flights"], data["groups"]), ([], []))
+
+    def test_invalid_parameters(self):
+        for params in [
+            {"group_by": "airport"},
+            {"top": "-1"},
+            {"top": "²"},
+            {"date": "20/03"},
+        ]:
+            response = self.get("flight-analytics", **params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.get("turnaround-analytics", group_by="arrival_airport")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_without_numpy(self):
+        with mock.patch("agoa.analytics.np", None):
+            response = self.get("flight-analytics")
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+    def test_management_command(self):
+        out = StringIO()
+        call_command(
+            "analytics",
+            "--from",
+            "2024-03-20",
+            "--group-by",
+            "airline",
+            "--json",
+            stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["departure_delay"]["p50_minutes"], 20.0)
+        self.assertEqual(len(report["groups"]), 2)
+
+        out = StringIO()
+        call_command("analytics", "--from", "2024-03-20", "--top", "1", stdout=out)
+        self.assertIn("longest: TB1 CDG-JFK 540.0 min", out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command(
+                "analytics",
+                "--from",
+                "2024-03-20",
+                "--kind",
+                "turnarounds",
+                "--group-by",
+                "departure_airport",
+            )
+
+
+class SnapshotTests(ScheduleFixtures, APITestCase):
+    def setUp(self):
+        """Two turnarounds at CDG on 2024-03-20 and one flight on 2024-03-21"""
+        ExpandTests.setUp(self)
+        self.start = timezone.make_aware(datetime(2024, 3, 20, 10, 0))
+        ExpandTests.create_turnarounds(self, 2)
+        self.late = self.create_flight(
+            "TA99", self.airline, self.cdg, self.jfk, self.start + timedelta(days=1)
+        )
+        self.root = Path(self.enterContext(tempfile.TemporaryDirectory()))
+
+    def test_partition_fingerprints_track_changes(self):
+        table = SNAPSHOT_TABLES["flights"]
+        before = partition_fingerprints(table, None, None)
+        self.assertEqual(sorted(before), ["2024-03-20", "2024-03-21"])
+        self.assertEqual(before["2024-03-20"][0], 4)
+
+        flight = Flight.objects.filter(flight_number="TA01").get()
+        flight.actual_departure = flight.scheduled_departure
+        flight.save()
+        after = partition_fingerprints(table, date(2024, 3, 20), date(2024, 3, 21))
+        self.assertNotEqual(after["2024-03-20"], before["2024-03-20"])
+        self.assertEqual(after["2024-03-21"], before["2024-03-21"])
+
+    def test_without_pyarrow(self):
+        with mock.patch("agoa.snapshot.pa", None):
+            response = self.client.get(
+                reverse("flight-snapshot"), {"date": "2024-03-20"}
+            )
+            self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+            with self.assertRaises(CommandError):
+                call_command("snapshot", "--output-dir", str(self.root))
+
+    @unittest.skipIf(snapshot.pa is None, "pyarrow is not installed")
+    def test_snapshot_is_partitioned_by_day(self):
+        report = write_snapshot(self.root)
+        self.assertEqual(
+            sorted(report.written),
+            [
+                "airlines/part.parquet",
+                "airports/part.parquet",
+                "flights/date=2024-03-20/part.parquet",
+                "flights/date=2024-03-21/part.parquet",
+                "turnarounds/date=2024-03-20/part.parquet",
+            ],
+        )
+        self.assertEqual(report.rows, 1 + 2 + 5 + 2)
+        flights = snapshot.pq.read_table(self.root / "flights").to_pylist()
+        late = next(row for row in flights if row["id"] == self.late.id)
+        self.assertEqual(late["scheduled_departure"], self.late.scheduled_departure)
+        self.assertEqual(late["departure_airport_id"], self.cdg.id)
+        self.assertIsNone(late["actual_departure"])
+        self.assertEqual(str(late["date"]), "2024-03-21")
+
+    @unittest.skipIf(snapshot.pa is None, "pyarrow is not installed")
+    def test_reruns_only_rewrite_changed_partitions(self):
+        write_snapshot(self.root)
+        self.assertEqual(write_snapshot(self.root).written, [])
+
+        self.late.actual_departure = self.late.scheduled_departure
+        self.late.save()
+        self.cdg.name = "Roissy"
+        self.cdg.save()
+        report = write_snapshot(self.root)
+        self.assertEqual(
+            report.written,
+            ["airports/part.parquet", "flights/date=2024-03-21/part.parquet"],
+        )
+        self.assertEqual(report.unchanged, 3)
+
+        self.late.delete()
+        report = write_snapshot(self.root, date(2024, 3, 21), date(2024, 3, 21))
+        self.assertEqual(report.removed, ["flights/date=2024-03-21"])
+        self.assertFalse((self.root / "flights" / "date=2024-03-21").exists())
+
+        # Another format starts over
+        report = write_snapshot(self.root, output="arrow")
+        self.assertEqual(len(report.written), 4)
+        self.assertTrue((self.root / "airlines" / "part.arrow").exists())
+
+    @unittest.skipIf(snapshot.pa is None, "pyarrow is not installed")
+    def test_snapshot_action(self):
+        response = self.client.get(
+            reverse("turnaround-snapshot"), {"date": "2024-03-20", "output": "arrow"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("turnarounds-2024-03-20.arrow", response["Content-Disposition"])
+        content = b"".join(response.streaming_content)
+        table = snapshot.pa.ipc.open_file(snapshot.pa.BufferReader(content)).read_all()
+        self.assertEqual(table.num_rows, 2)
+        self.assertEqual(
+            table.schema.names, list(SNAPSHOT_TABLES["turnarounds"].columns)
+        )
+
+        response = self.client.get(
+            reverse("flight-snapshot"), {"date": "2024-03-20", "output": "csv"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @unittest.skipIf(snapshot.pa is None, "pyarrow is not installed")
+    def test_management_command(self):
+        out = StringIO()
+        call_command(
+            "snapshot",
+            "--output-dir",
+            str(self.root),
+            "--from",
+            "2024-03-21",
+            stdout=out,
+        )
+        self.assertIn("Wrote 3 files (4 rows)", out.getvalue())
+        out = StringIO()
+        call_command("snapshot", "--output-dir", str(self.root), "--json", stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(
+            report["written"],
+            [
+                "flights/date=2024-03-20/part.parquet",
+                "turnarounds/date=2024-03-20/part.parquet",
+            ],
+        )
+
+
+class FixtureTests(ScheduleFixtures, APITestCase):
+    def setUp(self):
+        self.log_in()
+
+    def test_initial_data_loads(self):
+        """The README's loaddata step works, updated_at included"""
+        call_command("loaddata", "initial_data.json", verbosity=0)
+        self.assertEqual(Flight.objects.count(), 6)
+        self.assertEqual(Turnaround.objects.count(), 3)
+        self.assertFalse(Flight.objects.filter(updated_at__isnull=True).exists())
+
+        response = self.client.get(reverse("flight-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 6)
+
+    def test_statistics_of_loaded_data(self):
+        """Fixture days have no rollup rows until rebuilt, but still answer"""
+        call_command("loaddata", "initial_data.json", verbosity=0)
+        self.assertFalse(TurnaroundDailyStats.objects.exists())
+        params = {"date": "2024-03-20"}
+
+        live = {}
+        for name in ("average_duration", "punctuality"):
+            url = reverse(f"turnaround-{name.replace('_', '-')}")
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["count"], 3)
+            grouped = self.client.get(url, {**params, "group_by": "airport"})
+            self.assertEqual(grouped.status_code, status.HTTP_200_OK)
+            live[name] = (response.data, grouped.data)
+
+        call_command("rebuild_turnaround_stats", stdout=StringIO())
+        self.assertTrue(TurnaroundDailyStats.objects.exists())
+        for name in ("average_duration", "punctuality"):
+            url = reverse(f"turnaround-{name.replace('_', '-')}")
+            self.assertEqual(self.client.get(url, params).data, live[name][0])
+            grouped = self.client.get(url, {**params, "group_by": "airport"})
+            self.assertEqual(grouped.data, live[name][1])
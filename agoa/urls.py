@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from . import async_views, metrics
 from .views import AirlineViewSet, AirportViewSet, FlightViewSet, TurnaroundViewSet
 
 # DRF Router configuration
@@ -15,6 +16,28 @@ router.register(r"turnarounds", TurnaroundViewSet)
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/auth/", include("authentication.urls")),
+    # Async read endpoints, served natively under ASGI
+    path(
+        "api/async/turnarounds/by_date_and_airport/",
+        async_views.turnarounds_by_date_and_airport,
+        name="async-turnaround-by-date-and-airport",
+    ),
+    path(
+        "api/async/turnarounds/average_duration/",
+        async_views.turnarounds_average_duration,
+        name="async-turnaround-average-duration",
+    ),
+    path(
+        "api/async/flights/lookup/",
+        async_views.flight_lookup,
+        name="async-flight-lookup",
+    ),
+    path(
+        "api/async/turnarounds/stream/",
+        async_views.turnaround_stream,
+        name="async-turnaround-stream",
+    ),
+    path("api/_metrics", metrics.metrics_view, name="metrics"),
     # API Routes
     path("api/", include(router.urls)),
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
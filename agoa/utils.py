@@ -0,0 +1,69 @@
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+from typing import Any, Iterable, Iterator, Optional
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils import timezone
+
+# Largest primary key the supported databases store (signed 64-bit); larger
+# ids overflow when passed to a query
+MAX_ID = 2**63 - 1
+
+
+def day_bounds(day: date) -> tuple[datetime, datetime]:
+    """
+    Return the half-open ``[start, end)`` datetime range covering ``day``.
+
+    Filtering with ``field__gte=start, field__lt=end`` is equivalent to
+    ``field__date=day`` in the current time zone, but unlike the ``__date``
+    transform it lets the database use an index on ``field``.
+    """
+    return days_bounds(day, day)
+
+
+def days_bounds(first: date, last: date) -> tuple[datetime, datetime]:
+    """Return the half-open datetime range covering ``first`` to ``last``"""
+    start = timezone.make_aware(datetime.combine(first, time.min))
+    end = timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min))
+    return start, end
+
+
+def parse_date(value: str) -> date:
+    """Parse a ``YYYY-MM-DD`` query parameter, raising ``ValueError``"""
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def parse_int(value: str, minimum: int = 0, maximum: Optional[int] = None) -> int:
+    """
+    Parse an integer query parameter from ``minimum`` to ``maximum``.
+
+    Raises ``ValueError`` for anything else, including what ``str.isdigit``
+    accepts but ``int`` cannot read (e.g. "²").
+    """
+    number = int(value)
+    if number < minimum or (maximum is not None and number > maximum):
+        raise ValueError(f"{number} is out of range")
+    return number
+
+
+def batched(rows: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    """Yield lists of up to ``size`` consecutive items of ``rows``"""
+    iterator = iter(rows)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def shared_cache(alias: Optional[str]) -> Any:
+    """
+    The Django cache named ``alias`` if every worker process sees the same
+    one, else None: local-memory and dummy caches are per process, so
+    versions or revocations kept there never reach other workers.
+    """
+    if not alias:
+        return None
+    cache = caches[alias]
+    if isinstance(cache, (LocMemCache, DummyCache)):
+        return None
+    return cache
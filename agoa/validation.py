@@ -0,0 +1,178 @@
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Collection, Optional
+
+from django.conf import settings
+from django.db.models import (
+    BooleanField,
+    DurationField,
+    ExpressionWrapper,
+    F,
+    Q,
+    QuerySet,
+    Value,
+)
+from django.utils import timezone
+
+# Rule name -> what it reports
+VALIDATION_RULES = {
+    "time_order": "The arrival lands after the departure leaves, or the "
+    "turnaround ends before it starts",
+    "min_connection": "Less ground time between arrival and departure than "
+    "the minimum connection time",
+    "airport_mismatch": "The arrival or the departure does not use the "
+    "turnaround's airport",
+    "rotation_overlap": "The turnaround starts before the aircraft's previous "
+    "turnaround (the one its arrival flight departed from) ends",
+}
+
+
+@dataclass
+class Violation:
+    """One rule broken by one turnaround"""
+
+    rule: str
+    turnaround: int
+    airport: str
+    arrival_flight: int
+    departure_flight: int
+    detail: str
+
+
+@dataclass
+class ValidationReport:
+    """Violations found among ``checked`` turnarounds"""
+
+    checked: int = 0
+    violations: list[Violation] = field(default_factory=list)
+
+    def as_dict(self) -> dict[str, Any]:
+        counts = Counter(violation.rule for violation in self.violations)
+        return {
+            "checked": self.checked,
+            "valid": not self.violations,
+            "counts": {rule: counts[rule] for rule in VALIDATION_RULES},
+            "violations": [asdict(violation) for violation in self.violations],
+        }
+
+
+def _conditions(min_ground_time: timedelta) -> dict[str, Q]:
+    arrival = F("arrival_flight__scheduled_arrival")
+    departure = F("departure_flight__scheduled_departure")
+    return {
+        "time_order": Q(arrival_flight__scheduled_arrival__gt=departure)
+        | Q(scheduled_start__gt=F("scheduled_end")),
+        # Only connections in the right order: the others break time_order
+        "min_connection": Q(
+            departure_flight__scheduled_departure__gte=arrival,
+            departure_flight__scheduled_departure__lt=arrival
+            + Value(min_ground_time, output_field=DurationField()),
+        ),
+        "airport_mismatch": ~Q(arrival_flight__arrival_airport=F("airport"))
+        | ~Q(departure_flight__departure_airport=F("airport")),
+        # The previous turnaround of the rotation is the one the arrival
+        # flight departed from
+        "rotation_overlap": Q(
+            arrival_flight__departure_turnaround__scheduled_end__gt=F("scheduled_start")
+        ),
+    }
+
+
+def validate_turnarounds(
+    queryset: QuerySet,
+    rules: Optional[Collection[str]] = None,
+    min_ground_time: Optional[timedelta] = None,
+) -> ValidationReport:
+    """
+    Check every turnaround of ``queryset`` against ``VALIDATION_RULES``.
+
+    All rules are evaluated by the database in one query: each becomes a
+    boolean annotation, and only rows breaking at least one rule are read
+    back, with what is needed to describe them. ``rules`` restricts the
+    check to some rules; ``min_ground_time`` defaults to
+    ``AGOA_MIN_GROUND_TIME``.
+    """
+    rules = list(VALIDATION_RULES if rules is None else rules)
+    if min_ground_time is None:
+        min_ground_time = settings.AGOA_MIN_GROUND_TIME
+    conditions = _conditions(min_ground_time)
+    flags = {
+        f"breaks_{rule}": ExpressionWrapper(
+            conditions[rule], output_field=BooleanField()
+        )
+        for rule in rules
+    }
+
+    report = ValidationReport(checked=queryset.count())
+    if not rules:
+        return report
+
+    failing = Q()
+    for rule in rules:
+        failing |= Q(**{f"breaks_{rule}": True})
+    rows = (
+        queryset.annotate(**flags)
+        .filter(failing)
+        .order_by("scheduled_start", "id")
+        .values(
+            *flags,
+            "id",
+            "arrival_flight_id",
+            "departure_flight_id",
+            "scheduled_start",
+            "scheduled_end",
+            airport_code=F("airport__iata_code"),
+            arrival_number=F("arrival_flight__flight_number"),
+            departure_number=F("departure_flight__flight_number"),
+            arrival_time=F("arrival_flight__scheduled_arrival"),
+            departure_time=F("departure_flight__scheduled_departure"),
+            arrival_airport=F("arrival_flight__arrival_airport__iata_code"),
+            departure_airport=F("departure_flight__departure_airport__iata_code"),
+            previous_id=F("arrival_flight__departure_turnaround__id"),
+            previous_end=F("arrival_flight__departure_turnaround__scheduled_end"),
+        )
+    )
+    for row in rows:
+        for rule in rules:
+            if row[f"breaks_{rule}"]:
+                report.violations.append(
+                    Violation(
+                        rule=rule,
+                        turnaround=row["id"],
+                        airport=row["airport_code"],
+                        arrival_flight=row["arrival_flight_id"],
+                        departure_flight=row["departure_flight_id"],
+                        detail=_describe(rule, row, min_ground_time),
+                    )
+                )
+    return report
+
+
+def _time(value: datetime) -> str:
+    return f"{timezone.localtime(value):%H:%M}"
+
+
+def _describe(rule: str, row: dict[str, Any], min_ground_time: timedelta) -> str:
+    if rule == "time_order":
+        if row["arrival_time"] > row["departure_time"]:
+            return (
+                f"{row['arrival_number']} lands at {_time(row['arrival_time'])} "
+                f"after {row['departure_number']} leaves at "
+                f"{_time(row['departure_time'])}"
+            )
+        return "The turnaround ends before it starts"
+    if rule == "min_connection":
+        ground = (row["departure_time"] - row["arrival_time"]).total_seconds() // 60
+        minimum = min_ground_time.total_seconds() // 60
+        return f"{ground:.0f} minutes on the ground, minimum is {minimum:.0f}"
+    if rule == "airport_mismatch":
+        return (
+            f"{row['arrival_number']} lands at {row['arrival_airport']} and "
+            f"{row['departure_number']} leaves from {row['departure_airport']}, "
+            f"turnaround is at {row['airport_code']}"
+        )
+    return (
+        f"Starts at {_time(row['scheduled_start'])}, before turnaround "
+        f"{row['previous_id']} ends at {_time(row['previous_end'])}"
+    )
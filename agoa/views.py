@@ -1,21 +1,545 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from drf_spectacular.utils import extend_schema, extend_schema_view
-from django.db.models import Avg
-from datetime import datetime, timedelta
+from authentication.permissions import HasTokenScope
+from datetime import date, datetime, timedelta
+from typing import Optional
+from django.conf import settings
+from django.db.models import Count, Max, Q
 from django.utils import timezone
-from .models import Airline, Airport, Flight, Turnaround
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+import hashlib
+import tempfile
+from django.http import FileResponse
+from .models import Airline, Airport, Flight, Tombstone, Turnaround
 from .serializers import (
     AirlineSerializer,
     AirportSerializer,
     FlightSerializer,
+    RowSerializer,
+    TurnaroundMatchSerializer,
     TurnaroundSerializer,
 )
 from rest_framework.views import APIView
 from rest_framework.parsers import JSONParser
 from rest_framework.renderers import JSONRenderer
+from rest_framework.exceptions import ValidationError
+from .analytics import (
+    FLIGHT_GROUPS,
+    TURNAROUND_GROUPS,
+    analytics_available,
+    flight_analytics,
+    turnaround_analytics,
+)
+from .cache import reference_cache_for
+from .database import read_from_replicas
+from .export import (
+    EXPORT_CONTENT_TYPES,
+    FLIGHT_EXPORT_COLUMNS,
+    TURNAROUND_EXPORT_COLUMNS,
+    stream_export,
+)
+from .ingest import upsert_flights
+from .matching import MatchingRules, match_turnarounds
+from .occupancy import OCCUPANCY_KINDS, occupancy_cache
+from .parsers import NDJSONParser
+from .rotations import rotation_cache, simulation_payload
+from .snapshot import (
+    SNAPSHOT_FORMATS,
+    SNAPSHOT_TABLES,
+    snapshot_available,
+    write_table,
+)
+from .status import ingest_status_events
+from .stats import (
+    DURATION_GROUPS,
+    ROLLUP_GROUPS,
+    merge_percentiles,
+    rollup_duration_averages,
+    punctuality_ranking,
+    rollup_punctuality,
+    turnaround_duration_stats,
+)
+from .utils import MAX_ID, parse_date, parse_int
+from .validation import VALIDATION_RULES, validate_turnarounds
+
+
+def parse_date_range_params(params) -> tuple[date, date]:
+    """
+    Read a day or an inclusive range of days from query parameters.
+
+    Either ``date`` or both ``from`` and ``to`` must be given, in YYYY-MM-DD
+    format. Raises ``ValueError`` with a message suitable for the client on
+    invalid input.
+    """
+    day = params.get("date")
+    first, last = (day, day) if day else (params.get("from"), params.get("to"))
+    if not first or not last:
+        raise ValueError("Either date or from and to parameters are required")
+    try:
+        first, last = parse_date(first), parse_date(last)
+    except ValueError:
+        raise ValueError("Invalid date format. Use YYYY-MM-DD")
+    if first > last:
+        raise ValueError("from must not be after to")
+    return first, last
+
+
+def parse_analytics_params(params, groups) -> tuple[date, date, Optional[str], int]:
+    """
+    Read the date range, ``group_by`` and ``top`` of the analytics actions.
+
+    Raises ``ValueError`` with a message suitable for the client on invalid
+    input.
+    """
+    first, last = parse_date_range_params(params)
+    group_by = params.get("group_by")
+    if group_by and group_by not in groups:
+        raise ValueError(f"Invalid group_by. Use {', '.join(groups)}")
+    try:
+        top = parse_int(params.get("top", "10"), maximum=1000)
+    except ValueError:
+        raise ValueError("top must be an integer up to 1000")
+    return first, last, group_by or None, top
+
+
+ANALYTICS_UNAVAILABLE = {"error": "Analytics require NumPy, which is not installed"}
+
+
+def snapshot_response(params, name: str):
+    """
+    The ``SNAPSHOT_TABLES[name]`` partition of ``?date=`` as a file download,
+    in the ``?output=`` format (parquet or arrow).
+
+    The file is built in a temporary file, one record batch per chunk of
+    rows, and streamed from there.
+    """
+    if not snapshot_available():
+        return Response(
+            {"error": "Snapshots require pyarrow, which is not installed"},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+    day = params.get("date")
+    output = params.get("output", "parquet")
+    if not day:
+        return Response(
+            {"error": "Date parameter is required"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        day = parse_date(day)
+    except ValueError:
+        return Response(
+            {"error": "Invalid date format. Use YYYY-MM-DD"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if output not in SNAPSHOT_FORMATS:
+        return Response(
+            {"error": "Invalid output. Use parquet or arrow"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    table = SNAPSHOT_TABLES[name]
+    extension, content_type = SNAPSHOT_FORMATS[output]
+    file = tempfile.TemporaryFile()
+    write_table(table, table.rows(day), file, output)
+    file.seek(0)
+    return FileResponse(
+        file,
+        as_attachment=True,
+        filename=f"{name}-{day.isoformat()}{extension}",
+        content_type=content_type,
+    )
+
+
+def parse_export_params(params) -> tuple[date, date, Optional[str], str]:
+    """
+    Read the filters shared by the export actions.
+
+    The days are read by ``parse_date_range_params``, ``airport`` optionally
+    restricts to one IATA code and ``output`` picks ``csv`` (default) or
+    ``ndjson``. Raises ``ValueError`` on invalid input.
+    """
+    output = params.get("output", "csv")
+    if output not in EXPORT_CONTENT_TYPES:
+        raise ValueError("Invalid output. Use csv or ndjson")
+    first, last = parse_date_range_params(params)
+    return first, last, params.get("airport"), output
+
+
+def flight_lookup_queryset(queryset, params):
+    """
+    Filter ``queryset`` to the flights matching a lookup by number and day.
+
+    Reads ``flight_number``, ``date`` and the optional airline IATA code
+    ``airline`` from query parameters. Raises ``ValueError`` with a message
+    suitable for the client on invalid input.
+    """
+    flight_number = params.get("flight_number")
+    day = params.get("date")
+    if not flight_number or not day:
+        raise ValueError("flight_number and date parameters are required")
+    try:
+        day = parse_date(day)
+    except ValueError:
+        raise ValueError("Invalid date format. Use YYYY-MM-DD")
+    flights = queryset.departing_between(day, day).filter(flight_number=flight_number)
+    if params.get("airline"):
+        flights = flights.filter(airline__iata_code=params["airline"])
+    return flights
+
+
+# Accepted values of ?ordering= on the flight list, "-" for descending
+FLIGHT_ORDERING_FIELDS = ("scheduled_departure", "scheduled_arrival", "flight_number")
+
+
+def flight_search_queryset(queryset, params):
+    """
+    Filter and order ``queryset`` as requested by flight search parameters.
+
+    - airline, departure_airport, arrival_airport: IATA codes
+    - date, or from and to: scheduled departure day(s), YYYY-MM-DD
+    - flight_number: prefix of the flight number
+    - delayed: "true" for flights leaving later than AGOA_ON_TIME_THRESHOLD
+    - ordering: comma-separated FLIGHT_ORDERING_FIELDS, "-" for descending
+
+    Codes are resolved to ids through the reference caches, so filters hit
+    the flight indexes without joins. Returns ``(queryset, ordering)``,
+    ``ordering`` being None when not requested. Raises ``ValueError`` with
+    a message suitable for the client on invalid input.
+    """
+    for param, model in (
+        ("airline", Airline),
+        ("departure_airport", Airport),
+        ("arrival_airport", Airport),
+    ):
+        code = params.get(param)
+        if code:
+            pk = reference_cache_for(model).id_for_code(code.upper())
+            if pk is None:
+                return queryset.none(), None
+            queryset = queryset.filter(**{f"{param}_id": pk})
+
+    if any(params.get(name) for name in ("date", "from", "to")):
+        first, last = parse_date_range_params(params)
+        queryset = queryset.departing_between(first, last)
+    if params.get("flight_number"):
+        queryset = queryset.numbered_from(params["flight_number"].upper())
+    delayed = params.get("delayed")
+    if delayed not in (None, "", "false", "0"):
+        if delayed not in ("true", "1"):
+            raise ValueError("Invalid delayed. Use true or false")
+        queryset = queryset.delayed(settings.AGOA_ON_TIME_THRESHOLD)
+
+    ordering = None
+    if params.get("ordering"):
+        ordering = [name.strip() for name in params["ordering"].split(",")]
+        if any(name.lstrip("-") not in FLIGHT_ORDERING_FIELDS for name in ordering):
+            raise ValueError(
+                f"Invalid ordering. Use {', '.join(FLIGHT_ORDERING_FIELDS)}, "
+                "with - for descending"
+            )
+        ordering = (*ordering, "id")
+        queryset = queryset.order_by(*ordering)
+    return queryset, ordering
+
+
+def average_duration_payload(day: date, group_by: Optional[str], stats: list) -> dict:
+    """Body of the average_duration response for non-empty ``stats``"""
+    if group_by:
+        return {"date": day, "group_by": group_by, "groups": stats}
+    return {
+        "date": day,
+        "average_duration_minutes": stats[0]["scheduled"]["average_minutes"],
+        **stats[0],
+    }
+
+
+def parse_changed_since(params) -> Optional[datetime]:
+    """
+    Read the ``changed_since`` query parameter as an aware datetime.
+
+    Raises ``ValueError`` with a message suitable for the client on invalid
+    input. Times without an offset are taken in the current time zone.
+    """
+    raw = params.get("changed_since")
+    if not raw:
+        return None
+    try:
+        moment = parse_datetime(raw)
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise ValueError(
+            "Invalid changed_since. Use an ISO 8601 time, e.g. 2024-03-20T08:00:00Z"
+        )
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_expand(params, serializer_class) -> frozenset[str]:
+    """
+    Read the ``expand`` query parameter for an expandable serializer.
+
+    Raises ``ValidationError`` when a name is not expandable.
+    """
+    raw = params.get("expand", "")
+    expand = frozenset(name.strip() for name in raw.split(",") if name.strip())
+    unknown = expand - serializer_class.expandable_names()
+    if unknown:
+        raise ValidationError(
+            {"expand": f"Unknown field(s): {', '.join(sorted(unknown))}"}
+        )
+    return expand
+
+
+class ReadReplicaMixin:
+    """
+    Serve safe requests from the read replicas.
+
+    GET, HEAD and OPTIONS requests are dispatched inside
+    ``read_from_replicas()``, so ``ReadReplicaRouter`` sends their queries to
+    ``AGOA_READ_DATABASES`` when there are any. Writes, and the reads they
+    make, stay on the default database.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+        with read_from_replicas():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ExpandMixin:
+    """
+    Support ``?expand=field,...`` on viewsets with an expandable serializer.
+
+    The requested fields are passed to the serializer context and the
+    matching ``select_related`` lookups are applied to the queryset, so a
+    page costs the same number of queries whatever its size.
+    """
+
+    def get_expand(self) -> frozenset[str]:
+        if not hasattr(self, "_expand"):
+            self._expand = parse_expand(
+                self.request.query_params, self.get_serializer_class()
+            )
+        return self._expand
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        paths = self.get_serializer_class().select_related_paths(self.get_expand())
+        return queryset.select_related(*paths) if paths else queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["expand"] = self.get_expand()
+        return context
+
+
+class RowSerializerMixin:
+    """
+    Serve read-only collections from ``values()`` rows.
+
+    Unless fields are expanded, lists (paginated or not) are fetched with
+    ``values()`` and rendered by the ``RowSerializer`` compiled from the
+    view's serializer, with the same output, and the response is left to
+    ``FastJSONRenderer``. ``serialize_many`` does the same for actions
+    returning a queryset, and ``list_response`` for a list already filtered.
+    """
+
+    fast_rendering = False
+
+    def get_row_serializer(self) -> Optional[RowSerializer]:
+        if self.get_expand():
+            return None
+        return RowSerializer.for_serializer(self.get_serializer_class())
+
+    def serialize_many(self, queryset) -> list:
+        """Representation of every row of ``queryset``"""
+        row_serializer = self.get_row_serializer()
+        if row_serializer is None:
+            return self.get_serializer(queryset, many=True).data
+        self.fast_rendering = True
+        return row_serializer.to_representation(
+            row_serializer.values(queryset), using=queryset.db
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.list_response(self.filter_queryset(self.get_queryset()))
+
+    def list_response(self, queryset) -> Response:
+        """The list response for ``queryset``, paginated if requested"""
+        row_serializer = self.get_row_serializer()
+        if row_serializer is None:
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data)
+            return Response(self.get_serializer(queryset, many=True).data)
+        keep = ()
+        if self.paginator is not None and self.paginator.is_requested(self.request):
+            # Cursor pagination reads its position from dicts as from instances
+            keep = [name.lstrip("-") for name in self.pagination_ordering]
+        rows = row_serializer.values(queryset, keep)
+        page = self.paginate_queryset(rows)
+        self.fast_rendering = True
+        data = row_serializer.to_representation(
+            rows if page is None else page, using=queryset.db
+        )
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+
+class ReferenceCacheMixin:
+    """
+    Serve list and retrieve responses from the model's ReferenceCache.
+
+    Serialized data is cached per request path (query string included) and
+    model version. Responses carry an ETag and a Last-Modified header, and
+    matching conditional requests get a 304 without touching the database.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(request, super().retrieve, *args, **kwargs)
+
+    def _cached_response(self, request, view, *args, **kwargs):
+        reference_cache = reference_cache_for(self.queryset.model)
+        version, modified = reference_cache.version()
+        path = request.get_full_path()
+        etag = '"{}"'.format(hashlib.md5(f"{version}:{path}".encode()).hexdigest())
+        last_modified = int(modified)
+
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if not_modified is not None:
+            response = Response(status=not_modified.status_code)
+        else:
+            data = reference_cache.get_or_set(
+                ("response", path), lambda: view(request, *args, **kwargs).data
+            )
+            response = Response(data)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        return response
+
+
+class DeltaSyncMixin:
+    """
+    Conditional GET and delta sync for flight and turnaround collections.
+
+    Collection responses carry an ETag and a Last-Modified header derived
+    from the row count and latest ``updated_at`` of the requested rows and
+    from the latest deletion, so a client whose copy is current gets a 304
+    after two aggregate queries, without anything being serialized.
+
+    With ``?changed_since=<ISO 8601 time>`` only the rows updated since then
+    are returned, with the ids deleted since then::
+
+        {"changed_since": ..., "until": ..., "results": [...], "deleted": [...]}
+
+    ``deleted`` holds every row of the model deleted since then (from
+    ``Tombstone``, which does not know which filters a row matched), and the
+    rows whose ``Tombstone.FILTER_FIELDS`` changed since then and which no
+    longer match the request's filters: clients ignore the ids they do not
+    hold. Rows leaving ``?delayed=`` as time passes are not tracked; clients
+    filtering on it reload fully. The next sync passes ``until`` back as
+    ``changed_since``. Rows updated up to ``AGOA_SYNC_OVERLAP`` before
+    ``changed_since`` are sent again, so that writes committed late are not
+    missed. Times older than ``AGOA_TOMBSTONE_RETENTION`` get a 410: the
+    client must reload fully.
+
+    Both the full list and the changed rows are rendered by
+    ``list_response`` (see RowSerializerMixin), so ``?page_size=`` and
+    ``?cursor=`` page them too; changed rows are paged by
+    (``updated_at``, ``id``). Every page repeats ``deleted``, and the next
+    sync passes back the ``until`` of the first page.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.collection_response(
+            request, self.filter_queryset(self.get_queryset())
+        )
+
+    def collection_response(self, request, queryset):
+        """Answer for ``queryset``, a filtered ``get_queryset()``"""
+        until = timezone.now()
+        try:
+            since = parse_changed_since(request.query_params)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if since is not None and since < until - settings.AGOA_TOMBSTONE_RETENTION:
+            return Response(
+                {
+                    "error": "changed_since is older than the deletion history. "
+                    "Reload the collection without it"
+                },
+                status=status.HTTP_410_GONE,
+            )
+
+        tombstones = Tombstone.objects.filter(model=queryset.model._meta.model_name)
+        filtered = queryset
+        if since is not None:
+            start = since - settings.AGOA_SYNC_OVERLAP
+            queryset = queryset.filter(updated_at__gte=start)
+            tombstones = tombstones.filter(deleted_at__gte=start)
+        aggregates = [
+            queryset.aggregate(count=Count("pk"), last=Max("updated_at")),
+            tombstones.aggregate(count=Count("pk"), last=Max("deleted_at")),
+        ]
+
+        path = request.get_full_path()
+        version = ":".join(f"{row['count']}:{row['last']}" for row in aggregates)
+        etag = '"{}"'.format(hashlib.md5(f"{version}:{path}".encode()).hexdigest())
+        last_change = max(
+            filter(None, (row["last"] for row in aggregates)), default=None
+        )
+        last_modified = int(last_change.timestamp()) if last_change else None
+
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if not_modified is not None:
+            response = Response(status=not_modified.status_code)
+        elif since is None:
+            response = self.list_response(queryset)
+        else:
+            self.pagination_ordering = ("updated_at", "id")
+            listed = self.list_response(queryset.order_by("updated_at", "id")).data
+            if not isinstance(listed, dict):
+                listed = {"results": listed}
+            response = Response(
+                {
+                    "changed_since": since,
+                    "until": until,
+                    **listed,
+                    "deleted": list(
+                        dict.fromkeys(
+                            tombstones.filter(
+                                # Moved rows still matching were sent in results
+                                Q(moved=False)
+                                | ~Q(object_id__in=filtered.values("pk"))
+                            )
+                            .order_by("deleted_at")
+                            .values_list("object_id", flat=True)
+                        )
+                    ),
+                }
+            )
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        return response
 
 
 @extend_schema_view(
@@ -25,7 +549,7 @@ from rest_framework.renderers import JSONRenderer
     update=extend_schema(description="Update an airline"),
     destroy=extend_schema(description="Delete an airline"),
 )
-class AirlineViewSet(viewsets.ModelViewSet):
+class AirlineViewSet(ReadReplicaMixin, ReferenceCacheMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing airlines.
 
@@ -36,6 +560,9 @@ class AirlineViewSet(viewsets.ModelViewSet):
     - PUT /api/airlines/{id}/ : Update an airline
     - DELETE /api/airlines/{id}/ : Delete an airline
 
+    List and retrieve responses are cached until airlines change, and carry
+    ETag/Last-Modified headers for conditional requests.
+
     Required fields:
     - name: Full name of the airline
     - iata_code: 2-letter IATA code (unique)
@@ -43,7 +570,8 @@ class AirlineViewSet(viewsets.ModelViewSet):
 
     queryset = Airline.objects.all()
     serializer_class = AirlineSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, HasTokenScope]
+    pagination_ordering = ("id",)
 
 
 @extend_schema_view(
@@ -53,7 +581,7 @@ class AirlineViewSet(viewsets.ModelViewSet):
     update=extend_schema(description="Update an airport"),
     destroy=extend_schema(description="Delete an airport"),
 )
-class AirportViewSet(viewsets.ModelViewSet):
+class AirportViewSet(ReadReplicaMixin, ReferenceCacheMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing airports.
 
@@ -64,6 +592,13 @@ class AirportViewSet(viewsets.ModelViewSet):
     - PUT /api/airports/{id}/ : Update an airport
     - DELETE /api/airports/{id}/ : Delete an airport
 
+    List and retrieve responses are cached until airports change, and carry
+    ETag/Last-Modified headers for conditional requests.
+
+    Additional endpoints:
+    - GET /api/airports/{id}/occupancy/?date=YYYY-MM-DD&resolution=60
+      Aircraft on the ground per time bucket, and the peak of the day
+
     Required fields:
     - name: Full name of the airport
     - iata_code: 3-letter IATA code (unique)
@@ -73,7 +608,90 @@ class AirportViewSet(viewsets.ModelViewSet):
 
     queryset = Airport.objects.all()
     serializer_class = AirportSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, HasTokenScope]
+    pagination_ordering = ("id",)
+
+    @extend_schema(description="Aircraft on the ground at an airport over a day")
+    @action(detail=True, methods=["get"])
+    def occupancy(self, request, pk=None):
+        """
+        Count the turnarounds in progress at the airport over a day.
+
+        Counts come from an interval index of the airport's turnarounds for
+        the day, cached and kept up to date as turnarounds change. A
+        turnaround occupies the airport from its start (included) to its
+        end (excluded), and counts on every day it overlaps.
+
+        Query parameters:
+        - date: Date in YYYY-MM-DD format
+        - resolution: Optional bucket size in minutes (default 60)
+        - kind: Optional, "scheduled" (default) or "actual" times
+
+        Returns:
+        - peak: Highest number of aircraft on the ground, and when it is
+          first reached
+        - buckets: For each bucket, its start, the peak count and the time
+          weighted average count
+        """
+        airport = self.get_object()
+        day = request.query_params.get("date")
+        kind = request.query_params.get("kind", "scheduled")
+        resolution = request.query_params.get(
+            "resolution",
+            str(int(settings.AGOA_OCCUPANCY_RESOLUTION.total_seconds() // 60)),
+        )
+
+        if not day:
+            return Response(
+                {"error": "Date parameter is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            day = parse_date(day)
+        except ValueError:
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if kind not in OCCUPANCY_KINDS:
+            return Response(
+                {"error": "Invalid kind. Use scheduled or actual"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            resolution = parse_int(resolution, minimum=1, maximum=24 * 60)
+        except ValueError:
+            return Response(
+                {"error": "resolution must be a number of minutes up to 1440"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        occupancy = occupancy_cache.get(airport.id, day)
+        index = occupancy.indexes[kind]
+        peak, peak_at = index.peak(occupancy.start, occupancy.end)
+        buckets = index.timeline(
+            occupancy.start, occupancy.end, timedelta(minutes=resolution)
+        )
+        return Response(
+            {
+                "airport": airport.iata_code,
+                "date": day,
+                "kind": kind,
+                "resolution_minutes": int(resolution),
+                "peak": {
+                    "count": peak,
+                    "at": peak_at and timezone.localtime(peak_at),
+                },
+                "buckets": [
+                    {
+                        "start": timezone.localtime(bucket.start),
+                        "peak": bucket.peak,
+                        "average": round(bucket.average, 3),
+                    }
+                    for bucket in buckets
+                ],
+            }
+        )
 
 
 @extend_schema_view(
@@ -83,7 +701,13 @@ class AirportViewSet(viewsets.ModelViewSet):
     update=extend_schema(description="Update a flight"),
     destroy=extend_schema(description="Delete a flight"),
 )
-class FlightViewSet(viewsets.ModelViewSet):
+class FlightViewSet(
+    ReadReplicaMixin,
+    DeltaSyncMixin,
+    RowSerializerMixin,
+    ExpandMixin,
+    viewsets.ModelViewSet,
+):
     """
     API endpoint for managing flights.
 
@@ -94,6 +718,41 @@ class FlightViewSet(viewsets.ModelViewSet):
     - PUT /api/flights/{id}/ : Update a flight
     - DELETE /api/flights/{id}/ : Delete a flight
 
+    Additional endpoints:
+    - POST /api/flights/bulk/ : Upsert a schedule given as a JSON array or
+      as NDJSON (application/x-ndjson)
+    - GET /api/flights/export/?date=YYYY-MM-DD&airport=XXX&output=csv
+      Stream flights as CSV or NDJSON (see export)
+    - GET /api/flights/lookup/?flight_number=AF001&date=YYYY-MM-DD
+      Get the flight with a given number departing on a given day
+    - POST /api/flights/events/ : Ingest ETD/ETA/ATD/ATA status events,
+      as a JSON array or as NDJSON (see events)
+    - GET /api/flights/analytics/?from=YYYY-MM-DD&to=YYYY-MM-DD&group_by=airline
+      Delay distributions and longest flights of a date range
+    - GET /api/flights/snapshot/?date=YYYY-MM-DD&output=parquet
+      Download a day of flights as a Parquet or Arrow IPC file
+
+    Search (see flight_search_queryset), each filter served by an index:
+    - GET /api/flights/?departure_airport=CDG&arrival_airport=JFK&from=...&to=...
+    - ?airline=AF, ?flight_number=AF1 (prefix), ?delayed=true
+    - ?ordering=-scheduled_departure (scheduled_departure, scheduled_arrival
+      or flight_number)
+
+    Nested representations (opt-in):
+    - GET /api/flights/?expand=airline,departure_airport,arrival_airport
+      Render the listed foreign keys as nested objects instead of ids
+
+    Pagination (opt-in):
+    - GET /api/flights/?page_size=N : First page, ordered by
+      (scheduled_departure, id)
+    - GET /api/flights/?cursor=... : Page following the one that returned
+      the cursor
+
+    Refreshes (see DeltaSyncMixin):
+    - Responses carry an ETag; unchanged collections get a 304
+    - GET /api/flights/?changed_since=2024-03-20T08:00:00Z : Only the
+      flights updated since then, and the ids of those deleted
+
     Required fields:
     - flight_number: Unique identifier for the flight
     - airline: Reference to airline performing the flight
@@ -107,9 +766,256 @@ class FlightViewSet(viewsets.ModelViewSet):
     - actual_arrival: Actual arrival time
     """
 
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, HasTokenScope]
     queryset = Flight.objects.all()
     serializer_class = FlightSerializer
+    pagination_ordering = ("scheduled_departure", "id")
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action != "list":
+            return queryset
+        try:
+            queryset, ordering = flight_search_queryset(
+                queryset, self.request.query_params
+            )
+        except ValueError as exc:
+            raise ValidationError({"error": str(exc)})
+        if ordering is not None:
+            # Cursor pages follow the requested order
+            self.pagination_ordering = ordering
+        return queryset
+
+    @extend_schema(description="Upsert flights in batches from a schedule upload")
+    @action(detail=False, methods=["post"], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """
+        Create or update many flights in one call.
+
+        Each row uses IATA codes for the airline and airports:
+        {"flight_number": "AF001", "airline": "AF", "departure_airport": "CDG",
+         "arrival_airport": "JFK", "scheduled_departure": "...",
+         "scheduled_arrival": "...", "actual_departure": null,
+         "actual_arrival": null}
+
+        Rows matching an existing (flight_number, airline, scheduled_departure)
+        update that flight. Invalid rows are skipped and reported.
+
+        Returns:
+        - received: Number of rows read
+        - upserted: Number of flights created or updated
+        - failed: Number of rejected rows
+        - errors: List of {"row": index, "errors": {...}}
+        """
+        rows = request.data
+        # Strings are iterable too, but a bare string is not a list of rows
+        if isinstance(rows, (dict, str)) or not hasattr(rows, "__iter__"):
+            return Response(
+                {"error": "Expected a JSON array or NDJSON body"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(upsert_flights(rows).as_dict())
+
+    @extend_schema(description="Ingest a stream of flight status events")
+    @action(detail=False, methods=["post"], parser_classes=[JSONParser, NDJSONParser])
+    def events(self, request):
+        """
+        Record estimated and actual times for many flights.
+
+        Each event is {"flight": id, "event": "ETD" | "ETA" | "ATD" | "ATA",
+        "time": "..."}; a null time clears the value. Events for the same
+        flight and type within AGOA_STATUS_EVENT_WINDOW are coalesced and
+        written together, then actual times are copied to the turnarounds
+        and delays propagated down the aircraft rotation. Events for unknown
+        flights are ignored when applied.
+
+        Returns (202 Accepted, before the events are written):
+        - received: Number of events read
+        - queued: Number of valid events queued; they are written within
+          AGOA_STATUS_EVENT_WINDOW, and failures to write them are counted
+          in the metrics (agoa_status_flush_failures_total)
+        - failed: Number of rejected events
+        - errors: List of {"row": index, "errors": {...}}
+        """
+        rows = request.data
+        # Strings are iterable too, but a bare string is not a list of rows
+        if isinstance(rows, (dict, str)) or not hasattr(rows, "__iter__"):
+            return Response(
+                {"error": "Expected a JSON array or NDJSON body"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        result = ingest_status_events(rows)
+        return Response(result.as_dict(), status=status.HTTP_202_ACCEPTED)
+
+    @extend_schema(description="Find a flight by number and departure date")
+    @action(detail=False, methods=["get"])
+    def lookup(self, request):
+        """
+        Get the flight with a given number departing on a given day.
+
+        Query parameters:
+        - flight_number: Flight number, e.g. AF001
+        - date: Departure date in YYYY-MM-DD format
+        - airline: Optional IATA code, needed if several airlines use the
+          same number that day
+        """
+        try:
+            flights = flight_lookup_queryset(self.get_queryset(), request.query_params)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            flight = flights.get()
+        except Flight.DoesNotExist:
+            return Response(
+                {"error": "Flight not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        except Flight.MultipleObjectsReturned:
+            return Response(
+                {"error": "Several flights match. Pass the airline parameter"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(self.get_serializer(flight).data)
+
+    @extend_schema(description="Knock-on delays of delaying a flight")
+    @action(detail=True, methods=["get"])
+    def delay_impact(self, request, pk=None):
+        """
+        Simulate delaying this flight and follow the delay down its rotation.
+
+        Query parameters:
+        - minutes: Delay of the flight, a positive number of minutes
+
+        Each next flight of the aircraft can leave no earlier than
+        AGOA_MIN_GROUND_TIME after the previous one lands, so it is delayed
+        by whatever that pushes it past its current best departure time.
+        Nothing is saved.
+
+        Returns:
+        - flight: The delayed flight's id
+        - delay_minutes: The delay simulated
+        - flights: Every delayed flight, with its delay and new times
+        - turnarounds: Every turnaround whose start or end moves
+        """
+        try:
+            minutes = float(request.query_params.get("minutes", ""))
+        except ValueError:
+            minutes = 0
+        if not 0 < minutes <= 7 * 24 * 60:
+            return Response(
+                {"error": "minutes must be a positive number of minutes"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        flight = self.get_object()
+        day = timezone.localdate(flight.scheduled_departure)
+        simulation = rotation_cache.simulate(
+            day, {flight.pk: timedelta(minutes=minutes)}
+        )
+        return Response(
+            {
+                "flight": flight.pk,
+                "delay_minutes": minutes,
+                **simulation_payload(simulation),
+            }
+        )
+
+    @extend_schema(description="Delay distributions of flights over a date range")
+    @action(detail=False, methods=["get"])
+    def analytics(self, request):
+        """
+        Summarise the delays and durations of the flights departing in a range.
+
+        Every flight of the range is read into NumPy arrays in one query and
+        summarised with array operations (see agoa.analytics), so ranges of
+        millions of flights answer in seconds. Delays are actual minus
+        scheduled times over the flights with actual times.
+
+        Query parameters:
+        - date: Date in YYYY-MM-DD format, or
+        - from, to: Inclusive date range in YYYY-MM-DD format
+        - group_by: Optional, "airline", "departure_airport" or
+          "arrival_airport"
+        - top: Number of longest flights to list (default 10)
+
+        Returns:
+        - count: Number of flights
+        - departure_delay, arrival_delay: count, average_minutes and
+          p50/p90/p99_minutes
+        - on_time_departure_rate: Share of departures within the on-time
+          threshold (AGOA_ON_TIME_THRESHOLD)
+        - departure_delay_histogram: Flights per delay bucket
+        - longest_flights: The longest flights, actual block time if known
+        - groups: With group_by, the delays and on-time rate of each group
+
+        Answers 501 when NumPy is not installed.
+        """
+        if not analytics_available():
+            return Response(
+                ANALYTICS_UNAVAILABLE, status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+        try:
+            first, last, group_by, top = parse_analytics_params(
+                request.query_params, FLIGHT_GROUPS
+            )
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            {"from": first, "to": last, **flight_analytics(first, last, group_by, top)}
+        )
+
+    @extend_schema(description="A day of flights as a Parquet or Arrow file")
+    @action(detail=False, methods=["get"])
+    def snapshot(self, request):
+        """
+        Download the flights departing on a day as a columnar file, with the
+        columns and types of the `manage.py snapshot` partitions.
+
+        Query parameters:
+        - date: Date in YYYY-MM-DD format
+        - output: parquet (default) or arrow (Arrow IPC file)
+
+        Answers 501 when pyarrow is not installed.
+        """
+        return snapshot_response(request.query_params, "flights")
+
+    @extend_schema(description="Stream flights as CSV or NDJSON")
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """
+        Stream every flight of a day or date range.
+
+        Query parameters:
+        - date: Date in YYYY-MM-DD format, or
+        - from, to: Inclusive date range in YYYY-MM-DD format
+        - airport: Optional IATA code; keeps flights leaving or landing there
+        - output: csv (default) or ndjson
+
+        Days are matched on scheduled departure, or on scheduled arrival for
+        flights landing at the requested airport.
+        """
+        try:
+            first, last, airport_code, output = parse_export_params(
+                request.query_params
+            )
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if airport_code:
+            airport_id = (
+                Airport.objects.filter(iata_code=airport_code)
+                .values_list("id", flat=True)
+                .first()
+            )
+            flights = Flight.objects.serving_between(airport_id, first, last)
+        else:
+            flights = Flight.objects.departing_between(first, last)
+
+        return stream_export(flights, FLIGHT_EXPORT_COLUMNS, output, "flights")
 
 
 @extend_schema_view(
@@ -117,7 +1023,13 @@ class FlightViewSet(viewsets.ModelViewSet):
     retrieve=extend_schema(description="Retrieve a specific turnaround"),
     create=extend_schema(description="Create a new turnaround"),
 )
-class TurnaroundViewSet(viewsets.ModelViewSet):
+class TurnaroundViewSet(
+    ReadReplicaMixin,
+    DeltaSyncMixin,
+    RowSerializerMixin,
+    ExpandMixin,
+    viewsets.ModelViewSet,
+):
     """
     API endpoint for managing turnarounds (ground operations between flights).
 
@@ -126,12 +1038,50 @@ class TurnaroundViewSet(viewsets.ModelViewSet):
     - POST /api/turnarounds/ : Create a new turnaround
     - GET /api/turnarounds/{id}/ : Retrieve a specific turnaround
 
+    Nested representations (opt-in):
+    - GET /api/turnarounds/?expand=arrival_flight,departure_flight,airport,airline
+      Render the listed foreign keys as nested objects instead of ids;
+      flight fields (airline, departure_airport, arrival_airport) apply to
+      the nested flights
+
+    Pagination (opt-in):
+    - GET /api/turnarounds/?page_size=N : First page, ordered by
+      (scheduled_start, id)
+    - GET /api/turnarounds/?cursor=... : Page following the one that returned
+      the cursor
+
+    Refreshes (see DeltaSyncMixin), on the list and by_date_and_airport:
+    - Responses carry an ETag; unchanged collections get a 304
+    - ?changed_since=2024-03-20T08:00:00Z : Only the turnarounds updated
+      since then, and the ids of those deleted
+
     Additional endpoints:
     - GET /api/turnarounds/by_date_and_airport/?date=YYYY-MM-DD&airport=XXX
       Get all turnarounds for a specific date and airport
 
-    - GET /api/turnarounds/average_duration/?date=YYYY-MM-DD
-      Get average turnaround duration for a specific date
+    - GET /api/turnarounds/average_duration/?date=YYYY-MM-DD&group_by=airport
+      Get turnaround duration statistics for a specific date
+
+    - GET /api/turnarounds/punctuality/?from=YYYY-MM-DD&to=YYYY-MM-DD
+      Get delay and punctuality figures for a date range
+
+    - GET /api/turnarounds/punctuality_ranking/?from=YYYY-MM-DD&to=YYYY-MM-DD&top=N
+      Rank airline and airport pairs by turnaround punctuality
+
+    - GET /api/turnarounds/analytics/?from=YYYY-MM-DD&to=YYYY-MM-DD&group_by=airport
+      Turnaround duration distributions computed from the turnarounds
+
+    - GET /api/turnarounds/snapshot/?date=YYYY-MM-DD&output=parquet
+      Download a day of turnarounds as a Parquet or Arrow IPC file
+
+    - POST /api/turnarounds/match/
+      Create turnarounds by pairing arrivals with departures (see match)
+
+    - GET /api/turnarounds/export/?date=YYYY-MM-DD&airport=XXX&output=csv
+      Stream turnarounds as CSV or NDJSON
+
+    - GET /api/turnarounds/validate/?date=YYYY-MM-DD&airport=XXX
+      Report turnarounds breaking consistency rules (see validate)
 
     Required fields:
     - arrival_flight: Reference to the arriving flight
@@ -147,10 +1097,11 @@ class TurnaroundViewSet(viewsets.ModelViewSet):
     Note: Only GET and POST methods are allowed (no updates or deletions)
     """
 
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, HasTokenScope]
     queryset = Turnaround.objects.all()
     serializer_class = TurnaroundSerializer
     http_method_names = ["get", "post"]
+    pagination_ordering = ("scheduled_start", "id")
 
     @action(detail=False, methods=["get"])
     def by_date_and_airport(self, request):
@@ -160,6 +1111,8 @@ class TurnaroundViewSet(viewsets.ModelViewSet):
         Query parameters:
         - date: Date in YYYY-MM-DD format
         - airport: IATA code of the airport
+        - expand: Optional comma-separated fields to render nested
+        - changed_since: Optional time of the last sync (see DeltaSyncMixin)
 
         Returns:
         - List of turnarounds matching the criteria
@@ -181,25 +1134,203 @@ class TurnaroundViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        turnarounds = Turnaround.objects.filter(
-            scheduled_start__date=date, airport__iata_code=airport_code
-        ).select_related("arrival_flight", "departure_flight")
+        turnarounds = self.get_queryset().scheduled_on(date).at_airport(airport_code)
 
-        return Response(self.serializer_class(turnarounds, many=True).data)
+        return self.collection_response(request, turnarounds)
+
+    @extend_schema(
+        request=TurnaroundMatchSerializer,
+        description="Pair arrivals with departures of one airport and day",
+    )
+    @action(detail=False, methods=["post"])
+    def match(self, request):
+        """
+        Create turnarounds by pairing each arrival with the next departure.
+
+        Body:
+        - date: Day of the arrivals, YYYY-MM-DD
+        - airport: IATA code of the airport
+        - same_airline: Only pair flights of the same airline (default true)
+        - min_ground_minutes, max_ground_minutes: Allowed ground time,
+          defaulting to AGOA_MIN_GROUND_TIME and AGOA_MAX_GROUND_TIME
+        - dry_run: Return the pairs without saving them (default false)
+
+        Flights that already belong to a turnaround are not re-paired.
+
+        Returns:
+        - matched: Number of turnarounds
+        - turnarounds: The turnarounds created (or proposed)
+        """
+        params = TurnaroundMatchSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+
+        rules = {"same_airline": data["same_airline"]}
+        if "min_ground_minutes" in data:
+            rules["min_ground_time"] = timedelta(minutes=data["min_ground_minutes"])
+        if "max_ground_minutes" in data:
+            rules["max_ground_time"] = timedelta(minutes=data["max_ground_minutes"])
+
+        turnarounds = match_turnarounds(
+            data["date"],
+            data["airport"].id,
+            MatchingRules(**rules),
+            dry_run=data["dry_run"],
+        )
+        return Response(
+            {
+                "matched": len(turnarounds),
+                "turnarounds": self.get_serializer(turnarounds, many=True).data,
+            },
+            status=status.HTTP_200_OK if data["dry_run"] else status.HTTP_201_CREATED,
+        )
+
+    @extend_schema(description="Stream turnarounds as CSV or NDJSON")
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """
+        Stream every turnaround scheduled to start on a day or date range.
+
+        Query parameters:
+        - date: Date in YYYY-MM-DD format, or
+        - from, to: Inclusive date range in YYYY-MM-DD format
+        - airport: Optional IATA code of the airport
+        - output: csv (default) or ndjson
+        """
+        try:
+            first, last, airport_code, output = parse_export_params(
+                request.query_params
+            )
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        turnarounds = Turnaround.objects.scheduled_between(first, last)
+        if airport_code:
+            turnarounds = turnarounds.at_airport(airport_code)
+
+        return stream_export(
+            turnarounds, TURNAROUND_EXPORT_COLUMNS, output, "turnarounds"
+        )
+
+    @extend_schema(description="A day of turnarounds as a Parquet or Arrow file")
+    @action(detail=False, methods=["get"])
+    def snapshot(self, request):
+        """
+        Download the turnarounds starting on a day as a columnar file, with
+        the columns and types of the `manage.py snapshot` partitions.
+
+        Query parameters:
+        - date: Date in YYYY-MM-DD format
+        - output: parquet (default) or arrow (Arrow IPC file)
+
+        Answers 501 when pyarrow is not installed.
+        """
+        return snapshot_response(request.query_params, "turnarounds")
+
+    @extend_schema(description="Report turnarounds breaking consistency rules")
+    @action(detail=False, methods=["get"])
+    def validate(self, request):
+        """
+        Check the turnarounds of a day, a date range or an imported batch.
+
+        Rules (see agoa.validation.VALIDATION_RULES):
+        - time_order: arrival after departure, or end before start
+        - min_connection: ground time below the minimum connection time
+        - airport_mismatch: flights not using the turnaround's airport
+        - rotation_overlap: starts before the aircraft's previous turnaround
+          ends
+
+        Query parameters:
+        - date: Date in YYYY-MM-DD format, or
+        - from, to: Inclusive date range in YYYY-MM-DD format, or
+        - flights: Comma-separated flight ids; checks the turnarounds using
+          them, e.g. after a bulk upload
+        - airport: Optional IATA code of the airport
+        - rules: Optional comma-separated rules to check (default all)
+        - min_ground_minutes: Optional minimum connection time, defaulting
+          to AGOA_MIN_GROUND_TIME
+
+        Returns:
+        - checked: Number of turnarounds checked
+        - valid: Whether no rule is broken
+        - counts: Number of violations per rule
+        - violations: List of {rule, turnaround, airport, arrival_flight,
+          departure_flight, detail}
+        """
+        params = request.query_params
+        flights = params.get("flights")
+        if flights:
+            try:
+                ids = [parse_int(value, maximum=MAX_ID) for value in flights.split(",")]
+            except ValueError:
+                return Response(
+                    {"error": "flights must be comma-separated ids"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            turnarounds = Turnaround.objects.filter(
+                Q(arrival_flight_id__in=ids) | Q(departure_flight_id__in=ids)
+            )
+        else:
+            try:
+                first, last = parse_date_range_params(params)
+            except ValueError as exc:
+                return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            turnarounds = Turnaround.objects.scheduled_between(first, last)
+        if params.get("airport"):
+            turnarounds = turnarounds.at_airport(params["airport"])
+
+        rules = None
+        if params.get("rules"):
+            rules = [rule.strip() for rule in params["rules"].split(",")]
+            unknown = set(rules) - set(VALIDATION_RULES)
+            if unknown:
+                return Response(
+                    {"error": f"Unknown rule(s): {', '.join(sorted(unknown))}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        min_ground_time = None
+        if params.get("min_ground_minutes"):
+            try:
+                minutes = parse_int(params["min_ground_minutes"], maximum=24 * 60)
+            except ValueError:
+                return Response(
+                    {"error": "min_ground_minutes must be a number up to 1440"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            min_ground_time = timedelta(minutes=minutes)
+
+        report = validate_turnarounds(turnarounds, rules, min_ground_time)
+        return Response(report.as_dict())
 
     @action(detail=False, methods=["get"])
     def average_duration(self, request):
         """
-        Calculate average turnaround duration for a specific date.
+        Calculate turnaround duration statistics for a specific date.
+
+        Durations are measured from the turnaround's own start and end
+        times, scheduled and actual. Averages and counts are read from the
+        daily statistics rollup, or computed from the turnarounds when the
+        day has no rollup rows (e.g. after loaddata). Percentiles cannot be
+        rolled up; they are computed from the turnarounds in a single SQL
+        query unless ``percentiles=false``.
 
         Query parameters:
         - date: Date in YYYY-MM-DD format
+        - group_by: Optional, "airport" or "airline" (of the arrival flight)
+        - percentiles: Optional, "false" to leave p50/p90/p99 null and only
+          read the rollup
 
         Returns:
         - date: The requested date
-        - average_duration_minutes: Average duration in minutes
+        - average_duration_minutes: Average scheduled duration in minutes
+        - count: Number of turnarounds
+        - scheduled: average_minutes, p50_minutes, p90_minutes, p99_minutes
+        - actual: The same for turnarounds with actual times, plus their count
+        With group_by, the figures are returned per group under "groups".
         """
         date = request.query_params.get("date")
+        group_by = request.query_params.get("group_by")
 
         if not date:
             return Response(
@@ -215,21 +1346,150 @@ class TurnaroundViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Calculate average duration
-        avg_duration = Turnaround.objects.filter(scheduled_start__date=date).aggregate(
-            avg_duration=Avg("departure_flight__scheduled_departure")
-            - Avg("arrival_flight__scheduled_departure")
-        )["avg_duration"]
+        if group_by and group_by not in DURATION_GROUPS:
+            return Response(
+                {"error": "Invalid group_by. Use airport or airline"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        if avg_duration is None:
+        stats = rollup_duration_averages(date, date, group_by)
+
+        if not stats:
             return Response(
                 {"error": "No turnarounds found for this date"},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
+        if request.query_params.get("percentiles") not in ("0", "false"):
+            live = turnaround_duration_stats(
+                Turnaround.objects.scheduled_on(date), group_by
+            )
+            stats = merge_percentiles(stats, live, group_by)
+
+        return Response(average_duration_payload(date, group_by, stats))
+
+    @extend_schema(description="Turnaround punctuality over a date range")
+    @action(detail=False, methods=["get"])
+    def punctuality(self, request):
+        """
+        Report arrival/departure delays and turnaround duration deviation.
+
+        Figures are read from the daily statistics rollup, so the cost
+        depends on the number of days, not on the number of turnarounds.
+        A range without rollup rows (e.g. after loaddata) is computed from
+        the turnarounds instead.
+
+        Query parameters:
+        - date: Date in YYYY-MM-DD format, or
+        - from, to: Inclusive date range in YYYY-MM-DD format
+        - group_by: Optional, "airport" or "airline" (of the arrival flight)
+
+        Returns, overall or per group under "groups":
+        - count: Number of turnarounds
+        - average_arrival_delay_minutes: Mean delay of the arrival flights
+        - average_departure_delay_minutes: Mean delay of the departure flights
+        - on_time_departure_rate: Share of departures within the on-time
+          threshold (AGOA_ON_TIME_THRESHOLD)
+        - average_duration_deviation_minutes: Mean |actual - scheduled|
+          turnaround duration
+        """
+        group_by = request.query_params.get("group_by")
+        try:
+            first, last = parse_date_range_params(request.query_params)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if group_by and group_by not in ROLLUP_GROUPS:
+            return Response(
+                {"error": "Invalid group_by. Use airport or airline"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        stats = rollup_punctuality(first, last, group_by)
+        if group_by:
+            return Response(
+                {"from": first, "to": last, "group_by": group_by, "groups": stats}
+            )
+        if not stats:
+            return Response(
+                {"error": "No turnarounds found for this period"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response({"from": first, "to": last, **stats[0]})
+
+    @extend_schema(description="Turnaround duration distributions over a range")
+    @action(detail=False, methods=["get"])
+    def analytics(self, request):
+        """
+        Summarise the durations of the turnarounds starting in a range.
+
+        Unlike punctuality, figures are computed from the turnarounds
+        themselves, in NumPy arrays (see agoa.analytics), and include
+        percentiles.
+
+        Query parameters:
+        - date: Date in YYYY-MM-DD format, or
+        - from, to: Inclusive date range in YYYY-MM-DD format
+        - group_by: Optional, "airport" or "airline" (of the arrival flight)
+
+        Returns, overall and per group under "groups":
+        - count: Number of turnarounds
+        - scheduled_duration, actual_duration, duration_delta (actual -
+          scheduled): count, average_minutes and p50/p90/p99_minutes
+
+        Answers 501 when NumPy is not installed.
+        """
+        if not analytics_available():
+            return Response(
+                ANALYTICS_UNAVAILABLE, status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+        try:
+            first, last, group_by, _ = parse_analytics_params(
+                request.query_params, TURNAROUND_GROUPS
+            )
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            {"from": first, "to": last, **turnaround_analytics(first, last, group_by)}
+        )
+
+    @extend_schema(description="Rank airline/airport pairs by punctuality")
+    @action(detail=False, methods=["get"])
+    def punctuality_ranking(self, request):
+        """
+        Rank (airline, airport) pairs by turnaround punctuality.
+
+        Punctuality is the mean difference between actual and scheduled
+        turnaround duration (lower is better), as in the notebook's
+        exercise 2 query 5. Ties share a rank.
+
+        Query parameters:
+        - date: Date in YYYY-MM-DD format, or
+        - from, to: Inclusive date range in YYYY-MM-DD format
+        - top: Number of pairs to return (default 10)
+
+        Returns:
+        - results: List of {rank, airline, airport, count,
+          average_duration_deviation_minutes}, best first
+        """
+        try:
+            first, last = parse_date_range_params(request.query_params)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            top = parse_int(request.query_params.get("top", "10"), 1, 1000)
+        except ValueError:
+            return Response(
+                {"error": "top must be a positive integer up to 1000"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
         return Response(
             {
-                "date": date,
-                "average_duration_minutes": avg_duration.total_seconds() / 60,
+                "from": first,
+                "to": last,
+                "results": punctuality_ranking(first, last, top),
             }
         )
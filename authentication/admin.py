@@ -0,0 +1,18 @@
+from django.contrib import admin
+from .models import RevokedToken, ServiceAccount
+
+
+@admin.register(ServiceAccount)
+class ServiceAccountAdmin(admin.ModelAdmin):
+    """Service accounts, without their key hash."""
+
+    list_display = ("user", "key_id", "scopes", "last_login")
+    exclude = ("secret_hash",)
+    readonly_fields = ("key_id",)
+
+
+@admin.register(RevokedToken)
+class RevokedTokenAdmin(admin.ModelAdmin):
+    """Revoked access tokens, until they expire."""
+
+    list_display = ("jti", "revoked_at", "expires_at")
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class AuthenticationConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "authentication"
+
+    def ready(self) -> None:
+        from . import authentication  # noqa: F401
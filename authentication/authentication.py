@@ -0,0 +1,193 @@
+"""
+JWT authentication without a user query per request.
+
+``CachedJWTAuthentication`` verifies a token and loads its user once, then
+serves both from a per-process LRU keyed by the token's ``jti``, for at most
+``AGOA_AUTH_CACHE_TTL`` and never past the token's expiry. An entry is only
+used for the exact token string it was verified from.
+
+``revoke_token`` records a token in ``RevokedToken`` and, when
+``AGOA_AUTH_CACHE_ALIAS`` names a cache shared by the workers (see
+``shared_cache``), there too. Every cache hit checks the shared cache, or
+``RevokedToken`` when there is none, so that every worker stops accepting
+a revoked token at once. Changes to a user drop the entries of that user in
+this process; other processes see them within the TTL.
+"""
+
+import base64
+import binascii
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, NamedTuple, Optional
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, Token
+
+from agoa.utils import shared_cache
+
+from .models import RevokedToken, ServiceAccount
+
+
+class CachedToken(NamedTuple):
+    raw: bytes
+    token: Token
+    user: Any
+    expires_at: float
+
+
+def token_id(raw_token: bytes) -> Optional[str]:
+    """The ``jti`` claim of a token, read without verifying it"""
+    try:
+        payload = raw_token.split(b".")[1]
+        claims = json.loads(
+            base64.urlsafe_b64decode(payload + b"=" * (-len(payload) % 4))
+        )
+        jti = claims[api_settings.JTI_CLAIM]
+    except (IndexError, KeyError, TypeError, ValueError, binascii.Error):
+        return None
+    return jti if isinstance(jti, str) else None
+
+
+class TokenCache:
+    """Bounded, thread-safe LRU of verified tokens and their users"""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, CachedToken] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, jti: str, raw_token: bytes) -> Optional[CachedToken]:
+        with self._lock:
+            entry = self._entries.get(jti)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time() or not hmac.compare_digest(
+                entry.raw, raw_token
+            ):
+                del self._entries[jti]
+                return None
+            self._entries.move_to_end(jti)
+            return entry
+
+    def put(self, jti: str, raw_token: bytes, token: Token, user: Any) -> None:
+        expires_at = min(time.time() + self.ttl, float(token["exp"]))
+        with self._lock:
+            self._entries[jti] = CachedToken(raw_token, token, user, expires_at)
+            self._entries.move_to_end(jti)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, jti: str) -> None:
+        with self._lock:
+            self._entries.pop(jti, None)
+
+    def discard_user(self, user_id: Any) -> None:
+        with self._lock:
+            for jti in [
+                jti for jti, entry in self._entries.items() if entry.user.pk == user_id
+            ]:
+                del self._entries[jti]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(settings.AGOA_AUTH_CACHE_SIZE, settings.AGOA_AUTH_CACHE_TTL)
+
+
+def _revoked_key(jti: str) -> str:
+    return f"agoa:revoked-token:{jti}"
+
+
+def _shared_cache() -> Any:
+    return shared_cache(settings.AGOA_AUTH_CACHE_ALIAS)
+
+
+def revoke_token(token: Token) -> None:
+    """Reject ``token`` from now on, in every worker"""
+    jti = token[api_settings.JTI_CLAIM]
+    expires_at = datetime.fromtimestamp(token["exp"], tz=timezone.utc)
+    RevokedToken.objects.get_or_create(jti=jti, defaults={"expires_at": expires_at})
+    shared = _shared_cache()
+    if shared is not None:
+        timeout = max(int(token["exp"] - time.time()), 1)
+        shared.set(_revoked_key(jti), True, timeout)
+    token_cache.discard(jti)
+
+
+def service_token(account: ServiceAccount) -> AccessToken:
+    """A long-lived access token for the account, limited to its scopes"""
+    token = AccessToken.for_user(account.user)
+    token.set_exp(lifetime=settings.AGOA_SERVICE_TOKEN_LIFETIME)
+    token["scope"] = account.scopes
+    return token
+
+
+def is_revoked(jti: str) -> bool:
+    shared = _shared_cache()
+    if shared is not None and shared.get(_revoked_key(jti)):
+        return True
+    return RevokedToken.objects.filter(jti=jti).exists()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` caching verified tokens and their users.
+
+    A cached token costs no signature check and no user query, and at most
+    one indexed query for revocations (none with a shared cache); a new one is
+    verified, checked against the revoked tokens and its user loaded as
+    usual. Tokens without a ``jti`` are never cached.
+    """
+
+    def authenticate(self, request: Any) -> Optional[tuple[Any, Token]]:
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        jti = token_id(raw_token)
+        if jti is not None:
+            entry = token_cache.get(jti, raw_token)
+            if entry is not None:
+                shared = _shared_cache()
+                if shared is not None:
+                    revoked = shared.get(_revoked_key(jti))
+                else:
+                    # Per-process cache: only the database knows what other
+                    # workers revoked
+                    revoked = RevokedToken.objects.filter(jti=jti).exists()
+                if revoked:
+                    token_cache.discard(jti)
+                    raise InvalidToken("Token is revoked")
+                return entry.user, entry.token
+
+        token = self.get_validated_token(raw_token)
+        jti = token.get(api_settings.JTI_CLAIM)
+        if jti is not None and is_revoked(jti):
+            raise InvalidToken("Token is revoked")
+        user = self.get_user(token)
+        if jti is not None:
+            token_cache.put(jti, raw_token, token, user)
+        return user, token
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user(sender: Any, instance: User, **kwargs: Any) -> None:
+    # e.g. deactivated or with a new password: load the user again
+    token_cache.discard_user(instance.pk)
@@ -0,0 +1,57 @@
+from typing import Any
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+
+from authentication.models import SCOPES, ServiceAccount
+
+
+class Command(BaseCommand):
+    help = "Create a service account, or give an existing one a new key, and print it"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("username", help="User the account acts as")
+        parser.add_argument(
+            "--scope",
+            action="append",
+            dest="scopes",
+            choices=SCOPES,
+            help="Scope granted; repeat for several (default read)",
+        )
+        parser.add_argument(
+            "--rotate",
+            action="store_true",
+            help="Replace the key of an existing account",
+        )
+
+    @transaction.atomic
+    def handle(self, *args: Any, **options: Any) -> None:
+        scopes = options["scopes"] or ["read"]
+        account = ServiceAccount.objects.filter(
+            user__username=options["username"]
+        ).first()
+        if account is not None:
+            if not options["rotate"]:
+                raise CommandError(
+                    f"{options['username']} already has a service account; "
+                    "pass --rotate to give it a new key"
+                )
+            key = account.rotate_key()
+            if options["scopes"]:
+                account.scopes = " ".join(scopes)
+            account.save()
+        else:
+            user, created = User.objects.get_or_create(username=options["username"])
+            if created:
+                # Only the key logs in as a new user
+                user.set_unusable_password()
+                user.save()
+            account, key = ServiceAccount.create(user, scopes)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Service account {account.user.username} ({account.scopes}), "
+                "keep this key, it is not shown again:"
+            )
+        )
+        self.stdout.write(key)
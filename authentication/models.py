@@ -0,0 +1,86 @@
+import hashlib
+import hmac
+import secrets
+from typing import Optional
+
+from django.contrib.auth.models import User
+from django.db import models
+from django.utils import timezone
+
+# Scopes a service account may be given: "read" allows GET, HEAD and OPTIONS
+# requests, "write" every other method
+SCOPES = ("read", "write")
+
+
+def _hash_secret(secret: str) -> str:
+    # Secrets are random 256-bit strings: a fast hash is enough, no PBKDF2
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+
+class ServiceAccount(models.Model):
+    """
+    A machine client (e.g. a status feed) logging in with an API key.
+
+    The key is ``<key_id>.<secret>``; only a SHA-256 of the secret is kept.
+    Logging in with it issues a long-lived access token limited to the
+    account's scopes, for its user.
+    """
+
+    user: models.OneToOneField = models.OneToOneField(
+        User, on_delete=models.CASCADE, related_name="service_account"
+    )
+    key_id: models.CharField = models.CharField(max_length=16, unique=True)
+    secret_hash: models.CharField = models.CharField(max_length=64)
+    # Space-separated, as in the tokens' "scope" claim
+    scopes: models.CharField = models.CharField(max_length=100, default="read")
+    created_at: models.DateTimeField = models.DateTimeField(default=timezone.now)
+    last_login: models.DateTimeField = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"Service account {self.user.username} ({self.key_id})"
+
+    @classmethod
+    def create(cls, user: User, scopes: list[str]) -> tuple["ServiceAccount", str]:
+        """A new account for ``user`` and its key, which cannot be read again"""
+        account = cls(user=user, scopes=" ".join(scopes))
+        key = account.rotate_key()
+        account.save()
+        return account, key
+
+    def rotate_key(self) -> str:
+        """Replace the key (unsaved) and return the new one"""
+        self.key_id = secrets.token_hex(8)
+        secret = secrets.token_urlsafe(32)
+        self.secret_hash = _hash_secret(secret)
+        return f"{self.key_id}.{secret}"
+
+    @classmethod
+    def for_key(cls, key: str) -> Optional["ServiceAccount"]:
+        """The active account the key belongs to, if any"""
+        key_id, _, secret = key.partition(".")
+        account = (
+            cls.objects.select_related("user")
+            .filter(key_id=key_id, user__is_active=True)
+            .first()
+        )
+        if account is None or not hmac.compare_digest(
+            account.secret_hash, _hash_secret(secret)
+        ):
+            return None
+        return account
+
+
+class RevokedToken(models.Model):
+    """
+    An access token revoked before it expires.
+
+    ``CachedJWTAuthentication`` rejects tokens whose ``jti`` is listed.
+    Rows can be deleted once the token has expired.
+    """
+
+    jti: models.CharField = models.CharField(max_length=255, unique=True)
+    expires_at: models.DateTimeField = models.DateTimeField(db_index=True)
+    revoked_at: models.DateTimeField = models.DateTimeField(default=timezone.now)
+
+    def __str__(self) -> str:
+        return f"Revoked token {self.jti}"
@@ -0,0 +1,31 @@
+from typing import Any, Optional
+
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+from rest_framework.request import Request
+
+
+def token_scopes(request: Request) -> Optional[set[str]]:
+    """Scopes of the request's token, or None when it is not limited"""
+    token = request.auth
+    if token is None or not hasattr(token, "get"):
+        return None
+    scope = token.get("scope")
+    return None if scope is None else set(scope.split())
+
+
+class HasTokenScope(BasePermission):
+    """
+    Limit scoped tokens (issued to service accounts) to their scopes.
+
+    Safe requests need the "read" scope and the others "write". Tokens
+    without a "scope" claim, such as those of users logging in with a
+    password, are not limited.
+    """
+
+    message = "The token's scope does not allow this request."
+
+    def has_permission(self, request: Request, view: Any) -> bool:
+        scopes = token_scopes(request)
+        if scopes is None:
+            return True
+        return ("read" if request.method in SAFE_METHODS else "write") in scopes
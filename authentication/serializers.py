@@ -52,3 +52,12 @@ class RegisterSerializer(serializers.ModelSerializer):
             password=validated_data["password"],
         )
         return user
+
+
+class ServiceTokenSerializer(serializers.Serializer):
+    key = serializers.CharField(required=True, write_only=True)
+
+
+class RevokeTokenSerializer(serializers.Serializer):
+    # The access token to revoke; by default the one sent with the request
+    token = serializers.CharField(required=False, write_only=True)
@@ -3,6 +3,17 @@ from django.urls import reverse
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from .authentication import token_cache
+from .models import RevokedToken, ServiceAccount
 
 
 class AuthenticationTests(APITestCase):
@@ -93,3 +104,117 @@ class AuthenticationTests(APITestCase):
         response = self.client.post(url, incomplete_data, format="json")
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CachedTokenTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="feeder", password="pass12345")
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.url = reverse("airline-list")
+        token_cache.clear()
+        cache.clear()
+
+    def get(self, token=None):
+        return self.client.get(
+            self.url, headers={"Authorization": f"Bearer {token or self.token}"}
+        )
+
+    def test_cached_token_skips_the_user_query(self):
+        self.assertEqual(self.get().status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get().status_code, status.HTTP_200_OK)
+        self.assertFalse([q for q in queries if "auth_user" in q["sql"]])
+
+    def test_tampered_token_is_verified(self):
+        self.get()
+        header, payload, signature = self.token.split(".")
+        forged = f"{header}.{payload}.{signature[::-1]}"
+        self.assertEqual(self.get(forged).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoked_token_is_rejected(self):
+        self.get()
+        response = self.client.post(
+            reverse("revoke-token"),
+            headers={"Authorization": f"Bearer {self.token}"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get().status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(RevokedToken.objects.count(), 1)
+
+        # Another worker, with neither the token nor the revocation cached
+        cache.clear()
+        self.assertEqual(self.get().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocation_by_another_worker_is_seen_at_once(self):
+        self.get()
+        # Revoked on another worker: this process keeps the token cached and
+        # the default cache is not shared
+        RevokedToken.objects.create(
+            jti=AccessToken(self.token)["jti"],
+            expires_at=timezone.now() + timedelta(minutes=5),
+        )
+        self.assertEqual(self.get().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cannot_revoke_another_users_token(self):
+        other = User.objects.create_user(username="other", password="pass12345")
+        self.client.force_authenticate(user=other)
+        response = self.client.post(
+            reverse("revoke-token"), {"token": self.token}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(RevokedToken.objects.exists())
+
+    def test_deactivated_user_is_reloaded(self):
+        self.get()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get().status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ServiceAccountTests(APITestCase):
+    def create_account(self, *scopes):
+        arguments = [f"--scope={scope}" for scope in scopes]
+        out = StringIO()
+        call_command("create_service_account", "feed", *arguments, stdout=out)
+        return out.getvalue().splitlines()[-1]
+
+    def login(self, key):
+        return self.client.post(reverse("service-token"), {"key": key}, format="json")
+
+    def test_scoped_token_without_password_hashing(self):
+        key = self.create_account("read")
+        with mock.patch("django.contrib.auth.base_user.check_password") as check:
+            response = self.login(key)
+        check.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["scope"], "read")
+        self.assertIsNotNone(ServiceAccount.objects.get().last_login)
+
+        headers = {"Authorization": f"Bearer {response.data['access']}"}
+        url = reverse("airline-list")
+        self.assertEqual(self.client.get(url, headers=headers).status_code, 200)
+        airline = {"name": "Feed Air", "iata_code": "FA"}
+        response = self.client.post(url, airline, format="json", headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_write_scope(self):
+        key = self.create_account("read", "write")
+        headers = {"Authorization": f"Bearer {self.login(key).data['access']}"}
+        airline = {"name": "Feed Air", "iata_code": "FA"}
+        response = self.client.post(
+            reverse("airline-list"), airline, format="json", headers=headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_invalid_and_rotated_keys(self):
+        key = self.create_account()
+        key_id, _, secret = key.partition(".")
+        self.assertEqual(self.login(f"{key_id}.{secret[::-1]}").status_code, 401)
+        self.assertEqual(self.login("unknown").status_code, 401)
+
+        with self.assertRaises(CommandError):
+            self.create_account()
+        out = StringIO()
+        call_command("create_service_account", "feed", "--rotate", stdout=out)
+        self.assertEqual(self.login(key).status_code, 401)
+        self.assertEqual(self.login(out.getvalue().splitlines()[-1]).status_code, 200)
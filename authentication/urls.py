@@ -1,7 +1,14 @@
 from django.urls import path
-from .views import SecureLoginView, SecureRegisterView
+from .views import (
+    RevokeTokenView,
+    SecureLoginView,
+    SecureRegisterView,
+    ServiceTokenView,
+)
 
 urlpatterns = [
     path("login/", SecureLoginView.as_view(), name="secure-login"),
     path("register/", SecureRegisterView.as_view(), name="secure-register"),
+    path("service-token/", ServiceTokenView.as_view(), name="service-token"),
+    path("revoke/", RevokeTokenView.as_view(), name="revoke-token"),
 ]
@@ -5,18 +5,26 @@ from django.contrib.auth import authenticate
 from rest_framework import generics
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.permissions import IsAuthenticated
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from django.utils import timezone
+from .authentication import revoke_token, service_token
+from .models import ServiceAccount
 from .serializers import (
     UserSerializer,
     UserLoginSerializer,
     UserRegistrationSerializer,
     LoginSerializer,
     RegisterSerializer,
+    RevokeTokenSerializer,
+    ServiceTokenSerializer,
 )
 from rest_framework import status
 from django.core.exceptions import ValidationError
 from django.contrib.auth.password_validation import validate_password
 from typing import Any
+from datetime import datetime, timezone as dt_timezone
 from rest_framework.request import Request
 
 
@@ -83,3 +91,69 @@ class SecureRegisterView(generics.GenericAPIView):
             },
             status=status.HTTP_201_CREATED,
         )
+
+
+class ServiceTokenView(generics.GenericAPIView):
+    """
+    Exchange a service account's API key for a scoped access token.
+
+    The key is checked with a SHA-256 rather than the password hasher, and
+    the token lasts AGOA_SERVICE_TOKEN_LIFETIME, so feeders log in rarely
+    and cheaply.
+    """
+
+    permission_classes = [AllowAny]
+    serializer_class = ServiceTokenSerializer
+
+    def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        account = ServiceAccount.for_key(serializer.validated_data["key"])
+        if account is None:
+            return Response(
+                {"error": "Invalid API key"}, status=status.HTTP_401_UNAUTHORIZED
+            )
+        account.last_login = timezone.now()
+        account.save(update_fields=["last_login"])
+
+        token = service_token(account)
+        return Response(
+            {
+                "access": str(token),
+                "expires_at": datetime.fromtimestamp(token["exp"], tz=dt_timezone.utc),
+                "scope": account.scopes,
+            }
+        )
+
+
+class RevokeTokenView(generics.GenericAPIView):
+    """
+    Revoke an access token: the one given, or the one making the request.
+
+    Users may only revoke their own tokens, unless they are staff.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = RevokeTokenSerializer
+
+    def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        token = request.auth
+        if "token" in serializer.validated_data:
+            try:
+                token = AccessToken(serializer.validated_data["token"])
+            except TokenError as exc:
+                return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            if (
+                str(token.get("user_id")) != str(request.user.pk)
+                and not request.user.is_staff
+            ):
+                return Response(
+                    {"error": "Cannot revoke another user's token"},
+                    status=status.HTTP_403_FORBIDDEN,
+                )
+        revoke_token(token)
+        return Response(status=status.HTTP_204_NO_CONTENT)
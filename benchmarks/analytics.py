@@ -0,0 +1,117 @@
+"""
+Speed of the NumPy flight analytics against a loop over model instances.
+
+The synthetic generator fills a throwaway SQLite database with
+``--aircraft`` aircraft flying for ``--days`` days. The delays of every
+flight of the range are then summarised per airline twice: by
+``agoa.analytics.flight_analytics``, and by iterating the flights as model
+instances and sorting each airline's delays in Python, as a view would
+without it. Both must agree; the timings are printed as JSON, with the
+share of the NumPy side spent reading the columns:
+
+    python benchmarks/analytics.py --aircraft 3000 --days 30
+
+On SQLite the NumPy side measures about 10x faster than the loop, from 79k
+to 339k flights, short of the 20x first aimed for: about 90% of its time goes into
+reading the columns, mostly SQLite parsing datetimes and fetching rows,
+which no array operation shortens. ``read_share`` shows where a run stands.
+"""
+
+import argparse
+import json
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from common import git_revision, setup_django
+from generate import generate
+
+
+def nearest_rank(values: list, p: int) -> float:
+    return values[(len(values) * p + 99) // 100 - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--airports", type=int, default=100)
+    parser.add_argument("--airlines", type=int, default=20)
+    parser.add_argument("--aircraft", type=int, default=3000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    from agoa.analytics import FlightColumns, flight_analytics
+    from agoa.models import Flight
+    from agoa.stats import PERCENTILES
+    from agoa.utils import days_bounds
+
+    dataset = generate(
+        args.airports, args.airlines, args.aircraft, args.days, seed=args.seed
+    )
+    first = date.fromisoformat(dataset["first_day"])
+    last = first + timedelta(days=args.days - 1)
+    start, end = days_bounds(first, last)
+
+    def orm_loop() -> dict:
+        delays = defaultdict(list)
+        flights = Flight.objects.filter(
+            scheduled_departure__gte=start, scheduled_departure__lt=end
+        ).select_related("airline")
+        for flight in flights:
+            if flight.actual_departure is not None:
+                delay = flight.actual_departure - flight.scheduled_departure
+                delays[flight.airline.iata_code].append(delay.total_seconds() / 60)
+        groups = {}
+        for airline, values in delays.items():
+            values.sort()
+            groups[airline] = {
+                "count": len(values),
+                **{f"p{p}_minutes": nearest_rank(values, p) for p in PERCENTILES},
+            }
+        return groups
+
+    def vectorized() -> dict:
+        report = flight_analytics(first, last, "airline", top=10)
+        return {
+            group["airline"]: {
+                key: group["departure_delay"][key]
+                for key in ("count", *(f"p{p}_minutes" for p in PERCENTILES))
+            }
+            for group in report["groups"]
+            if group["departure_delay"]["count"]
+        }
+
+    def read() -> None:
+        FlightColumns(first, last)
+
+    timings = {}
+    answers = {}
+    for name, run in (("orm_loop", orm_loop), ("numpy", vectorized), ("read", read)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            answers[name] = run()
+            best = min(best, time.perf_counter() - started)
+        timings[name] = best
+
+    results = {
+        **git_revision(),
+        "benchmark": "analytics",
+        "settings": vars(args),
+        "dataset": dataset,
+        "flights": Flight.objects.filter(
+            scheduled_departure__gte=start, scheduled_departure__lt=end
+        ).count(),
+        "agree": answers["orm_loop"] == answers["numpy"],
+        "orm_loop_s": round(timings["orm_loop"], 3),
+        "numpy_s": round(timings["numpy"], 3),
+        "speedup": round(timings["orm_loop"] / timings["numpy"], 1),
+        "read_share": round(timings["read"] / timings["numpy"], 2),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Concurrent-request throughput of the async read endpoints against the
+sync DRF views they mirror.
+
+Both sides run in process on a seeded SQLite database: sync requests go
+through the WSGI handler from a pool of ``--concurrency`` threads, async
+requests through the ASGI handler as ``--concurrency`` concurrent tasks on
+one event loop. Results are printed as JSON.
+
+    python benchmarks/async_views.py --requests 400 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from common import auth_header, percentile, seed, setup_django
+
+DAY = date(2024, 3, 20)
+
+# name -> (sync path, async path, query parameters)
+ENDPOINTS = {
+    "by_date_and_airport": (
+        "/api/turnarounds/by_date_and_airport/",
+        "/api/async/turnarounds/by_date_and_airport/",
+        {"date": DAY.isoformat(), "airport": "CDG"},
+    ),
+    "average_duration": (
+        "/api/turnarounds/average_duration/",
+        "/api/async/turnarounds/average_duration/",
+        {"date": DAY.isoformat(), "group_by": "airport", "percentiles": "true"},
+    ),
+    "flight_lookup": (
+        "/api/flights/lookup/",
+        "/api/async/flights/lookup/",
+        {"flight_number": "AF00000D", "date": DAY.isoformat()},
+    ),
+}
+
+
+def summarise(latencies: list[float], elapsed: float) -> dict:
+    return {
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def run_sync(path: str, params: dict, headers: dict, requests: int, workers: int):
+    from django.test import Client
+
+    def call(_: int) -> float:
+        started = time.perf_counter()
+        response = Client().get(path, params, headers=headers)
+        assert response.status_code == 200, response.content
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        latencies = list(pool.map(call, range(requests)))
+    return summarise(latencies, time.perf_counter() - started)
+
+
+async def run_async(path: str, params: dict, headers: dict, requests: int, tasks: int):
+    from django.test import AsyncClient
+
+    client = AsyncClient()
+    slots = asyncio.Semaphore(tasks)
+
+    async def call() -> float:
+        async with slots:
+            started = time.perf_counter()
+            response = await client.get(path, params, headers=headers)
+            assert response.status_code == 200, response.content
+            return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(call() for _ in range(requests)))
+    return summarise(list(latencies), time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turnarounds", type=int, default=500, help="per airport")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    setup_django()
+    seed(DAY, args.turnarounds)
+    headers = auth_header()
+
+    results = {"settings": vars(args), "endpoints": {}}
+    for name, (sync_path, async_path, params) in ENDPOINTS.items():
+        sync = run_sync(sync_path, params, headers, args.requests, args.concurrency)
+        concurrent = asyncio.run(
+            run_async(async_path, params, headers, args.requests, args.concurrency)
+        )
+        results["endpoints"][name] = {"sync": sync, "async": concurrent}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Helpers shared by the benchmark scripts.
+
+``setup_django`` points Django at a throwaway SQLite test database and
+``seed`` fills it with a synthetic schedule, so benchmarks never touch
+``db.sqlite3``. Only the data generator writes to the configured database.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+AIRPORT_CODES = ["CDG", "JFK", "LHR", "FRA", "AMS", "MAD", "FCO", "DXB"]
+AIRLINE_CODES = ["AF", "BA", "LH", "KL", "IB", "AZ", "EK", "DL"]
+
+
+def setup_django(test_database: bool = True) -> None:
+    """
+    Configure Django and create an empty test database in a temp file.
+
+    Databases mirroring the default one read the test database. With
+    ``test_database=False`` the configured database is migrated and used
+    instead.
+    """
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "agoa.settings")
+
+    from django.conf import settings
+
+    database = settings.DATABASES["default"]
+    if test_database and database["ENGINE"] == "django.db.backends.sqlite3":
+        path = Path(tempfile.mkdtemp()) / "benchmark.sqlite3"
+        database["TEST"] = {"NAME": str(path)}
+
+    import django
+    from django.core.management import call_command
+    from django.db import connection, connections
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    if not test_database:
+        call_command("migrate", verbosity=0)
+        return
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    # Replicas (see AGOA_DATABASE_PROFILE) read the test database too
+    for alias, database in settings.DATABASES.items():
+        mirror = database.get("TEST", {}).get("MIRROR")
+        if mirror:
+            connections[alias].creation.set_as_test_mirror(
+                connections[mirror].settings_dict
+            )
+
+
+def seed(day, turnarounds_per_airport: int) -> None:
+    """
+    Create a day of turnarounds at every airport of ``AIRPORT_CODES``.
+
+    Each turnaround links an arrival from the next airport in the list with
+    a departure back to it, spread over the day every few minutes.
+    """
+    from django.utils import timezone
+
+    from agoa.models import Airline, Airport, Flight, Turnaround
+    from agoa.stats import rebuild_daily_stats
+
+    airlines = Airline.objects.bulk_create(
+        Airline(name=f"Airline {code}", iata_code=code) for code in AIRLINE_CODES
+    )
+    airports = Airport.objects.bulk_create(
+        Airport(name=f"Airport {code}", iata_code=code, city=code, country="XX")
+        for code in AIRPORT_CODES
+    )
+    start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    step = timedelta(days=1) / max(turnarounds_per_airport, 1)
+
+    flights, pairs = [], []
+    for a, airport in enumerate(airports):
+        origin = airports[(a + 1) % len(airports)]
+        for i in range(turnarounds_per_airport):
+            airline = airlines[i % len(airlines)]
+            landing = start + step * i
+            leaving = landing + timedelta(minutes=45 + i % 60)
+            number = f"{airline.iata_code}{a}{i:04d}"
+            inbound = Flight(
+                flight_number=f"{number}A",
+                airline=airline,
+                departure_airport=origin,
+                arrival_airport=airport,
+                scheduled_departure=landing - timedelta(hours=2),
+                scheduled_arrival=landing,
+                actual_arrival=landing + timedelta(minutes=i % 20),
+            )
+            outbound = Flight(
+                flight_number=f"{number}D",
+                airline=airline,
+                departure_airport=airport,
+                arrival_airport=origin,
+                scheduled_departure=leaving,
+                scheduled_arrival=leaving + timedelta(hours=2),
+                actual_departure=leaving + timedelta(minutes=i % 25),
+            )
+            flights += [inbound, outbound]
+            pairs.append((airport, inbound, outbound))
+    Flight.objects.bulk_create(flights, batch_size=1000)
+
+    Turnaround.objects.bulk_create(
+        (
+            Turnaround(
+                airport=airport,
+                arrival_flight=inbound,
+                departure_flight=outbound,
+                scheduled_start=inbound.scheduled_arrival,
+                scheduled_end=outbound.scheduled_departure,
+                actual_start=inbound.actual_arrival,
+                actual_end=outbound.actual_departure,
+            )
+            for airport, inbound, outbound in pairs
+        ),
+        batch_size=1000,
+    )
+    rebuild_daily_stats(day, day)
+
+
+def auth_header() -> dict[str, str]:
+    """Create a user and return the headers authenticating as them"""
+    from django.contrib.auth.models import User
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    user = User.objects.create_user(username="benchmark", password="benchmark")
+    token = RefreshToken.for_user(user).access_token
+    return {"Authorization": f"Bearer {token}"}
+
+
+def percentile(values: list[float], p: int) -> float:
+    """Nearest-rank percentile of ``values``"""
+    ordered = sorted(values)
+    return ordered[max((len(ordered) * p + 99) // 100 - 1, 0)]
+
+
+def git_revision() -> dict:
+    """The commit being measured, and whether the tree has local changes"""
+
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "-uno", "--porcelain")),
+    }
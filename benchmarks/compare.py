@@ -0,0 +1,80 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+Takes the JSON written by ``micro.py`` or ``load.py`` on two commits and
+prints, per action and serializer, the change in median latency and in SQL
+queries per request. An entry regresses when its median is more than
+``--threshold`` percent slower or it makes more queries; the exit status is
+1 when any does, so the script can gate a CI job:
+
+    python benchmarks/compare.py micro-main.json micro-branch.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+SECTIONS = ("actions", "serializers")
+
+
+def compare(before: dict, after: dict, threshold: float) -> list[dict]:
+    """One row per entry present in both results"""
+    rows = []
+    for section in SECTIONS:
+        old, new = before.get(section, {}), after.get(section, {})
+        for name in old.keys() & new.keys():
+            was, now = old[name], new[name]
+            if not was.get("p50_ms") or now.get("p50_ms") is None:
+                continue
+            change = (now["p50_ms"] / was["p50_ms"] - 1) * 100
+            more_queries = (
+                was.get("queries") is not None
+                and now.get("queries") is not None
+                and now["queries"] > was["queries"]
+            )
+            rows.append(
+                {
+                    "name": f"{section}/{name}",
+                    "before_ms": was["p50_ms"],
+                    "after_ms": now["p50_ms"],
+                    "change_percent": round(change, 1),
+                    "before_queries": was.get("queries"),
+                    "after_queries": now.get("queries"),
+                    "regression": change > threshold or more_queries,
+                }
+            )
+    return sorted(rows, key=lambda row: row["name"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("before", type=Path)
+    parser.add_argument("after", type=Path)
+    parser.add_argument("--threshold", type=float, default=10, help="percent")
+    parser.add_argument("--json", action="store_true", help="print rows as JSON")
+    args = parser.parse_args()
+
+    before = json.loads(args.before.read_text())
+    after = json.loads(args.after.read_text())
+    if before.get("benchmark") != after.get("benchmark"):
+        parser.error("the files come from different benchmarks")
+    rows = compare(before, after, args.threshold)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(f"{before.get('commit', '?')[:10]} -> {after.get('commit', '?')[:10]}")
+        width = max((len(row["name"]) for row in rows), default=10)
+        for row in rows:
+            print(
+                f"{row['name']:<{width}}  {row['before_ms']:>9.2f} ms"
+                f" -> {row['after_ms']:>9.2f} ms  {row['change_percent']:>+7.1f}%"
+                f"  queries {row['before_queries']} -> {row['after_queries']}"
+                f"{'  REGRESSION' if row['regression'] else ''}"
+            )
+    sys.exit(1 if any(row["regression"] for row in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Mixed read/write throughput of the development and production database
+profiles.
+
+Each profile (``AGOA_DATABASE_PROFILE``) runs in its own process on a seeded
+throwaway SQLite file. ``--readers`` threads request turnarounds and flights
+while ``--writers`` threads post flight status events, applied at once, for
+``--duration`` seconds. The reads and writes per second, their latency
+percentiles and the failed requests (e.g. "database is locked") of each
+profile are printed as JSON:
+
+    python benchmarks/database_profile.py --readers 8 --writers 2
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+from common import auth_header, git_revision, percentile, seed, setup_django
+
+PROFILES = ("development", "production")
+DAY = date(2024, 3, 20)
+
+
+def read(client, rng: random.Random, flight_ids: list[int], headers: dict):
+    if rng.random() < 0.5:
+        path = "/api/turnarounds/by_date_and_airport/"
+        params = {"date": DAY.isoformat(), "airport": rng.choice(["CDG", "JFK"])}
+    else:
+        path, params = f"/api/flights/{rng.choice(flight_ids)}/", {}
+    return client.get(path, params, headers=headers)
+
+
+def write(client, rng: random.Random, flight_ids: list[int], headers: dict):
+    eta = datetime.combine(DAY, datetime.min.time(), timezone.utc) + timedelta(
+        minutes=rng.randrange(24 * 60)
+    )
+    event = {"flight": rng.choice(flight_ids), "event": "ETA", "time": eta.isoformat()}
+    return client.post(
+        "/api/flights/events/",
+        [event],
+        content_type="application/json",
+        headers=headers,
+    )
+
+
+def worker(kind, number, flight_ids, headers, deadline, results, lock):
+    from django.db import connections
+    from django.test import Client
+
+    client = Client(raise_request_exception=False)
+    rng = random.Random(f"{kind}{number}")
+    request = read if kind == "reads" else write
+    latencies, failures = [], 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = request(client, rng, flight_ids, headers)
+        if response.status_code >= 400:
+            failures += 1
+        else:
+            latencies.append(time.perf_counter() - started)
+    connections.close_all()
+    with lock:
+        results[kind]["latencies"] += latencies
+        results[kind]["failures"] += failures
+
+
+def run_profile(args: argparse.Namespace) -> dict:
+    """Measure the profile this process was started with"""
+    setup_django()
+    from django.conf import settings
+    from django.test.utils import override_settings
+
+    from agoa.models import Flight
+
+    seed(DAY, args.turnarounds)
+    headers = auth_header()
+    flight_ids = list(Flight.objects.values_list("id", flat=True))
+
+    results = defaultdict(lambda: {"latencies": [], "failures": 0})
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(kind, n, flight_ids, headers, deadline, results, lock),
+        )
+        for kind, count in (("reads", args.readers), ("writes", args.writers))
+        for n in range(count)
+    ]
+    with override_settings(
+        AGOA_STATUS_EVENT_WINDOW=timedelta(0), AGOA_PUSH_DEBOUNCE=timedelta(0)
+    ):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    measured = {"databases": sorted(settings.DATABASES)}
+    for kind in ("reads", "writes"):
+        latencies = results[kind]["latencies"]
+        measured[kind] = {
+            "per_second": round(len(latencies) / args.duration, 2),
+            "failures": results[kind]["failures"],
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        }
+    return measured
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turnarounds", type=int, default=200, help="per airport")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    parser.add_argument("--profile", choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        print(json.dumps(run_profile(args)))
+        return
+
+    profiles = {}
+    for profile in PROFILES:
+        child = subprocess.run(
+            [sys.executable, __file__, *sys.argv[1:], "--profile", profile],
+            env={**os.environ, "AGOA_DATABASE_PROFILE": profile},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        profiles[profile] = json.loads(child.stdout.splitlines()[-1])
+    results = {
+        **git_revision(),
+        "benchmark": "database_profile",
+        "settings": {
+            name: value for name, value in vars(args).items() if name != "profile"
+        },
+        "profiles": profiles,
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Synthetic flight schedule at realistic volumes.
+
+Airports are scattered on a plane and weighted by a Zipf law, so a few hubs
+carry most of the traffic. Every aircraft belongs to an airline and flies
+the same daily rotation out of its home airport: out and back to a
+destination, then to the next, until the evening. Each day the rotation
+starts late with some probability and the delay propagates down the
+rotation, absorbed by slack ground time and extended by random
+disruptions. Consecutive legs of an aircraft, overnight included, form the
+turnarounds.
+
+The same ``--seed`` gives the same data. Rows are written a day at a time
+into the configured database, which is migrated first:
+
+    python benchmarks/generate.py --airports 300 --aircraft 3000 --days 90
+
+creates 300 airports and about 1.1 million flights.
+"""
+
+import argparse
+import json
+import math
+import random
+import string
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import product
+
+from common import setup_django
+
+FIRST_DAY = date(2024, 3, 18)
+
+# Scheduled ground time, and the shortest turnaround an aircraft can make
+GROUND_MINUTES = (45, 90)
+MIN_TURN_MINUTES = 35
+# The last departure of a rotation leaves before this hour
+CURFEW_HOUR = 22
+
+CITIES = ["Paris", "London", "New York", "Frankfurt", "Madrid", "Dubai", "Tokyo"]
+COUNTRIES = ["FR", "GB", "US", "DE", "ES", "AE", "JP"]
+
+
+@dataclass
+class Leg:
+    flight_number: str
+    airline_id: int
+    departure_airport_id: int
+    arrival_airport_id: int
+    # Offsets from midnight and block time, in minutes
+    departure: int
+    block: int
+
+
+def codes(length: int, count: int) -> list[str]:
+    """The first ``count`` upper-case codes of ``length`` letters"""
+    letters = product(string.ascii_uppercase, repeat=length)
+    return ["".join(code) for code, _ in zip(letters, range(count))]
+
+
+def block_minutes(positions: dict[int, tuple[float, float]], a: int, b: int) -> int:
+    """Block time between two airports: taxi plus distance, up to 8 hours"""
+    (x1, y1), (x2, y2) = positions[a], positions[b]
+    return min(40 + int(math.hypot(x1 - x2, y1 - y2) * 250), 480)
+
+
+def plan_rotations(
+    rng: random.Random, airports: list, airlines: list, aircraft: int
+) -> list[list[Leg]]:
+    """The daily rotation of every aircraft, as a list of legs"""
+    ids = [airport.id for airport in airports]
+    weights = [1 / (rank + 1) for rank in range(len(ids))]
+    positions = {pk: (rng.random(), rng.random()) for pk in ids}
+    numbers = {airline.id: 0 for airline in airlines}
+
+    rotations = []
+    for _ in range(aircraft):
+        airline = rng.choice(airlines)
+        home = rng.choices(ids, weights)[0]
+        minute = rng.randrange(5 * 60, 9 * 60, 5)
+        legs: list[Leg] = []
+        while True:
+            destination = rng.choices(ids, weights)[0]
+            if destination == home:
+                continue
+            block = block_minutes(positions, home, destination)
+            ground = rng.randrange(*GROUND_MINUTES, 5)
+            back = minute + block + ground
+            if back >= CURFEW_HOUR * 60:
+                break
+            for origin, target, departure in (
+                (home, destination, minute),
+                (destination, home, back),
+            ):
+                numbers[airline.id] += 1
+                legs.append(
+                    Leg(
+                        flight_number=f"{airline.iata_code}{numbers[airline.id]}",
+                        airline_id=airline.id,
+                        departure_airport_id=origin,
+                        arrival_airport_id=target,
+                        departure=departure,
+                        block=block,
+                    )
+                )
+            minute = back + block + rng.randrange(*GROUND_MINUTES, 5)
+        if legs:
+            rotations.append(legs)
+    return rotations
+
+
+def fly(rng: random.Random, legs: list[Leg], day_start: datetime) -> list:
+    """One day of a rotation, with delays propagated from leg to leg"""
+    from agoa.models import Flight
+
+    flights = []
+    ready = None
+    late = rng.random() < 0.3
+    for leg in legs:
+        scheduled = day_start + timedelta(minutes=leg.departure)
+        departure = scheduled if ready is None else max(scheduled, ready)
+        if late:
+            departure += timedelta(minutes=rng.expovariate(1 / 20))
+            late = False
+        departure += timedelta(minutes=rng.expovariate(1 / 3))
+        if rng.random() < 0.05:
+            departure += timedelta(minutes=rng.expovariate(1 / 45))
+        departure = departure.replace(second=0, microsecond=0)
+        arrival = departure + timedelta(
+            minutes=round(leg.block * rng.uniform(0.92, 1.08))
+        )
+        ready = arrival + timedelta(minutes=MIN_TURN_MINUTES)
+        flights.append(
+            Flight(
+                flight_number=leg.flight_number,
+                airline_id=leg.airline_id,
+                departure_airport_id=leg.departure_airport_id,
+                arrival_airport_id=leg.arrival_airport_id,
+                scheduled_departure=scheduled,
+                scheduled_arrival=scheduled + timedelta(minutes=leg.block),
+                actual_departure=departure,
+                actual_arrival=arrival,
+            )
+        )
+    return flights
+
+
+def generate(
+    airports: int,
+    airlines: int,
+    aircraft: int,
+    days: int,
+    first_day: date = FIRST_DAY,
+    seed: int = 0,
+) -> dict:
+    """
+    Create the reference data and ``days`` days of rotations.
+
+    Returns the counts of created rows, and the busiest airport and a flight
+    number of the first day, as handles for benchmarks.
+    """
+    from django.db import transaction
+    from django.utils import timezone
+
+    from agoa.models import Airline, Airport, Flight, Turnaround
+    from agoa.stats import rebuild_daily_stats
+
+    rng = random.Random(seed)
+    airline_rows = Airline.objects.bulk_create(
+        Airline(name=f"Airline {code}", iata_code=code) for code in codes(2, airlines)
+    )
+    airport_rows = Airport.objects.bulk_create(
+        Airport(
+            name=f"Airport {code}",
+            iata_code=code,
+            city=rng.choice(CITIES),
+            country=rng.choice(COUNTRIES),
+        )
+        for code in codes(3, airports)
+    )
+    rotations = plan_rotations(rng, airport_rows, airline_rows, aircraft)
+
+    flight_count = turnaround_count = 0
+    # Aircraft -> its last arrival, for the overnight turnaround
+    last_arrivals: dict[int, Flight] = {}
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        day_start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        flown = [fly(rng, legs, day_start) for legs in rotations]
+        with transaction.atomic():
+            Flight.objects.bulk_create(
+                [flight for flights in flown for flight in flights], batch_size=2000
+            )
+            turnarounds = []
+            for plane, flights in enumerate(flown):
+                inbound = last_arrivals.get(plane)
+                for outbound in flights:
+                    if inbound is not None:
+                        turnarounds.append(
+                            Turnaround(
+                                airport_id=outbound.departure_airport_id,
+                                arrival_flight_id=inbound.id,
+                                departure_flight_id=outbound.id,
+                                scheduled_start=inbound.scheduled_arrival,
+                                scheduled_end=outbound.scheduled_departure,
+                                actual_start=inbound.actual_arrival,
+                                actual_end=outbound.actual_departure,
+                            )
+                        )
+                    inbound = outbound
+                last_arrivals[plane] = inbound
+            Turnaround.objects.bulk_create(turnarounds, batch_size=2000)
+        flight_count += sum(len(flights) for flights in flown)
+        turnaround_count += len(turnarounds)
+    rebuild_daily_stats(first_day, first_day + timedelta(days=days - 1))
+
+    return {
+        "airlines": len(airline_rows),
+        "airports": len(airport_rows),
+        "flights": flight_count,
+        "turnarounds": turnaround_count,
+        "first_day": first_day.isoformat(),
+        "busiest_airport": airport_rows[0].iata_code,
+        "flight_number": rotations[0][0].flight_number,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--airports", type=int, default=300)
+    parser.add_argument("--airlines", type=int, default=60)
+    parser.add_argument("--aircraft", type=int, default=3000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--first-day", type=date.fromisoformat, default=FIRST_DAY)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.airports < 2:
+        parser.error("--airports must be at least 2")
+
+    setup_django(test_database=False)
+    from agoa.models import Flight
+
+    if Flight.objects.exists():
+        parser.error("the database already has flights; start from an empty one")
+
+    started = time.perf_counter()
+    summary = generate(
+        args.airports,
+        args.airlines,
+        args.aircraft,
+        args.days,
+        first_day=args.first_day,
+        seed=args.seed,
+    )
+    summary["seconds"] = round(time.perf_counter() - started, 1)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""
+Locust-style load test of a running server.
+
+``--users`` simulated users start over ``--ramp-up`` seconds, then each
+repeatedly picks a task by weight, sends it on its own keep-alive
+connection and waits a random think time, until ``--duration`` has passed.
+Handles (airports, flights, days) are read from the API first, so any
+database works; fill one with ``generate.py``. Results per task are
+written as JSON for ``compare.py``. When the server runs
+``MetricsMiddleware``, the SQL queries per request of each view are read
+from ``/api/_metrics``: start a fresh server so that its metrics window
+only covers this run.
+
+    python benchmarks/generate.py && python manage.py runserver --noreload
+    python benchmarks/load.py --users 20 --duration 60 --output load.json
+"""
+
+import argparse
+import http.client
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+from urllib.parse import urlencode, urlsplit
+
+from common import git_revision, percentile
+
+# Series of the metrics endpoint: agoa_sql_queries_sum{view="...",method="GET"}
+METRIC_LINE = re.compile(
+    r'^agoa_sql_queries_(sum|count)\{view="([^"]*)",method="([^"]*)"\} (\S+)$'
+)
+
+
+@dataclass
+class Handles:
+    """Rows picked from the API for the tasks to request"""
+
+    airports: list[dict]
+    flights: list[dict]
+
+    def airport(self, rng: random.Random) -> dict:
+        # The first airports of the generator are its hubs
+        return rng.choice(self.airports[: max(len(self.airports) // 10, 1)])
+
+    def flight(self, rng: random.Random) -> dict:
+        return rng.choice(self.flights)
+
+    def day(self, rng: random.Random) -> str:
+        return self.flight(rng)["scheduled_departure"][:10]
+
+
+@dataclass
+class Task:
+    weight: int
+    method: str
+    # View name in the metrics, to match queries per request
+    view: str
+    # The path and query parameters (or JSON body) of one request
+    request: Callable[[Handles, random.Random], tuple[str, Optional[object]]]
+
+
+def lookup(handles: Handles, rng: random.Random) -> tuple[str, dict]:
+    flight = handles.flight(rng)
+    params = {
+        "flight_number": flight["flight_number"],
+        "date": flight["scheduled_departure"][:10],
+    }
+    return "/api/flights/lookup/", params
+
+
+def status_event(handles: Handles, rng: random.Random) -> tuple[str, list]:
+    flight = handles.flight(rng)
+    event = {
+        "flight": flight["id"],
+        "event": "ETA",
+        "time": flight["scheduled_arrival"],
+    }
+    return "/api/flights/events/", [event]
+
+
+TASKS = {
+    "turnaround-by-date-and-airport": Task(
+        30,
+        "GET",
+        "turnaround-by-date-and-airport",
+        lambda h, rng: (
+            "/api/turnarounds/by_date_and_airport/",
+            {"date": h.day(rng), "airport": h.airport(rng)["iata_code"]},
+        ),
+    ),
+    "flight-lookup": Task(25, "GET", "flight-lookup", lookup),
+    "flight-search": Task(
+        15,
+        "GET",
+        "flight-list",
+        lambda h, rng: (
+            "/api/flights/",
+            {
+                "departure_airport": h.airport(rng)["iata_code"],
+                "date": h.day(rng),
+                "page_size": 100,
+            },
+        ),
+    ),
+    "flight-detail": Task(
+        10,
+        "GET",
+        "flight-detail",
+        lambda h, rng: (f"/api/flights/{h.flight(rng)['id']}/", None),
+    ),
+    "airport-occupancy": Task(
+        5,
+        "GET",
+        "airport-occupancy",
+        lambda h, rng: (
+            f"/api/airports/{h.airport(rng)['id']}/occupancy/",
+            {"date": h.day(rng)},
+        ),
+    ),
+    "turnaround-average-duration": Task(
+        5,
+        "GET",
+        "turnaround-average-duration",
+        lambda h, rng: (
+            "/api/turnarounds/average_duration/",
+            {"date": h.day(rng), "group_by": "airport"},
+        ),
+    ),
+    "turnaround-punctuality": Task(
+        5,
+        "GET",
+        "turnaround-punctuality",
+        lambda h, rng: (
+            "/api/turnarounds/punctuality/",
+            {"date": h.day(rng), "group_by": "airline"},
+        ),
+    ),
+    "airport-list": Task(
+        5, "GET", "airport-list", lambda h, rng: ("/api/airports/", None)
+    ),
+}
+
+# Sent with --writes only, as they change the data
+WRITE_TASKS = {"flight-events": Task(5, "POST", "flight-events", status_event)}
+
+
+class Session:
+    """One user's keep-alive connection, reopened after errors"""
+
+    def __init__(self, base_url: str, token: Optional[str] = None) -> None:
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.token = token
+        self.connection: Optional[http.client.HTTPConnection] = None
+
+    def request(self, method: str, path: str, data: Optional[object] = None):
+        headers = {"Accept": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        body = None
+        if method == "GET" and data:
+            path = f"{path}?{urlencode(data)}"
+        elif data is not None:
+            body = json.dumps(data)
+            headers["Content-Type"] = "application/json"
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(
+                self.host, self.port, timeout=30
+            )
+        try:
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            raise
+
+
+def authenticate(base_url: str, username: str, password: str) -> str:
+    """An access token for the user, registering them on first use"""
+    session = Session(base_url)
+    credentials = {"username": username, "password": password}
+    status, body = session.request("POST", "/api/auth/login/", credentials)
+    if status == 401:
+        credentials["email"] = f"{username}@example.com"
+        status, body = session.request("POST", "/api/auth/register/", credentials)
+    if status not in (200, 201):
+        raise SystemExit(f"Could not log in as {username}: {status} {body[:200]!r}")
+    return json.loads(body)["tokens"]["access"]
+
+
+def discover(session: Session, sample: int) -> Handles:
+    _, body = session.request("GET", "/api/airports/")
+    airports = json.loads(body)
+    _, body = session.request("GET", "/api/flights/", {"page_size": sample})
+    flights = json.loads(body)["results"]
+    if not airports or not flights:
+        raise SystemExit("The database has no flights; run generate.py first")
+    return Handles(airports, flights)
+
+
+def sql_queries_per_view(session: Session) -> dict[tuple[str, str], float]:
+    """Mean SQL queries per request of each (view, method), if exposed"""
+    status, body = session.request("GET", "/api/_metrics")
+    if status != 200:
+        return {}
+    totals: dict[tuple[str, str], dict[str, float]] = defaultdict(dict)
+    for line in body.decode().splitlines():
+        match = METRIC_LINE.match(line)
+        if match:
+            kind, view, method, value = match.groups()
+            totals[(view, method)][kind] = float(value)
+    return {
+        key: values["sum"] / values["count"]
+        for key, values in totals.items()
+        if values.get("count")
+    }
+
+
+def run_user(
+    args: argparse.Namespace,
+    token: str,
+    handles: Handles,
+    tasks: dict[str, Task],
+    number: int,
+    start: float,
+    deadline: float,
+    samples: dict[str, list[float]],
+    failures: Counter,
+    lock: threading.Lock,
+) -> None:
+    rng = random.Random(args.seed + number)
+    session = Session(args.base_url, token)
+    names = list(tasks)
+    weights = [tasks[name].weight for name in names]
+    time.sleep(args.ramp_up * number / args.users)
+    latencies: dict[str, list[float]] = defaultdict(list)
+    failed: Counter = Counter()
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        task = tasks[name]
+        path, data = task.request(handles, rng)
+        started = time.perf_counter()
+        try:
+            status, _ = session.request(task.method, path, data)
+        except (OSError, http.client.HTTPException):
+            status = 0
+        finished = time.perf_counter()
+        # Requests of the ramp-up are sent but not measured
+        if started >= start + args.ramp_up:
+            if status >= 400 or status == 0:
+                failed[name] += 1
+            else:
+                latencies[name].append(finished - started)
+        time.sleep(rng.uniform(args.min_wait, args.max_wait))
+    with lock:
+        for name, values in latencies.items():
+            samples[name] += values
+        failures.update(failed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=60, help="seconds")
+    parser.add_argument("--ramp-up", type=float, default=5, help="seconds")
+    parser.add_argument("--min-wait", type=float, default=0.05, help="think time")
+    parser.add_argument("--max-wait", type=float, default=0.5, help="think time")
+    parser.add_argument("--writes", action="store_true", help="send status events")
+    parser.add_argument("--sample", type=int, default=500, help="flights to pick")
+    parser.add_argument("--username", default="benchmark")
+    parser.add_argument("--password", default="benchmark-load")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="JSON file (default: stdout)")
+    args = parser.parse_args()
+
+    token = authenticate(args.base_url, args.username, args.password)
+    handles = discover(Session(args.base_url, token), args.sample)
+    tasks = {**TASKS, **(WRITE_TASKS if args.writes else {})}
+
+    samples: dict[str, list[float]] = defaultdict(list)
+    failures: Counter = Counter()
+    lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + args.ramp_up + args.duration
+    users = [
+        threading.Thread(
+            target=run_user,
+            args=(
+                args,
+                token,
+                handles,
+                tasks,
+                n,
+                start,
+                deadline,
+                samples,
+                failures,
+                lock,
+            ),
+        )
+        for n in range(args.users)
+    ]
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+
+    queries = sql_queries_per_view(Session(args.base_url, token))
+    results = {}
+    for name, task in tasks.items():
+        latencies = samples.get(name, [])
+        query_mean = queries.get((task.view, task.method))
+        results[name] = {
+            "requests": len(latencies),
+            "failures": failures[name],
+            "requests_per_second": round(len(latencies) / args.duration, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+            "queries": round(query_mean, 2) if query_mean is not None else None,
+        }
+    total = sum(result["requests"] for result in results.values())
+    output = {
+        **git_revision(),
+        "benchmark": "load",
+        "settings": {
+            name: value
+            for name, value in vars(args).items()
+            if name not in ("output", "password")
+        },
+        "requests_per_second": round(total / args.duration, 2),
+        "actions": results,
+    }
+    text = json.dumps(output, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Cost of the request metrics middleware on the hot read endpoints.
+
+Each endpoint is called in alternating rounds through two test clients, one
+built with ``agoa.metrics.MetricsMiddleware`` and one without, on a seeded
+SQLite database. The median request time of each side and the relative
+overhead are printed as JSON.
+
+    python benchmarks/metrics_overhead.py --rounds 20 --requests 25
+"""
+
+import argparse
+import json
+import statistics
+import time
+from datetime import date
+
+from common import auth_header, seed, setup_django
+
+DAY = date(2024, 3, 20)
+
+# name -> (path, query parameters)
+ENDPOINTS = {
+    "by_date_and_airport": (
+        "/api/turnarounds/by_date_and_airport/",
+        {"date": DAY.isoformat(), "airport": "CDG"},
+    ),
+    "flight_lookup": (
+        "/api/flights/lookup/",
+        {"flight_number": "AF00000D", "date": DAY.isoformat()},
+    ),
+    "flight_search": (
+        "/api/flights/",
+        {"departure_airport": "CDG", "date": DAY.isoformat(), "page_size": 50},
+    ),
+}
+
+MIDDLEWARE = "agoa.metrics.MetricsMiddleware"
+
+
+def client(with_metrics: bool):
+    from django.conf import settings
+    from django.test import Client
+    from django.test.utils import override_settings
+
+    middleware = [name for name in settings.MIDDLEWARE if name != MIDDLEWARE]
+    if with_metrics:
+        middleware.insert(0, MIDDLEWARE)
+    instance = Client()
+    # The handler loads the middleware on its first request
+    with override_settings(MIDDLEWARE=middleware):
+        instance.get("/api/_metrics")
+    return instance
+
+
+def timed_round(client, path: str, params: dict, headers: dict, requests: int):
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(path, params, headers=headers)
+        assert response.status_code == 200, response.content
+    return (time.perf_counter() - started) / requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turnarounds", type=int, default=500, help="per airport")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=25, help="per round")
+    args = parser.parse_args()
+
+    setup_django()
+    seed(DAY, args.turnarounds)
+    headers = auth_header()
+    clients = {"without": client(False), "with": client(True)}
+
+    results = {"settings": vars(args), "endpoints": {}}
+    for name, (path, params) in ENDPOINTS.items():
+        rounds = {side: [] for side in clients}
+        for _ in range(args.rounds):
+            for side, instance in clients.items():
+                rounds[side].append(
+                    timed_round(instance, path, params, headers, args.requests)
+                )
+        medians = {side: statistics.median(times) for side, times in rounds.items()}
+        results["endpoints"][name] = {
+            "without_ms": round(medians["without"] * 1000, 3),
+            "with_ms": round(medians["with"] * 1000, 3),
+            "overhead_percent": round(
+                (medians["with"] / medians["without"] - 1) * 100, 2
+            ),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
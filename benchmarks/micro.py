@@ -0,0 +1,335 @@
+"""
+Micro-benchmarks of every viewset action and of the model serializers.
+
+A throwaway SQLite database is filled by the synthetic generator, then each
+action is called ``--requests`` times in process through the test client
+and each serializer renders ``--rows`` rows ``--requests`` times. Per
+action the latency percentiles, SQL queries per request and response size
+are written as JSON, with the commit they were measured on, for
+``compare.py``:
+
+    python benchmarks/micro.py --output micro-$(git rev-parse --short HEAD).json
+"""
+
+import argparse
+import json
+import statistics
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from functools import cache
+from pathlib import Path
+from typing import Callable, Optional
+
+from common import auth_header, git_revision, percentile, setup_django
+from generate import generate
+
+# Flights created by the write benchmarks depart from this time onwards
+WRITE_START = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass
+class Call:
+    method: str
+    path: str
+    # Query parameters of a GET, JSON body otherwise
+    data: dict | list = field(default_factory=dict)
+
+
+def summarise(latencies: list[float], queries: list[int]) -> dict:
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "queries": max(queries),
+    }
+
+
+def action_calls(dataset: dict) -> dict[str, Callable[[int], Call]]:
+    """Action name -> the request of each iteration"""
+    from agoa.models import Airline, Airport, Flight, Turnaround
+
+    day = dataset["first_day"]
+    next_day = (datetime.fromisoformat(day) + timedelta(days=1)).date().isoformat()
+    code = dataset["busiest_airport"]
+    airport = Airport.objects.get(iata_code=code)
+    airline = Airline.objects.order_by("pk").first()
+    flight = Flight.objects.get(
+        flight_number=dataset["flight_number"],
+        scheduled_departure__date=day,
+    )
+    turnaround = Turnaround.objects.filter(airport=airport).order_by("pk").first()
+    rows = {"date": day, "airport": code}
+
+    def new_flight(i: int, by_code: bool = False) -> dict:
+        """A flight to create, its airline and airports by id or IATA code"""
+        departure = WRITE_START + timedelta(minutes=i)
+        ends = (airport, flight.arrival_airport)
+        if by_code:
+            keys = [airline.iata_code] + [end.iata_code for end in ends]
+        else:
+            keys = [airline.pk] + [end.pk for end in ends]
+        return {
+            "flight_number": f"ZZ{i}",
+            "airline": keys[0],
+            "departure_airport": keys[1],
+            "arrival_airport": keys[2],
+            "scheduled_departure": departure.isoformat(),
+            "scheduled_arrival": (departure + timedelta(hours=2)).isoformat(),
+        }
+
+    @cache
+    def created() -> list[int]:
+        return list(
+            Flight.objects.filter(scheduled_departure__gte=WRITE_START)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+
+    def flight_time(i: int) -> str:
+        return (flight.scheduled_departure + timedelta(seconds=i)).isoformat()
+
+    flights, turnarounds = "/api/flights/", "/api/turnarounds/"
+    return {
+        "airline-list": lambda i: Call("get", "/api/airlines/"),
+        "airline-detail": lambda i: Call("get", f"/api/airlines/{airline.pk}/"),
+        "airport-list": lambda i: Call("get", "/api/airports/"),
+        "airport-detail": lambda i: Call("get", f"/api/airports/{airport.pk}/"),
+        "airport-occupancy": lambda i: Call(
+            "get", f"/api/airports/{airport.pk}/occupancy/", {"date": day}
+        ),
+        "flight-list": lambda i: Call("get", flights, {"page_size": 100}),
+        "flight-list-expand": lambda i: Call(
+            "get",
+            flights,
+            {"page_size": 100, "expand": "airline,departure_airport,arrival_airport"},
+        ),
+        "flight-list-search": lambda i: Call(
+            "get", flights, {"departure_airport": code, "date": day, "page_size": 100}
+        ),
+        "flight-list-delayed": lambda i: Call(
+            "get", flights, {"delayed": "true", "date": day, "page_size": 100}
+        ),
+        "flight-list-changed-since": lambda i: Call(
+            "get", flights, {"changed_since": datetime.now(timezone.utc).isoformat()}
+        ),
+        "flight-detail": lambda i: Call("get", f"{flights}{flight.pk}/"),
+        "flight-lookup": lambda i: Call(
+            "get",
+            f"{flights}lookup/",
+            {"flight_number": flight.flight_number, "date": day},
+        ),
+        "flight-export": lambda i: Call("get", f"{flights}export/", rows),
+        "flight-create": lambda i: Call("post", flights, new_flight(i)),
+        "flight-partial-update": lambda i: Call(
+            "patch", f"{flights}{flight.pk}/", {"actual_departure": flight_time(i)}
+        ),
+        "flight-bulk": lambda i: Call(
+            "post", f"{flights}bulk/", [new_flight(j, by_code=True) for j in range(100)]
+        ),
+        "flight-events": lambda i: Call(
+            "post",
+            f"{flights}events/",
+            [{"flight": flight.pk, "event": "ETA", "time": flight_time(i)}],
+        ),
+        "flight-destroy": lambda i: Call("delete", f"{flights}{created()[i]}/"),
+        "turnaround-list": lambda i: Call("get", turnarounds, {"page_size": 100}),
+        "turnaround-list-expand": lambda i: Call(
+            "get",
+            turnarounds,
+            {
+                "page_size": 100,
+                "expand": "airport,arrival_flight,departure_flight,airline",
+            },
+        ),
+        "turnaround-detail": lambda i: Call("get", f"{turnarounds}{turnaround.pk}/"),
+        "turnaround-by-date-and-airport": lambda i: Call(
+            "get", f"{turnarounds}by_date_and_airport/", rows
+        ),
+        "turnaround-export": lambda i: Call("get", f"{turnarounds}export/", rows),
+        "turnaround-validate": lambda i: Call("get", f"{turnarounds}validate/", rows),
+        "turnaround-average-duration": lambda i: Call(
+            "get",
+            f"{turnarounds}average_duration/",
+            {"date": day, "group_by": "airport", "percentiles": "true"},
+        ),
+        "turnaround-punctuality": lambda i: Call(
+            "get",
+            f"{turnarounds}punctuality/",
+            {"from": day, "to": next_day, "group_by": "airline"},
+        ),
+        "turnaround-punctuality-ranking": lambda i: Call(
+            "get",
+            f"{turnarounds}punctuality_ranking/",
+            {"from": day, "to": next_day},
+        ),
+        "turnaround-match": lambda i: Call(
+            "post", f"{turnarounds}match/", {**rows, "dry_run": True}
+        ),
+    }
+
+
+def run_actions(
+    calls: dict[str, Callable[[int], Call]],
+    headers: dict,
+    requests: int,
+    only: Optional[str],
+) -> dict:
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client()
+    results = {}
+    for name, make in calls.items():
+        if only and only not in name:
+            continue
+        latencies, queries, sizes = [], [], []
+        for i in range(requests + 1):
+            call = make(i)
+            if call.method == "get":
+                kwargs = {"data": call.data}
+            else:
+                kwargs = {"data": call.data, "content_type": "application/json"}
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = getattr(client, call.method)(
+                    call.path, headers=headers, **kwargs
+                )
+                body = (
+                    b"".join(response.streaming_content)
+                    if response.streaming
+                    else response.content
+                )
+                elapsed = time.perf_counter() - started
+            assert response.status_code < 400, (name, response.status_code, body)
+            if i == 0:
+                continue  # warm-up
+            latencies.append(elapsed)
+            queries.append(len(captured))
+            sizes.append(len(body))
+        results[name] = {**summarise(latencies, queries), "bytes": max(sizes)}
+    return results
+
+
+def run_serializers(rows: int, requests: int) -> dict:
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    from agoa.models import Flight, Turnaround
+    from agoa.serializers import (
+        FlightBulkRowSerializer,
+        FlightSerializer,
+        RowSerializer,
+        TurnaroundSerializer,
+    )
+
+    flight_expand = {"airline", "departure_airport", "arrival_airport"}
+    turnaround_expand = {"airport", "arrival_flight", "departure_flight"}
+    flights = list(Flight.objects.order_by("pk")[:rows])
+    expanded_flights = list(
+        Flight.objects.select_related(*flight_expand).order_by("pk")[:rows]
+    )
+    turnarounds = list(Turnaround.objects.order_by("pk")[:rows])
+    expanded_turnarounds = list(
+        Turnaround.objects.select_related(
+            *TurnaroundSerializer.select_related_paths(turnaround_expand)
+        ).order_by("pk")[:rows]
+    )
+    flight_rows = RowSerializer.for_serializer(FlightSerializer)
+    flight_values = list(flight_rows.values(Flight.objects.order_by("pk")[:rows]))
+    turnaround_rows = RowSerializer.for_serializer(TurnaroundSerializer)
+    turnaround_values = list(
+        turnaround_rows.values(Turnaround.objects.order_by("pk")[:rows])
+    )
+    upload = [
+        {
+            **FlightSerializer(flight).data,
+            "airline": "AA",
+            "departure_airport": "AAA",
+            "arrival_airport": "AAB",
+        }
+        for flight in flights
+    ]
+
+    # name -> callable rendering or validating the rows once
+    cases = {
+        "FlightSerializer": lambda: FlightSerializer(flights, many=True).data,
+        "FlightSerializer-expand": lambda: FlightSerializer(
+            expanded_flights, many=True, context={"expand": flight_expand}
+        ).data,
+        "TurnaroundSerializer": lambda: TurnaroundSerializer(
+            turnarounds, many=True
+        ).data,
+        "TurnaroundSerializer-expand": lambda: TurnaroundSerializer(
+            expanded_turnarounds,
+            many=True,
+            context={"expand": turnaround_expand | flight_expand},
+        ).data,
+        "FlightSerializer-rows": lambda: flight_rows.to_representation(flight_values),
+        "TurnaroundSerializer-rows": lambda: turnaround_rows.to_representation(
+            turnaround_values
+        ),
+        "FlightBulkRowSerializer-validate": lambda: FlightBulkRowSerializer(
+            data=upload, many=True
+        ).is_valid(raise_exception=True),
+    }
+    results = {}
+    for name, render in cases.items():
+        render()  # warm-up
+        latencies, queries = [], []
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                render()
+                latencies.append(time.perf_counter() - started)
+            queries.append(len(captured))
+        results[name] = {**summarise(latencies, queries), "rows": rows}
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--airports", type=int, default=40)
+    parser.add_argument("--airlines", type=int, default=10)
+    parser.add_argument("--aircraft", type=int, default=300)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=30, help="per action")
+    parser.add_argument("--rows", type=int, default=500, help="per serializer call")
+    parser.add_argument("--only", help="run the actions whose name contains this")
+    parser.add_argument("--output", type=Path, help="JSON file (default: stdout)")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test.utils import override_settings
+
+    dataset = generate(
+        args.airports, args.airlines, args.aircraft, args.days, seed=args.seed
+    )
+    headers = auth_header()
+    # Status events are applied within the request rather than by a timer
+    with override_settings(
+        AGOA_STATUS_EVENT_WINDOW=timedelta(0), AGOA_PUSH_DEBOUNCE=timedelta(0)
+    ):
+        actions = run_actions(action_calls(dataset), headers, args.requests, args.only)
+    results = {
+        **git_revision(),
+        "benchmark": "micro",
+        "settings": {
+            name: value for name, value in vars(args).items() if name != "output"
+        },
+        "dataset": dataset,
+        "actions": actions,
+        "serializers": {} if args.only else run_serializers(args.rows, args.requests),
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
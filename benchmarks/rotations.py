@@ -0,0 +1,113 @@
+"""
+Speed of the rotation graph: loading a day, delay what-ifs and syncing.
+
+The synthetic generator fills a throwaway SQLite database, and the actual
+times of its middle day are cleared, as if the day were being planned. The
+rotation graph of that day is loaded, ``--what-ifs`` random flights are
+delayed by up to three hours each, and ``--changes`` flights get new
+estimates before the graph is synced again. The timings are printed as
+JSON:
+
+    python benchmarks/rotations.py --aircraft 3000 --what-ifs 1000
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+
+from common import git_revision, percentile, setup_django
+from generate import generate
+
+
+def milliseconds(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--airports", type=int, default=100)
+    parser.add_argument("--airlines", type=int, default=20)
+    parser.add_argument("--aircraft", type=int, default=3000)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--what-ifs", type=int, default=1000)
+    parser.add_argument("--changes", type=int, default=100)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.utils import timezone
+
+    from agoa.models import Flight
+    from agoa.rotations import RotationGraph
+    from agoa.utils import days_bounds
+
+    dataset = generate(
+        args.airports, args.airlines, args.aircraft, args.days, seed=args.seed
+    )
+    day = date.fromisoformat(dataset["first_day"]) + timedelta(days=args.days // 2)
+
+    # Plan the day as if it had not flown yet: departed flights stop delays
+    start, end = days_bounds(day, day + timedelta(days=1))
+    Flight.objects.filter(
+        scheduled_departure__gte=start, scheduled_departure__lt=end
+    ).update(actual_departure=None, actual_arrival=None)
+
+    started = time.perf_counter()
+    graph = RotationGraph.load(day, day + timedelta(days=1))
+    load_seconds = time.perf_counter() - started
+
+    rng = random.Random(args.seed)
+    flight_ids = list(graph.ids)
+    latencies, knock_ons = [], []
+    for _ in range(args.what_ifs):
+        delay = timedelta(minutes=rng.randrange(15, 180))
+        started = time.perf_counter()
+        simulation = graph.simulate({rng.choice(flight_ids): delay})
+        latencies.append(time.perf_counter() - started)
+        knock_ons.append(len(simulation.flights) - 1)
+
+    # A whole network's worth of delays at once
+    delays = {
+        flight_id: timedelta(minutes=30)
+        for flight_id in rng.sample(flight_ids, len(flight_ids) // 10)
+    }
+    started = time.perf_counter()
+    network = graph.simulate(delays)
+    network_seconds = time.perf_counter() - started
+
+    changed = list(Flight.objects.filter(pk__in=rng.sample(flight_ids, args.changes)))
+    for flight in changed:
+        flight.estimated_departure = flight.scheduled_departure + timedelta(hours=1)
+        flight.updated_at = timezone.now()
+    Flight.objects.bulk_update(changed, ["estimated_departure", "updated_at"])
+    started = time.perf_counter()
+    graph.sync()
+    sync_seconds = time.perf_counter() - started
+
+    results = {
+        **git_revision(),
+        "benchmark": "rotations",
+        "settings": vars(args),
+        "dataset": dataset,
+        "graph": {"flights": len(graph), "turnarounds": graph.turnaround_count},
+        "load_ms": milliseconds(load_seconds),
+        "what_if": {
+            "p50_ms": milliseconds(percentile(latencies, 50)),
+            "p95_ms": milliseconds(percentile(latencies, 95)),
+            "max_ms": milliseconds(max(latencies)),
+            "mean_knock_on_flights": round(sum(knock_ons) / len(knock_ons), 2),
+        },
+        "network_what_if": {
+            "delayed_flights": len(delays),
+            "knock_on_flights": len(network.flights) - len(delays),
+            "ms": milliseconds(network_seconds),
+        },
+        "sync_ms": milliseconds(sync_seconds),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
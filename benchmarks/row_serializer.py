@@ -0,0 +1,92 @@
+"""
+Throughput of the values() fast path of the list endpoints against the DRF
+serializers.
+
+On a seeded SQLite database, each endpoint is requested in alternating
+rounds with ``RowSerializer`` enabled and disabled (the views then fall
+back to the model serializers and the standard JSON encoder). The bodies
+of both sides are checked to be identical, and the requests per second of
+each side and the speedup are printed as JSON.
+
+    python benchmarks/row_serializer.py --turnarounds 1250 --rounds 5
+"""
+
+import argparse
+import json
+import statistics
+import time
+from datetime import date
+from unittest import mock
+
+from common import auth_header, seed, setup_django
+
+DAY = date(2024, 3, 20)
+
+# name -> (path, query parameters)
+ENDPOINTS = {
+    "turnaround_list": ("/api/turnarounds/", {}),
+    "flight_list_by_date": ("/api/flights/", {"date": DAY.isoformat()}),
+    "by_date_and_airport": (
+        "/api/turnarounds/by_date_and_airport/",
+        {"date": DAY.isoformat(), "airport": "CDG"},
+    ),
+}
+
+
+def timed_round(client, path: str, params: dict, headers: dict, requests: int):
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(path, params, headers=headers)
+        assert response.status_code == 200, response.content
+    return (time.perf_counter() - started) / requests, response.content
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turnarounds", type=int, default=1250, help="per airport")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=3, help="per round")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import Client
+
+    from agoa.renderers import orjson
+    from agoa.serializers import RowSerializer
+
+    seed(DAY, args.turnarounds)
+    headers = auth_header()
+    client = Client()
+    disabled = mock.patch.object(RowSerializer, "for_serializer", return_value=None)
+
+    results = {
+        "settings": vars(args),
+        "orjson": orjson is not None,
+        "endpoints": {},
+    }
+    for name, (path, params) in ENDPOINTS.items():
+        rounds = {"serializer": [], "rows": []}
+        bodies = {}
+        for _ in range(args.rounds):
+            with disabled:
+                seconds, bodies["serializer"] = timed_round(
+                    client, path, params, headers, args.requests
+                )
+            rounds["serializer"].append(seconds)
+            seconds, bodies["rows"] = timed_round(
+                client, path, params, headers, args.requests
+            )
+            rounds["rows"].append(seconds)
+        assert bodies["rows"] == bodies["serializer"], f"{name}: bodies differ"
+        medians = {side: statistics.median(times) for side, times in rounds.items()}
+        results["endpoints"][name] = {
+            "rows": len(json.loads(bodies["rows"])),
+            "serializer_requests_per_second": round(1 / medians["serializer"], 2),
+            "rows_requests_per_second": round(1 / medians["rows"], 2),
+            "speedup": round(medians["serializer"] / medians["rows"], 2),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Speed and size of the columnar snapshots against an NDJSON dump.
+
+The synthetic generator fills a throwaway SQLite database. A full snapshot
+is written, then one day of flights is edited and the snapshot updated
+again, which should rewrite only that day. The same flights are dumped as
+NDJSON for comparison, and read back both ways. The timings and sizes are
+printed as JSON:
+
+    python benchmarks/snapshot.py --aircraft 3000 --days 7 --format parquet
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from common import git_revision, setup_django
+from generate import generate
+
+
+def size(path: Path) -> int:
+    return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--airports", type=int, default=100)
+    parser.add_argument("--airlines", type=int, default=20)
+    parser.add_argument("--aircraft", type=int, default=3000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=("parquet", "arrow"), default="parquet")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.utils import timezone
+
+    from agoa.export import FLIGHT_EXPORT_COLUMNS, _ndjson_lines
+    from agoa.models import Flight
+    from agoa.snapshot import pa, pq, write_snapshot
+    from agoa.utils import days_bounds
+
+    if pa is None:
+        parser.error("pyarrow is not installed")
+
+    dataset = generate(
+        args.airports, args.airlines, args.aircraft, args.days, seed=args.seed
+    )
+    root = Path(tempfile.mkdtemp())
+
+    started = time.perf_counter()
+    full = write_snapshot(root / "snapshot", output=args.format)
+    full_seconds = time.perf_counter() - started
+
+    day = date.fromisoformat(dataset["first_day"]) + timedelta(days=args.days // 2)
+    start, end = days_bounds(day, day)
+    Flight.objects.filter(
+        scheduled_departure__gte=start, scheduled_departure__lt=end
+    ).update(estimated_departure=None, updated_at=timezone.now())
+    started = time.perf_counter()
+    rerun = write_snapshot(root / "snapshot", output=args.format)
+    rerun_seconds = time.perf_counter() - started
+
+    dump = root / "flights.ndjson"
+    started = time.perf_counter()
+    rows = Flight.objects.values_list(*FLIGHT_EXPORT_COLUMNS.values()).iterator(
+        chunk_size=settings.AGOA_EXPORT_CHUNK_SIZE
+    )
+    with dump.open("w") as file:
+        file.writelines(_ndjson_lines(list(FLIGHT_EXPORT_COLUMNS), rows))
+    dump_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with dump.open() as file:
+        dumped = [json.loads(line) for line in file]
+    parse_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    if args.format == "parquet":
+        table = pq.read_table(root / "snapshot" / "flights")
+    else:
+        table = pa.concat_tables(
+            pa.ipc.open_file(path).read_all()
+            for path in sorted((root / "snapshot" / "flights").rglob("*.arrow"))
+        )
+    read_seconds = time.perf_counter() - started
+
+    results = {
+        **git_revision(),
+        "benchmark": "snapshot",
+        "settings": vars(args),
+        "dataset": dataset,
+        "snapshot": {
+            "files": len(full.written),
+            "rows": full.rows,
+            "bytes": size(root / "snapshot"),
+            "full_s": round(full_seconds, 3),
+            "rerun_files": len(rerun.written),
+            "rerun_s": round(rerun_seconds, 3),
+            "read_flights_s": round(read_seconds, 3),
+            "flights_read": table.num_rows,
+        },
+        "ndjson": {
+            "bytes": dump.stat().st_size,
+            "dump_s": round(dump_seconds, 3),
+            "parse_s": round(parse_seconds, 3),
+            "flights_read": len(dumped),
+        },
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Cost of authenticating a request with and without the token cache.
+
+On a throwaway SQLite database, the same bearer tokens (``--tokens`` users)
+are authenticated ``--requests`` times by simplejwt's ``JWTAuthentication``
+and by ``CachedJWTAuthentication``, and the mean time and SQL queries per
+request of each are printed as JSON, with the cost of a service-account
+login against a password login:
+
+    python benchmarks/token_auth.py --tokens 50 --requests 5000
+"""
+
+import argparse
+import json
+import time
+
+from common import git_revision, setup_django
+
+
+def measure(authenticator, requests: list) -> dict:
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        for request in requests:
+            authenticator.authenticate(request)
+        seconds = time.perf_counter() - started
+    return {
+        "mean_us": round(seconds / len(requests) * 1e6, 2),
+        "queries": round(len(queries) / len(requests), 3),
+    }
+
+
+def timed_logins(client, path: str, body: dict, count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        response = client.post(path, body, content_type="application/json")
+        assert response.status_code == 200, response.content
+    return round((time.perf_counter() - started) / count * 1000, 2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--logins", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.test import Client, RequestFactory
+    from rest_framework.request import Request
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from authentication.authentication import CachedJWTAuthentication
+    from authentication.models import ServiceAccount
+
+    users = [
+        User.objects.create_user(username=f"user{n}", password="benchmark-pass")
+        for n in range(args.tokens)
+    ]
+    tokens = [str(AccessToken.for_user(user)) for user in users]
+    factory = RequestFactory()
+    requests = [
+        Request(
+            factory.get(
+                "/api/flights/",
+                headers={"Authorization": f"Bearer {tokens[n % len(tokens)]}"},
+            )
+        )
+        for n in range(args.requests)
+    ]
+
+    _, key = ServiceAccount.create(users[0], ["read"])
+    client = Client()
+    results = {
+        **git_revision(),
+        "benchmark": "token_auth",
+        "settings": vars(args),
+        "authenticate": {
+            "JWTAuthentication": measure(JWTAuthentication(), requests),
+            "CachedJWTAuthentication": measure(CachedJWTAuthentication(), requests),
+        },
+        "login_ms": {
+            "password": timed_logins(
+                client,
+                "/api/auth/login/",
+                {"username": "user0", "password": "benchmark-pass"},
+                args.logins,
+            ),
+            "service_account": timed_logins(
+                client, "/api/auth/service-token/", {"key": key}, args.logins
+            ),
+        },
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()